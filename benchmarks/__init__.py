@@ -0,0 +1 @@
+# Performance benchmarks for the customer support multi-agent system
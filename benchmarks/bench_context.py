@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Prompt-context size before and after token-budgeted selection.
+
+For every synthetic user, builds the handler prompt context the way the
+handlers did before (top-2 similar issues plus the first two raw KB
+resolutions) and with ``build_memory_context`` (rolling summary, session
+turns, similar issues and KB resolutions packed into the budget), and
+reports prompt-context tokens and build time. The "verbose" corpus repeats
+each stored response to mimic long LLM answers, which is where the old
+context grew without bound.
+
+Usage:
+    python -m benchmarks.bench_context
+    python -m benchmarks.bench_context --users 500 --budget 400 --verbosity 8
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import percentile, print_table
+from benchmarks.synthetic_data import QUERY_TEMPLATES, generate_memory
+from src.context import build_memory_context, count_tokens, summarize_history
+from src.memory import match_knowledge_base, score_similar_issues
+
+
+def legacy_context(state: Dict[str, Any]) -> str:
+    """Handler context as built before the context budget"""
+    similar_issues = state.get('similar_past_issues', [])
+    kb_entry = state.get('knowledge_base_entry')
+    context = ""
+    if similar_issues:
+        context += "\nPast similar issues:\n"
+        for issue in similar_issues[:2]:
+            context += f"- Previous query: '{issue.get('query', '')}'\n"
+            context += f"  Resolution: {issue.get('resolution', 'N/A')}\n"
+    if kb_entry:
+        context += f"\nKnowledge base for {kb_entry.get('categories', [])}:\n"
+        context += f"Frequent resolutions: {kb_entry.get('resolutions', [])[:2]}\n"
+    return context
+
+
+def make_states(args, verbosity: int) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    memory = generate_memory(args.users, args.conversations, kb_entries=15, patterns=0, seed=args.seed)
+    for entry in memory["knowledge_base"].values():
+        entry["resolutions"] = [" ".join([r] * verbosity) for r in entry["resolutions"]]
+
+    states = []
+    for profile in memory["user_profiles"].values():
+        for conversation in profile["conversation_history"]:
+            conversation["response"] = " ".join([conversation["response"]] * verbosity)
+        category = rng.choice(list(QUERY_TEMPLATES))
+        query = rng.choice(QUERY_TEMPLATES[category]).format(order_id=rng.randint(10000, 99999), amount=42)
+        # A follow-up turn: the previous exchange is in the session history
+        previous = profile["conversation_history"][-1]
+        states.append({
+            "query": query,
+            "categories": [category],
+            "similar_past_issues": score_similar_issues(profile["conversation_history"], query, [category]),
+            "knowledge_base_entry": match_knowledge_base(memory["knowledge_base"], [category]),
+            "user_summary": summarize_history(profile["conversation_history"]),
+            "conversation_history": [{"role": "user", "content": previous["query"]},
+                                     {"role": "assistant", "content": previous["response"]},
+                                     {"role": "user", "content": query}],
+        })
+    return states
+
+
+def measure(states: List[Dict[str, Any]], build) -> Dict[str, float]:
+    tokens, seconds = [], 0.0
+    for state in states:
+        start = time.perf_counter()
+        context = build(state)
+        seconds += time.perf_counter() - start
+        tokens.append(count_tokens(context))
+    return {"mean_tokens": round(sum(tokens) / len(tokens), 1), "p95_tokens": percentile(tokens, 95),
+            "max_tokens": max(tokens), "us_per_build": round(seconds * 1e6 / len(states), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--conversations", type=int, default=120, help="Conversations per user (50 are kept)")
+    parser.add_argument("--budget", type=int, default=600, help="Context token budget")
+    parser.add_argument("--verbosity", type=int, default=6, help="Response repetition for the verbose corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+    for corpus, verbosity in (("synthetic", 1), ("verbose", args.verbosity)):
+        states = make_states(args, verbosity)
+        results[f"{corpus}/before"] = measure(states, legacy_context)
+        results[f"{corpus}/after"] = measure(states, lambda state: build_memory_context(state, args.budget))
+
+    print(f"Prompt context tokens ({args.users} users, budget {args.budget})")
+    print_table(results, ["mean_tokens", "p95_tokens", "max_tokens", "us_per_build"])
+    over = [name for name, result in results.items() if name.endswith("after") and result["max_tokens"] > args.budget]
+    if over:
+        print(f"\n❌ Context over budget in {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Entity index lookups at scale.
+
+Stores synthetic conversations mentioning ``--entities`` distinct order ids
+(``--refs`` conversations each, spread over many users), then compares
+finding every conversation about one order with the entity index against
+scanning every user's conversation history, which was the only way before.
+Reports the time to build the index, lookup p50/p95 and, for SQLite,
+save_conversation latency with the index at that size (the incremental
+maintenance cost).
+
+Usage:
+    python -m benchmarks.bench_entity_index
+    python -m benchmarks.bench_entity_index --entities 2000000 --refs 2 --backends sqlite
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import percentile, print_table
+from benchmarks.synthetic_data import make_conversation
+from src.memory import AgentMemory, entity_refs, index_entity_refs
+from src.memory_sqlite import SQLiteAgentMemory
+
+USERS_PER_ENTITY = 50_000  # users the conversations are spread over, per million entities
+
+
+def synthetic_refs(entities: int, refs_per_entity: int, seed: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(entity key, reference) in chronological order, each order mentioned by refs_per_entity conversations"""
+    rng = random.Random(seed)
+    users = max(1, entities * USERS_PER_ENTITY // 1_000_000)
+    start = datetime(2025, 1, 1)
+    for i in range(entities * refs_per_entity):
+        conversation = make_conversation(rng, start + timedelta(seconds=i))
+        conversation["entities"] = {"order_id": str(10_000_000 + i % entities)}
+        yield from entity_refs(f"user_{rng.randrange(users)}", conversation)
+
+
+def lookup_latencies(find, entities: int, lookups: int, seed: int) -> List[float]:
+    rng = random.Random(seed + 1)
+    latencies = []
+    for _ in range(lookups):
+        order_id = str(10_000_000 + rng.randrange(entities))
+        start = time.perf_counter()
+        refs = find(order_id)
+        latencies.append(time.perf_counter() - start)
+        assert refs, order_id
+    return latencies
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    ms = [latency * 1000.0 for latency in latencies]
+    return {"lookup_p50_ms": round(percentile(ms, 50), 3), "lookup_p95_ms": round(percentile(ms, 95), 3)}
+
+
+def run_json(args) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    start = time.perf_counter()
+    index: Dict[str, List[Dict[str, Any]]] = {}
+    history: List[Tuple[str, Dict[str, Any]]] = []
+    for key, ref in synthetic_refs(args.entities, args.refs, args.seed):
+        index_entity_refs(index, [(key, ref)])
+        history.append((key, ref))
+    build_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        memory.memory = {"user_profiles": {}, "successful_patterns": {}, "knowledge_base": {}, "entity_index": index,
+                         "stats": {"total_conversations": len(history), "resolved_issues": 0}}
+        latencies = lookup_latencies(lambda order_id: memory.find_conversations_by_entity("order_id", order_id),
+                                     args.entities, args.lookups, args.seed)
+    results["json/index"] = {"build_s": round(build_s, 2), **summarize(latencies)}
+
+    # Before the index: walk every stored conversation
+    def scan(order_id: str):
+        key = f"order_id:{order_id}"
+        return [ref for ref_key, ref in history if ref_key == key]
+    latencies = lookup_latencies(scan, args.entities, args.scan_lookups, args.seed)
+    results["json/scan"] = summarize(latencies)
+    return results
+
+
+def run_sqlite(args) -> Dict[str, Dict[str, Any]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = SQLiteAgentMemory(os.path.join(tmp, "memory.db"))
+        memory.load()
+        start = time.perf_counter()
+        with memory.batch():
+            conn = memory._connect()
+            conn.executemany("INSERT INTO entity_refs (entity_key, data) VALUES (?, ?)",
+                             ((key, json.dumps(ref)) for key, ref in synthetic_refs(args.entities, args.refs, args.seed)))
+        build_s = time.perf_counter() - start
+        size_mb = os.path.getsize(memory.storage_path) / 1e6
+
+        latencies = lookup_latencies(lambda order_id: memory.find_conversations_by_entity("order_id", order_id),
+                                     args.entities, args.lookups, args.seed)
+        result = {"build_s": round(build_s, 2), **summarize(latencies), "db_mb": round(size_mb, 1)}
+
+        rng = random.Random(args.seed + 2)
+        saves = []
+        for i in range(args.saves):
+            conversation = make_conversation(rng, datetime.now())
+            conversation["entities"] = {"order_id": str(10_000_000 + rng.randrange(args.entities))}
+            conversation["satisfactory"] = False
+            start = time.perf_counter()
+            memory.save_conversation(f"writer_{i}", conversation)
+            saves.append((time.perf_counter() - start) * 1000.0)
+        result["save_p50_ms"] = round(percentile(saves, 50), 3)
+        memory.close()
+    return {"sqlite/index": result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=1_000_000, help="Distinct order ids indexed")
+    parser.add_argument("--refs", type=int, default=1, help="Conversations per order id")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--scan-lookups", type=int, default=10, help="Lookups for the history-scan baseline")
+    parser.add_argument("--saves", type=int, default=500, help="save_conversation calls against the full index")
+    parser.add_argument("--backends", default="json,sqlite")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from src.tracing import set_exporter
+    set_exporter(None)
+
+    results = {}
+    for backend in args.backends.split(","):
+        results.update({"json": run_json, "sqlite": run_sqlite}[backend](args))
+        print(f"  finished {backend}", file=sys.stderr)
+
+    print(f"Entity index ({args.entities:,} order ids x {args.refs} conversations)")
+    print_table(results, ["build_s", "lookup_p50_ms", "lookup_p95_ms", "save_p50_ms", "db_mb"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Frontend page loads: the old static server against the new one.
+
+    legacy    socketserver.TCPServer + SimpleHTTPRequestHandler on frontend/
+              (one request at a time, HTTP/1.0, no compression, no Cache-Control)
+    threaded  servers/frontend_server.py: threaded, keep-alive, hashed and
+              precompressed assets from src/static_assets.py
+
+``--clients`` simulated browsers each load the page ``--loads`` times,
+keeping one connection per browser where the server allows it. A page load
+fetches index.html and every asset it references, the way a browser would:
+the first load downloads everything (gzip accepted); later loads reuse the
+cache, revalidating with If-None-Match / If-Modified-Since unless the
+response was marked immutable. With ``--stalled N``, N extra connections
+send half a request and then hang for the whole run (slow mobile clients).
+
+Reports page loads per second, page-load latency p50/p95, bytes on the
+wire per first and repeat load, and page loads that failed (timed out).
+
+Usage:
+    python -m benchmarks.bench_frontend
+    python -m benchmarks.bench_frontend --clients 16 --loads 50 --stalled 2
+"""
+
+import argparse
+import gzip
+import http.client
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "servers"))
+
+from benchmarks.harness import percentile, print_table
+from frontend_server import make_server
+
+FRONTEND = Path(__file__).resolve().parents[1] / "frontend"
+REFERENCE = re.compile(rb'\b(?:href|src)="([^":]+)"')
+TIMEOUT_SECONDS = 5.0
+
+
+class QuietLegacyHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietTCPServer(socketserver.TCPServer):
+    def handle_error(self, request, client_address):
+        pass  # clients that gave up waiting (broken pipe)
+
+
+def start_legacy():
+    server = QuietTCPServer(("127.0.0.1", 0), partial(QuietLegacyHandler, directory=str(FRONTEND)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_threaded():
+    server = make_server("127.0.0.1", 0, str(FRONTEND))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Browser:
+    """One client with an HTTP cache and (when the server allows it) a kept-alive connection"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.connection: Optional[http.client.HTTPConnection] = None
+        self.cache: Dict[str, Dict[str, Any]] = {}
+
+    def fetch(self, path: str) -> Tuple[bytes, int]:
+        cached = self.cache.get(path)
+        if cached and "immutable" in cached["cache_control"]:
+            return cached["body"], 0
+        headers = {"Accept-Encoding": "gzip"}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        elif cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=TIMEOUT_SECONDS)
+        self.connection.request("GET", path, headers=headers)
+        response = self.connection.getresponse()
+        body = response.read()
+        wire = len(body) + sum(len(name) + len(value) + 4 for name, value in response.getheaders())
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        if response.status == 304:
+            return cached["body"], wire
+        if response.getheader("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        self.cache[path] = {"body": body, "etag": response.getheader("ETag"),
+                            "last_modified": response.getheader("Last-Modified"),
+                            "cache_control": response.getheader("Cache-Control") or ""}
+        return body, wire
+
+    def load_page(self) -> int:
+        index, wire = self.fetch("/")
+        for reference in REFERENCE.findall(index):
+            path = reference.decode()
+            _, asset_wire = self.fetch(path if path.startswith("/") else "/" + path)
+            wire += asset_wire
+        return wire
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def stall(port: int, stop: threading.Event):
+    with socket.create_connection(("127.0.0.1", port)) as conn:
+        conn.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n")
+        stop.wait()
+
+
+def run_server(start, args) -> Dict[str, Any]:
+    server = start()
+    port = server.server_address[1]
+    stop = threading.Event()
+    stallers = [threading.Thread(target=stall, args=(port, stop), daemon=True) for _ in range(args.stalled)]
+    for staller in stallers:
+        staller.start()
+    time.sleep(0.1)
+
+    lock = threading.Lock()
+    latencies: List[float] = []
+    first_bytes: List[int] = []
+    repeat_bytes: List[int] = []
+    failures = [0]
+
+    def client():
+        browser = Browser(port)
+        for load in range(args.loads):
+            start_time = time.perf_counter()
+            try:
+                wire = browser.load_page()
+            except (OSError, http.client.HTTPException):
+                browser.close()
+                browser.connection = None
+                with lock:
+                    failures[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start_time)
+                (first_bytes if load == 0 else repeat_bytes).append(wire)
+        browser.close()
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    stop.set()
+    server.shutdown()
+    server.server_close()
+
+    ms = [latency * 1000.0 for latency in latencies]
+    return {
+        "loads_per_s": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "first_load_kb": round(sum(first_bytes) / len(first_bytes) / 1024, 1) if first_bytes else "",
+        "repeat_load_kb": round(sum(repeat_bytes) / len(repeat_bytes) / 1024, 2) if repeat_bytes else "",
+        "failed": failures[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent simulated browsers")
+    parser.add_argument("--loads", type=int, default=25, help="Page loads per browser")
+    parser.add_argument("--stalled", type=int, default=0, help="Connections that send half a request and hang")
+    parser.add_argument("--servers", default="legacy,threaded")
+    args = parser.parse_args()
+
+    starters = {"legacy": start_legacy, "threaded": start_threaded}
+    results = {}
+    for name in args.servers.split(","):
+        results[name] = run_server(starters[name], args)
+        print(f"  finished {name}", file=sys.stderr)
+
+    print(f"Frontend page loads: {args.clients} browsers x {args.loads} loads, {args.stalled} stalled connections")
+    print_table(results, ["loads_per_s", "p50_ms", "p95_ms", "first_load_kb", "repeat_load_kb", "failed"])
+
+
+if __name__ == "__main__":
+    main()
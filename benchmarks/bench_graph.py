@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the support graph and the FastAPI app.
+
+Runs create_graph() and the /api/v1/support/query endpoint against the
+deterministic FakeChatModel at increasing concurrency and reports
+throughput, p50/p95/p99 latency, LLM calls per request and memory-store
+cost. Memory writes go through the write-behind queue as they do in the
+server (memory cost includes draining it). Exits non-zero when a metric
+regresses past the stored baseline.
+
+Usage:
+    python -m benchmarks.bench_graph
+    python -m benchmarks.bench_graph --target api --concurrency 1,8,64
+    python -m benchmarks.bench_graph --update-baseline
+    python -m benchmarks.bench_graph --sync-memory   # memory writes on the request path
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import (
+    compare_to_baseline, isolated_runtime, load_baseline, print_table, save_baseline, summarize_latencies,
+)
+from src.fake_llm import LATENCY_DISTRIBUTIONS, FakeChatModel
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "bench_graph.json"
+DEFAULT_CONCURRENCY = "1,4,16,64,256"
+
+QUERIES = [
+    "I have a billing issue with order 12345",
+    "My app keeps crashing after the latest update",
+    "I want to return the shoes from order 98765",
+    "hi",
+    "I was charged twice and the website shows an error",
+    "How do I change my account email?",
+]
+
+
+def build_state(query: str, user_id: str) -> Dict:
+    return {
+        "query": query,
+        "user_id": user_id,
+        "categories": [],
+        "entities": {},
+        "sentiment": None,
+        "priority": None,
+        "response": None,
+        "escalation_needed": False,
+        "attempts": 0,
+        "conversation_history": [],
+        "satisfactory": None,
+        "similar_past_issues": [],
+        "knowledge_base_entry": None,
+        "memory_loaded": False
+    }
+
+
+def run_graph_level(concurrency: int, total: int, users: int) -> Tuple[List[float], int, float]:
+    from src.graph import create_graph
+
+    app = create_graph()
+    errors = 0
+
+    def one(i: int) -> float:
+        start = time.perf_counter()
+        app.invoke(build_state(QUERIES[i % len(QUERIES)], f"bench_user_{i % users}"))
+        return time.perf_counter() - start
+
+    latencies = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(one, i) for i in range(total)]:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    return latencies, errors, time.perf_counter() - start
+
+
+def run_api_level(concurrency: int, total: int, users: int) -> Tuple[List[float], int, float]:
+    import httpx
+    from src.api import app
+
+    async def drive():
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def one(i: int):
+                nonlocal errors
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post("/api/v1/support/query", json={
+                        "query": QUERIES[i % len(QUERIES)],
+                        "user_id": f"bench_user_{i % users}",
+                    })
+                    if response.status_code == 200:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(total)))
+            return latencies, errors, time.perf_counter() - start
+
+    return asyncio.run(drive())
+
+
+RUNNERS = {"graph": run_graph_level, "api": run_api_level}
+
+
+def run_benchmark(args) -> Dict[str, Dict[str, float]]:
+    results = {}
+    targets = ["graph", "api"] if args.target == "both" else [args.target]
+    for target in targets:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            total = max(args.requests, concurrency * 2)
+            llm = FakeChatModel(
+                latency_ms=args.latency_ms,
+                latency_distribution=args.distribution,
+                latency_jitter_ms=args.jitter_ms,
+                failure_rate=args.failure_rate,
+                seed=args.seed,
+            )
+            with isolated_runtime(llm, write_behind=not args.sync_memory) as memory:
+                # Analytics and fallback logging print per request; keep the report readable
+                with contextlib.redirect_stdout(io.StringIO()):
+                    latencies, errors, wall = RUNNERS[target](concurrency, total, args.users)
+                if not args.sync_memory:
+                    memory.drain()  # count the queued writes' store time too
+                meter = memory.meter_snapshot()
+
+            metrics = summarize_latencies(latencies, wall)
+            metrics.update({
+                "concurrency": concurrency,
+                "error_rate": round(errors / total, 4),
+                "llm_calls_per_request": round(llm.stats["calls"] / total, 2),
+                "memory_ms_per_request": round(meter["seconds"] * 1000.0 / total, 3),
+                "memory_bytes_per_request": round(meter["bytes"] / total),
+            })
+            suffix = "+sync-memory" if args.sync_memory else ""
+            results[f"{target}@c{concurrency}{suffix}"] = metrics
+            print(f"  finished {target} at concurrency {concurrency}", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["graph", "api", "both"], default="both")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per level (at least 2x concurrency)")
+    parser.add_argument("--users", type=int, default=50, help="Distinct user ids to spread requests over")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Median fake LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--sync-memory", action="store_true",
+                        help="Write memory inside save_memory instead of through the write-behind queue")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    print_table(results, ["throughput_rps", "p50_ms", "p95_ms", "p99_ms",
+                          "llm_calls_per_request", "memory_ms_per_request", "error_rate"])
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\n📌 Baseline written to {args.baseline}")
+        return
+
+    regressions = compare_to_baseline(results, load_baseline(args.baseline), args.tolerance)
+    if regressions:
+        print("\n❌ Performance regressions detected:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+    print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
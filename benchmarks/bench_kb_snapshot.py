@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory with and without the shared knowledge snapshot.
+
+Builds a store holding only a knowledge base and ``--patterns`` resolution
+patterns, then starts ``--workers`` processes at once for each way a worker
+can read the knowledge base:
+
+    json      AgentMemory: every worker parses its own copy of the memory file
+    sqlite    SQLiteAgentMemory: KB rows are read and parsed per lookup
+    snapshot  SQLite store with KB_SNAPSHOT: lookups read the shared mmap snapshot
+
+Each worker runs ``--lookups`` KB lookups (exact and partial category
+matches), then, while all workers are still alive, reports its RSS and PSS
+(proportional set size: shared pages divided among the processes mapping
+them, so PSS summed over workers is what the host actually pays). ``none``
+is a worker that only imported the code.
+
+Usage:
+    python -m benchmarks.bench_kb_snapshot
+    python -m benchmarks.bench_kb_snapshot --workers 8 --patterns 200000
+"""
+
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import percentile, print_table
+from benchmarks.synthetic_data import CORE_CATEGORIES, LONG_TAIL_CATEGORIES, write_memory_file
+
+MODES = ["none", "json", "sqlite", "snapshot"]
+
+
+def _memory_mb() -> Dict[str, float]:
+    """Current RSS and PSS of this process (Linux /proc)"""
+    values = {}
+    for path, field in (("/proc/self/status", "VmRSS:"), ("/proc/self/smaps_rollup", "Pss:")):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        values[field.rstrip(":").lower().replace("vm", "")] = round(int(line.split()[1]) / 1024.0, 1)
+                        break
+        except FileNotFoundError:
+            pass
+    return values
+
+
+def worker(mode: str, paths: Dict[str, str], lookups: int, seed: int, barrier, results):
+    from src.tracing import set_exporter
+    set_exporter(None)
+
+    if mode == "json":
+        from src.memory import AgentMemory
+        memory = AgentMemory(paths["json"])
+        memory.load()
+    elif mode == "sqlite":
+        from src.memory_sqlite import SQLiteAgentMemory
+        memory = SQLiteAgentMemory(paths["sqlite"])
+    elif mode == "snapshot":
+        from src.kb_snapshot import SnapshotMemory, SnapshotReader
+        from src.memory_sqlite import SQLiteAgentMemory
+        memory = SnapshotMemory(SQLiteAgentMemory(paths["sqlite"]), SnapshotReader(paths["snapshot"], 60.0))
+    else:
+        memory = None
+
+    latencies: List[float] = []
+    if memory is not None:
+        rng = random.Random(seed)
+        categories = CORE_CATEGORIES + LONG_TAIL_CATEGORIES + ["unknown"]
+        for _ in range(lookups):
+            query = rng.sample(categories, rng.randint(1, 3))
+            start = time.perf_counter()
+            memory.get_knowledge_base_entry(query)
+            latencies.append(time.perf_counter() - start)
+
+    barrier.wait()  # every worker is alive and mapped before anyone measures
+    usage = _memory_mb()
+    barrier.wait()
+    results.put({**usage, **{f"lookup_p{pct}_us": round(percentile(latencies, pct) * 1e6, 1) if latencies else ""
+                             for pct in (50, 95)}})
+
+
+def run_mode(mode: str, args, paths: Dict[str, str]) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, paths, args.lookups, args.seed + i, barrier, results))
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get(timeout=600) for _ in processes]
+    for process in processes:
+        process.join()
+
+    rss = [sample.get("rss", 0.0) for sample in samples]
+    pss = [sample.get("pss", 0.0) for sample in samples]
+    return {
+        "rss_mb_per_worker": round(sum(rss) / len(rss), 1),
+        "pss_mb_per_worker": round(sum(pss) / len(pss), 1),
+        "pss_mb_total": round(sum(pss), 1),
+        "lookup_p50_us": samples[0]["lookup_p50_us"],
+        "lookup_p95_us": samples[0]["lookup_p95_us"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--patterns", type=int, default=100000, help="Resolution patterns in the store")
+    parser.add_argument("--kb-entries", type=int, default=298, help="Knowledge-base entries (298 = every combination)")
+    parser.add_argument("--lookups", type=int, default=2000, help="KB lookups per worker")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from src.kb_snapshot import SnapshotCompiler
+    from src.memory_sqlite import SQLiteAgentMemory
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {"json": f"{tmp}/memory.json", "sqlite": f"{tmp}/memory.db", "snapshot": f"{tmp}/knowledge.snapshot"}
+        write_memory_file(Path(paths["json"]), users=0, conversations=0, kb_entries=args.kb_entries,
+                          patterns=args.patterns, seed=args.seed)
+        store = SQLiteAgentMemory(paths["sqlite"])
+        store.import_json(paths["json"])
+        SnapshotCompiler(store, paths["snapshot"]).compile()
+        store.close()
+        sizes = {name: round(Path(path).stat().st_size / 1e6, 1) for name, path in paths.items()}
+
+        for mode in args.modes.split(","):
+            results[mode] = run_mode(mode, args, paths)
+            print(f"  finished {mode}", file=sys.stderr)
+
+    print(f"Knowledge base reads at {args.workers} workers ({args.kb_entries} KB entries, {args.patterns} patterns; "
+          f"files: json {sizes['json']} MB, sqlite {sizes['sqlite']} MB, snapshot {sizes['snapshot']} MB)")
+    print_table(results, ["rss_mb_per_worker", "pss_mb_per_worker", "pss_mb_total", "lookup_p50_us", "lookup_p95_us"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the agent memory store.
+
+Generates (or reuses) a synthetic dataset, then measures each store
+operation in a fresh process so peak RSS is attributable to that
+operation alone: startup load (_load_memory), save_conversation,
+find_similar_past_issues, get_knowledge_base_entry and get_system_stats.
+Reports ops/sec, mean latency and peak RSS per backend.
+
+Usage:
+    python -m benchmarks.bench_memory --users 10000 --conversations 50
+    python -m benchmarks.bench_memory --dataset data/synthetic_memory.json --ops save_conversation
+"""
+
+import argparse
+import json
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import print_table
+from benchmarks.synthetic_data import (
+    CORE_CATEGORIES, make_conversation_payload, make_user_id, write_memory_file,
+)
+
+OPERATIONS = ["load", "save_conversation", "find_similar_past_issues", "get_knowledge_base_entry", "get_system_stats"]
+
+
+def _json_store(path: Path):
+    from src.memory import AgentMemory
+    return AgentMemory(str(path))
+
+
+def _copy_dataset(dataset: Path, destination: Path):
+    shutil.copy(dataset, destination)
+
+
+def _sqlite_store(path: Path):
+    from src.memory_sqlite import SQLiteAgentMemory
+    return SQLiteAgentMemory(str(path))
+
+
+def _import_dataset(dataset: Path, destination: Path):
+    store = _sqlite_store(destination)
+    store.import_json(str(dataset))
+    store.close()
+
+
+# name -> (factory(path), prepare(synthetic JSON dataset, destination), file suffix)
+BACKENDS = {
+    "json": (_json_store, _copy_dataset, ".json"),
+    "sqlite": (_sqlite_store, _import_dataset, ".db"),
+}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def run_operation(backend: str, prepared: str, operation: str, count: int, users: int, seed: int) -> Dict[str, Any]:
+    """Run one operation `count` times against a private copy of a prepared store (executed in a child process)"""
+    from src.tracing import set_exporter
+
+    set_exporter(None)
+    factory, _, suffix = BACKENDS[backend]
+    rng = random.Random(seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = Path(tmp) / f"store{suffix}"
+        shutil.copy(prepared, store_path)
+
+        load_start = time.perf_counter()
+        store = factory(store_path)
+        store.load()
+        load_seconds = time.perf_counter() - load_start
+        rss_after_load = _peak_rss_mb()
+
+        if operation == "load":
+            timings = [load_seconds]
+            for _ in range(count - 1):
+                start = time.perf_counter()
+                factory(store_path).load()
+                timings.append(time.perf_counter() - start)
+        else:
+            timings = []
+            for _ in range(count):
+                user_id = make_user_id(rng.randrange(users))
+                if operation == "save_conversation":
+                    payload = make_conversation_payload(rng)
+                    start = time.perf_counter()
+                    store.save_conversation(user_id, payload)
+                elif operation == "find_similar_past_issues":
+                    payload = make_conversation_payload(rng)
+                    start = time.perf_counter()
+                    store.find_similar_past_issues(user_id, payload["query"], payload["categories"])
+                elif operation == "get_knowledge_base_entry":
+                    categories = rng.sample(CORE_CATEGORIES, rng.randint(1, 2))
+                    start = time.perf_counter()
+                    store.get_knowledge_base_entry(categories)
+                else:
+                    start = time.perf_counter()
+                    store.get_system_stats()
+                timings.append(time.perf_counter() - start)
+
+    total = sum(timings)
+    return {
+        "ops": len(timings),
+        "ops_per_sec": round(len(timings) / total, 1) if total else float("inf"),
+        "mean_us": round(total / len(timings) * 1e6, 1),
+        "max_us": round(max(timings) * 1e6, 1),
+        "rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, help="Existing synthetic dataset (generated when omitted)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--kb-entries", type=int, default=15)
+    parser.add_argument("--patterns", type=int, default=1000)
+    parser.add_argument("--backend", default=",".join(BACKENDS), help="Comma-separated backends to compare")
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="Comma-separated operations")
+    parser.add_argument("--count", type=int, default=200, help="Repetitions per operation")
+    parser.add_argument("--write-count", type=int, default=20, help="Repetitions for save_conversation and load")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json-out", type=Path, help="Write raw results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = args.dataset
+        if dataset is None:
+            dataset = Path(tmp) / "synthetic_memory.json"
+            print(f"Generating {args.users} users x {args.conversations} conversations...", file=sys.stderr)
+            write_memory_file(dataset, args.users, args.conversations, args.kb_entries, args.patterns, args.seed)
+        print(f"Dataset: {dataset} ({dataset.stat().st_size / 1e6:.1f} MB)", file=sys.stderr)
+
+        results = {}
+        for backend in args.backend.split(","):
+            # Convert the dataset once in this process so conversion cost stays out of the child's RSS
+            _, prepare, suffix = BACKENDS[backend]
+            prepared = Path(tmp) / f"prepared_{backend}{suffix}"
+            prepare(dataset, prepared)
+            for operation in args.ops.split(","):
+                count = args.write_count if operation in ("load", "save_conversation") else args.count
+                # A fresh process per operation keeps peak RSS attributable to it
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    results[f"{backend}:{operation}"] = pool.submit(
+                        run_operation, backend, str(prepared), operation, count, args.users, args.seed
+                    ).result()
+                print(f"  finished {backend}:{operation}", file=sys.stderr)
+
+    print_table(results, ["ops_per_sec", "mean_us", "max_us", "rss_after_load_mb", "peak_rss_mb"])
+    if args.json_out:
+        args.json_out.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
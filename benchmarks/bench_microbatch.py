@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Validation micro-batching on and off.
+
+Runs create_graph() against the fake LLM at increasing concurrency with
+VALIDATION_BATCHING off and on and reports throughput, p50/p95 latency,
+provider calls per request and per second (what a provider's request-rate
+limit counts), LLM tokens per request and the mean validation batch size.
+``--provider-concurrency`` caps the fake LLM's concurrent calls, as a
+provider's concurrency limit does; that is where fewer calls turn into
+throughput.
+
+Usage:
+    python -m benchmarks.bench_microbatch
+    python -m benchmarks.bench_microbatch --concurrency 16,64 --wait-ms 10 --provider-concurrency 0
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_graph import QUERIES, build_state
+from benchmarks.harness import isolated_runtime, print_table, summarize_latencies
+from src.fake_llm import LATENCY_DISTRIBUTIONS, FakeChatModel
+from src.microbatch import batch_size
+from src.ratelimit import llm_tokens_total
+
+
+def run(args, concurrency: int, batching: bool) -> Dict[str, Any]:
+    from src.container import container
+    from src.graph import create_graph
+
+    os.environ["VALIDATION_BATCHING"] = "on" if batching else "off"
+    os.environ["VALIDATION_BATCH_WAIT_MS"] = str(args.wait_ms)
+    os.environ["VALIDATION_BATCH_MAX_ITEMS"] = str(args.max_items)
+    container.reset("validation_batcher")
+    llm = FakeChatModel(latency_ms=args.latency_ms, latency_distribution=args.distribution,
+                        latency_jitter_ms=args.jitter_ms, max_concurrent_calls=args.provider_concurrency,
+                        seed=args.seed)
+    total = max(args.requests, concurrency * 2)
+    tokens_before, batches_before = llm_tokens_total.value(), batch_size.summary()
+
+    with isolated_runtime(llm, write_behind=True):
+        app = create_graph()
+
+        def one(i: int) -> float:
+            start = time.perf_counter()
+            # Distinct users so every query is classified and validated
+            app.invoke(build_state(QUERIES[i % len(QUERIES)], f"batch_user_{i}"))
+            return time.perf_counter() - start
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                latencies = list(pool.map(one, range(total)))
+            wall = time.perf_counter() - start
+
+    metrics = summarize_latencies(latencies, wall)
+    batches = batch_size.summary()
+    batched_items = batches["sum"] - batches_before["sum"]
+    batch_count = batches["count"] - batches_before["count"]
+    metrics.update({
+        "llm_calls_per_request": round(llm.stats["calls"] / total, 2),
+        "provider_calls_per_s": round(llm.stats["calls"] / wall, 1),
+        "tokens_per_request": round((llm_tokens_total.value() - tokens_before) / total, 1),
+        "mean_batch": round(batched_items / batch_count, 2) if batch_count else "",
+    })
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per level (at least 2x concurrency)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Median fake LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--provider-concurrency", type=int, default=8, help="Concurrent LLM calls (0 = unlimited)")
+    parser.add_argument("--wait-ms", type=float, default=5.0, help="Batching window")
+    parser.add_argument("--max-items", type=int, default=16, help="Judgments per batch")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = {}
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        for batching in (False, True):
+            name = f"c{concurrency}/{'batched' if batching else 'individual'}"
+            results[name] = run(args, concurrency, batching)
+            print(f"  finished {name}", file=sys.stderr)
+    for name in ("VALIDATION_BATCHING", "VALIDATION_BATCH_WAIT_MS", "VALIDATION_BATCH_MAX_ITEMS"):
+        os.environ.pop(name, None)
+
+    print(f"Validation micro-batching (LLM {args.latency_ms:g} ms x {args.provider_concurrency or 'unlimited'} "
+          f"concurrent, window {args.wait_ms:g} ms, "
+          f"up to {args.max_items} items)")
+    print_table(results, ["throughput_rps", "p50_ms", "p95_ms", "llm_calls_per_request", "provider_calls_per_s",
+                          "tokens_per_request", "mean_batch"])
+
+
+if __name__ == "__main__":
+    main()
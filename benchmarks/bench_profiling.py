@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Cost of the profiling surface on the support query endpoint.
+
+Sends the same queries through the API in-process against the fake LLM
+in each mode and reports latency and the overhead against profiling off:
+
+    off        PROFILING off (the default)
+    enabled    PROFILING on with an admin token, but no query picked
+    sampler    every query stack-sampled (PROFILING_SAMPLE_RATE=1)
+    cprofile   every query under cProfile
+
+``--llm-latency-ms`` defaults to 0, so the graph's own CPU time is all
+that is measured and the profilers' overhead is as large as it gets.
+The overhead also includes writing each profile to disk.
+
+Usage:
+    python -m benchmarks.bench_profiling
+    python -m benchmarks.bench_profiling --requests 500 --llm-latency-ms 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import isolated_runtime, print_table, summarize_latencies
+from benchmarks.synthetic_data import QUERY_TEMPLATES
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.profiling import Profiler
+
+QUERIES = [template for templates in QUERY_TEMPLATES.values() for template in templates]
+MODES = {
+    "off": {"enabled": False},
+    "enabled": {},
+    "sampler": {"sample_rate": 1.0, "mode": "sampler"},
+    "cprofile": {"sample_rate": 1.0, "mode": "cprofile"},
+}
+
+
+def run_mode(settings: Dict, args, directory: str) -> List[float]:
+    import httpx
+    from src.api import app
+
+    profiler = Profiler(directory, sample_interval=args.sample_interval_ms / 1000.0,
+                        max_profiles=args.requests, **settings)
+
+    async def drive():
+        latencies = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for i in range(args.requests):
+                query = QUERIES[i % len(QUERIES)].format(order_id=10000 + i, amount=42)
+                start = time.perf_counter()
+                response = await client.post("/api/v1/support/query",
+                                             json={"query": query, "user_id": f"bench_user_{i % 20}"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with container.override(profiler=profiler):
+        return asyncio.run(drive())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Queries per mode")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--sample-interval-ms", type=float, default=5.0)
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    from src.tracing import set_exporter
+    set_exporter(None)
+    os.environ.setdefault("ADMIN_TOKEN", "bench")
+
+    results = {}
+    llm = FakeChatModel(latency_ms=args.llm_latency_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        with isolated_runtime(llm):
+            run_mode(MODES["off"], argparse.Namespace(**{**vars(args), "requests": 20}), tmp)  # warm up
+        for mode in args.modes.split(","):
+            # A fresh store per mode, so history built up by earlier modes doesn't slow later ones
+            with isolated_runtime(llm):
+                latencies = run_mode(MODES[mode], args, str(Path(tmp) / mode))
+            results[mode] = summarize_latencies(latencies, sum(latencies))
+            results[mode]["mean_ms"] = round(statistics.mean(latencies) * 1000.0, 2)
+            print(f"  finished {mode}", file=sys.stderr)
+    if "off" in results:
+        for row in results.values():
+            row["overhead_pct"] = round(100.0 * (row["mean_ms"] / results["off"]["mean_ms"] - 1.0), 1)
+
+    print(f"Profiling overhead over {args.requests} sequential queries (fake LLM {args.llm_latency_ms:.0f} ms)")
+    print_table(results, ["requests", "mean_ms", "p50_ms", "p95_ms", "overhead_pct"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the local sentiment/priority scorer.
+
+Scores synthetic support queries (decorated with angry, urgent and relaxed
+phrasings so every branch runs) one at a time with a cold cache and through
+``score_batch``. Reports microseconds per query and exits non-zero when the
+p99 of a cold single score exceeds the per-request budget (default 1 ms).
+
+Usage:
+    python -m benchmarks.bench_sentiment
+    python -m benchmarks.bench_sentiment --queries 20000 --budget-us 500
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import percentile, print_table
+from benchmarks.synthetic_data import QUERY_TEMPLATES
+from src.sentiment import score_batch, score_text
+
+DECORATIONS = [
+    "{q}", "{q}", "{q}!!", "{q}. This is unacceptable, I want this fixed immediately",
+    "{q}. Third time asking, still not resolved", "Just wondering: {q}", "{q}. No rush, thanks!",
+    "{Q}", "{q}. I am very disappointed and frustrated", "{q}. Great service as always, thank you",
+]
+
+
+def make_queries(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    templates = [t for group in QUERY_TEMPLATES.values() for t in group]
+    queries = []
+    for i in range(count):
+        base = rng.choice(templates).format(order_id=rng.randint(10000, 99999), amount=rng.randint(5, 500))
+        queries.append(rng.choice(DECORATIONS).format(q=base, Q=base.upper()) + f" (ref {i})")
+    return queries
+
+
+def time_single(queries: List[str]) -> Dict[str, float]:
+    score_text.cache_clear()
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        score_text(query)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return {"us_per_query": round(sum(samples) / len(samples), 2),
+            "p99_us": round(percentile(samples, 99), 2), "max_us": round(max(samples), 2)}
+
+
+def time_batch(queries: List[str], batch_size: int) -> Dict[str, float]:
+    score_text.cache_clear()
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        score_batch(queries[i:i + batch_size])
+    elapsed_us = (time.perf_counter() - start) * 1e6
+    return {"us_per_query": round(elapsed_us / len(queries), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--budget-us", type=float, default=1000.0, help="Per-request budget for a cold score")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, args.seed)
+    results = {
+        "single (cold)": time_single(queries),
+        f"batch of {args.batch_size}": time_batch(queries, args.batch_size),
+    }
+    print(f"Sentiment scorer ({args.queries} queries)")
+    print_table(results, ["us_per_query", "p99_us", "max_us"])
+
+    cold = results["single (cold)"]
+    if cold["p99_us"] > args.budget_us:
+        print(f"\n❌ p99 cold score {cold['p99_us']} µs exceeds the {args.budget_us:g} µs budget")
+        sys.exit(1)
+    print(f"\n✅ p99 cold score {cold['p99_us']} µs is within the {args.budget_us:g} µs budget")
+
+
+if __name__ == "__main__":
+    main()
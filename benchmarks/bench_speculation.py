@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Speculative handler execution on and off.
+
+Replays the synthetic query templates for returning synthetic users
+(history in a SQLite memory store, so classification and memory loading
+do real work) through create_graph() against the fake LLM, once with
+SPECULATIVE_HANDLERS off and once on, and reports p50/p95 latency, LLM
+calls per request, the speculation hit rate and the handler time that
+overlapped classification and memory loading.
+
+``--memory-latency-ms`` adds a delay to every memory read, modelling a
+store behind a network round trip (local SQLite answers in about a
+millisecond), which is where the overlap pays off most.
+
+Usage:
+    python -m benchmarks.bench_speculation
+    python -m benchmarks.bench_speculation --memory-latency-ms 5 --concurrency 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import isolated_runtime, print_table, summarize_latencies
+from benchmarks.synthetic_data import QUERY_TEMPLATES, make_user_id, write_memory_file
+from src.fake_llm import LATENCY_DISTRIBUTIONS, FakeChatModel
+from src.memory_sqlite import SQLiteAgentMemory
+from src.speculation import speculation_saved_seconds
+
+READ_METHODS = ("get_user_profile", "find_similar_past_issues", "get_knowledge_base_entry", "get_user_summary")
+
+
+class SlowReads(SQLiteAgentMemory):
+    """SQLiteAgentMemory whose reads each cost an extra round trip"""
+
+    def __init__(self, storage_path: str, read_latency_ms: float):
+        self.read_latency_ms = read_latency_ms
+        super().__init__(storage_path)
+
+
+def _slow(method):
+    def wrapper(self, *args, **kwargs):
+        time.sleep(self.read_latency_ms / 1000.0)
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+for _name in READ_METHODS:
+    setattr(SlowReads, _name, _slow(getattr(SQLiteAgentMemory, _name)))
+
+
+def make_queries(count: int, users: int, seed: int) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        category = rng.choice(list(QUERY_TEMPLATES))
+        template = rng.choice(QUERY_TEMPLATES[category])
+        queries.append({"user_id": make_user_id(rng.randrange(users)),
+                        "query": template.format(order_id=rng.randint(10000, 99999), amount=rng.randint(5, 500))})
+    return queries
+
+
+def run(args, speculative: bool, memory_file: Path) -> Dict[str, Any]:
+    from src.container import container
+    from src.graph import create_graph
+    from src.sessions import first_turn_state
+
+    os.environ["SPECULATIVE_HANDLERS"] = "on" if speculative else "off"
+    container.reset("speculator")
+    llm = FakeChatModel(latency_ms=args.latency_ms, latency_distribution=args.distribution,
+                        latency_jitter_ms=args.jitter_ms, seed=args.seed)
+    queries = make_queries(args.requests, args.users, args.seed)
+    saved_before = speculation_saved_seconds.summary()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = SlowReads(str(Path(tmp) / "agent_memory.db"), args.memory_latency_ms)
+        memory.import_json(str(memory_file))
+        with isolated_runtime(llm, memory=memory, write_behind=True):
+            app = create_graph()
+
+            def one(item: Dict[str, str]) -> float:
+                start = time.perf_counter()
+                app.invoke(first_turn_state(item["query"], item["user_id"]))
+                return time.perf_counter() - start
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                    latencies = list(pool.map(one, queries))
+                wall = time.perf_counter() - start
+            stats = container.get("speculator").get_stats()
+
+    metrics = summarize_latencies(latencies, wall)
+    saved = speculation_saved_seconds.summary()
+    hits = saved["count"] - saved_before["count"]
+    metrics.update({
+        "llm_calls_per_request": round(llm.stats["calls"] / len(queries), 2),
+        "hit_rate": stats["hit_rate"] if speculative else "",
+        "saved_ms_per_hit": round((saved["sum"] - saved_before["sum"]) * 1000.0 / hits, 2) if hits else "",
+    })
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--users", type=int, default=200, help="Synthetic returning users")
+    parser.add_argument("--conversations", type=int, default=50, help="Stored conversations per user")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Median fake LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--memory-latency-ms", type=float, default=0.0, help="Extra delay per memory read")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory_file = Path(tmp) / "synthetic_memory.json"
+        write_memory_file(memory_file, args.users, args.conversations, seed=args.seed)
+        results = {
+            "speculation off": run(args, speculative=False, memory_file=memory_file),
+            "speculation on": run(args, speculative=True, memory_file=memory_file),
+        }
+    os.environ.pop("SPECULATIVE_HANDLERS", None)
+
+    print(f"Speculative handlers ({args.requests} queries, concurrency {args.concurrency}, "
+          f"LLM {args.latency_ms:g} ms, memory reads +{args.memory_latency_ms:g} ms)")
+    print_table(results, ["p50_ms", "p95_ms", "throughput_rps", "llm_calls_per_request", "hit_rate",
+                          "saved_ms_per_hit"])
+    off, on = results["speculation off"]["p50_ms"], results["speculation on"]["p50_ms"]
+    print(f"\np50 {off} ms -> {on} ms ({(off - on) / off * 100:+.1f}% faster)" if off else "")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark.
+
+Measures (1) cold import time of the main modules in fresh interpreters and
+(2) time-to-first-request for a real uvicorn process: how long after spawn
+/health answers, when /ready reports warm-up finished, and how long the
+first support query takes (served by the fake LLM so no API key or network
+is needed).
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --dataset data/synthetic_memory.json
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.harness import print_table
+
+MODULES = ["src.api", "src.graph", "src.nodes", "src.memory"]
+
+
+def _clean_env(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("OPENROUTER_API_KEY", "benchmark")
+    env.update(extra or {})
+    return env
+
+
+def measure_import(module: str, repeats: int) -> Dict[str, float]:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=_clean_env(),
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]) * 1000.0)
+    return {"median_ms": round(statistics.median(samples), 1), "min_ms": round(min(samples), 1)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(check, deadline: float, interval: float = 0.005) -> Optional[float]:
+    while time.perf_counter() < deadline:
+        try:
+            if check():
+                return time.perf_counter()
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+    return None
+
+
+def measure_first_request(memory_path: Path, timeout: float) -> Dict[str, float]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = _clean_env({"LLM_PROVIDER": "fake", "MEMORY_PATH": str(memory_path)})
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        health_at = _wait_for(lambda: requests.get(f"{base}/health", timeout=1).ok, deadline)
+        ready_at = _wait_for(lambda: requests.get(f"{base}/ready", timeout=1).ok, deadline)
+        query_start = time.perf_counter()
+        response = requests.post(f"{base}/api/v1/support/query", timeout=timeout,
+                                 json={"query": "I have a billing issue with order 12345", "user_id": "startup_bench"})
+        first_query_at = time.perf_counter()
+        response.raise_for_status()
+        second_start = time.perf_counter()
+        requests.post(f"{base}/api/v1/support/query", timeout=timeout,
+                      json={"query": "Thanks, one more question", "user_id": "startup_bench"})
+        second_ms = (time.perf_counter() - second_start) * 1000.0
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    return {
+        "health_ms": round((health_at - start) * 1000.0, 1) if health_at else float("nan"),
+        "ready_ms": round((ready_at - start) * 1000.0, 1) if ready_at else float("nan"),
+        "first_query_ms": round((first_query_at - start) * 1000.0, 1),
+        "first_query_latency_ms": round((first_query_at - query_start) * 1000.0, 1),
+        "second_query_latency_ms": round(second_ms, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="Cold imports per module")
+    parser.add_argument("--runs", type=int, default=3, help="Server spawns for time-to-first-request")
+    parser.add_argument("--dataset", type=Path, help="Memory file to start with (default: empty store)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    imports = {module: measure_import(module, args.repeats) for module in MODULES}
+    print("Cold import time")
+    print_table(imports, ["median_ms", "min_ms"])
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            memory_path = Path(tmp) / f"memory_{run}.json"
+            if args.dataset:
+                shutil.copy(args.dataset, memory_path)
+            runs[f"run{run + 1}"] = measure_first_request(memory_path, args.timeout)
+    print("\nTime to first request (from process spawn)")
+    print_table(runs, ["health_ms", "ready_ms", "first_query_ms", "first_query_latency_ms", "second_query_latency_ms"])
+
+
+if __name__ == "__main__":
+    main()
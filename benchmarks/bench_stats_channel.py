@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Dashboard stats: per-tab polling against the server-sent stats stream.
+
+Starts the API in-process under uvicorn and opens ``--tabs`` dashboards
+for ``--duration`` seconds while a writer bumps the conversation counters
+every ``--write-interval`` seconds:
+
+    polling  every tab GETs /api/v1/support/stats every --poll-interval seconds
+             (what script.js did against /health, at 30 s)
+    stream   every tab holds /api/v1/support/stats/stream open; one aggregator
+             reads the store every --stream-interval seconds
+
+Reports HTTP requests made (a stream is one long-lived request), store
+reads per minute, bytes sent to the tabs per minute, and how long a counter change took to reach a tab (p50/p95).
+Intervals default to a scaled-down 30 s poll so a run takes seconds.
+
+Usage:
+    python -m benchmarks.bench_stats_channel
+    python -m benchmarks.bench_stats_channel --tabs 500 --duration 20
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_startup import _free_port
+from benchmarks.harness import percentile, print_table
+from src.container import container
+from src.stats_channel import StatsAggregator
+
+
+class CountingMemory:
+    """Just enough of the memory store for the stats endpoints, counting reads"""
+
+    def __init__(self):
+        self.stats = {"total_conversations": 0, "resolved_issues": 0, "active_users": 100,
+                      "memory_patterns": 40, "knowledge_base_entries": 30, "indexed_entities": 500}
+        self.reads = 0
+        self.changed_at: Dict[int, float] = {}  # total_conversations -> when it was written
+
+    def get_system_stats(self) -> Dict[str, Any]:
+        self.reads += 1
+        return dict(self.stats)
+
+    def write(self):
+        self.stats["total_conversations"] += 1
+        self.stats["resolved_issues"] += 1
+        self.changed_at[self.stats["total_conversations"]] = time.perf_counter()
+
+
+def start_api(port: int):
+    import uvicorn
+    from src.api import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def _header_bytes(response) -> int:
+    return sum(len(name) + len(value) + 4 for name, value in response.headers.raw)
+
+
+async def poll_tab(client, args, memory: CountingMemory, lags: List[float], totals: Dict[str, int], stop: float):
+    seen = 0
+    await asyncio.sleep(random.uniform(0, args.poll_interval))  # tabs were opened at different times
+    while time.perf_counter() < stop:
+        try:
+            response = await client.get("/api/v1/support/stats")
+        except Exception:
+            totals["errors"] += 1
+            await asyncio.sleep(args.poll_interval)
+            continue
+        totals["requests"] += 1
+        totals["bytes"] += len(response.content) + _header_bytes(response)
+        total = response.json()["total_conversations"]
+        if total > seen:
+            if seen:  # staleness of the oldest change this poll picked up
+                lags.append(time.perf_counter() - memory.changed_at[seen + 1])
+            seen = total
+        await asyncio.sleep(args.poll_interval)
+
+
+async def stream_tab(client, memory: CountingMemory, lags: List[float], totals: Dict[str, int], stop: float):
+    totals["requests"] += 1
+    try:
+        async with client.stream("GET", "/api/v1/support/stats/stream") as response:
+            totals["bytes"] += _header_bytes(response)
+            event = None
+            async for line in response.aiter_lines():
+                totals["bytes"] += len(line) + 1
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: ") and event == "delta":
+                    total = json.loads(line[len("data: "):]).get("total_conversations")
+                    if total in memory.changed_at:
+                        lags.append(time.perf_counter() - memory.changed_at[total])
+                if time.perf_counter() >= stop:
+                    return
+    except Exception:
+        totals["errors"] += 1
+
+
+def run_mode(mode: str, args) -> Dict[str, Any]:
+    import httpx
+
+    memory = CountingMemory()
+    aggregator = StatsAggregator(memory.get_system_stats, interval=args.stream_interval,
+                                 max_subscribers=args.tabs)
+    container.set("memory", memory)
+    container.set("stats_aggregator", aggregator)
+    port = _free_port()
+    server = start_api(port)
+
+    async def drive():
+        lags: List[float] = []
+        totals = {"requests": 0, "bytes": 0, "errors": 0}
+        limits = httpx.Limits(max_connections=args.tabs + 10, max_keepalive_connections=args.tabs + 10)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+            stop = time.perf_counter() + args.duration
+
+            async def writer():
+                while time.perf_counter() < stop:
+                    await asyncio.sleep(args.write_interval)
+                    memory.write()
+
+            if mode == "polling":
+                tabs = [poll_tab(client, args, memory, lags, totals, stop) for _ in range(args.tabs)]
+            else:
+                tabs = [stream_tab(client, memory, lags, totals, stop) for _ in range(args.tabs)]
+            reads_before = memory.reads
+            await asyncio.gather(writer(), *tabs)
+            totals["reads"] = memory.reads - reads_before
+        return lags, totals
+
+    lags, totals = asyncio.run(drive())
+    server.should_exit = True
+    time.sleep(0.2)
+    per_minute = 60.0 / args.duration
+    return {
+        "http_requests": totals["requests"],
+        "store_reads_per_min": round(totals["reads"] * per_minute),
+        "kb_per_min": round(totals["bytes"] * per_minute / 1024, 1),
+        "lag_p50_s": round(percentile(lags, 50), 2) if lags else "",
+        "lag_p95_s": round(percentile(lags, 95), 2) if lags else "",
+        "errors": totals["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tabs", type=int, default=200, help="Open dashboards")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode")
+    parser.add_argument("--poll-interval", type=float, default=3.0, help="Per-tab polling period (30 s scaled down)")
+    parser.add_argument("--stream-interval", type=float, default=0.2, help="Aggregator read period (2 s scaled down)")
+    parser.add_argument("--write-interval", type=float, default=1.0, help="Seconds between counter changes")
+    parser.add_argument("--modes", default="polling,stream")
+    args = parser.parse_args()
+
+    from src.tracing import set_exporter
+    set_exporter(None)
+
+    results = {}
+    for mode in args.modes.split(","):
+        results[mode] = run_mode(mode, args)
+        print(f"  finished {mode}", file=sys.stderr)
+
+    print(f"Dashboard stats for {args.tabs} tabs over {args.duration:.0f}s (poll every {args.poll_interval}s, "
+          f"stream reads every {args.stream_interval}s, a change every {args.write_interval}s)")
+    print_table(results, ["http_requests", "store_reads_per_min", "kb_per_min", "lag_p50_s", "lag_p95_s", "errors"])
+
+
+if __name__ == "__main__":
+    main()
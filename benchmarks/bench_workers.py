@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Worker-scaling benchmark for the production server.
+
+Starts ``servers/prod_server.py`` with 1, 2, 4, ... workers sharing one
+SQLite memory database, drives concurrent HTTP load against it with the
+fake LLM, and reports throughput, latency and scaling efficiency relative
+to a single worker. It also checks that the shared stats counter equals
+the number of successful queries, i.e. no worker lost another's writes.
+
+Usage:
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1,2,4,8 --requests 400 --latency-ms 100
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_startup import _clean_env, _free_port, _wait_for
+from benchmarks.harness import print_table, summarize_latencies
+
+
+def run_load(base: str, total: int, concurrency: int, timeout: float) -> Dict[str, Any]:
+    local = threading.local()
+
+    def one(index: int):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.post(f"{base}/api/v1/support/query", timeout=timeout, json={
+            "query": f"I have a billing issue with order {10000 + index}",
+            "user_id": f"worker_bench_{index % 50}",
+        })
+        return time.perf_counter() - start, response.ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in outcomes if ok]
+    summary = summarize_latencies(latencies, wall)
+    summary["errors"] = total - len(latencies)
+    return summary
+
+
+def measure_workers(workers: int, args, db_path: Path) -> Dict[str, Any]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = _clean_env({
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "WARMUP_LLM_PING": "off",
+    })
+    process = subprocess.Popen(
+        [sys.executable, "servers/prod_server.py", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--memory-backend", "sqlite", "--memory-path", str(db_path)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.perf_counter() + args.timeout
+        # /ready is per worker, so poll until a full round of connections has hit warm workers
+        ready = _wait_for(lambda: all(requests.get(f"{base}/ready", timeout=1).ok for _ in range(workers * 2)),
+                          deadline, interval=0.1)
+        if ready is None:
+            raise RuntimeError(f"server with {workers} worker(s) did not become ready")
+        time.sleep(args.settle)
+
+        result = run_load(base, args.requests, args.concurrency, args.timeout)
+        stats = requests.get(f"{base}/api/v1/support/stats", timeout=args.timeout).json()
+        successful = result["requests"]
+        result["stored_conversations"] = stats["total_conversations"]
+        result["lost_writes"] = successful - stats["total_conversations"]
+    finally:
+        process.terminate()
+        process.wait(timeout=args.timeout)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=200, help="Queries per worker count")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client connections")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake LLM latency per call")
+    parser.add_argument("--settle", type=float, default=1.0, help="Seconds to wait after /ready")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            print(f"Running {args.requests} queries against {workers} worker(s)...")
+            results[f"workers={workers}"] = measure_workers(workers, args, Path(tmp) / f"memory_{workers}.db")
+
+    single = next(iter(results.values()))["throughput_rps"]
+    for label, result in results.items():
+        workers = int(label.split("=")[1])
+        result["speedup"] = round(result["throughput_rps"] / single, 2) if single else 0.0
+        result["efficiency"] = round(result["speedup"] / workers, 2)
+
+    print(f"\nWorker scaling (cpu_count={os.cpu_count()}, fake LLM {args.latency_ms:g} ms/call)")
+    print_table(results, ["throughput_rps", "p50_ms", "p95_ms", "speedup", "efficiency", "errors", "lost_writes"])
+    if any(result["lost_writes"] for result in results.values()):
+        print("❌ Shared memory lost writes across workers")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Shared helpers for the benchmark suites: isolated runtimes with the fake
+LLM, a metered memory store, latency summaries and baseline comparison.
+"""
+
+import json
+import math
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.memory import AgentMemory, set_agent_memory
+from src.write_behind import WriteBehindMemory
+
+# Direction in which each metric is allowed to move without counting as a regression
+METRIC_DIRECTIONS = {
+    "throughput_rps": "higher",
+    "p50_ms": "lower",
+    "p95_ms": "lower",
+    "p99_ms": "lower",
+    "llm_calls_per_request": "lower",
+    "memory_ms_per_request": "lower",
+    "memory_bytes_per_request": "lower",
+    "error_rate": "lower",
+}
+
+# Absolute slack so tiny values (sub-millisecond latencies, zero errors) don't flap
+ABSOLUTE_SLACK = {
+    "p50_ms": 2.0,
+    "p95_ms": 2.0,
+    "p99_ms": 2.0,
+    "memory_ms_per_request": 0.5,
+    "error_rate": 0.01,
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize_latencies(latencies: List[float], wall_seconds: float) -> Dict[str, float]:
+    """Throughput and latency percentiles for one benchmark run (latencies in seconds)"""
+    ms = [latency * 1000.0 for latency in latencies]
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+    }
+
+
+class MeteredAgentMemory(AgentMemory):
+    """AgentMemory that accounts the time and bytes spent in the store"""
+
+    def __init__(self, storage_path: str):
+        self._meter_lock = threading.Lock()
+        self._meter_local = threading.local()
+        self.op_seconds = 0.0
+        self.op_count = 0
+        self.bytes_written = 0
+        super().__init__(storage_path)
+
+    def _save_memory(self):
+        super()._save_memory()
+        size = self.storage_path.stat().st_size
+        with self._meter_lock:
+            self.bytes_written += size
+
+    def meter_snapshot(self) -> Dict[str, Any]:
+        with self._meter_lock:
+            return {"seconds": self.op_seconds, "ops": self.op_count, "bytes": self.bytes_written}
+
+
+def _metered(method):
+    def wrapper(self, *args, **kwargs):
+        depth = getattr(self._meter_local, "depth", 0)
+        self._meter_local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._meter_local.depth = depth
+            if depth == 0:
+                elapsed = time.perf_counter() - start
+                with self._meter_lock:
+                    self.op_seconds += elapsed
+                    self.op_count += 1
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ("get_user_profile", "save_conversation", "find_similar_past_issues",
+              "get_knowledge_base_entry", "update_knowledge_base"):
+    setattr(MeteredAgentMemory, _name, _metered(getattr(AgentMemory, _name)))
+
+
+@contextmanager
+def isolated_runtime(llm, memory: Optional[AgentMemory] = None, write_behind: bool = False):
+    """Run with the given LLM, a throwaway memory store and no rate limits, restoring the globals afterwards
+
+    With write_behind the store sits behind a WriteBehindMemory queue, which is drained before returning.
+    """
+    from src.config import set_llm
+    from src.container import container
+    from src.ratelimit import RateLimiter
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if memory is None:
+            memory = MeteredAgentMemory(str(Path(tmp) / "agent_memory.json"))
+        if write_behind:
+            memory = WriteBehindMemory(memory)
+        previous_llm = set_llm(llm)
+        previous_memory = set_agent_memory(memory)
+        try:
+            # Benchmarks replay a few synthetic users far faster than any real user
+            with container.override(rate_limiter=RateLimiter(limits={})):
+                yield memory
+        finally:
+            if write_behind:
+                memory.close()
+            set_llm(previous_llm)
+            set_agent_memory(previous_memory)
+
+
+def load_baseline(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                        tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed past the tolerance"""
+    regressions = []
+    for scenario, metrics in results.items():
+        expected = baseline.get(scenario)
+        if not expected:
+            continue
+        for metric, direction in METRIC_DIRECTIONS.items():
+            if metric not in metrics or metric not in expected:
+                continue
+            actual, reference = metrics[metric], expected[metric]
+            slack = ABSOLUTE_SLACK.get(metric, 0.0)
+            if direction == "higher":
+                limit = reference * (1 - tolerance) - slack
+                regressed = actual < limit
+            else:
+                limit = reference * (1 + tolerance) + slack
+                regressed = actual > limit
+            if regressed:
+                regressions.append(f"{scenario}: {metric} {actual} vs baseline {reference} (limit {round(limit, 2)})")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]], columns: List[str]):
+    widths = [max(len(column) + 2, 12) for column in columns]
+    name_width = max([len("scenario")] + [len(scenario) for scenario in results]) + 2
+    header = f"{'scenario':<{name_width}}" + "".join(f"{column:>{width}}" for column, width in zip(columns, widths))
+    print(header)
+    print("-" * len(header))
+    for scenario, metrics in results.items():
+        print(f"{scenario:<{name_width}}" + "".join(f"{metrics.get(column, ''):>{width}}" for column, width in zip(columns, widths)))
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Replay captured production traffic (see src/capture.py) as a load test.
+
+Re-sends every recorded query with its recorded pacing, against
+
+    api    the FastAPI app in-process (admission control, sessions, the full endpoint)
+    graph  create_graph() directly, with an in-memory session checkpointer
+    --url  a running server (its own LLM and memory; nothing is stubbed)
+
+In-process targets run on a throwaway memory store with rate limits off,
+and every LLM call is answered with the response recorded for that query
+(matched by prompt digest, else by call order), taking as long as it did
+in production unless ``--llm-latency none``. Follow-up turns wait for
+their conversation's earlier turn, as a user would.
+
+``--speed 1`` keeps the recorded arrival times, ``--speed 10`` compresses
+them tenfold, and ``--speed 0`` sends as fast as ``--concurrency`` allows.
+
+Reports recorded vs replayed latency (overall and per route), and every
+query whose status, route, categories, fast path or escalation changed,
+so two builds can be compared on the same traffic. ``--output`` writes the
+replayed results in the capture format; ``--compare A B`` diffs two such
+files without replaying.
+
+Usage:
+    python -m benchmarks.replay_traffic data/traffic_capture.ndjson
+    python -m benchmarks.replay_traffic data/traffic_capture.ndjson --target graph --speed 0 --concurrency 16
+    python -m benchmarks.replay_traffic data/traffic_capture.ndjson --output build_b.ndjson
+    python -m benchmarks.replay_traffic --compare build_a.ndjson build_b.ndjson
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.harness import isolated_runtime, percentile, print_table
+from src.capture import RecordedResponder, load_capture, replaying, summarize_result
+
+COMPARED_FIELDS = ("status", "route", "categories", "fast_path", "escalation_needed")
+
+
+def _outcome(record: Dict[str, Any]) -> Dict[str, Any]:
+    result = record.get("result") or {}
+    return {"status": record.get("status"), "route": result.get("route"),
+            "categories": sorted(result.get("categories") or []), "fast_path": result.get("fast_path"),
+            "escalation_needed": result.get("escalation_needed")}
+
+
+class Replayer:
+    def __init__(self, args):
+        self.args = args
+        self.conversations: Dict[str, asyncio.Future] = {}  # recorded pseudonym -> replayed conversation id
+        self.stub_stats: Counter = Counter()
+
+    async def conversation_for(self, record: Dict[str, Any]) -> Optional[str]:
+        """The replayed id of an earlier turn's conversation, once that turn has finished"""
+        pseudonym = record["request"].get("conversation")
+        if record["request"].get("follow_up") and pseudonym in self.conversations:
+            return await self.conversations[pseudonym]
+        return None
+
+    def started_conversation(self, record: Dict[str, Any]) -> Optional[asyncio.Future]:
+        pseudonym = record["request"].get("conversation")
+        if pseudonym and not record["request"].get("follow_up") and pseudonym not in self.conversations:
+            self.conversations[pseudonym] = asyncio.get_running_loop().create_future()
+            return self.conversations[pseudonym]
+        return None
+
+    async def send_api(self, client, record: Dict[str, Any], conversation_id: Optional[str]):
+        request = record["request"]
+        body = {"query": request["query"], "user_id": request.get("user_id"),
+                "metadata": request.get("metadata") or {}}
+        if conversation_id:
+            body["conversation_id"] = conversation_id
+        response = await client.post("/api/v1/support/query", json=body)
+        if response.status_code != 200:
+            return response.status_code, None, None
+        data = response.json()
+        return 200, summarize_result(data), data["conversation_id"]
+
+    def run_graph(self, graph, sessions, record: Dict[str, Any], conversation_id: Optional[str]):
+        from src.admission import classify_priority
+        from src.sessions import first_turn_state, follow_up_state
+
+        request = record["request"]
+        metadata = request.get("metadata") or {}
+        user_id = request.get("user_id") or f"user_{uuid.uuid4().hex[:8]}"
+        priority = classify_priority(request["query"], metadata)
+        if conversation_id:
+            state = follow_up_state(request["query"], user_id, metadata.get("deadline_ms"), priority)
+        else:
+            conversation_id = f"conv_{uuid.uuid4().hex}"
+            state = first_turn_state(request["query"], user_id, metadata.get("deadline_ms"), priority)
+        result = graph.invoke(state, sessions.config(conversation_id), durability="exit")
+        return 200, summarize_result(result), conversation_id
+
+    async def replay_one(self, send, record: Dict[str, Any]) -> Dict[str, Any]:
+        started_conversation = self.started_conversation(record)
+        conversation_id = await self.conversation_for(record)
+        ts = time.time()
+        start = time.perf_counter()
+        status, result, replayed_conversation = 500, None, None
+        with replaying(record) as cursor:
+            try:
+                status, result, replayed_conversation = await send(record, conversation_id)
+            except Exception as e:
+                print(f"Replay of {record['capture_id']} failed: {e}", file=sys.stderr)
+        latency_ms = (time.perf_counter() - start) * 1000.0
+        if started_conversation is not None:
+            started_conversation.set_result(replayed_conversation)
+        self.stub_stats.update(cursor.stats)
+        return {"capture_id": record["capture_id"], "ts": round(ts, 3), "status": status,
+                "latency_ms": round(latency_ms, 1), "request": record["request"], "result": result, "llm": []}
+
+    async def replay(self, records: List[Dict[str, Any]], send) -> List[Dict[str, Any]]:
+        args = self.args
+        slots = asyncio.Semaphore(args.concurrency) if args.speed == 0 else None
+        origin, started = records[0]["ts"], time.perf_counter()
+
+        async def scheduled(record):
+            if slots is not None:
+                async with slots:
+                    return await self.replay_one(send, record)
+            delay = (record["ts"] - origin) / args.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return await self.replay_one(send, record)
+
+        return await asyncio.gather(*(scheduled(record) for record in records))
+
+
+def replay(args, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    import httpx
+
+    replayer = Replayer(args)
+
+    if args.url:
+        async def drive_remote():
+            async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+                return await replayer.replay(records, lambda record, conv: replayer.send_api(client, record, conv))
+        return asyncio.run(drive_remote())
+
+    from src.container import container
+    from src.fake_llm import FakeChatModel
+    from src.sessions import SessionStore, build_checkpointer
+    from src.tracing import set_exporter
+
+    set_exporter(None)
+    llm = FakeChatModel(responder=RecordedResponder(latency=args.llm_latency == "recorded"))
+    sessions = SessionStore(build_checkpointer())
+    with isolated_runtime(llm), container.override(sessions=sessions):
+        if args.target == "graph":
+            from src.graph import create_graph
+            graph = create_graph(checkpointer=sessions.checkpointer)
+
+            async def send(record, conversation_id):
+                return await asyncio.to_thread(replayer.run_graph, graph, sessions, record, conversation_id)
+
+            results = asyncio.run(replayer.replay(records, send))
+        else:
+            from src.api import app
+
+            async def drive_app():
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+                    return await replayer.replay(records,
+                                                 lambda record, conv: replayer.send_api(client, record, conv))
+            results = asyncio.run(drive_app())
+    stubbed = sum(replayer.stub_stats.values())
+    if stubbed:
+        print(f"LLM calls answered from the capture: {replayer.stub_stats['exact']} by prompt, "
+              f"{replayer.stub_stats['in_order']} by call order; {replayer.stub_stats['unrecorded']} unrecorded "
+              f"(default fake reply)")
+    return results
+
+
+def latency_summary(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = [record["latency_ms"] for record in records if record.get("status") == 200]
+    span = max(record["ts"] for record in records) - min(record["ts"] for record in records) if records else 0
+    return {"requests": len(records), "ok": len(latencies),
+            "rps": round(len(records) / span, 2) if span else "",
+            **{f"p{pct}_ms": round(percentile(latencies, pct), 1) for pct in (50, 90, 95, 99)},
+            "max_ms": round(max(latencies), 1) if latencies else 0.0}
+
+
+def report(baseline: List[Dict[str, Any]], candidate: List[Dict[str, Any]], labels=("recorded", "replayed"),
+           examples: int = 10):
+    print("\nLatency (ms, successful queries)")
+    print_table({labels[0]: latency_summary(baseline), labels[1]: latency_summary(candidate)},
+                ["requests", "ok", "rps", "p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms"])
+
+    by_route: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: {labels[0]: [], labels[1]: []})
+    for label, records in zip(labels, (baseline, candidate)):
+        for record in records:
+            if record.get("status") == 200:
+                by_route[_outcome(record)["route"]][label].append(record["latency_ms"])
+    rows = {}
+    for route, latencies in sorted(by_route.items(), key=lambda item: -len(item[1][labels[0]])):
+        rows[route] = {"count": len(latencies[labels[0]]) or len(latencies[labels[1]])}
+        for label in labels:
+            for pct in (50, 95):
+                rows[route][f"{label}_p{pct}"] = round(percentile(latencies[label], pct), 1) if latencies[label] else ""
+    print("\nLatency by route (ms)")
+    print_table(rows, ["count"] + [f"{label}_p{pct}" for label in labels for pct in (50, 95)])
+
+    matched = {record["capture_id"]: record for record in candidate}
+    changed = Counter()
+    transitions = Counter()
+    samples = []
+    for record in baseline:
+        other = matched.get(record["capture_id"])
+        if other is None:
+            changed["missing"] += 1
+            continue
+        before, after = _outcome(record), _outcome(other)
+        fields = [field for field in COMPARED_FIELDS if before[field] != after[field]]
+        for field in fields:
+            changed[field] += 1
+        if before["route"] != after["route"]:
+            transitions[f"{before['route']} -> {after['route']}"] += 1
+        if fields and len(samples) < examples:
+            samples.append((record["capture_id"], record["request"]["query"],
+                            {field: (before[field], after[field]) for field in fields}))
+
+    compared = sum(record["capture_id"] in matched for record in baseline)
+    print(f"\nDifferences ({labels[0]} -> {labels[1]}) over {compared} queries")
+    for field in COMPARED_FIELDS + ("missing",):
+        print(f"  {field:<18} {changed[field]}")
+    if transitions:
+        print("Route changes:")
+        for transition, count in transitions.most_common():
+            print(f"  {count:>5}  {transition}")
+    for capture_id, query, fields in samples:
+        print(f"  {capture_id}  {query[:60]!r}")
+        for field, (before, after) in fields.items():
+            print(f"      {field}: {before} -> {after}")
+    return changed
+
+
+def write_results(path: str, records: List[Dict[str, Any]]):
+    import json
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", nargs="?", help="NDJSON capture (TRAFFIC_CAPTURE_PATH)")
+    parser.add_argument("--target", choices=("api", "graph"), default="api")
+    parser.add_argument("--url", help="Replay against a running server instead (no LLM stubbing)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Arrival-time speed-up (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight with --speed 0")
+    parser.add_argument("--llm-latency", choices=("recorded", "none"), default="recorded")
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N queries")
+    parser.add_argument("--examples", type=int, default=10, help="Changed queries to print")
+    parser.add_argument("--output", help="Write the replayed results here (capture format)")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="Diff two capture/result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        report(load_capture(args.compare[0]), load_capture(args.compare[1]), labels=("a", "b"),
+               examples=args.examples)
+        return
+    if not args.capture:
+        parser.error("a capture file is required")
+    records = load_capture(args.capture)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        parser.error(f"{args.capture} has no records")
+
+    target = args.url or args.target
+    print(f"Replaying {len(records)} queries against {target} at "
+          f"{'max speed' if args.speed == 0 else f'{args.speed:g}x'}", file=sys.stderr)
+    results = replay(args, records)
+    if args.output:
+        write_results(args.output, results)
+    report(records, results, examples=args.examples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for the agent memory store.
+
+Produces memory files in the same layout AgentMemory persists (user
+profiles with conversation history, successful patterns, knowledge base
+and stats) at configurable scale, plus a stream of conversation payloads
+for write benchmarks. Output is deterministic for a given seed.
+
+Usage:
+    python -m benchmarks.synthetic_data --users 100000 --conversations 50 --out data/synthetic_memory.json
+"""
+
+import argparse
+import itertools
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+CORE_CATEGORIES = ["billing", "technical", "returns", "general"]
+LONG_TAIL_CATEGORIES = ["shipping", "account", "subscription", "warranty", "loyalty", "giftcards", "privacy", "delivery"]
+
+QUERY_TEMPLATES = {
+    "billing": [
+        "I was charged twice for order {order_id}",
+        "My refund for order {order_id} hasn't arrived yet",
+        "Why is my invoice higher this month?",
+        "Please update the payment method on my account",
+        "I see an unknown charge of ${amount} on my card",
+    ],
+    "technical": [
+        "The app crashes when I open the settings page",
+        "I can't log in after resetting my password",
+        "The website shows an error at checkout for order {order_id}",
+        "Notifications stopped working after the latest update",
+        "The tracking page for order {order_id} never loads",
+    ],
+    "returns": [
+        "I want to return the shoes from order {order_id}",
+        "The return label for order {order_id} is not working",
+        "How long does a return take to process?",
+        "Can I exchange order {order_id} for a different size?",
+    ],
+    "general": [
+        "hi",
+        "What are your opening hours?",
+        "How do I change my account email?",
+        "Do you ship internationally?",
+        "Thanks for the help earlier",
+    ],
+}
+
+RESPONSE_SENTENCES = [
+    "I've looked into your account and can see what happened.",
+    "I've issued a correction and you should see it within 3-5 business days.",
+    "Please try clearing your cache and restarting the app.",
+    "I've emailed you a new prepaid return label.",
+    "Our team has escalated this with the warehouse.",
+    "You can manage this from Settings > Account at any time.",
+    "Let me know if there's anything else I can help with.",
+]
+
+# Fixed reference time keeps generated files byte-identical across runs
+GENERATED_AT = datetime(2025, 6, 1)
+
+FIRST_NAMES = ["alex", "sam", "jordan", "taylor", "morgan", "casey", "riley", "jamie", "drew", "quinn"]
+
+
+def _categories(rng: random.Random) -> List[str]:
+    primary = rng.choices(CORE_CATEGORIES, weights=[35, 30, 20, 15])[0]
+    if rng.random() < 0.2:
+        secondary = rng.choice([c for c in CORE_CATEGORIES if c != primary])
+        return [primary, secondary]
+    return [primary]
+
+
+def make_conversation(rng: random.Random, timestamp: datetime) -> Dict[str, Any]:
+    """One conversation summary in the shape save_conversation stores"""
+    categories = _categories(rng)
+    template = rng.choice(QUERY_TEMPLATES[categories[0]])
+    order_id = str(rng.randint(10000, 99999999))
+    query = template.format(order_id=order_id, amount=rng.randint(5, 500))
+    entities = {"order_id": order_id} if "{order_id}" in template else {}
+    response = " ".join(rng.sample(RESPONSE_SENTENCES, rng.randint(2, 5)))
+    return {
+        "timestamp": timestamp.isoformat(),
+        "query": query,
+        "categories": categories,
+        "resolution": rng.random() < 0.8,
+        "response": response,
+        "entities": entities
+    }
+
+
+def make_conversation_payload(rng: random.Random) -> Dict[str, Any]:
+    """Input for AgentMemory.save_conversation, as built by the save_memory node"""
+    summary = make_conversation(rng, GENERATED_AT)
+    return {
+        "query": summary["query"],
+        "categories": summary["categories"],
+        "entities": summary["entities"],
+        "sentiment": rng.choice(["neutral", "negative", "positive"]),
+        "response": summary["response"],
+        "satisfactory": summary["resolution"],
+        "escalation_needed": False
+    }
+
+
+def make_profile(rng: random.Random, conversations: int, start: datetime) -> Dict[str, Any]:
+    timestamp = start
+    history = []
+    for _ in range(conversations):
+        timestamp += timedelta(minutes=rng.randint(10, 60 * 24 * 7))
+        history.append(make_conversation(rng, timestamp))
+
+    common_issues: Dict[str, int] = {}
+    for conversation in history:
+        for category in conversation["categories"]:
+            common_issues[category] = common_issues.get(category, 0) + 1
+
+    return {
+        # save_conversation keeps the last 50 conversations but resolved issues are unbounded
+        "conversation_history": history[-50:],
+        "preferences": {"language": rng.choice(["en", "en", "en", "es", "de", "fr"]),
+                        "channel": rng.choice(["chat", "email", "phone"])},
+        "resolved_issues": [c for c in history if c["resolution"]],
+        "common_issues": common_issues,
+        "last_interaction": history[-1]["timestamp"] if history else None,
+        "total_interactions": len(history)
+    }
+
+
+def make_user_id(index: int) -> str:
+    """Deterministic user id so benchmarks can address users without loading the dataset"""
+    return f"{FIRST_NAMES[index % len(FIRST_NAMES)]}_{index:07d}"
+
+
+def _kb_keys(count: int) -> List[str]:
+    """Category keys in the order real traffic would create them"""
+    categories = CORE_CATEGORIES + LONG_TAIL_CATEGORIES
+    keys = []
+    for size in (1, 2, 3):
+        for combo in itertools.combinations(sorted(categories), size):
+            keys.append("_".join(combo))
+            if len(keys) >= count:
+                return keys
+    return keys
+
+
+def make_knowledge_base(rng: random.Random, entries: int) -> Dict[str, Any]:
+    knowledge_base = {}
+    for key in _kb_keys(entries):
+        queries = [make_conversation(rng, GENERATED_AT)["query"] for _ in range(10)]
+        knowledge_base[key] = {
+            "categories": key.split("_"),
+            "common_queries": queries,
+            "resolutions": [" ".join(rng.sample(RESPONSE_SENTENCES, 3)) for _ in range(10)],
+            "frequency": rng.randint(10, 5000),
+            "last_updated": GENERATED_AT.isoformat()
+        }
+    return knowledge_base
+
+
+def make_patterns(rng: random.Random, count: int) -> Dict[str, Any]:
+    patterns = {}
+    for i in range(count):
+        categories = _categories(rng)
+        key = f"{'_'.join(sorted(categories))}_{i % 10000}"
+        patterns[key] = {
+            "categories": categories,
+            "query_patterns": [make_conversation(rng, GENERATED_AT)["query"].lower() for _ in range(5)],
+            "successful_responses": [" ".join(rng.sample(RESPONSE_SENTENCES, 3)) for _ in range(5)],
+            "frequency": rng.randint(1, 200),
+            "last_used": GENERATED_AT.isoformat()
+        }
+    return patterns
+
+
+def iter_profiles(users: int, conversations: int, seed: int = 0) -> Iterator[tuple]:
+    """Yield (user_id, profile) pairs without holding the whole dataset in memory"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    for index in range(users):
+        yield make_user_id(index), make_profile(rng, conversations, start)
+
+
+def generate_memory(users: int, conversations: int, kb_entries: int = 15, patterns: int = 1000,
+                    seed: int = 0) -> Dict[str, Any]:
+    """Build a complete in-memory dataset in AgentMemory's layout"""
+    rng = random.Random(seed + 1)
+    user_profiles = dict(iter_profiles(users, conversations, seed))
+    total = sum(p["total_interactions"] for p in user_profiles.values())
+    resolved = sum(len(p["resolved_issues"]) for p in user_profiles.values())
+    return {
+        "user_profiles": user_profiles,
+        "successful_patterns": make_patterns(rng, patterns),
+        "knowledge_base": make_knowledge_base(rng, kb_entries),
+        "stats": {"total_conversations": total, "resolved_issues": resolved}
+    }
+
+
+def write_memory_file(path: Path, users: int, conversations: int, kb_entries: int = 15,
+                      patterns: int = 1000, seed: int = 0) -> Dict[str, int]:
+    """Stream a dataset to disk user by user; returns the written stats"""
+    rng = random.Random(seed + 1)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    total = resolved = 0
+    with open(path, "w") as f:
+        f.write('{"user_profiles": {')
+        for i, (user_id, profile) in enumerate(iter_profiles(users, conversations, seed)):
+            if i:
+                f.write(", ")
+            f.write(f"{json.dumps(user_id)}: {json.dumps(profile)}")
+            total += profile["total_interactions"]
+            resolved += len(profile["resolved_issues"])
+        f.write('}, "successful_patterns": ')
+        f.write(json.dumps(make_patterns(rng, patterns)))
+        f.write(', "knowledge_base": ')
+        f.write(json.dumps(make_knowledge_base(rng, kb_entries)))
+        stats = {"total_conversations": total, "resolved_issues": resolved}
+        f.write(f', "stats": {json.dumps(stats)}}}')
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--conversations", type=int, default=50, help="Conversations per user")
+    parser.add_argument("--kb-entries", type=int, default=15)
+    parser.add_argument("--patterns", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=Path("data/synthetic_memory.json"))
+    args = parser.parse_args()
+
+    stats = write_memory_file(args.out, args.users, args.conversations, args.kb_entries, args.patterns, args.seed)
+    size_mb = args.out.stat().st_size / 1e6
+    print(f"✓ Wrote {args.users} users / {stats['total_conversations']} conversations to {args.out} ({size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
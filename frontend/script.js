@@ -10,21 +10,96 @@ document.addEventListener('DOMContentLoaded', function() {
     const exportChatBtn = document.getElementById('export-chat');
 
     // Configuration
-    const API_BASE_URL = 'http://127.0.0.1:8000';
+    // Same origin when the API serves the page; the API's default address otherwise
+    const API_BASE_URL = window.location.protocol.startsWith('http') && window.location.port !== '3000'
+        ? window.location.origin
+        : 'http://127.0.0.1:8000';
     const USER_ID = 'frontend_user_' + Date.now();
+    const POLL_INTERVAL_MS = 30000;       // fallback polling when the stats stream is unavailable
+    const STREAM_BACKOFF_MIN_MS = 1000;
+    const STREAM_BACKOFF_MAX_MS = 60000;
     let isConnected = false;
     let conversationHistory = [];
+    let stats = {};
+    let statsStream = null;
+    let streamFailures = 0;
+    let reconnectTimer = null;
+    let pollTimer = null;
 
     // Initialize the application
     initializeApp();
 
     function initializeApp() {
-        checkBackendHealth();
         setupEventListeners();
         loadConversationHistory();
-        setInterval(checkBackendHealth, 30000); // Check every 30 seconds
+        openStatsStream();
     }
 
+    // Stats arrive over a server-sent event stream (a snapshot, then only changed counters).
+    // While it is down we reconnect with exponential backoff and poll as a fallback.
+    function openStatsStream() {
+        clearTimeout(reconnectTimer);
+        reconnectTimer = null;
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        statsStream = new EventSource(`${API_BASE_URL}/api/v1/support/stats/stream`);
+        statsStream.addEventListener('open', () => {
+            streamFailures = 0;
+            stopPolling();
+            updateConnectionStatus(true);
+        });
+        statsStream.addEventListener('snapshot', (e) => {
+            stats = JSON.parse(e.data);
+            updateServerStats(stats);
+        });
+        statsStream.addEventListener('delta', (e) => {
+            stats = Object.assign(stats, JSON.parse(e.data));
+            updateServerStats(stats);
+        });
+        statsStream.addEventListener('error', () => {
+            // Take over reconnecting from the browser so retries back off
+            closeStatsStream();
+            streamFailures += 1;
+            const delay = Math.min(STREAM_BACKOFF_MAX_MS, STREAM_BACKOFF_MIN_MS * 2 ** (streamFailures - 1));
+            reconnectTimer = setTimeout(openStatsStream, delay * (0.5 + Math.random() / 2));
+            startPolling();
+        });
+    }
+
+    function closeStatsStream() {
+        if (statsStream) {
+            statsStream.close();
+            statsStream = null;
+        }
+    }
+
+    function startPolling() {
+        if (pollTimer === null) {
+            checkBackendHealth();
+            pollTimer = setInterval(checkBackendHealth, POLL_INTERVAL_MS);
+        }
+    }
+
+    function stopPolling() {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    }
+
+    // Hidden tabs don't hold a stream open
+    document.addEventListener('visibilitychange', () => {
+        if (document.hidden) {
+            clearTimeout(reconnectTimer);
+            reconnectTimer = null;
+            closeStatsStream();
+            stopPolling();
+        } else if (!statsStream) {
+            streamFailures = 0;
+            openStatsStream();
+        }
+    });
+
     function setupEventListeners() {
         sendButton.addEventListener('click', handleSendMessage);
         userInput.addEventListener('keypress', handleKeyPress);
@@ -35,14 +110,14 @@ document.addEventListener('DOMContentLoaded', function() {
 
     async function checkBackendHealth() {
         try {
-            const response = await fetch(`${API_BASE_URL}/health`, {
-                timeout: 5000
+            const response = await fetch(`${API_BASE_URL}/api/v1/support/stats`, {
+                signal: AbortSignal.timeout(5000)
             });
 
             if (response.ok) {
-                const data = await response.json();
+                stats = await response.json();
                 updateConnectionStatus(true);
-                updateServerStats(data);
+                updateServerStats(stats);
             } else {
                 updateConnectionStatus(false);
             }
@@ -61,10 +136,10 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     function updateServerStats(data) {
-        if (data && data.stats) {
-            document.getElementById('total-conversations').textContent = data.stats.total_conversations || '-';
-            document.getElementById('active-users').textContent = data.stats.active_users || '-';
-            document.getElementById('resolution-rate').textContent = data.stats.resolution_rate ? `${data.stats.resolution_rate}%` : '-';
+        if (data) {
+            document.getElementById('total-conversations').textContent = data.total_conversations ?? '-';
+            document.getElementById('active-users').textContent = data.active_users ?? '-';
+            document.getElementById('resolution-rate').textContent = data.total_conversations ? `${data.resolution_rate}%` : '-';
         }
     }
 
@@ -1,30 +1,74 @@
 #!/usr/bin/env python3
 """
-Simple HTTP server to serve the frontend.
+Standalone HTTP server for the frontend.
 Run this script to start the frontend server on port 3000.
+
+Serves the same content-hashed, precompressed assets as the API app (see
+src/static_assets.py) from a threaded HTTP/1.1 server, so connections are
+kept alive and a slow client only ties up its own thread. The API server
+already serves the frontend at http://127.0.0.1:8000/; use this one to host
+it on a separate port.
 """
 
-import http.server
-import socketserver
-import os
+import argparse
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.static_assets import StaticAssets, default_frontend_dir
+
 PORT = 3000
-DIRECTORY = Path(__file__).parent / "frontend"
 
-class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=str(DIRECTORY), **kwargs)
 
-    def end_headers(self):
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        super().end_headers()
+class FrontendRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    assets: StaticAssets = None
+
+    def _send(self, include_body: bool):
+        served = self.assets.respond(self.path.split("?", 1)[0], self.headers.get("Accept-Encoding"),
+                                     self.headers.get("If-None-Match"))
+        if served is None:
+            status, headers, body = 404, {"Content-Type": "text/plain; charset=utf-8"}, b"Not Found"
+        else:
+            status, headers, body = served
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if include_body and status != 304:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._send(include_body=True)
+
+    def do_HEAD(self):
+        self._send(include_body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host: str, port: int, directory: str) -> ThreadingHTTPServer:
+    handler = type("Handler", (FrontendRequestHandler,), {"assets": StaticAssets(directory)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
 
 def run_server():
-    with socketserver.TCPServer(("", PORT), CustomHTTPRequestHandler) as httpd:
-        print(f"🚀 Frontend server running at http://localhost:{PORT}")
+    parser = argparse.ArgumentParser(description="Serve the chat frontend")
+    parser.add_argument("--host", default="")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--directory", default=default_frontend_dir(),
+                        help="frontend/dist when built (python -m src.static_assets), else frontend/")
+    args = parser.parse_args()
+
+    with make_server(args.host, args.port, args.directory) as httpd:
+        print(f"🚀 Frontend server running at http://localhost:{args.port}")
         print("📱 Make sure the backend API server is running on http://127.0.0.1:8000")
         print("📋 API Docs: http://127.0.0.1:8000/docs")
         print("🛑 Press Ctrl+C to stop the server")
@@ -32,7 +76,7 @@ def run_server():
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n👋 Server stopped")
-            httpd.shutdown()
+
 
 if __name__ == "__main__":
-    run_server()
\ No newline at end of file
+    run_server()
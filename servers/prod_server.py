@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Production server for the Advanced Customer Support Multi-Agent API.
+
+Runs N worker processes (uvicorn's process manager, or gunicorn with
+uvicorn workers when installed) on uvloop + httptools, without auto-reload.
+On SIGTERM/SIGINT each worker stops accepting connections, finishes
+in-flight requests within the grace period and flushes pending memory
+writes in the application lifespan before exiting.
+
+All workers share one SQLite memory database (MEMORY_BACKEND=sqlite),
+because the JSON store is per-process and would split users' memory.
+For the same reason, with more than one worker conversation sessions are
+checkpointed to a SQLite database next to it (SESSION_CHECKPOINTER=sqlite),
+so a follow-up routed to another worker still finds its session.
+
+Usage:
+    python servers/prod_server.py --workers 4
+    python servers/prod_server.py --workers 8 --server gunicorn --port 8000
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def configure_environment(args):
+    """Point every worker at the shared memory backend and session checkpointer before they fork"""
+    os.environ["MEMORY_BACKEND"] = args.memory_backend
+    if args.memory_path:
+        os.environ["MEMORY_PATH"] = args.memory_path
+    if args.workers > 1 and args.memory_backend == "json":
+        print("⚠️  MEMORY_BACKEND=json is per-process; users' memory will be split across workers")
+    if args.workers > 1:
+        # An explicit SESSION_CHECKPOINTER still wins, e.g. with sticky sessions at the load balancer
+        os.environ.setdefault("SESSION_CHECKPOINTER", "sqlite")
+        memory_dir = os.path.dirname(args.memory_path or "data/agent_memory.db")
+        os.environ.setdefault("SESSION_DB_PATH", os.path.join(memory_dir, "sessions.db"))
+    if os.getenv("SESSION_CHECKPOINTER", "memory").lower() == "sqlite" and not _available("langgraph.checkpoint.sqlite"):
+        print("❌ SESSION_CHECKPOINTER=sqlite requires langgraph-checkpoint-sqlite")
+        sys.exit(1)
+    elif args.workers > 1 and os.getenv("SESSION_CHECKPOINTER", "memory").lower() == "memory":
+        print("⚠️  SESSION_CHECKPOINTER=memory is per-process; follow-ups on another worker start a new session")
+
+
+def run_uvicorn(args):
+    import uvicorn
+
+    uvicorn.run(
+        "src.api:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if _available("uvloop") else "auto",
+        http="httptools" if _available("httptools") else "auto",
+        reload=False,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        log_level=args.log_level,
+        access_log=args.access_log,
+    )
+
+
+def run_gunicorn(args):
+    if not _available("gunicorn"):
+        print("❌ gunicorn is not installed (pip install gunicorn uvicorn-worker)")
+        sys.exit(1)
+    worker_class = "uvicorn_worker.UvicornWorker" if _available("uvicorn_worker") else "uvicorn.workers.UvicornWorker"
+    argv = [
+        "gunicorn", "src.api:app",
+        "--workers", str(args.workers),
+        "--worker-class", worker_class,
+        "--bind", f"{args.host}:{args.port}",
+        "--graceful-timeout", str(args.graceful_timeout),
+        "--keep-alive", str(args.keep_alive),
+        "--log-level", args.log_level,
+    ]
+    os.chdir(ROOT)
+    os.execvp(argv[0], argv)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--memory-backend", choices=["sqlite", "json"], default="sqlite")
+    parser.add_argument("--memory-path", help="Shared memory store path (default: data/agent_memory.db)")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="Seconds to drain in-flight requests")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    print(f"🚀 Starting {args.workers} {args.server} worker(s) on http://{args.host}:{args.port}")
+    print(f"🗄️  Memory backend: {args.memory_backend}")
+    print(f"💬 Session checkpointer: {os.getenv('SESSION_CHECKPOINTER', 'memory')}")
+
+    os.chdir(ROOT)
+    if args.server == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_uvicorn(args)
+
+
+if __name__ == "__main__":
+    main()
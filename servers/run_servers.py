@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Combined server script to run both frontend and backend.
-This script starts the FastAPI backend and serves the frontend.
+This script starts the FastAPI backend, which also serves the frontend at /.
+Pass --separate-frontend to additionally run the frontend server on port 3000.
 """
 
 import subprocess
@@ -33,14 +34,13 @@ def run_backend():
         sys.exit(1)
 
 def run_frontend():
-    """Run the frontend HTTP server"""
+    """Run the standalone frontend server on port 3000"""
     print("🌐 Starting frontend server...")
     time.sleep(2)  # Wait for backend to start
 
     try:
-        # Run the frontend server
         subprocess.run([
-            sys.executable, "frontend_server.py"
+            sys.executable, str(Path(__file__).parent / "frontend_server.py")
         ], check=True)
     except subprocess.CalledProcessError as e:
         print(f"❌ Error starting frontend: {e}")
@@ -50,9 +50,14 @@ def main():
     print("🤖 Advanced Customer Support System")
     print("=" * 50)
     print("🚀 Starting both frontend and backend servers...")
+    print("📱 Frontend: http://127.0.0.1:8000/ (served by the API)")
     print()
 
-    # Start backend in a separate thread
+    if "--separate-frontend" not in sys.argv:
+        run_backend()
+        return
+
+    # Also serve the frontend on port 3000
     backend_thread = threading.Thread(target=run_backend, daemon=True)
     backend_thread.start()
 
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Local OTLP stand-in collector.
+
+Accepts OTLP/HTTP JSON trace exports on /v1/traces and appends every span
+as one JSON line to an output file, so traces can be inspected without
+running a real OpenTelemetry collector.
+
+Usage:
+    python servers/trace_collector.py [output_file]
+
+Then start the API with:
+    TRACE_EXPORTER=otlp OTLP_ENDPOINT=http://localhost:4318/v1/traces python servers/api_server.py
+"""
+
+import http.server
+import json
+import sys
+from pathlib import Path
+
+PORT = 4318
+OUTPUT = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("data/collected_traces.ndjson")
+
+
+class CollectorHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/v1/traces":
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            self.send_error(400, "Invalid JSON")
+            return
+
+        count = 0
+        with open(OUTPUT, "a") as f:
+            for resource_spans in payload.get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for span in scope_spans.get("spans", []):
+                        f.write(json.dumps(span) + "\n")
+                        count += 1
+
+        body = json.dumps({"accepted": count}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_collector():
+    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with http.server.ThreadingHTTPServer(("", PORT), CollectorHandler) as httpd:
+        print(f"📡 Trace collector listening on http://localhost:{PORT}/v1/traces")
+        print(f"📝 Writing spans to {OUTPUT}")
+        print("🛑 Press Ctrl+C to stop the collector")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Collector stopped")
+
+
+if __name__ == "__main__":
+    run_collector()
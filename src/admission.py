@@ -0,0 +1,190 @@
+"""
+Priority-aware admission control in front of graph execution.
+
+At most ADMISSION_MAX_CONCURRENCY queries run the graph at once per worker;
+the rest wait in a bounded queue (ADMISSION_MAX_QUEUE). Waiting queries are
+released in weighted-fair order (start-time fair queuing): every
+(priority, tenant) pair is a flow, flows with a higher priority weight get
+proportionally more of the slots, and tenants at the same priority share
+them evenly, so one tenant's bulk traffic can't starve everyone else.
+
+A query is shed with ``Overloaded`` (HTTP 429 + Retry-After) when the queue
+is full or when its estimated wait (queries ahead of it x the average
+service time / concurrency) exceeds ADMISSION_MAX_WAIT_MS scaled by its
+priority: low-priority traffic is shed first.
+
+Priority comes from ``metadata.priority`` (high | normal | low), then from
+a customer tier in ``metadata.tier``, then from the local sentiment scorer
+on the query text (see sentiment.py). The tenant is ``metadata.tenant_id``.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import load_settings
+from .container import container
+from .metrics import metrics
+from .sentiment import PRIORITIES, score_text
+
+PRIORITY_WEIGHTS = {"high": 4.0, "normal": 2.0, "low": 1.0}
+# Fraction of ADMISSION_MAX_WAIT_MS each priority is willing to queue for
+PRIORITY_WAIT_FACTORS = {"high": 3.0, "normal": 1.0, "low": 0.3}
+HIGH_VALUE_TIERS = ("enterprise", "premium", "vip")
+
+queue_depth = metrics.gauge("admission_queue_depth", "Queries waiting for admission")
+in_flight = metrics.gauge("admission_in_flight", "Queries currently running the graph")
+queue_wait_seconds = metrics.histogram("admission_queue_wait_seconds", "Time spent waiting for admission",
+                                       [0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10])
+shed_total = metrics.counter("admission_shed_total", "Queries rejected with 429, by priority and reason")
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server overloaded ({reason}); retry after {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def classify_priority(query: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """Cheap pre-classifier: explicit priority, then customer tier, then the local sentiment scorer"""
+    metadata = metadata or {}
+    explicit = str(metadata.get("priority", "")).lower()
+    if explicit in PRIORITIES:
+        return explicit
+    if str(metadata.get("tier", "")).lower() in HIGH_VALUE_TIERS:
+        return "high"
+    return score_text(query).priority
+
+
+class Ticket:
+    __slots__ = ("priority", "tenant", "enqueued_at", "admitted_at", "future")
+
+    def __init__(self, priority: str, tenant: str):
+        self.priority = priority
+        self.tenant = tenant
+        self.enqueued_at = time.perf_counter()
+        self.admitted_at: Optional[float] = None
+        self.future: Optional[asyncio.Future] = None
+
+    @property
+    def wait_seconds(self) -> float:
+        return (self.admitted_at or time.perf_counter()) - self.enqueued_at
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 256, max_wait_ms: float = 10000.0,
+                 initial_service_ms: float = 1000.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait_ms = max_wait_ms
+        self.service_ms = initial_service_ms  # EWMA of graph execution time
+        self.running = 0
+        self._queue: List[Tuple[float, int, int, Ticket]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._flow_finish: Dict[Tuple[str, str], float] = {}
+        self.admitted = 0
+        self.shed = 0
+
+    # Scheduling
+    def _tag(self, ticket: Ticket) -> float:
+        """Start-time fair queuing tag: a flow's next request starts after its previous one finishes"""
+        return max(self._virtual_time, self._flow_finish.get((ticket.priority, ticket.tenant), 0.0))
+
+    def estimated_wait_ms(self, ahead: int) -> float:
+        return (ahead + 1) * self.service_ms / self.max_concurrency
+
+    def _queued_ahead(self, tag: float) -> int:
+        return sum(1 for queued_tag, _, _, ticket in self._queue if queued_tag <= tag and not ticket.future.done())
+
+    def _publish(self):
+        queue_depth.set(len(self._queue))
+        in_flight.set(self.running)
+
+    async def acquire(self, priority: str = "normal", tenant: str = "default") -> Ticket:
+        """Wait for a slot; raises Overloaded when the query should be shed instead"""
+        ticket = Ticket(priority if priority in PRIORITIES else "normal", tenant or "default")
+        if self.running < self.max_concurrency and not self._queue:
+            self._admit(ticket)
+            return ticket
+
+        if len(self._queue) >= self.max_queue:
+            self._shed(ticket, "queue_full")
+        tag = self._tag(ticket)
+        estimate = self.estimated_wait_ms(self._queued_ahead(tag))
+        if estimate > self.max_wait_ms * PRIORITY_WAIT_FACTORS[ticket.priority]:
+            self._shed(ticket, "wait_estimate", estimate)
+
+        self._flow_finish[(ticket.priority, ticket.tenant)] = tag + 1.0 / PRIORITY_WEIGHTS[ticket.priority]
+        ticket.future = asyncio.get_running_loop().create_future()
+        # Equal start tags go to the higher priority first, then in arrival order
+        heapq.heappush(self._queue, (tag, PRIORITIES.index(ticket.priority), next(self._sequence), ticket))
+        self._publish()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                self.release(ticket)  # admitted just as the client went away
+            self._queue = [entry for entry in self._queue if entry[-1] is not ticket]
+            heapq.heapify(self._queue)
+            self._publish()
+            raise
+        return ticket
+
+    def _admit(self, ticket: Ticket):
+        ticket.admitted_at = time.perf_counter()
+        self.running += 1
+        self.admitted += 1
+        queue_wait_seconds.observe(ticket.wait_seconds, priority=ticket.priority)
+        self._publish()
+
+    def _shed(self, ticket: Ticket, reason: str, estimate_ms: Optional[float] = None):
+        self.shed += 1
+        shed_total.inc(priority=ticket.priority, reason=reason)
+        estimate_ms = estimate_ms if estimate_ms is not None else self.estimated_wait_ms(len(self._queue))
+        raise Overloaded(reason, retry_after=max(1, math.ceil(estimate_ms / 1000.0)))
+
+    def release(self, ticket: Ticket):
+        """Finish a query and admit the next waiter in fair order"""
+        if ticket.admitted_at is not None:
+            elapsed_ms = (time.perf_counter() - ticket.admitted_at) * 1000.0
+            self.service_ms = 0.8 * self.service_ms + 0.2 * elapsed_ms
+        self.running -= 1
+        while self._queue and self.running < self.max_concurrency:
+            tag, _, _, waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue  # cancelled while queued
+            self._virtual_time = max(self._virtual_time, tag)
+            self._admit(waiter)
+            waiter.future.set_result(True)
+        if not self._queue and self.running == 0:
+            # Idle: forget per-flow history so old traffic doesn't penalise new requests
+            self._flow_finish.clear()
+            self._virtual_time = 0.0
+        self._publish()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "queued": len(self._queue), "admitted": self.admitted,
+                "shed": self.shed, "service_ms": round(self.service_ms, 1),
+                "max_concurrency": self.max_concurrency, "max_queue": self.max_queue}
+
+
+def build_admission_controller() -> AdmissionController:
+    load_settings()
+    return AdmissionController(
+        max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "256")),
+        max_wait_ms=float(os.getenv("ADMISSION_MAX_WAIT_MS", "10000")),
+    )
+
+
+container.register("admission", build_admission_controller)
+
+
+def get_admission_controller() -> AdmissionController:
+    return container.get("admission")
@@ -1,17 +1,42 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import json
 import uuid
 from datetime import datetime
 
-from .graph import create_graph
-from .memory import agent_memory
+from starlette.concurrency import run_in_threadpool
+
+from .admission import Overloaded, classify_priority, get_admission_controller
+from .capture import Capture, get_traffic_recorder, summarize_result, traffic_capture_enabled
+from .compression import compressed_response
+from .config import is_admin
+from .container import container
+from .idempotency import IdempotencyConflict, IdempotencyMismatch, get_idempotency_manager
+from .memory import ENTITY_INDEX_MAX_REFS, get_agent_memory
+from .metrics import metrics, record_query
+from .profiling import PROFILE_FORMATS, Profiler, get_profiler
+from .ratelimit import RateLimited, get_rate_limiter, meter_llm_usage
+from .sentiment import score_batch
+from .static_assets import frontend_serving_enabled, get_static_assets
+from .sessions import first_turn_state, follow_up_state, get_session_store
+from .stats_channel import (
+    StreamsFull, get_stats_aggregator, stats_events, stats_stream_enabled, stream_heartbeat_seconds,
+    with_resolution_rate,
+)
+from .tracing import start_span, get_tracer
+from .warmup import run_warmup, warmup_enabled, warmup_state
 
 # Pydantic models for API requests/responses
 class CustomerQueryRequest(BaseModel):
     query: str = Field(..., description="Customer's question or issue")
     user_id: Optional[str] = Field(None, description="Unique user identifier (auto-generated if not provided)")
+    conversation_id: Optional[str] = Field(None, description="Continue an existing conversation (new one if not provided)")
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional context or metadata")
 
 class CustomerQueryResponse(BaseModel):
@@ -24,12 +49,31 @@ class CustomerQueryResponse(BaseModel):
     escalation_needed: bool
     processing_time: float
     timestamp: datetime
+    follow_up: bool = Field(False, description="True when this query continued an existing conversation")
+    attempts: int = Field(0, description="Validation attempts used (refinement rounds + 1)")
+    degradations: List[str] = Field(default_factory=list, description="Shortcuts taken to meet the deadline (e.g. skipped_validation, kb_answer)")
+    trace_id: Optional[str] = Field(None, description="Trace identifier for correlating slow requests")
+    sentiment: Optional[str] = Field(None, description="positive, neutral or negative (local scorer)")
+    priority: Optional[str] = Field(None, description="high, normal or low")
+    fast_path: Optional[str] = Field(None, description="Template intent that answered without an LLM call (e.g. greeting)")
+    profile_id: Optional[str] = Field(None, description="Profile taken of this query (GET /api/v1/admin/profiles/{profile_id})")
+
+class SentimentBatchRequest(BaseModel):
+    texts: List[str] = Field(..., max_length=1000, description="Texts to score (up to 1000)")
+
+class SentimentBatchResponse(BaseModel):
+    results: List[Dict[str, Any]]
+    processing_ms: float
 
 class ConversationHistoryResponse(BaseModel):
     user_id: str
     total_conversations: int
     recent_conversations: List[Dict[str, Any]]
     common_issues: Dict[str, int]
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the page of older conversations (None on the last page)")
+
+# Conversation fields the history endpoint can project
+HISTORY_FIELDS = ("timestamp", "query", "categories", "resolution", "response", "entities")
 
 class SystemStatsResponse(BaseModel):
     total_conversations: int
@@ -37,12 +81,43 @@ class SystemStatsResponse(BaseModel):
     active_users: int
     memory_patterns: int
     knowledge_base_entries: int
+    indexed_entities: int = 0
+    resolution_rate: float = Field(0.0, description="Resolved issues as a percentage of all conversations")
+
+class EntityConversationsResponse(BaseModel):
+    entity_type: str
+    value: str
+    conversations: List[Dict[str, Any]] = Field(..., description="Newest first, across all users")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up this worker's graph, memory and LLM pool; flush memory and traces on shutdown."""
+    warmup_task = None
+    if warmup_enabled():
+        # Warm up in a thread so /health answers while /ready still reports warming
+        warmup_task = asyncio.create_task(asyncio.to_thread(run_warmup))
+    else:
+        warmup_state.set_status("skipped")
+    # Built before warm-up loads the memory store, so PROFILING_TRACEMALLOC_FRAMES sees it load
+    get_profiler()
+    yield
+    if warmup_task is not None:
+        await warmup_task
+    # Graceful shutdown: persist pending memory writes before the worker exits
+    if container.is_initialized("memory"):
+        get_agent_memory().close()
+    if container.is_initialized("speculator"):
+        container.get("speculator").close()
+    if container.is_initialized("traffic_recorder"):
+        get_traffic_recorder().close()
+    get_tracer().flush()
 
 # FastAPI app
 app = FastAPI(
     title="Advanced Customer Support Multi-Agent API",
     description="API for LangGraph-powered multi-agent customer service system with memory and learning capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware for frontend integration
@@ -54,18 +129,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global graph instance (in production, consider connection pooling)
-graph_app = None
+def _build_graph():
+    # langgraph is a heavy import; keep it off the module import path
+    from .graph import create_graph
+    return create_graph()
+
+container.register("graph", _build_graph)
 
 def get_graph():
-    """Lazy initialization of the graph to avoid multiprocessing issues."""
-    global graph_app
-    if graph_app is None:
-        graph_app = create_graph()
-    return graph_app
+    """Compiled graph, built once on first use (thread-safe via the container)."""
+    return container.get("graph")
+
+def _build_session_graph():
+    from .graph import create_graph
+    return create_graph(checkpointer=get_session_store().checkpointer)
+
+container.register("session_graph", _build_session_graph)
+
+def get_session_graph():
+    """Compiled graph that keeps per-conversation state in the session checkpointer."""
+    return container.get("session_graph")
 
 @app.post("/api/v1/support/query", response_model=CustomerQueryResponse)
-async def process_customer_query(request: CustomerQueryRequest, background_tasks: BackgroundTasks):
+async def process_customer_query(request: CustomerQueryRequest, background_tasks: BackgroundTasks, http_request: Request,
+                                 x_api_key: Optional[str] = Header(None),
+                                 idempotency_key: Optional[str] = Header(None)):
     """
     Process a customer support query through the multi-agent system.
 
@@ -74,40 +162,118 @@ async def process_customer_query(request: CustomerQueryRequest, background_tasks
     - Applies memory and learning
     - Routes to appropriate agents
     - Returns personalized response
+
+    metadata.deadline_ms sets this request's latency budget (server default:
+    REQUEST_LATENCY_BUDGET_MS); nodes degrade rather than run past it.
+    metadata.priority / metadata.tier / metadata.tenant_id feed admission
+    control; an overloaded worker answers 429 with Retry-After.
+    Queries are rate-limited per user (or client IP), X-API-Key and tenant,
+    and tenants have an hourly LLM-token budget; both also answer 429.
+    With an Idempotency-Key header, retries attach to the running execution
+    or replay its stored response (Idempotent-Replayed: true) instead of
+    running the graph again.
+    With TRAFFIC_CAPTURE=on, queries are recorded for replay (see capture.py).
+    With PROFILING=on, X-Profile plus X-Admin-Token profiles the query (see profiling.py).
     """
+    if idempotency_key is not None:
+        return await _idempotent_query(request, background_tasks, http_request, x_api_key, idempotency_key)
+    if not traffic_capture_enabled():
+        return await _process_query(request, background_tasks, http_request, x_api_key)
+    with get_traffic_recorder().capture(request.query, request.user_id, request.metadata) as capture:
+        return await _process_query(request, background_tasks, http_request, x_api_key, capture)
+
+async def _process_query(request: CustomerQueryRequest, background_tasks: BackgroundTasks, http_request: Request,
+                         x_api_key: Optional[str], capture: Optional[Capture] = None) -> CustomerQueryResponse:
+    metadata = request.metadata or {}
+    deadline_ms = metadata.get("deadline_ms")
+    if deadline_ms is not None:
+        if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0:
+            raise HTTPException(status_code=422, detail="metadata.deadline_ms must be a positive number")
+        deadline_ms = float(deadline_ms)
+    profiler = get_profiler()
+    try:
+        profile = profiler.for_request(http_request.headers)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    tenant_id = str(metadata["tenant_id"]) if metadata.get("tenant_id") else None
+    limiter = get_rate_limiter()
+    try:
+        client = http_request.client.host if http_request.client else "unknown"
+        # The SQLite store takes a write lock (and now and then prunes) per check: keep it off the event loop
+        await run_in_threadpool(limiter.check, user=request.user_id or f"ip:{client}", api_key=x_api_key,
+                                tenant=tenant_id)
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
+
+    priority = classify_priority(request.query, metadata)
+    tenant = tenant_id or "default"
+
     try:
         import time
         start_time = time.time()
 
-        # Generate user_id if not provided
-        user_id = request.user_id or f"user_{uuid.uuid4().hex[:8]}"
+        # Continue the conversation if it exists; otherwise start a new one
+        sessions = get_session_store()
+        conversation_id = request.conversation_id or f"conv_{uuid.uuid4().hex}"
+        # Checkpointer reads (and touch's evictions) may hit SQLite: run them in the threadpool
+        owner = await run_in_threadpool(sessions.owner, conversation_id) if request.conversation_id else None
+        if owner is not None and request.user_id not in (None, owner):
+            # Never continue another user's conversation
+            owner, conversation_id = None, f"conv_{uuid.uuid4().hex}"
+        follow_up = owner is not None
 
-        # Prepare initial state
-        initial_state = {
-            "query": request.query,
-            "user_id": user_id,
-            "categories": [],
-            "entities": {},
-            "sentiment": None,
-            "priority": None,
-            "response": None,
-            "escalation_needed": False,
-            "attempts": 0,  # Start from 0 for API calls
-            "conversation_history": [],
-            "satisfactory": None,
-            "similar_past_issues": [],
-            "knowledge_base_entry": None,
-            "memory_loaded": False
-        }
-
-        # Process through the graph
-        result = get_graph().invoke(initial_state)
+        # Generate user_id if not provided
+        user_id = request.user_id or owner or f"user_{uuid.uuid4().hex[:8]}"
+
+        # Follow-ups only send per-turn fields; the rest comes from the checkpoint
+        if follow_up:
+            turn_state = follow_up_state(request.query, user_id, deadline_ms, priority)
+        else:
+            turn_state = first_turn_state(request.query, user_id, deadline_ms, priority)
+        await run_in_threadpool(sessions.touch, conversation_id)
+
+        # Wait for a graph slot in weighted-fair order, or shed the query
+        admission = get_admission_controller()
+        try:
+            ticket = await admission.acquire(priority, tenant)
+        except Overloaded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
+
+        # Process through the graph inside a root span
+        with start_span("support.query", {"user.id": user_id, "query.length": len(request.query),
+                                          "session.follow_up": follow_up, "admission.priority": priority,
+                                          "admission.wait_ms": round(ticket.wait_seconds * 1000, 1)}) as span:
+            try:
+                # Off the event loop so queued requests keep being admitted and shed
+                with meter_llm_usage() as usage:
+                    result = await run_in_threadpool(profiler.wrap(profile, get_session_graph().invoke), turn_state,
+                                                     sessions.config(conversation_id), durability="exit")
+            finally:
+                admission.release(ticket)
+            await run_in_threadpool(limiter.charge_llm_tokens, tenant_id, usage.tokens)
+            span.set_attributes({
+                "state.categories": result.get("categories", []),
+                "state.attempts": result.get("attempts", 0),
+                "state.llm_calls": result.get("llm_calls", 0),
+                "state.satisfactory": bool(result.get("satisfactory")),
+                "state.escalation_needed": bool(result.get("escalation_needed")),
+                "state.degradations": result.get("degradations") or [],
+                "state.fast_path": result.get("fast_path") or "",
+                "llm.tokens": usage.tokens,
+            })
+            if profile is not None and profile.saved:
+                span.set_attribute("profile.id", profile.profile_id)
 
         processing_time = time.time() - start_time
+        record_query(result, processing_time)
+        if capture is not None:
+            capture.user_id, capture.conversation_id, capture.follow_up = user_id, conversation_id, follow_up
+            capture.result = summarize_result(result)
 
         # Prepare response
         response = CustomerQueryResponse(
-            conversation_id=f"conv_{uuid.uuid4().hex}",
+            conversation_id=conversation_id,
             user_id=user_id,
             query=request.query,
             response=result.get("response", "I'm sorry, I couldn't process your request at this time."),
@@ -115,7 +281,15 @@ async def process_customer_query(request: CustomerQueryRequest, background_tasks
             satisfactory=result.get("satisfactory", False),
             escalation_needed=result.get("escalation_needed", False),
             processing_time=round(processing_time, 2),
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            follow_up=follow_up,
+            attempts=result.get("attempts", 0),
+            degradations=result.get("degradations") or [],
+            trace_id=span.trace_id,
+            sentiment=result.get("sentiment"),
+            priority=result.get("priority"),
+            fast_path=result.get("fast_path"),
+            profile_id=profile.profile_id if profile is not None and profile.saved else None
         )
 
         # Background task to log analytics (optional)
@@ -123,33 +297,170 @@ async def process_customer_query(request: CustomerQueryRequest, background_tasks
 
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
-@app.get("/api/v1/support/history/{user_id}", response_model=ConversationHistoryResponse)
-async def get_conversation_history(user_id: str, limit: int = 10):
+async def _idempotent_query(request: CustomerQueryRequest, background_tasks: BackgroundTasks, http_request: Request,
+                            x_api_key: Optional[str], idempotency_key: str) -> JSONResponse:
+    """Run the query once per (caller, Idempotency-Key) and replay the response to retries"""
+    if not 0 < len(idempotency_key) <= 255 or not idempotency_key.isprintable():
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1-255 printable characters")
+    client = http_request.client.host if http_request.client else "unknown"
+    caller = f"key:{x_api_key}" if x_api_key else f"user:{request.user_id}" if request.user_id else f"ip:{client}"
+    scoped_key = hashlib.sha256(f"{caller}\n{idempotency_key}".encode("utf-8")).hexdigest()
+    fingerprint = hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+
+    async def execute() -> Dict[str, Any]:
+        response = await process_customer_query(request, background_tasks, http_request, x_api_key, None)
+        return response.model_dump(mode="json")
+
+    try:
+        body, outcome = await get_idempotency_manager().run(scoped_key, fingerprint, execute)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
+    except IdempotencyMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    headers = {"Idempotency-Key": idempotency_key}
+    if outcome != "executed":
+        headers["Idempotent-Replayed"] = "true"
+    return JSONResponse(body, headers=headers)
+
+@app.post("/api/v1/support/sentiment/batch", response_model=SentimentBatchResponse)
+async def score_sentiment_batch(request: SentimentBatchRequest):
+    """
+    Score sentiment and priority for many texts with the local scorer (no LLM calls).
+    """
+    import time
+    start_time = time.perf_counter()
+    results = [score.as_dict() for score in score_batch(request.texts)]
+    return SentimentBatchResponse(results=results,
+                                  processing_ms=round((time.perf_counter() - start_time) * 1000.0, 3))
+
+def _history_etag(user_id: str, profile: Dict[str, Any], *request_key: Any) -> str:
+    """Weak ETag from the profile version (every saved conversation bumps both) and the page requested"""
+    version = f"{user_id}|{profile.get('total_interactions', 0)}|{profile.get('last_interaction')}|{request_key}"
+    return f'W/"{hashlib.sha1(version.encode()).hexdigest()[:20]}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or etag[2:] in tags
+
+@app.get("/api/v1/support/history/{user_id}", response_model=ConversationHistoryResponse,
+         responses={304: {"description": "History unchanged since the ETag in If-None-Match"},
+                    404: {"description": "Unknown user"}})
+async def get_conversation_history(
+    user_id: str,
+    request: Request,
+    limit: int = Query(10, ge=1, le=50, description="Conversations per page (the last 50 are kept)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page: return older conversations"),
+    fields: Optional[str] = Query(None, description=f"Comma-separated conversation fields to return ({', '.join(HISTORY_FIELDS)})"),
+):
     """
     Get conversation history for a specific user.
 
-    Returns recent conversations and common issues for personalization.
+    Returns the newest conversations (oldest first within the page) and common
+    issues for personalization. Page back with ``cursor``, trim entries with
+    ``fields``, and send ``If-None-Match`` to get 304 while nothing changed.
     """
     try:
-        profile = agent_memory.get_user_profile(user_id)
-
-        # Get recent conversations (limited)
-        recent_conversations = profile.get("conversation_history", [])[-limit:]
+        projection = None
+        if fields:
+            projection = [field.strip() for field in fields.split(",") if field.strip()]
+            unknown = sorted(set(projection) - set(HISTORY_FIELDS))
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        if cursor:
+            try:
+                datetime.fromisoformat(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="cursor must be a next_cursor value")
+
+        # Reads wait for the user's queued writes (write-behind), so keep them off the event loop
+        profile = await run_in_threadpool(get_agent_memory().find_user_profile, user_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail=f"No history for user {user_id}")
+
+        etag = _history_etag(user_id, profile, limit, cursor, projection)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        # History is kept in chronological order, so timestamps double as cursors
+        history = profile.get("conversation_history", [])
+        if cursor:
+            history = [conversation for conversation in history if conversation.get("timestamp", "") < cursor]
+        page = history[-limit:]
+        next_cursor = page[0].get("timestamp") if len(history) > limit else None
+        if projection:
+            page = [{field: conversation.get(field) for field in projection} for conversation in page]
+
+        body = json.dumps({
+            "user_id": user_id,
+            "total_conversations": profile.get("total_interactions", 0),
+            "recent_conversations": page,
+            "common_issues": profile.get("common_issues", {}),
+            "next_cursor": next_cursor
+        }, default=str, separators=(",", ":")).encode()
+        return compressed_response(body, request.headers.get("accept-encoding"), headers=headers)
 
-        response = ConversationHistoryResponse(
-            user_id=user_id,
-            total_conversations=profile.get("total_interactions", 0),
-            recent_conversations=recent_conversations,
-            common_issues=profile.get("common_issues", {})
-        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
 
-        return response
+def _require_admin(x_admin_token: Optional[str]):
+    """403 unless the X-Admin-Token header matches ADMIN_TOKEN"""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/api/v1/support/entities/{entity_type}/{value}", response_model=EntityConversationsResponse)
+async def get_entity_conversations(
+    entity_type: str,
+    value: str,
+    limit: int = Query(10, ge=1, le=ENTITY_INDEX_MAX_REFS, description="Conversations to return (newest first)"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Find earlier conversations of any user that mention an entity, e.g.
+    ``/entities/order_id/12345``, from the entity index (no history scan).
+    Admin only: the results hold other users' queries and responses.
+    """
+    _require_admin(x_admin_token)
+    try:
+        conversations = await run_in_threadpool(get_agent_memory().find_conversations_by_entity,
+                                                entity_type, value, limit)
+        return EntityConversationsResponse(entity_type=entity_type, value=value, conversations=conversations)
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving conversations: {str(e)}")
+
+async def _set_account_link(user_id: str, other_user_id: str, linked: bool, x_admin_token: Optional[str]):
+    _require_admin(x_admin_token)
+    if user_id == other_user_id:
+        raise HTTPException(status_code=422, detail="An account cannot be linked to itself")
+    memory = get_agent_memory()
+    await run_in_threadpool(memory.link_accounts, user_id, other_user_id, linked)
+    return {"user_id": user_id, "linked_accounts": await run_in_threadpool(memory.linked_accounts, user_id)}
+
+@app.put("/api/v1/admin/accounts/{user_id}/links/{other_user_id}")
+async def link_accounts(user_id: str, other_user_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Link two accounts, e.g. one household (admin only). Handlers then see
+    each other's conversations about a shared order, not just whether they
+    were resolved.
+    """
+    return await _set_account_link(user_id, other_user_id, True, x_admin_token)
+
+@app.delete("/api/v1/admin/accounts/{user_id}/links/{other_user_id}")
+async def unlink_accounts(user_id: str, other_user_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Remove a link made with PUT (admin only).
+    """
+    return await _set_account_link(user_id, other_user_id, False, x_admin_token)
 
 @app.get("/api/v1/support/stats", response_model=SystemStatsResponse)
 async def get_system_stats():
@@ -157,33 +468,34 @@ async def get_system_stats():
     Get system-wide statistics and performance metrics.
     """
     try:
-        stats = agent_memory.get_memory_stats()
-
-        # Count unique users
-        user_profiles = agent_memory.memory.get("user_profiles", {})
-        active_users = len(user_profiles)
-
-        # Count successful patterns
-        patterns = agent_memory.memory.get("successful_patterns", {})
-        memory_patterns = len(patterns)
-
-        # Count knowledge base entries
-        kb = agent_memory.memory.get("knowledge_base", {})
-        knowledge_base_entries = len(kb)
-
-        response = SystemStatsResponse(
-            total_conversations=stats.get("total_conversations", 0),
-            resolved_issues=stats.get("resolved_issues", 0),
-            active_users=active_users,
-            memory_patterns=memory_patterns,
-            knowledge_base_entries=knowledge_base_entries
-        )
-
-        return response
+        # get_system_stats drains the write-behind queue first
+        stats = await run_in_threadpool(get_agent_memory().get_system_stats)
+        return SystemStatsResponse(**with_resolution_rate(stats))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving stats: {str(e)}")
 
+@app.get("/api/v1/support/stats/stream")
+async def stream_system_stats():
+    """
+    Server-sent events with the system statistics: a snapshot on connect, then
+    only the counters that changed (see stats_channel.py).
+
+    Returns 503 when the stream is disabled or this worker has too many open
+    streams; clients then poll /api/v1/support/stats instead.
+    """
+    if not stats_stream_enabled():
+        raise HTTPException(status_code=503, detail="Stats stream disabled; poll /api/v1/support/stats")
+    aggregator = get_stats_aggregator()
+    try:
+        queue = await aggregator.subscribe()
+    except StreamsFull as e:
+        raise HTTPException(status_code=503, detail=f"{e}; poll /api/v1/support/stats",
+                            headers={"Retry-After": "60"})
+    return StreamingResponse(stats_events(aggregator, queue, stream_heartbeat_seconds()),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/api/v1/support/feedback")
 async def submit_feedback(conversation_id: str, user_id: str, rating: int, feedback: Optional[str] = None):
     """
@@ -215,10 +527,91 @@ async def submit_feedback(conversation_id: str, user_id: str, rating: int, feedb
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error submitting feedback: {str(e)}")
 
+@app.get("/", include_in_schema=False)
+@app.get("/index.html", include_in_schema=False)
+@app.get("/static/{name}", include_in_schema=False)
+async def serve_frontend(request: Request):
+    """
+    The chat frontend: content-hashed, precompressed assets (see static_assets.py).
+    """
+    if not frontend_serving_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    served = get_static_assets().respond(request.url.path, request.headers.get("accept-encoding"),
+                                         request.headers.get("if-none-match"))
+    if served is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    status_code, headers, body = served
+    return Response(content=body, status_code=status_code, headers=headers)
+
+def _admin_profiler(x_admin_token: Optional[str]) -> Profiler:
+    """The profiler, for callers with the admin token (404 while profiling is off)"""
+    profiler = get_profiler()
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    _require_admin(x_admin_token)
+    return profiler
+
+@app.get("/api/v1/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """
+    Saved query profiles and memory snapshots of all workers, newest first (admin only).
+    """
+    profiler = _admin_profiler(x_admin_token)
+    profiles = await run_in_threadpool(profiler.list_profiles)
+    return {"profiles": profiles, "sample_rate": profiler.sample_rate, "mode": profiler.mode,
+            "tracemalloc": profiler.tracing}
+
+@app.get("/api/v1/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = Query("raw", pattern="^(raw|text)$"),
+                           x_admin_token: Optional[str] = Header(None)):
+    """
+    Download a profile: .pstats (cprofile), .collapsed stacks (sampler) or a
+    tracemalloc snapshot; format=text returns a readable summary instead.
+    """
+    profiler = _admin_profiler(x_admin_token)
+    meta = await run_in_threadpool(profiler.get_profile, profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile {profile_id}")
+    try:
+        if format == "text":
+            return PlainTextResponse(await run_in_threadpool(profiler.summary, meta))
+        body = await run_in_threadpool(profiler.profile_file(meta).read_bytes)
+    except OSError:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} was pruned")
+    media_type = "text/plain" if PROFILE_FORMATS[meta["mode"]] == "collapsed" else "application/octet-stream"
+    return Response(body, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{meta["file"]}"'})
+
+@app.post("/api/v1/admin/tracemalloc/{action}")
+async def control_tracemalloc(action: str, frames: int = Query(25, ge=1, le=100),
+                              scope: str = Query("memory", pattern="^(memory|all)$"),
+                              x_admin_token: Optional[str] = Header(None)):
+    """
+    Allocation tracing on the worker that answers (admin only).
+
+    start begins tracing with `frames` frames per allocation, snapshot saves
+    a snapshot (scope=memory keeps allocations made from the memory store)
+    and returns its top lines, and stop ends tracing.
+    """
+    profiler = _admin_profiler(x_admin_token)
+    if action == "start":
+        return {"started": profiler.start_tracemalloc(frames), "tracemalloc": True}
+    if action == "stop":
+        profiler.stop_tracemalloc()
+        return {"tracemalloc": False}
+    if action != "snapshot":
+        raise HTTPException(status_code=404, detail="Use start, snapshot or stop")
+    try:
+        return await run_in_threadpool(profiler.snapshot_memory, scope)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @app.get("/health")
 async def health_check():
     """
     Health check endpoint for monitoring and load balancers.
+
+    Liveness only: answers immediately without touching the LLM, memory or graph.
     """
     return {
         "status": "healthy",
@@ -226,6 +619,39 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Prometheus-format metrics for this worker (attempts and LLM calls per query, escalations).
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint reporting this worker's warm-up state.
+
+    Returns 503 until start-up warm-up (graph compile, memory load, LLM pool,
+    dry run) has finished. Without warm-up, ready once the lazily built
+    services are all initialized.
+    """
+    memory_loaded = container.is_initialized("memory") and get_agent_memory().is_loaded
+    components = {
+        "llm": container.is_initialized("llm"),
+        "memory": memory_loaded,
+        "graph": container.is_initialized("graph")
+    }
+    warmup = warmup_state.to_dict()
+    if warmup["status"] in ("cold", "skipped"):
+        ready = all(components.values())
+    else:
+        ready = warmup["status"] == "ready"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming", "components": components,
+                 "warmup": warmup, "timestamp": datetime.now().isoformat()}
+    )
+
 # Background tasks
 def log_query_analytics(request: CustomerQueryRequest, response: CustomerQueryResponse):
     """
@@ -253,19 +679,19 @@ def log_query_analytics(request: CustomerQueryRequest, response: CustomerQueryRe
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return {
+    return JSONResponse(status_code=exc.status_code, headers=getattr(exc, "headers", None), content={
         "error": True,
         "message": exc.detail,
         "status_code": exc.status_code
-    }
+    })
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    return {
+    return JSONResponse(status_code=500, content={
         "error": True,
         "message": "Internal server error",
         "status_code": 500
-    }
+    })
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,292 @@
+"""
+Opt-in traffic capture for the support query endpoint, and the recorded
+LLM responses used to replay it.
+
+With TRAFFIC_CAPTURE=on, every query that runs the graph is appended to
+TRAFFIC_CAPTURE_PATH as one JSON object per line (NDJSON):
+
+    {"capture_id": "...", "ts": 1760000000.0, "status": 200, "latency_ms": 812.4,
+     "request": {"query": "...", "user_id": "u_...", "conversation": "c_...", "follow_up": false,
+                 "metadata": {"priority": "high"}},
+     "result": {"route": "billing_handler", "categories": ["billing"], "escalation_needed": false, ...},
+     "llm": [{"kind": "answer", "prompt_sha": "...", "prompt_chars": 1510, "latency_ms": 640.1,
+              "response": "..."}]}
+
+Records are sanitized before they are written: user and conversation ids
+become salted pseudonyms (TRAFFIC_CAPTURE_SALT), so one user's turns still
+line up; emails, card numbers, SSNs and phone numbers in queries and LLM
+responses are masked; metadata keeps only the fields that change how a
+query is handled; prompts are stored as a digest of their sanitized text.
+TRAFFIC_CAPTURE_SAMPLE (0-1) records a fraction of queries. Idempotent
+replays are not recorded, since they do not run the graph.
+
+``benchmarks/replay_traffic.py`` re-drives a capture against the API or
+the graph, answering LLM calls with RecordedResponder.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import load_settings
+from .container import container
+from .metrics import metrics
+
+CAPTURED_METADATA = ("priority", "tier", "tenant_id", "deadline_ms")
+RESULT_FIELDS = ("categories", "sentiment", "priority", "fast_path", "escalation_needed", "satisfactory",
+                 "attempts", "llm_calls", "degradations")
+
+# Most specific first: card numbers would otherwise match as phone numbers
+_PII_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "<email>"),
+    (re.compile(r"\b\d{3}-\d{2}-\d{4}\b"), "<ssn>"),
+    (re.compile(r"\b(?:\d[ -]?){12,18}\d\b"), "<card>"),
+    (re.compile(r"(?<![\w+(])[+(]?(?:\d[\s().-]{0,2}){9,14}\d\b"), "<phone>"),
+]
+_PROMPT_KINDS = [
+    ("Evaluate, for each numbered item", "batch_validation"),
+    ("Evaluate if", "validation"),
+    ("Improve this", "refinement"),
+]
+
+captured_total = metrics.counter("traffic_captured_total", "Queries written to the traffic capture, by status")
+
+
+def sanitize_text(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return text
+    for pattern, replacement in _PII_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def pseudonym(prefix: str, value: Optional[str], salt: str) -> Optional[str]:
+    if value is None:
+        return None
+    return f"{prefix}_{hashlib.sha256(f'{salt}:{value}'.encode('utf-8')).hexdigest()[:16]}"
+
+
+def prompt_kind(prompt: str) -> str:
+    for prefix, kind in _PROMPT_KINDS:
+        if prompt.startswith(prefix):
+            return kind
+    return "answer"
+
+
+def prompt_digest(prompt: str) -> str:
+    return hashlib.sha256(sanitize_text(prompt).encode("utf-8")).hexdigest()[:32]
+
+
+def route_of(result: Dict[str, Any]) -> str:
+    """The path a query took through the graph, e.g. fast_path:greeting or collaboration>escalate"""
+    if result.get("fast_path"):
+        return f"fast_path:{result['fast_path']}"
+    from .graph import route_after_classify
+    route = route_after_classify({"categories": result.get("categories") or []})
+    return f"{route}>escalate" if result.get("escalation_needed") else route
+
+
+def summarize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {field: result.get(field) for field in RESULT_FIELDS}
+    summary["route"] = route_of(result)
+    return summary
+
+
+class Capture:
+    """One query being recorded; the endpoint fills in who asked and what the graph did"""
+
+    def __init__(self, query: str, user_id: Optional[str], metadata: Optional[Dict[str, Any]]):
+        self.capture_id = uuid.uuid4().hex
+        self.ts = time.time()
+        self.query = query
+        self.metadata = metadata or {}
+        self.user_id = user_id
+        self.conversation_id: Optional[str] = None
+        self.follow_up = False
+        self.result: Optional[Dict[str, Any]] = None
+        self.llm_calls: List[Dict[str, Any]] = []
+
+    def add_llm_call(self, prompt: str, response: str, latency: float):
+        self.llm_calls.append({"kind": prompt_kind(prompt), "prompt_sha": prompt_digest(prompt),
+                               "prompt_chars": len(prompt), "latency_ms": round(latency * 1000.0, 1),
+                               "response": sanitize_text(response)})
+
+
+_current_capture: contextvars.ContextVar[Optional[Capture]] = contextvars.ContextVar("traffic_capture", default=None)
+
+
+def record_llm_call(prompt: str, response: Any, latency: float):
+    """Attach an LLM exchange to the query being captured, if any"""
+    capture = _current_capture.get()
+    if capture is not None:
+        capture.add_llm_call(prompt, getattr(response, "content", "") or "", latency)
+
+
+class TrafficRecorder:
+    """Appends sanitized query records to an NDJSON file (one write per line, safe across workers)"""
+
+    def __init__(self, path: str, sample_rate: float = 1.0, salt: str = ""):
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.salt = salt
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+
+    @contextmanager
+    def capture(self, query: str, user_id: Optional[str] = None,
+                metadata: Optional[Dict[str, Any]] = None) -> Iterator[Optional[Capture]]:
+        """Record the query run inside the block (yields None when it is not sampled)"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            yield None
+            return
+        capture = Capture(query, user_id, metadata)
+        token = _current_capture.set(capture)
+        started = time.perf_counter()
+        status = 200
+        try:
+            yield capture
+        except Exception as e:
+            status = getattr(e, "status_code", 500)
+            raise
+        finally:
+            _current_capture.reset(token)
+            try:
+                self.write(self.record(capture, status, (time.perf_counter() - started) * 1000.0))
+            except OSError as e:
+                print(f"Traffic capture write failed: {e}")
+
+    def record(self, capture: Capture, status: int, latency_ms: float) -> Dict[str, Any]:
+        metadata = {name: pseudonym("t", str(value), self.salt) if name == "tenant_id" else value
+                    for name, value in capture.metadata.items() if name in CAPTURED_METADATA}
+        return {
+            "capture_id": capture.capture_id,
+            "ts": round(capture.ts, 3),
+            "status": status,
+            "latency_ms": round(latency_ms, 1),
+            "request": {
+                "query": sanitize_text(capture.query),
+                "user_id": pseudonym("u", capture.user_id, self.salt),
+                "conversation": pseudonym("c", capture.conversation_id, self.salt),
+                "follow_up": capture.follow_up,
+                "metadata": metadata,
+            },
+            "result": capture.result,
+            "llm": capture.llm_calls,
+        }
+
+    def write(self, record: Dict[str, Any]):
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            if self._fd is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            os.write(self._fd, line)
+        captured_total.inc(status=str(record["status"]))
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    """Records of a capture file in timestamp order (blank and truncated lines skipped)"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # a worker killed mid-write
+    return sorted(records, key=lambda record: record["ts"])
+
+
+class ReplayCursor:
+    """The recorded LLM calls of the query being replayed, each used once"""
+
+    def __init__(self, record: Dict[str, Any]):
+        self.calls = list(record.get("llm") or [])
+        self.used = [False] * len(self.calls)
+        self.stats = {"exact": 0, "in_order": 0, "unrecorded": 0}
+
+    def take(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """The call with the same prompt, else the next unused call of the same kind"""
+        digest, kind = prompt_digest(prompt), prompt_kind(prompt)
+        for match, stat in ((lambda call: call["prompt_sha"] == digest, "exact"),
+                            (lambda call: call["kind"] == kind, "in_order")):
+            for i, call in enumerate(self.calls):
+                if not self.used[i] and match(call):
+                    self.used[i] = True
+                    self.stats[stat] += 1
+                    return call
+        self.stats["unrecorded"] += 1
+        return None
+
+
+_current_replay: contextvars.ContextVar[Optional[ReplayCursor]] = contextvars.ContextVar("traffic_replay",
+                                                                                           default=None)
+
+
+@contextmanager
+def replaying(record: Dict[str, Any]) -> Iterator[ReplayCursor]:
+    """LLM calls made inside the block are answered from this record"""
+    cursor = ReplayCursor(record)
+    token = _current_replay.set(cursor)
+    try:
+        yield cursor
+    finally:
+        _current_replay.reset(token)
+
+
+class RecordedResponder:
+    """FakeChatModel responder answering from the record being replayed (see replaying)
+
+    A call with no recorded counterpart (a new prompt kind, an extra
+    refinement round) gets the fake model's default reply. With
+    latency=True each recorded call also takes as long as it did.
+    """
+
+    def __init__(self, latency: bool = True):
+        self.latency = latency
+
+    def __call__(self, prompt: str) -> str:
+        cursor = _current_replay.get()
+        call = cursor.take(prompt) if cursor is not None else None
+        if call is None:
+            from .fake_llm import default_responder
+            return default_responder(prompt)
+        if self.latency and call.get("latency_ms"):
+            time.sleep(call["latency_ms"] / 1000.0)
+        return call["response"]
+
+
+def traffic_capture_enabled() -> bool:
+    load_settings()
+    return os.getenv("TRAFFIC_CAPTURE", "off").lower() in ("1", "on", "true", "yes")
+
+
+def build_traffic_recorder() -> TrafficRecorder:
+    load_settings()
+    return TrafficRecorder(os.getenv("TRAFFIC_CAPTURE_PATH", "data/traffic_capture.ndjson"),
+                           sample_rate=float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", "1.0")),
+                           salt=os.getenv("TRAFFIC_CAPTURE_SALT", ""))
+
+
+container.register("traffic_recorder", build_traffic_recorder)
+
+
+def get_traffic_recorder() -> TrafficRecorder:
+    return container.get("traffic_recorder")
@@ -0,0 +1,78 @@
+"""
+Response compression negotiated from the client's Accept-Encoding.
+
+Brotli (``br``) is used when the optional ``brotli`` package is installed,
+gzip otherwise. Bodies shorter than MIN_COMPRESS_BYTES go out uncompressed:
+below that the encoding overhead eats the saving.
+"""
+
+import gzip
+from typing import Dict, Optional, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 512
+
+
+def available_encodings():
+    """Encodings this server can produce, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    weights = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    return weights
+
+
+def negotiate_encoding(accept_encoding: Optional[str], encodings: Optional[Sequence[str]] = None) -> Optional[str]:
+    """Best encoding the client accepts, or None for identity
+
+    ``encodings`` (most preferred first) defaults to what this server can
+    compress on the fly; pass the variants already on disk for static files.
+    """
+    if not accept_encoding:
+        return None
+    weights = _parse_accept_encoding(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in available_encodings() if encodings is None else encodings:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def compressed_response(body: bytes, accept_encoding: Optional[str], media_type: str = "application/json",
+                        headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    """Response with the body compressed for the client when it is worth it"""
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, headers=headers, media_type=media_type)
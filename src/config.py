@@ -1,16 +1,79 @@
-from langchain_openai import ChatOpenAI
+import hmac
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model="z-ai/glm-4.5-air:free",
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-    default_headers={
-        "HTTP-Referer": "",  # Optional
-        "X-Title": "",  # Optional
-    }
-)
\ No newline at end of file
+import threading
+from typing import Optional
+
+from .container import container
+
+_settings_lock = threading.Lock()
+_settings_loaded = False
+
+
+def load_settings():
+    """Load .env into the environment once (deferred until a service needs it)"""
+    global _settings_loaded
+    if _settings_loaded:
+        return
+    with _settings_lock:
+        if not _settings_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _settings_loaded = True
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """Whether an X-Admin-Token header matches ADMIN_TOKEN (never, while ADMIN_TOKEN is unset)"""
+    load_settings()
+    expected = os.getenv("ADMIN_TOKEN", "")
+    return bool(expected and token) and hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+
+def admin_token_configured() -> bool:
+    load_settings()
+    return bool(os.getenv("ADMIN_TOKEN"))
+
+
+def build_llm():
+    """Construct the chat model; LLM_PROVIDER=fake selects the offline fake model"""
+    load_settings()
+
+    if os.getenv("LLM_PROVIDER", "openrouter").lower() == "fake":
+        from .fake_llm import FakeChatModel
+        return FakeChatModel(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")),
+            latency_distribution=os.getenv("FAKE_LLM_DISTRIBUTION", "constant"),
+            latency_jitter_ms=float(os.getenv("FAKE_LLM_JITTER_MS", "0")),
+            failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")),
+        )
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model="z-ai/glm-4.5-air:free",
+        base_url="https://openrouter.ai/api/v1",
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        default_headers={
+            "HTTP-Referer": "",  # Optional
+            "X-Title": "",  # Optional
+        }
+    )
+
+
+container.register("llm", build_llm)
+
+
+def get_llm():
+    """Return the chat model used by the graph nodes (built on first use)"""
+    return container.get("llm")
+
+
+def set_llm(model):
+    """Swap the chat model (e.g. for a fake model in tests/benchmarks); returns the previous one"""
+    return container.set("llm", model)
+
+
+def __getattr__(name):
+    # Backwards compatibility for `from src.config import llm`
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,72 @@
+"""
+Dependency-injection container for shared services.
+
+The LLM client, the memory store and the compiled graph are expensive to
+build (heavy imports, client construction, parsing the memory file), so
+they are created on first use rather than at import time. Tests and
+benchmarks can swap any of them with ``container.set(...)``, or scope a
+replacement to the current context (thread / task / graph run) with
+``container.override(...)``.
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+_overrides: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("container_overrides", default={})
+
+
+class Container:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Register the factory used to build a service on first use"""
+        with self._lock:
+            self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        overrides = _overrides.get()
+        if name in overrides:
+            return overrides[name]
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            # Re-check under the lock so concurrent first requests build only once
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def set(self, name: str, instance: Any) -> Any:
+        """Replace a service instance; returns the previous one (None if not yet built)"""
+        with self._lock:
+            previous = self._instances.get(name)
+            if instance is None:
+                self._instances.pop(name, None)
+            else:
+                self._instances[name] = instance
+            return previous
+
+    @contextmanager
+    def override(self, **instances: Any):
+        """Use the given instances only within the current context"""
+        token = _overrides.set({**_overrides.get(), **instances})
+        try:
+            yield
+        finally:
+            _overrides.reset(token)
+
+    def is_initialized(self, name: str) -> bool:
+        return name in self._instances
+
+    def reset(self, name: str):
+        """Drop a built instance so the next get() rebuilds it"""
+        with self._lock:
+            self._instances.pop(name, None)
+
+
+container = Container()
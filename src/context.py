@@ -0,0 +1,303 @@
+"""
+Token-budgeted prompt context for the handlers.
+
+Handlers used to paste the top similar issues and raw KB resolutions into
+the prompt, so the context grew with the length of every stored answer and
+had no overall limit. Now the candidates are scored and packed into a
+token budget instead:
+
+    user summary         rolling per-user summary of every past conversation
+    session turns        earlier turns of the current conversation
+    similar issues       past conversations from load_memory
+    related              conversations about the same order (entity index); other
+                         accounts' only as resolved/unresolved, unless linked
+    KB resolutions       the matched knowledge-base entry
+
+Each candidate is scored by word overlap with the query plus a per-kind
+weight and recency, truncated to CONTEXT_ITEM_MAX_TOKENS, and taken
+greedily (at most KIND_LIMITS per kind, duplicates dropped) until the
+budget is spent. The budget is CONTEXT_TOKEN_BUDGET, or a per-model default
+from MODEL_CONTEXT_BUDGETS; it is a ceiling, not a target.
+
+Tokens are counted with tiktoken (CONTEXT_TOKENIZER, default cl100k_base)
+when its encoding is available locally, otherwise with a regex
+approximation of BPE (~4 characters per word piece).
+
+The per-user summary is folded in incrementally by ``update_user_summary``
+each time save_memory stores a conversation, so old history costs a fixed
+handful of tokens however long the user has been around.
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import load_settings
+
+# Prompt context budgets by model-name prefix (tokens), for when CONTEXT_TOKEN_BUDGET is unset
+MODEL_CONTEXT_BUDGETS = {
+    "z-ai/glm-4.5-air": 1500,
+    "gpt-4o": 2000,
+    "fake": 600,
+}
+DEFAULT_CONTEXT_BUDGET = 1000
+
+KIND_WEIGHTS = {"summary": 3.0, "session": 2.0, "related": 1.75, "similar": 1.5, "kb": 1.0}
+KIND_LIMITS = {"summary": 1, "session": 6, "related": 3, "similar": 2, "kb": 2}
+SECTION_TITLES = {
+    "summary": "Customer summary",
+    "session": "Earlier in this conversation",
+    "related": "Earlier conversations about the same order",
+    "similar": "Past similar issues",
+    "kb": "Known resolutions",
+}
+SUMMARY_RECENT = 3
+SUMMARY_ORDER_IDS = 5
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+_QUERY_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are at be but by can do for from have i in is it me my of on or our so that "
+                       "the this to was we what when where why will with you your".split())
+
+_encoder_lock = threading.Lock()
+_encoder: Any = None
+_encoder_loaded = False
+
+
+# Token counting
+def _get_encoder():
+    """tiktoken encoder, or None when tiktoken or its encoding file isn't available"""
+    global _encoder, _encoder_loaded
+    if _encoder_loaded:
+        return _encoder
+    with _encoder_lock:
+        if not _encoder_loaded:
+            load_settings()
+            name = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")
+            if name != "approx":
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding(name)
+                except Exception as e:
+                    print(f"tiktoken encoding '{name}' unavailable ({type(e).__name__}); approximating token counts")
+            _encoder_loaded = True
+    return _encoder
+
+
+def _approx_count(text: str) -> int:
+    """Approximate BPE token count: punctuation alone, one token per 4 characters of a word"""
+    return sum((len(piece) + 3) // 4 for piece in _WORD.findall(text))
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return _approx_count(text)
+
+
+def fit_tokens(text: str, max_tokens: int) -> Tuple[str, int]:
+    """(text cut to at most max_tokens tokens with an ellipsis marking the cut, its token count)"""
+    if max_tokens <= 0 or not text:
+        return "", 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        tokens = encoder.encode(text)
+        if len(tokens) <= max_tokens:
+            return text, len(tokens)
+        return encoder.decode(tokens[:max_tokens - 1]).rstrip() + "…", max_tokens
+    # One pass: remember where max_tokens - 1 tokens end, keep counting to see whether the cut is needed
+    used, cut, cut_used = 0, None, 0
+    for match in _WORD.finditer(text):
+        cost = (match.end() - match.start() + 3) // 4
+        if cut is None and used + cost > max_tokens - 1:
+            cut, cut_used = match.start(), used
+        used += cost
+        if used > max_tokens:
+            return text[:cut].rstrip() + "…", cut_used + 1
+    return text, used
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens, marking the cut with an ellipsis"""
+    return fit_tokens(text, max_tokens)[0]
+
+
+def context_budget(model_name: Optional[str] = None) -> int:
+    load_settings()
+    configured = os.getenv("CONTEXT_TOKEN_BUDGET")
+    if configured:
+        return int(configured)
+    for prefix, budget in MODEL_CONTEXT_BUDGETS.items():
+        if model_name and model_name.startswith(prefix):
+            return budget
+    return DEFAULT_CONTEXT_BUDGET
+
+
+def item_max_tokens() -> int:
+    load_settings()
+    return int(os.getenv("CONTEXT_ITEM_MAX_TOKENS", "120"))
+
+
+# Rolling per-user summary
+def new_user_summary() -> Dict[str, Any]:
+    return {"conversations": 0, "resolved": 0, "categories": {}, "negative": 0,
+            "order_ids": [], "recent_unresolved": [], "recent_resolved": []}
+
+
+def _push_recent(items: List[Any], value: Any, limit: int):
+    if value in items:
+        items.remove(value)
+    items.append(value)
+    del items[:-limit]
+
+
+def update_user_summary(summary: Optional[Dict[str, Any]], conversation: Dict[str, Any],
+                        sentiment: Optional[str] = None) -> Dict[str, Any]:
+    """Fold one stored conversation into the summary (constant work per conversation)"""
+    summary = summary or new_user_summary()
+    summary["conversations"] += 1
+    for category in conversation.get("categories", []):
+        summary["categories"][category] = summary["categories"].get(category, 0) + 1
+    if sentiment == "negative":
+        summary["negative"] += 1
+    order_id = (conversation.get("entities") or {}).get("order_id")
+    if order_id:
+        _push_recent(summary["order_ids"], str(order_id), SUMMARY_ORDER_IDS)
+    topic = truncate_tokens(conversation.get("query", ""), 24)
+    if conversation.get("resolution"):
+        summary["resolved"] += 1
+        _push_recent(summary["recent_resolved"], topic, SUMMARY_RECENT)
+        if topic in summary["recent_unresolved"]:
+            summary["recent_unresolved"].remove(topic)
+    else:
+        _push_recent(summary["recent_unresolved"], topic, SUMMARY_RECENT)
+    return summary
+
+
+def summarize_history(history: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Summary for profiles stored before summaries existed"""
+    summary = None
+    for conversation in history:
+        summary = update_user_summary(summary, conversation)
+    return summary
+
+
+def render_user_summary(summary: Dict[str, Any]) -> str:
+    top = sorted(summary["categories"].items(), key=lambda item: item[1], reverse=True)[:3]
+    parts = [f"{summary['conversations']} past conversations ({summary['resolved']} resolved)"]
+    if top:
+        parts.append("mostly " + ", ".join(f"{category} ({count})" for category, count in top))
+    if summary.get("negative"):
+        parts.append(f"{summary['negative']} negative")
+    if summary["order_ids"]:
+        parts.append("orders " + ", ".join(summary["order_ids"]))
+    text = "; ".join(parts) + "."
+    if summary["recent_unresolved"]:
+        text += " Unresolved: " + "; ".join(f"'{topic}'" for topic in summary["recent_unresolved"]) + "."
+    if summary["recent_resolved"]:
+        text += " Recently resolved: " + "; ".join(f"'{topic}'" for topic in summary["recent_resolved"]) + "."
+    return text
+
+
+# Candidate selection
+def _keywords(text: str) -> set:
+    return {word for word in _QUERY_WORD.findall(text.lower()) if word not in _STOPWORDS}
+
+
+def _relevance(query_words: set, text: str) -> float:
+    if not query_words:
+        return 0.0
+    return len(query_words & _keywords(text)) / len(query_words)
+
+
+def _candidates(state: Dict[str, Any], max_chars: int) -> List[Tuple[float, str, str]]:
+    """(score, kind, text) for everything that could go into the prompt, texts cut to max_chars"""
+    query = state.get('query', '')
+    query_words = _keywords(query)
+    candidates = []
+
+    summary = state.get('user_summary')
+    if summary and summary.get("conversations"):
+        candidates.append((KIND_WEIGHTS["summary"], "summary", render_user_summary(summary)))
+
+    # Earlier turns of this conversation, newest first (the last user turn is the query itself)
+    turns = list(state.get('conversation_history') or [])
+    if turns and turns[-1].get("role") == "user" and turns[-1].get("content") == query:
+        turns = turns[:-1]
+    for age, turn in enumerate(reversed(turns)):
+        text = f"{turn.get('role', 'user')}: {turn.get('content', '')}"[:max_chars]
+        score = KIND_WEIGHTS["session"] / (1 + 0.5 * age) + _relevance(query_words, text)
+        candidates.append((score, "session", text))
+
+    for issue in state.get('similar_past_issues') or []:
+        outcome = "resolved" if issue.get('resolution') else "unresolved"
+        text = f"'{issue.get('query', '')}' ({outcome}): {issue.get('response') or 'N/A'}"[:max_chars]
+        score = KIND_WEIGHTS["similar"] * (1.0 if issue.get('resolution') else 0.6) \
+            + _relevance(query_words, issue.get('query', ''))
+        candidates.append((score, "similar", text))
+
+    for age, ref in enumerate(state.get('related_conversations') or []):
+        outcome = "resolved" if ref.get('resolution') else "unresolved"
+        if 'query' in ref:
+            text = f"'{ref.get('query', '')}' ({outcome}): {ref.get('response') or 'N/A'}"[:max_chars]
+        else:  # another account's conversation: only whether it was resolved
+            text = f"Another account raised this order about {', '.join(ref.get('categories') or ['it'])} ({outcome})"
+        score = KIND_WEIGHTS["related"] * (1.0 if ref.get('resolution') else 0.6) / (1 + 0.25 * age) \
+            + _relevance(query_words, ref.get('query', ''))
+        candidates.append((score, "related", text))
+
+    kb_entry = state.get('knowledge_base_entry') or {}
+    resolutions = kb_entry.get('resolutions') or []
+    for age, resolution in enumerate(reversed(resolutions)):
+        resolution = resolution[:max_chars]
+        score = KIND_WEIGHTS["kb"] / (1 + 0.25 * age) + _relevance(query_words, resolution)
+        candidates.append((score, "kb", resolution))
+    return candidates
+
+
+def select_context(state: Dict[str, Any], budget: Optional[int] = None,
+                   max_item_tokens: Optional[int] = None) -> List[Tuple[str, str]]:
+    """Highest-scoring (kind, text) items that fit in the token budget, section headers included"""
+    budget = context_budget() if budget is None else budget
+    max_item_tokens = item_max_tokens() if max_item_tokens is None else max_item_tokens
+    selected, seen, used = [], set(), 0
+    per_kind: Dict[str, int] = {}
+    # Tokens average ~4 characters; anything past 8 per token would be truncated anyway
+    max_chars = max_item_tokens * 8
+    for score, kind, text in sorted(_candidates(state, max_chars), key=lambda c: c[0], reverse=True):
+        if per_kind.get(kind, 0) >= KIND_LIMITS[kind]:
+            continue
+        text = " ".join(text.split())
+        if text in seen:
+            continue
+        text, cost = fit_tokens(text, max_item_tokens)
+        cost += 2  # bullet and newline
+        if kind not in per_kind:
+            cost += count_tokens(f"\n{SECTION_TITLES[kind]}:\n")
+        if used + cost > budget:
+            continue
+        selected.append((kind, text))
+        seen.add(text)
+        per_kind[kind] = per_kind.get(kind, 0) + 1
+        used += cost
+    return selected
+
+
+def build_memory_context(state: Dict[str, Any], budget: Optional[int] = None,
+                         max_item_tokens: Optional[int] = None) -> str:
+    """Prompt context section: selected items grouped by kind, in a fixed section order"""
+    selected = select_context(state, budget, max_item_tokens)
+    context = ""
+    for kind in SECTION_TITLES:
+        items = [text for item_kind, text in selected if item_kind == kind]
+        if items:
+            context += f"\n{SECTION_TITLES[kind]}:\n" + "".join(f"- {text}\n" for text in items)
+    return context
+
+
+def model_name(llm: Any) -> Optional[str]:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__.lower()
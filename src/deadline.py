@@ -0,0 +1,87 @@
+"""
+Per-request deadlines propagated through the graph.
+
+Every query gets an absolute deadline: ``metadata.deadline_ms`` from the
+request, or the server-wide REQUEST_LATENCY_BUDGET_MS (default 30000).
+start_turn stores it in the state as ``deadline_at`` and every node can ask
+for the remaining budget. LLM calls get the remaining time as their
+timeout and are skipped outright (DeadlineExceeded) when less than
+DEADLINE_MIN_LLM_MS (default 1000) is left. Nodes then degrade instead of
+overrunning: handlers answer from the knowledge base, a similar resolved
+past issue or a canned reply, and validation is skipped. Every shortcut
+is recorded in ``degradations`` and returned to the client.
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import load_settings
+
+# Degradation names reported in the API response
+KB_ANSWER = "kb_answer"
+CACHED_ANSWER = "cached_answer"
+CANNED_FALLBACK = "canned_fallback"
+SKIPPED_VALIDATION = "skipped_validation"
+SKIPPED_MEMORY_LOOKUP = "skipped_memory_lookup"
+
+
+class DeadlineExceeded(TimeoutError):
+    """Not enough of the request budget is left for the operation"""
+
+
+def default_deadline_ms() -> float:
+    load_settings()
+    return float(os.getenv("REQUEST_LATENCY_BUDGET_MS", "30000"))
+
+
+def min_llm_call_ms() -> float:
+    load_settings()
+    return float(os.getenv("DEADLINE_MIN_LLM_MS", "1000"))
+
+
+def deadline_at(started_at: float, deadline_ms: Optional[float] = None) -> float:
+    """Absolute deadline (epoch seconds) for a request that started at `started_at`"""
+    budget = deadline_ms if deadline_ms is not None else default_deadline_ms()
+    return started_at + budget / 1000.0
+
+
+def remaining_ms(state: Dict[str, Any]) -> float:
+    """Milliseconds left before the request deadline (infinite when there is none)"""
+    deadline = state.get('deadline_at')
+    if deadline is None:
+        return float("inf")
+    return (deadline - time.time()) * 1000.0
+
+
+def llm_timeout(state: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Per-call LLM timeout in seconds derived from the remaining budget"""
+    if state is None:
+        return None
+    remaining = remaining_ms(state)
+    if remaining == float("inf"):
+        return None
+    if remaining < min_llm_call_ms():
+        raise DeadlineExceeded(f"{max(remaining, 0.0):.0f} ms left before the deadline")
+    return remaining / 1000.0
+
+
+def with_degradation(state: Dict[str, Any], degradation: str) -> List[str]:
+    """The state's degradations plus a new one (each listed once)"""
+    degradations = list(state.get('degradations') or [])
+    if degradation not in degradations:
+        degradations.append(degradation)
+    return degradations
+
+
+def degraded_answer(state: Dict[str, Any], canned: str) -> Tuple[str, str]:
+    """Best answer available without an LLM call: KB resolution, a similar resolved issue (this user's, then
+    a linked account's about the same order), or the canned reply"""
+    kb_entry = state.get('knowledge_base_entry')
+    if kb_entry and kb_entry.get('resolutions'):
+        return kb_entry['resolutions'][-1], KB_ANSWER
+    for issue in (state.get('similar_past_issues') or []) + (state.get('related_conversations') or []):
+        # Resolution hints from unlinked accounts carry no response, so they are never replayed
+        if issue.get('resolution') and issue.get('response'):
+            return issue['response'], CACHED_ANSWER
+    return canned, CANNED_FALLBACK
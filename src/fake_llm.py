@@ -0,0 +1,153 @@
+"""
+Deterministic fake chat model for offline tests and benchmarks.
+
+The model plugs in wherever the OpenRouter-backed ChatOpenAI client is used
+(see ``config.set_llm``) and simulates provider behaviour: a configurable
+latency distribution, per-token streaming, random failures and an optional
+cap on concurrent calls (further calls queue, as behind a provider's
+concurrency limit), all driven by a seeded RNG so runs are reproducible.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal", "exponential")
+
+
+class FakeLLMError(RuntimeError):
+    """Simulated provider failure"""
+
+
+def default_responder(prompt: str) -> str:
+    """Answer validation prompts with 'yes' and everything else with a canned reply"""
+    if "one line per item" in prompt:
+        # Batched validation (see microbatch.py): one verdict per numbered item
+        items = re.findall(r"^\[(\d+)\]$", prompt, re.MULTILINE)
+        return "\n".join(f"{item}: yes" for item in items)
+    if "Is this response satisfactory?" in prompt or "Answer with only 'yes' or 'no'" in prompt:
+        return "yes"
+    digest = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+    return (f"Thanks for reaching out. I've reviewed your request (ref {digest}) "
+            "and here are the next steps to resolve it.")
+
+
+class FakeChatModel(BaseChatModel):
+    latency_ms: float = 0.0
+    latency_distribution: str = "constant"
+    latency_jitter_ms: float = 0.0
+    latency_sigma: float = 0.5
+    token_latency_ms: float = 0.0
+    failure_rate: float = 0.0
+    max_concurrent_calls: int = 0  # 0 = unlimited
+    seed: Optional[int] = 0
+    responder: Callable[[str], str] = default_responder
+
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+    _slots: Optional[threading.BoundedSemaphore] = PrivateAttr()
+    _stats: Dict[str, int] = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {self.latency_distribution}")
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrent_calls) if self.max_concurrent_calls else None
+        self._stats = {"calls": 0, "failures": 0, "timeouts": 0, "prompt_chars": 0, "completion_chars": 0}
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def _sample_latency(self) -> float:
+        """Sample one call latency in seconds from the configured distribution"""
+        mean, jitter = self.latency_ms, self.latency_jitter_ms
+        rng = self._rng
+        if self.latency_distribution == "uniform":
+            value = rng.uniform(mean - jitter, mean + jitter)
+        elif self.latency_distribution == "normal":
+            value = rng.gauss(mean, jitter)
+        elif self.latency_distribution == "lognormal":
+            # Heavy right tail with median latency_ms
+            value = mean * rng.lognormvariate(0.0, self.latency_sigma)
+        elif self.latency_distribution == "exponential":
+            value = rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+        else:
+            value = mean
+        return max(value, 0.0) / 1000.0
+
+    def _begin_call(self, prompt: str, timeout: Optional[float] = None):
+        with self._lock:
+            delay = self._sample_latency()
+            failed = self._rng.random() < self.failure_rate
+            timed_out = timeout is not None and delay > timeout
+            self._stats["calls"] += 1
+            self._stats["prompt_chars"] += len(prompt)
+            if failed:
+                self._stats["failures"] += 1
+            if timed_out:
+                self._stats["timeouts"] += 1
+        if timed_out:
+            # Like an HTTP client timeout: give up after `timeout` seconds
+            time.sleep(timeout)
+            raise FakeLLMError(f"Simulated LLM timeout after {timeout:.3f}s")
+        if delay:
+            if self._slots is not None:
+                with self._slots:
+                    time.sleep(delay)
+            else:
+                time.sleep(delay)
+        if failed:
+            raise FakeLLMError("Simulated LLM provider failure")
+
+    def _respond(self, prompt: str) -> str:
+        text = self.responder(prompt)
+        with self._lock:
+            self._stats["completion_chars"] += len(text)
+        return text
+
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        self._begin_call(prompt, kwargs.get("timeout"))
+        message = AIMessage(content=self._respond(prompt))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        self._begin_call(prompt, kwargs.get("timeout"))
+        tokens = self._respond(prompt).split(" ")
+        for i, token in enumerate(tokens):
+            if self.token_latency_ms:
+                time.sleep(self.token_latency_ms / 1000.0)
+            text = token if i == len(tokens) - 1 else token + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,162 @@
+"""
+Zero-LLM fast path for greetings and templated FAQs.
+
+"hi" used to cost a handler LLM call plus an LLM validation. Queries that
+are *only* a greeting, a thank-you, a goodbye or one of the templated FAQ
+intents are now answered from a template straight after start_turn, and
+the turn goes to save_memory without touching an LLM node.
+
+Patterns must match the whole (normalized) query, so "hi, my app crashes"
+still takes the normal path. FAQ templates are filled with entities from
+the query or the session (e.g. ``{order_id}``); an intent whose template
+needs an entity that isn't known does not match.
+
+Extra FAQ intents can be loaded from a JSON file (FASTPATH_FAQ_PATH) with
+the same fields as DEFAULT_INTENTS; an entry with an existing name
+replaces it. FASTPATH=off disables the fast path.
+"""
+
+import json
+import os
+import re
+import string
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .config import load_settings
+
+DEFAULT_INTENTS: List[Dict[str, Any]] = [
+    {
+        "name": "greeting",
+        "patterns": [r"(hi|hello|hey|hiya|howdy|greetings|good (morning|afternoon|evening))( there)?"],
+        "template": "Hello! I'm your support assistant. How can I help you today? You can ask about orders, billing, returns or technical issues.",
+        "categories": ["general"],
+    },
+    {
+        "name": "thanks",
+        "patterns": [r"(ok(ay)?,? )?(thanks?|thank you|thx|ty|cheers)( (so|very) much| a lot)?( for (your|the) help)?"],
+        "template": "You're welcome! Is there anything else I can help you with?",
+        "categories": ["general"],
+    },
+    {
+        "name": "goodbye",
+        "patterns": [r"(bye|goodbye|see you|see ya|that'?s all|no,? that'?s (it|all))( for now)?( thanks?)?"],
+        "template": "Thanks for contacting support. Have a great day!",
+        "categories": ["general"],
+    },
+    {
+        "name": "order_status",
+        "patterns": [r"(where is|what is the status of|status of|track|tracking for) (my )?order( id)?( number)? ?#?\d*"],
+        "template": "You can follow order {order_id} under Orders > Track order in your account; tracking updates within a few hours of each carrier scan. If it hasn't moved in 5 business days, reply here and we'll open an investigation.",
+        "requires": ["order_id"],
+        "categories": ["general"],
+    },
+    {
+        "name": "return_policy",
+        "patterns": [r"(what is|what's) (your|the) return policy", r"how (do|can) i return (an item|something|a product)"],
+        "template": "Most items can be returned within 30 days of delivery in their original condition. Start a return under Orders > Return items and we'll email a prepaid label.",
+        "categories": ["returns"],
+    },
+    {
+        "name": "password_reset",
+        "patterns": [r"(how (do|can) i )?(reset|change) (my )?password", r"i forgot my password"],
+        "template": "Use 'Forgot password' on the sign-in page; we'll email a reset link that is valid for one hour. Check your spam folder if it doesn't arrive within a few minutes.",
+        "categories": ["technical"],
+    },
+    {
+        "name": "business_hours",
+        "patterns": [r"(what are )?your (business|opening|support) hours", r"when (are you|is support) open"],
+        "template": "Our support team is available Monday to Friday, 8am-8pm, and this assistant is available 24/7.",
+        "categories": ["general"],
+    },
+]
+
+_TRAILING = re.compile(r"[\s!?.,:;)(*~-]+$")
+_LEADING = re.compile(r"^[\s!?.,:;)(*~-]+")
+_SPACES = re.compile(r"\s+")
+
+
+class FastPathMatch(NamedTuple):
+    intent: str
+    response: str
+    categories: List[str]
+
+
+class CompiledIntent(NamedTuple):
+    name: str
+    patterns: List[re.Pattern]
+    template: str
+    requires: List[str]
+    categories: List[str]
+
+
+def normalize(query: str) -> str:
+    query = _SPACES.sub(" ", (query or "").strip().lower().replace("’", "'"))
+    return _LEADING.sub("", _TRAILING.sub("", query))
+
+
+def compile_intents(intents: List[Dict[str, Any]]) -> List[CompiledIntent]:
+    compiled = []
+    for intent in intents:
+        fields = {name for _, name, _, _ in string.Formatter().parse(intent["template"]) if name}
+        compiled.append(CompiledIntent(
+            name=intent["name"],
+            patterns=[re.compile(pattern) for pattern in intent["patterns"]],
+            template=intent["template"],
+            requires=sorted(set(intent.get("requires", [])) | fields),
+            categories=list(intent.get("categories", ["general"])),
+        ))
+    return compiled
+
+
+def load_intents() -> List[CompiledIntent]:
+    """Built-in intents merged with the optional FASTPATH_FAQ_PATH file"""
+    load_settings()
+    intents = {intent["name"]: intent for intent in DEFAULT_INTENTS}
+    path = os.getenv("FASTPATH_FAQ_PATH")
+    if path:
+        with open(path) as f:
+            for intent in json.load(f):
+                intents[intent["name"]] = intent
+    return compile_intents(list(intents.values()))
+
+
+def fast_path_enabled() -> bool:
+    load_settings()
+    return os.getenv("FASTPATH", "on").lower() not in ("0", "off", "false", "no")
+
+
+_intents_lock = threading.Lock()
+_intents: Optional[List[CompiledIntent]] = None
+
+
+def get_intents() -> List[CompiledIntent]:
+    global _intents
+    if _intents is None:
+        with _intents_lock:
+            if _intents is None:
+                _intents = load_intents()
+    return _intents
+
+
+def reload_intents():
+    """Re-read the intents (e.g. after editing FASTPATH_FAQ_PATH)"""
+    global _intents
+    with _intents_lock:
+        _intents = load_intents()
+
+
+def match_fast_path(query: str, entities: Optional[Dict[str, Any]] = None,
+                    intents: Optional[List[CompiledIntent]] = None) -> Optional[FastPathMatch]:
+    """Templated answer when the whole query is a known intent and its entities are known"""
+    text = normalize(query)
+    if not text or len(text) > 120:
+        return None
+    entities = entities or {}
+    for intent in get_intents() if intents is None else intents:
+        if not any(pattern.fullmatch(text) for pattern in intent.patterns):
+            continue
+        if any(not entities.get(name) for name in intent.requires):
+            continue
+        return FastPathMatch(intent.name, intent.template.format_map(entities), intent.categories)
+    return None
@@ -3,10 +3,22 @@ from .state import CustomerServiceState
 from .nodes import (
     classify_query, analyze_sentiment, handle_billing, handle_technical,
     handle_returns, handle_general, escalate, generate_response, validate_response, collaborate,
-    load_memory, save_memory
+    load_memory, save_memory, start_turn, has_new_context, refine_response, answer_fast_path, session_entities
 )
+from .fastpath import fast_path_enabled, match_fast_path
+from .refinement import budget_exhausted
+from .tracing import traced_node
 
 # Router functions
+def route_after_start(state: CustomerServiceState) -> str:
+    # Greetings and templated FAQs are answered without any LLM call
+    if fast_path_enabled() and match_fast_path(state['query'], session_entities(state)):
+        return "fast_path"
+    # Follow-up turns in a session reuse the stored classification and memory context
+    if state.get('memory_loaded') and not has_new_context(state):
+        return "sentiment"
+    return "classify"
+
 def route_after_classify(state: CustomerServiceState) -> str:
     categories = state['categories']
     if not categories:
@@ -29,31 +41,36 @@ def route_after_sentiment(state: CustomerServiceState) -> str:
 def route_after_validate(state: CustomerServiceState) -> str:
     if state.get('satisfactory'):
         return "save_memory"  # Always save memory before ending
-    elif state['attempts'] >= 3:
+    elif budget_exhausted(state):
         return "escalate"
     else:
-        return "generate_response"
+        return "refine"
 
 # Build graph
-def create_graph():
+def create_graph(checkpointer=None):
+    """Compile the workflow; pass a checkpointer to keep per-conversation state between turns"""
     graph = StateGraph(CustomerServiceState)
 
     # Add nodes
-    graph.add_node("classify", classify_query)
-    graph.add_node("load_memory", load_memory)
-    graph.add_node("sentiment", analyze_sentiment)
-    graph.add_node("technical_handler", handle_technical)
-    graph.add_node("billing_handler", handle_billing)
-    graph.add_node("returns_handler", handle_returns)
-    graph.add_node("general_handler", handle_general)
-    graph.add_node("collaboration", collaborate)
-    graph.add_node("escalate", escalate)
-    graph.add_node("generate_response", generate_response)
-    graph.add_node("validate", validate_response)
-    graph.add_node("save_memory", save_memory)
+    graph.add_node("start_turn", traced_node("start_turn", start_turn))
+    graph.add_node("fast_path", traced_node("fast_path", answer_fast_path))
+    graph.add_node("classify", traced_node("classify", classify_query))
+    graph.add_node("load_memory", traced_node("load_memory", load_memory))
+    graph.add_node("sentiment", traced_node("sentiment", analyze_sentiment))
+    graph.add_node("technical_handler", traced_node("technical_handler", handle_technical))
+    graph.add_node("billing_handler", traced_node("billing_handler", handle_billing))
+    graph.add_node("returns_handler", traced_node("returns_handler", handle_returns))
+    graph.add_node("general_handler", traced_node("general_handler", handle_general))
+    graph.add_node("collaboration", traced_node("collaboration", collaborate))
+    graph.add_node("escalate", traced_node("escalate", escalate))
+    graph.add_node("generate_response", traced_node("generate_response", generate_response))
+    graph.add_node("validate", traced_node("validate", validate_response))
+    graph.add_node("refine", traced_node("refine", refine_response))
+    graph.add_node("save_memory", traced_node("save_memory", save_memory))
 
     # Add edges
-    graph.set_entry_point("classify")
+    graph.set_entry_point("start_turn")
+    graph.add_conditional_edges("start_turn", route_after_start)
     graph.add_edge("classify", "load_memory")
     graph.add_edge("load_memory", "sentiment")
     graph.add_conditional_edges("sentiment", route_after_sentiment)
@@ -64,10 +81,10 @@ def create_graph():
     graph.add_edge("collaboration", "generate_response")
     graph.add_edge("generate_response", "validate")
     graph.add_conditional_edges("validate", route_after_validate)
-    graph.add_edge("validate", "save_memory")  # Save memory after validation
-    graph.add_edge("save_memory", END)
+    graph.add_edge("refine", "validate")
     graph.add_edge("escalate", "save_memory")  # Also save when escalating
-    graph.add_edge("save_memory", END)  # Ensure END after save_memory
+    graph.add_edge("fast_path", "save_memory")
+    graph.add_edge("save_memory", END)
 
     # Compile
-    return graph.compile()
\ No newline at end of file
+    return graph.compile(checkpointer=checkpointer)
\ No newline at end of file
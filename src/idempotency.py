@@ -0,0 +1,293 @@
+"""
+Idempotency keys for the support query endpoint.
+
+Clients and gateways retry ``/api/v1/support/query`` on timeouts; without a
+key every retry re-ran the graph, paid for the LLM calls again and saved
+the conversation a second time. A request with an ``Idempotency-Key``
+header is executed once per key:
+
+- while it runs, duplicates with the same key on this worker attach to the
+  same execution and get its response (or its error);
+- once it has completed, the stored response is replayed until the key
+  expires (IDEMPOTENCY_TTL_SECONDS, default 24 h);
+- a key another worker is still executing (shared SQLite store) is polled
+  until that worker finishes, then replayed, or answered with 409 when it
+  takes too long;
+- reusing a key with a different request body is rejected with 422.
+
+Failed executions are not stored, so a retry after an error runs again.
+Keys are scoped to the caller (API key, user id or client IP) by the API
+and stored hashed. The store is bounded to IDEMPOTENCY_MAX_KEYS (oldest
+first) and lives in this process (IDEMPOTENCY_BACKEND=memory) or in a
+SQLite file shared by every worker (IDEMPOTENCY_BACKEND=sqlite,
+IDEMPOTENCY_DB_PATH).
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from .config import load_settings
+from .container import container
+from .metrics import metrics
+
+PENDING = "pending"
+DONE = "done"
+
+requests_total = metrics.counter("idempotency_requests_total",
+                                 "Queries carrying an Idempotency-Key, by outcome (executed, replayed, attached, ...)")
+
+
+class IdempotencyConflict(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"A request with this Idempotency-Key is still being processed; retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class IdempotencyMismatch(Exception):
+    def __init__(self):
+        super().__init__("Idempotency-Key was already used with a different request body")
+
+
+class IdempotencyRecord(NamedTuple):
+    fingerprint: str
+    status: str  # pending | done
+    response: Optional[str]  # JSON body once done
+    expires_at: float
+
+
+# Storage backends
+class InMemoryIdempotencyStore:
+    """Keys for a single worker process, oldest evicted first beyond max_keys"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._records: "OrderedDict[str, IdempotencyRecord]" = OrderedDict()
+
+    def _live(self, key: str, now: float) -> Optional[IdempotencyRecord]:
+        record = self._records.get(key)
+        if record is not None and record.expires_at <= now:
+            del self._records[key]
+            return None
+        return record
+
+    def get(self, key: str, now: float) -> Optional[IdempotencyRecord]:
+        with self._lock:
+            return self._live(key, now)
+
+    def claim(self, key: str, fingerprint: str, now: float, pending_ttl: float) -> Optional[IdempotencyRecord]:
+        """Claim the key for execution; returns the existing record instead when it is taken"""
+        with self._lock:
+            record = self._live(key, now)
+            if record is not None:
+                return record
+            self._records[key] = IdempotencyRecord(fingerprint, PENDING, None, now + pending_ttl)
+            while len(self._records) > self.max_keys:
+                self._records.popitem(last=False)
+            return None
+
+    def complete(self, key: str, fingerprint: str, response: str, expires_at: float):
+        with self._lock:
+            self._records[key] = IdempotencyRecord(fingerprint, DONE, response, expires_at)
+
+    def release(self, key: str):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record.status == PENDING:
+                del self._records[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+
+class SQLiteIdempotencyStore:
+    """Keys shared by every worker through one SQLite file"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status TEXT NOT NULL,
+                                                 response TEXT, expires_at REAL NOT NULL, created_at REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS idempotency_keys_created ON idempotency_keys (created_at);
+    """
+    PRUNE_EVERY = 100  # claims between sweeps of expired and excess keys
+
+    def __init__(self, path: str = "data/idempotency.db", max_keys: int = 10000, busy_timeout_ms: int = 5000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_keys = max_keys
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._claims = 0
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), isolation_level=None,
+                                   timeout=self.busy_timeout_ms / 1000.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        # IMMEDIATE so two workers can't both claim the same key
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _record(row) -> Optional[IdempotencyRecord]:
+        return IdempotencyRecord(*row) if row else None
+
+    def get(self, key: str, now: float) -> Optional[IdempotencyRecord]:
+        row = self._connect().execute(
+            "SELECT fingerprint, status, response, expires_at FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+            (key, now)).fetchone()
+        return self._record(row)
+
+    def claim(self, key: str, fingerprint: str, now: float, pending_ttl: float) -> Optional[IdempotencyRecord]:
+        self._claims += 1
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?", (key, now))
+            row = conn.execute("SELECT fingerprint, status, response, expires_at FROM idempotency_keys WHERE key = ?",
+                               (key,)).fetchone()
+            if row:
+                return self._record(row)
+            conn.execute("INSERT INTO idempotency_keys (key, fingerprint, status, response, expires_at, created_at) "
+                         "VALUES (?, ?, ?, NULL, ?, ?)", (key, fingerprint, PENDING, now + pending_ttl, now))
+            if self._claims % self.PRUNE_EVERY == 0:
+                self._prune(conn, now)
+        return None
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,))
+        excess = conn.execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0] - self.max_keys
+        if excess > 0:
+            conn.execute("DELETE FROM idempotency_keys WHERE key IN "
+                         "(SELECT key FROM idempotency_keys ORDER BY created_at LIMIT ?)", (excess,))
+
+    def complete(self, key: str, fingerprint: str, response: str, expires_at: float):
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, status, response, expires_at, "
+                         "created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, fingerprint, DONE, response, expires_at, time.time()))
+
+    def release(self, key: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND status = ?", (key, PENDING))
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0]
+
+
+# Execution
+class IdempotencyManager:
+    def __init__(self, store=None, ttl: float = 86400.0, pending_ttl: float = 300.0, wait_timeout: float = 30.0):
+        self.store = store if store is not None else InMemoryIdempotencyStore()
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl  # a claim from a worker that died stops blocking the key after this
+        self.wait_timeout = wait_timeout
+        self._in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    async def run(self, key: str, fingerprint: str,
+                  execute: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], str]:
+        """(response body, outcome): runs execute() once per key and replays its result to duplicates"""
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            if in_flight[0] != fingerprint:
+                raise self._mismatch()
+            requests_total.inc(outcome="attached")
+            return await asyncio.shield(in_flight[1]), "attached"
+
+        # Registered before the store is consulted, so duplicates on this worker attach instead of polling
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (fingerprint, future)
+        try:
+            body, outcome = await self._claim_and_execute(key, fingerprint, execute)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # retrieved here so an unattached failure isn't logged as lost
+            raise
+        else:
+            future.set_result(body)
+            requests_total.inc(outcome=outcome)
+            return body, outcome
+        finally:
+            del self._in_flight[key]
+
+    async def _claim_and_execute(self, key: str, fingerprint: str,
+                                 execute: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], str]:
+        # Store calls run on a thread: the SQLite store may wait out another worker's write lock
+        record = await asyncio.to_thread(self.store.claim, key, fingerprint, time.time(), self.pending_ttl)
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                raise self._mismatch()
+            if record.status == PENDING:
+                record = await self._wait_for_other_worker(key)
+            return json.loads(record.response), "replayed"
+
+        try:
+            body = await execute()
+        except BaseException:
+            # Not stored: a retry after a failure runs again
+            await asyncio.to_thread(self.store.release, key)
+            raise
+        await asyncio.to_thread(self.store.complete, key, fingerprint, json.dumps(body), time.time() + self.ttl)
+        return body, "executed"
+
+    async def _wait_for_other_worker(self, key: str) -> IdempotencyRecord:
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            record = await asyncio.to_thread(self.store.get, key, time.time())
+            if record is None:
+                break  # the other worker failed and released the key
+            if record.status == DONE:
+                return record
+        requests_total.inc(outcome="conflict")
+        raise IdempotencyConflict(retry_after=1)
+
+    def _mismatch(self) -> IdempotencyMismatch:
+        requests_total.inc(outcome="mismatch")
+        return IdempotencyMismatch()
+
+
+def build_idempotency_manager() -> IdempotencyManager:
+    load_settings()
+    max_keys = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+    backend = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        store = SQLiteIdempotencyStore(os.getenv("IDEMPOTENCY_DB_PATH", "data/idempotency.db"), max_keys)
+    elif backend == "memory":
+        store = InMemoryIdempotencyStore(max_keys)
+    else:
+        raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {backend}")
+    return IdempotencyManager(store, ttl=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")))
+
+
+container.register("idempotency", build_idempotency_manager)
+
+
+def get_idempotency_manager() -> IdempotencyManager:
+    return container.get("idempotency")
@@ -0,0 +1,333 @@
+"""
+Read-only, memory-mapped snapshot of the knowledge base, shared by every
+worker process.
+
+With the JSON store every worker parses its own copy of knowledge_base;
+with SQLite every query re-reads and re-parses KB rows (all of them when
+there is no exact category match). With KB_SNAPSHOT=on a compiler
+periodically writes the knowledge base into one immutable binary file and
+each worker mmaps it: the OS keeps a single copy of the pages for all
+workers, and a lookup decodes only the entry it returns.
+
+File layout (little-endian):
+
+    header    magic, format version, generation, created_at, sha1 of the contents, section count
+    sections  name, record count, offset of the record table
+    records   key offset/length, value offset/length, insertion position; sorted by key
+    data      UTF-8 keys and JSON values
+
+Keys are found by binary search over the sorted records; the insertion
+position keeps partial KB matches identical to match_knowledge_base.
+
+Updates: every worker starts a compiler thread, but only the one holding
+an exclusive flock on ``<snapshot>.lock`` reads the store and compiles.
+It keeps the lock for as long as it runs; the others only retry the lock
+each interval, so one of them takes over if that worker exits. The
+compiler writes a new file next to the old one and renames it into
+place, so readers never see a partial file. With the JSON store the
+snapshot holds the elected worker's copy of the knowledge base, so use
+SQLite with several workers (as servers/prod_server.py does). Each worker checks the file at most every
+KB_SNAPSHOT_CHECK_SECONDS and swaps to the new mapping; readers still using
+the old one keep it until they are done. Writes keep going to the primary
+store, so new KB entries show up in reads after the next compile
+(KB_SNAPSHOT_INTERVAL_SECONDS). Until a snapshot exists, reads fall
+through to the store.
+
+Build one by hand with ``python -m src.kb_snapshot <memory.json|memory.db> <snapshot>``.
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .memory import match_knowledge_base
+from .metrics import metrics
+
+MAGIC = b"KBSNAP\x00\x01"
+FORMAT_VERSION = 1
+SECTIONS = ("knowledge_base",)
+
+_HEADER = struct.Struct("<8sIQd20sI")  # magic, version, generation, created_at, digest, sections
+_SECTION = struct.Struct("<32sIQ")  # name, records, record table offset
+_RECORD = struct.Struct("<QIQII")  # key offset, key length, value offset, value length, position
+
+snapshot_generation = metrics.gauge("kb_snapshot_generation", "Generation of the knowledge snapshot this worker reads")
+snapshot_compiles_total = metrics.counter("kb_snapshot_compiles_total",
+                                          "Knowledge snapshot compiles, by result (written, unchanged, failed)")
+
+
+def _digest(tables: Dict[str, Dict[str, Any]]) -> Tuple[bytes, Dict[str, List[Tuple[bytes, bytes]]]]:
+    encoded = {section: [(key.encode("utf-8"), json.dumps(value, default=str, separators=(",", ":")).encode("utf-8"))
+                         for key, value in tables.get(section, {}).items()]
+               for section in SECTIONS}
+    sha = hashlib.sha1()
+    for section in SECTIONS:
+        for key, value in encoded[section]:
+            sha.update(struct.pack("<II", len(key), len(value)) + key + value)
+    return sha.digest(), encoded
+
+
+def write_snapshot(path: str, tables: Dict[str, Dict[str, Any]], generation: int = 0) -> bytes:
+    """Write tables to a new snapshot file and atomically rename it over path; returns its digest"""
+    digest, encoded = _digest(tables)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    offset = _HEADER.size + _SECTION.size * len(SECTIONS)
+    section_entries, record_tables = [], []
+    for section in SECTIONS:
+        section_entries.append((section, len(encoded[section]), offset))
+        offset += _RECORD.size * len(encoded[section])
+    data = bytearray()
+    for section in SECTIONS:
+        records = []
+        for position, (key, value) in enumerate(encoded[section]):
+            key_offset = offset + len(data)
+            data += key
+            value_offset = offset + len(data)
+            data += value
+            records.append((key, _RECORD.pack(key_offset, len(key), value_offset, len(value), position)))
+        record_tables.append(b"".join(record for _, record in sorted(records)))
+
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, generation, time.time(), digest, len(SECTIONS)))
+        for name, count, table_offset in section_entries:
+            f.write(_SECTION.pack(name.encode("utf-8"), count, table_offset))
+        for table in record_tables:
+            f.write(table)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return digest
+
+
+class KnowledgeSnapshot:
+    """One mapped snapshot file; immutable, safe to share between threads"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.file_id = (stat.st_ino, stat.st_mtime_ns)
+        self.size_bytes = stat.st_size
+        magic, version, self.generation, self.created_at, self.digest, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a knowledge snapshot (version {FORMAT_VERSION})")
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        self._insertion_order: Dict[str, List[int]] = {}
+        for i in range(count):
+            name, records, table_offset = _SECTION.unpack_from(self._mm, _HEADER.size + i * _SECTION.size)
+            self._sections[name.rstrip(b"\x00").decode("utf-8")] = (records, table_offset)
+
+    def _record(self, section: str, index: int) -> Tuple[int, int, int, int, int]:
+        _, table_offset = self._sections[section]
+        return _RECORD.unpack_from(self._mm, table_offset + index * _RECORD.size)
+
+    def _key(self, record) -> bytes:
+        return self._mm[record[0]:record[0] + record[1]]
+
+    def __len__(self) -> int:
+        return sum(records for records, _ in self._sections.values())
+
+    def count(self, section: str) -> int:
+        return self._sections.get(section, (0, 0))[0]
+
+    def get(self, section: str, key: str) -> Optional[Dict[str, Any]]:
+        """Decoded value for key, or None"""
+        target = key.encode("utf-8")
+        low, high = 0, self.count(section)
+        while low < high:
+            middle = (low + high) // 2
+            record = self._record(section, middle)
+            current = self._key(record)
+            if current == target:
+                return json.loads(self._mm[record[2]:record[2] + record[3]])
+            if current < target:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def keys(self, section: str) -> Iterator[str]:
+        """Keys in the order they were inserted in the store"""
+        order = self._insertion_order.get(section)
+        if order is None:
+            positions = [self._record(section, i)[4] for i in range(self.count(section))]
+            order = self._insertion_order[section] = sorted(range(len(positions)), key=positions.__getitem__)
+        for index in order:
+            yield self._key(self._record(section, index)).decode("utf-8")
+
+    def knowledge_base_entry(self, categories: List[str]) -> Optional[Dict[str, Any]]:
+        """Same result as match_knowledge_base, decoding only the matched entry"""
+        entry = self.get("knowledge_base", "_".join(sorted(categories)))
+        if entry is not None:
+            return entry
+        matched = match_knowledge_base({key: key for key in self.keys("knowledge_base")}, categories)
+        return None if matched is None else self.get("knowledge_base", matched)
+
+
+class SnapshotReader:
+    """The current snapshot at a path, re-checked at most every check_interval seconds"""
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[KnowledgeSnapshot] = None
+        self._checked_at = float("-inf")
+
+    def current(self) -> Optional[KnowledgeSnapshot]:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = now
+                self._refresh()
+            finally:
+                self._lock.release()
+        return self._snapshot
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._snapshot is not None and self._snapshot.file_id == (stat.st_ino, stat.st_mtime_ns):
+            return
+        try:
+            snapshot = KnowledgeSnapshot(self.path)
+        except (OSError, ValueError) as e:
+            print(f"Knowledge snapshot {self.path} unreadable: {e}")
+            return
+        # Readers holding the old snapshot keep its mapping until they drop it
+        self._snapshot = snapshot
+        snapshot_generation.set(snapshot.generation)
+
+
+class SnapshotCompiler:
+    """Rebuilds the snapshot from the primary store every interval seconds, while it holds the lock"""
+
+    def __init__(self, memory: Any, path: str, interval: float = 30.0):
+        self.memory = memory
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="kb-snapshot-compiler", daemon=True)
+            self._thread.start()
+
+    @property
+    def elected(self) -> bool:
+        return self._lock_file is not None
+
+    def elect(self) -> bool:
+        """Take the compiler lock if it is free and keep it until stop(); True while this compiler holds it"""
+        if self._lock_file is None:
+            lock_path = Path(f"{self.path}.lock")
+            lock_path.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = open(lock_path, "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        while True:
+            # Standby workers only retry the lock; the store is read by the elected one
+            if self.elect():
+                self.compile()
+            if self._stop.wait(self.interval):
+                return
+
+    def compile(self) -> str:
+        """written, unchanged, busy (another process holds the compiler lock) or failed"""
+        if not self.elect():
+            return "busy"
+        try:
+            result = self._compile()
+        except Exception as e:
+            print(f"Knowledge snapshot compile failed: {e}")
+            result = "failed"
+        snapshot_compiles_total.inc(result=result)
+        return result
+
+    def _compile(self) -> str:
+        tables = self.memory.knowledge_tables()
+        previous = None
+        if os.path.exists(self.path):
+            try:
+                previous = KnowledgeSnapshot(self.path)
+            except (OSError, ValueError):
+                pass
+        if previous is not None and previous.digest == _digest(tables)[0]:
+            return "unchanged"
+        write_snapshot(self.path, tables, generation=previous.generation + 1 if previous else 1)
+        return "written"
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._lock_file is not None:
+            self._lock_file.close()  # releases the flock for a standby worker
+            self._lock_file = None
+
+
+class SnapshotMemory:
+    """Memory store whose KB reads come from the mapped snapshot; everything else goes to the store"""
+
+    def __init__(self, backend: Any, reader: SnapshotReader, compiler: Optional[SnapshotCompiler] = None):
+        self.backend = backend
+        self.reader = reader
+        self.compiler = compiler
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["backend"], name)
+
+    def get_knowledge_base_entry(self, categories: List[str]) -> Optional[Dict[str, Any]]:
+        snapshot = self.reader.current()
+        if snapshot is None:
+            return self.backend.get_knowledge_base_entry(categories)
+        return snapshot.knowledge_base_entry(categories)
+
+    def flush(self):
+        self.backend.flush()
+
+    def close(self):
+        if self.compiler is not None:
+            self.compiler.stop()
+        self.backend.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m src.kb_snapshot <agent_memory.json|agent_memory.db> <snapshot>")
+        sys.exit(1)
+    if sys.argv[1].endswith(".db"):
+        from .memory_sqlite import SQLiteAgentMemory
+        source = SQLiteAgentMemory(sys.argv[1])
+    else:
+        from .memory import AgentMemory
+        source = AgentMemory(sys.argv[1])
+    SnapshotCompiler(source, sys.argv[2]).compile()
+    snapshot = KnowledgeSnapshot(sys.argv[2])
+    print(f"✓ Wrote generation {snapshot.generation} of {sys.argv[2]}: "
+          f"{snapshot.count('knowledge_base')} KB entries, "
+          f"{snapshot.size_bytes} bytes")
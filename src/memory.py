@@ -1,15 +1,248 @@
+import copy
+import functools
 import json
 import os
-from typing import Dict, List, Any, Optional
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 
+from .config import load_settings
+from .container import container
+from .context import summarize_history, update_user_summary
+from .tracing import traced
+from .write_behind import WriteBehindMemory
+
+def _synchronized(method):
+    """Serialize access to the shared memory dict across request threads"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+# Record helpers shared by every storage backend
+def new_user_profile() -> Dict[str, Any]:
+    return {
+        "conversation_history": [],
+        "preferences": {},
+        "resolved_issues": [],
+        "common_issues": {},
+        "last_interaction": None,
+        "total_interactions": 0
+    }
+
+def apply_conversation(profile: Dict[str, Any], conversation_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Append a conversation to a profile in place; returns the stored summary"""
+    conversation_summary = {
+        "timestamp": datetime.now().isoformat(),
+        "query": conversation_data.get("query", ""),
+        "categories": conversation_data.get("categories", []),
+        "resolution": conversation_data.get("satisfactory", False),
+        "response": conversation_data.get("response", ""),
+        "entities": conversation_data.get("entities", {})
+    }
+
+    # Fold every conversation into the rolling summary so history older than the last 50 stays represented
+    summary = profile.get("summary") or summarize_history(profile["conversation_history"])
+    profile["summary"] = update_user_summary(summary, conversation_summary, conversation_data.get("sentiment"))
+
+    profile["conversation_history"].append(conversation_summary)
+    profile["last_interaction"] = conversation_summary["timestamp"]
+    profile["total_interactions"] += 1
+
+    # Keep only last 50 conversations to prevent memory bloat
+    if len(profile["conversation_history"]) > 50:
+        profile["conversation_history"] = profile["conversation_history"][-50:]
+
+    # Update common issues
+    for category in conversation_summary["categories"]:
+        profile["common_issues"][category] = profile["common_issues"].get(category, 0) + 1
+
+    if conversation_summary["resolution"]:
+        profile["resolved_issues"].append(conversation_summary)
+
+    return conversation_summary
+
+def apply_account_link(profile: Dict[str, Any], other_user_id: str, linked: bool = True):
+    """Add (or remove) other_user_id in a profile's linked_accounts in place"""
+    links = [user_id for user_id in profile.get("linked_accounts", []) if user_id != other_user_id]
+    if linked:
+        links.append(other_user_id)
+    profile["linked_accounts"] = links
+
+def pattern_key(conversation_data: Dict[str, Any]) -> str:
+    """Pattern key from categories and query (crc32 keeps keys stable across worker processes)"""
+    query = conversation_data.get("query", "").lower()
+    categories_str = "_".join(sorted(conversation_data.get("categories", [])))
+    return f"{categories_str}_{zlib.crc32(query.encode()) % 10000}"
+
+def apply_successful_pattern(pattern: Optional[Dict[str, Any]], conversation_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Create or extend a successful resolution pattern"""
+    query = conversation_data.get("query", "").lower()
+    response = conversation_data.get("response", "")
+
+    if pattern is None:
+        return {
+            "categories": conversation_data.get("categories", []),
+            "query_patterns": [query],
+            "successful_responses": [response],
+            "frequency": 1,
+            "last_used": datetime.now().isoformat()
+        }
+
+    pattern["query_patterns"].append(query)
+    pattern["successful_responses"].append(response)
+    pattern["frequency"] += 1
+    pattern["last_used"] = datetime.now().isoformat()
+
+    # Keep only top 5 similar queries and responses
+    pattern["query_patterns"] = pattern["query_patterns"][-5:]
+    pattern["successful_responses"] = pattern["successful_responses"][-5:]
+    return pattern
+
+# Entity index: "order_id:12345" -> newest references to conversations that mention it, across all users
+ENTITY_INDEX_MAX_REFS = 20
+
+def entity_key(entity_type: str, value: Any) -> str:
+    return f"{entity_type}:{value}"
+
+def entity_refs(user_id: str, conversation_summary: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(entity key, reference) for every scalar entity of a stored conversation"""
+    entities = conversation_summary.get("entities") or {}
+    ref = {
+        "user_id": user_id,
+        "timestamp": conversation_summary.get("timestamp"),
+        "query": conversation_summary.get("query", ""),
+        "categories": conversation_summary.get("categories", []),
+        "resolution": conversation_summary.get("resolution", False),
+        "response": conversation_summary.get("response", "")
+    }
+    return [(entity_key(entity_type, value), ref) for entity_type, value in entities.items()
+            if isinstance(value, (str, int)) and value != ""]
+
+def index_entity_refs(index: Dict[str, List[Dict[str, Any]]], refs: List[Tuple[str, Dict[str, Any]]]):
+    """Append references to an in-memory entity index, keeping the newest ENTITY_INDEX_MAX_REFS per entity"""
+    for key, ref in refs:
+        bucket = index.setdefault(key, [])
+        bucket.append(ref)
+        if len(bucket) > ENTITY_INDEX_MAX_REFS:
+            del bucket[:-ENTITY_INDEX_MAX_REFS]
+
+def resolution_hint(ref: Dict[str, Any]) -> Dict[str, Any]:
+    """A reference to an unlinked account's conversation: whether it was resolved, without its query or response"""
+    return {field: ref.get(field) for field in ("timestamp", "categories", "resolution")}
+
+def build_entity_index(profiles: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Entity index over every stored conversation (for stores written before the index existed)"""
+    refs = [ref for user_id, profile in profiles
+            for conversation in profile.get("conversation_history", [])
+            for ref in entity_refs(user_id, conversation)]
+    refs.sort(key=lambda item: item[1]["timestamp"] or "")
+    index: Dict[str, List[Dict[str, Any]]] = {}
+    index_entity_refs(index, refs)
+    return index
+
+def score_similar_issues(history: List[Dict[str, Any]], current_query: str, categories: List[str]) -> List[Dict[str, Any]]:
+    """Top 3 past conversations by category and word overlap"""
+    similar_issues = []
+
+    current_words = set(current_query.lower().split())
+    current_categories = set(categories)
+
+    for issue in history:
+        # Check category overlap
+        issue_categories = set(issue.get("categories", []))
+        category_overlap = len(current_categories & issue_categories)
+
+        # Check query similarity (simple word overlap)
+        issue_words = set(issue.get("query", "").lower().split())
+        word_overlap = len(current_words & issue_words)
+
+        if category_overlap > 0 or word_overlap > 2:  # At least some similarity
+            similarity_score = category_overlap * 2 + word_overlap
+            similar_issues.append({
+                **issue,
+                "similarity_score": similarity_score
+            })
+
+    # Return top 3 most similar issues
+    return sorted(similar_issues, key=lambda x: x["similarity_score"], reverse=True)[:3]
+
+def match_knowledge_base(knowledge_base: Dict[str, Any], categories: List[str]) -> Optional[Dict[str, Any]]:
+    """Exact category-key match first, then the first partial match"""
+    categories_key = "_".join(sorted(categories))
+
+    # Look for exact category match first
+    if categories_key in knowledge_base:
+        return knowledge_base[categories_key]
+
+    # Look for partial matches
+    for kb_key, entry in knowledge_base.items():
+        if any(cat in kb_key for cat in categories):
+            return entry
+
+    return None
+
+def apply_knowledge_base_update(kb_entry: Optional[Dict[str, Any]], categories_key: str,
+                                query: str, resolution: str) -> Dict[str, Any]:
+    """Create or extend a knowledge base entry with a successful resolution"""
+    if kb_entry is None:
+        kb_entry = {
+            "categories": list(categories_key.split("_")),
+            "common_queries": [],
+            "resolutions": [],
+            "frequency": 0,
+            "last_updated": datetime.now().isoformat()
+        }
+
+    kb_entry["common_queries"].append(query)
+    kb_entry["resolutions"].append(resolution)
+    kb_entry["frequency"] += 1
+    kb_entry["last_updated"] = datetime.now().isoformat()
+
+    # Keep only recent entries
+    kb_entry["common_queries"] = kb_entry["common_queries"][-10:]
+    kb_entry["resolutions"] = kb_entry["resolutions"][-10:]
+    return kb_entry
+
 class AgentMemory:
-    def __init__(self, storage_path: str = "data/agent_memory.json"):
+    def __init__(self, storage_path: str = "data/agent_memory.json", fsync: bool = False):
+        self._lock = threading.RLock()
         self.storage_path = Path(storage_path)
         self.storage_path.parent.mkdir(exist_ok=True)
-        self.memory = self._load_memory()
-
+        self.fsync = fsync
+        self._memory: Optional[Dict[str, Any]] = None
+        self._batch_local = threading.local()
+
+    @property
+    def memory(self) -> Dict[str, Any]:
+        """Memory contents, parsed from disk on first access"""
+        if self._memory is None:
+            self.load()
+        return self._memory
+
+    @memory.setter
+    def memory(self, value: Dict[str, Any]):
+        self._memory = value
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._memory is not None
+
+    def load(self) -> Dict[str, Any]:
+        """Parse the memory file now instead of on the first request"""
+        with self._lock:
+            if self._memory is None:
+                memory = self._load_memory()
+                if "entity_index" not in memory:
+                    memory["entity_index"] = build_entity_index(memory["user_profiles"].items())
+                self._memory = memory
+        return self._memory
+
+    @traced("memory.load")
     def _load_memory(self) -> Dict[str, Any]:
         """Load memory from persistent storage"""
         if self.storage_path.exists():
@@ -22,163 +255,227 @@ class AgentMemory:
             "user_profiles": {},
             "successful_patterns": {},
             "knowledge_base": {},
+            "entity_index": {},
             "stats": {"total_conversations": 0, "resolved_issues": 0}
         }
 
+    @traced("memory.persist")
+    @_synchronized
     def _save_memory(self):
-        """Save memory to persistent storage"""
-        with open(self.storage_path, 'w') as f:
+        """Save memory to persistent storage (write a temp file, then rename over the old one)"""
+        tmp_path = self.storage_path.with_name(self.storage_path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
             json.dump(self.memory, f, indent=2, default=str)
-
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.storage_path)
+
+    def _persist(self):
+        """Save now, or once at the end of the enclosing batch()"""
+        if getattr(self._batch_local, "depth", 0):
+            self._batch_local.dirty = True
+        else:
+            self._save_memory()
+
+    @contextmanager
+    def batch(self):
+        """Apply several writes from this thread with a single file rewrite at the end"""
+        depth = getattr(self._batch_local, "depth", 0)
+        self._batch_local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._batch_local.depth = depth
+            if depth == 0 and getattr(self._batch_local, "dirty", False):
+                self._batch_local.dirty = False
+                self._save_memory()
+
+    @_synchronized
     def get_user_profile(self, user_id: str) -> Dict[str, Any]:
         """Get or create user profile"""
         if user_id not in self.memory["user_profiles"]:
-            self.memory["user_profiles"][user_id] = {
-                "conversation_history": [],
-                "preferences": {},
-                "resolved_issues": [],
-                "common_issues": {},
-                "last_interaction": None,
-                "total_interactions": 0
-            }
+            self.memory["user_profiles"][user_id] = new_user_profile()
         return self.memory["user_profiles"][user_id]
 
+    @traced("memory.find_user_profile", lambda profile: {"memory.found": profile is not None})
+    @_synchronized
+    def find_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """User profile snapshot, or None for unknown users (never creates one)"""
+        profile = self.memory["user_profiles"].get(user_id)
+        if profile is None:
+            return None
+        return {**profile, "conversation_history": list(profile["conversation_history"])}
+
+    @traced("memory.save_conversation")
+    @_synchronized
     def save_conversation(self, user_id: str, conversation_data: Dict[str, Any]):
         """Save conversation data to user profile"""
         profile = self.get_user_profile(user_id)
-
-        # Add conversation summary
-        conversation_summary = {
-            "timestamp": datetime.now().isoformat(),
-            "query": conversation_data.get("query", ""),
-            "categories": conversation_data.get("categories", []),
-            "resolution": conversation_data.get("satisfactory", False),
-            "response": conversation_data.get("response", ""),
-            "entities": conversation_data.get("entities", {})
-        }
-
-        profile["conversation_history"].append(conversation_summary)
-        profile["last_interaction"] = conversation_summary["timestamp"]
-        profile["total_interactions"] += 1
-
-        # Keep only last 50 conversations to prevent memory bloat
-        if len(profile["conversation_history"]) > 50:
-            profile["conversation_history"] = profile["conversation_history"][-50:]
-
-        # Update common issues
-        for category in conversation_summary["categories"]:
-            profile["common_issues"][category] = profile["common_issues"].get(category, 0) + 1
+        conversation_summary = apply_conversation(profile, conversation_data)
+        index_entity_refs(self.memory.setdefault("entity_index", {}), entity_refs(user_id, conversation_summary))
 
         # If resolved, add to successful patterns
         if conversation_summary["resolution"]:
             self._add_successful_pattern(conversation_data)
-            profile["resolved_issues"].append(conversation_summary)
 
         self.memory["stats"]["total_conversations"] += 1
         if conversation_summary["resolution"]:
             self.memory["stats"]["resolved_issues"] += 1
 
-        self._save_memory()
+        self._persist()
 
     def _add_successful_pattern(self, conversation_data: Dict[str, Any]):
         """Add successful resolution pattern"""
-        query = conversation_data.get("query", "").lower()
-        categories = conversation_data.get("categories", [])
-        categories_str = "_".join(sorted(categories))
-        response = conversation_data.get("response", "")
-
-        # Create pattern key using string
-        pattern_key = f"{categories_str}_{hash(query) % 10000}"
-
-        if pattern_key not in self.memory["successful_patterns"]:
-            self.memory["successful_patterns"][pattern_key] = {
-                "categories": categories,
-                "query_patterns": [query],
-                "successful_responses": [response],
-                "frequency": 1,
-                "last_used": datetime.now().isoformat()
-            }
-        else:
-            pattern = self.memory["successful_patterns"][pattern_key]
-            pattern["query_patterns"].append(query)
-            pattern["successful_responses"].append(response)
-            pattern["frequency"] += 1
-            pattern["last_used"] = datetime.now().isoformat()
-
-            # Keep only top 5 similar queries and responses
-            pattern["query_patterns"] = pattern["query_patterns"][-5:]
-            pattern["successful_responses"] = pattern["successful_responses"][-5:]
+        key = pattern_key(conversation_data)
+        patterns = self.memory["successful_patterns"]
+        patterns[key] = apply_successful_pattern(patterns.get(key), conversation_data)
 
+    @traced("memory.find_similar_past_issues",
+            lambda issues: {"memory.similar_issues": len(issues)})
+    @_synchronized
     def find_similar_past_issues(self, user_id: str, current_query: str, categories: List[str]) -> List[Dict[str, Any]]:
         """Find similar past issues for the user"""
         profile = self.get_user_profile(user_id)
-        similar_issues = []
-
-        current_words = set(current_query.lower().split())
-        current_categories = set(categories)
-
-        for issue in profile["conversation_history"]:
-            # Check category overlap
-            issue_categories = set(issue.get("categories", []))
-            category_overlap = len(current_categories & issue_categories)
-
-            # Check query similarity (simple word overlap)
-            issue_words = set(issue.get("query", "").lower().split())
-            word_overlap = len(current_words & issue_words)
-
-            if category_overlap > 0 or word_overlap > 2:  # At least some similarity
-                similarity_score = category_overlap * 2 + word_overlap
-                similar_issues.append({
-                    **issue,
-                    "similarity_score": similarity_score
-                })
-
-        # Return top 3 most similar issues
-        return sorted(similar_issues, key=lambda x: x["similarity_score"], reverse=True)[:3]
-
+        return score_similar_issues(profile["conversation_history"], current_query, categories)
+
+    @traced("memory.find_conversations_by_entity",
+            lambda refs: {"memory.conversations": len(refs)})
+    @_synchronized
+    def find_conversations_by_entity(self, entity_type: str, value: Any, limit: int = 10) -> List[Dict[str, Any]]:
+        """Newest conversations of any user that mention the entity (e.g. an order_id)"""
+        refs = self.memory.get("entity_index", {}).get(entity_key(entity_type, value), [])
+        return [dict(ref) for ref in reversed(refs[-limit:])]
+
+    @traced("memory.link_accounts")
+    @_synchronized
+    def link_accounts(self, user_id: str, other_user_id: str, linked: bool = True):
+        """Link two accounts (e.g. one household) so each sees the other's conversations about shared orders"""
+        apply_account_link(self.get_user_profile(user_id), other_user_id, linked)
+        apply_account_link(self.get_user_profile(other_user_id), user_id, linked)
+        self._persist()
+
+    @_synchronized
+    def linked_accounts(self, user_id: str) -> List[str]:
+        """Accounts linked to the user with link_accounts"""
+        profile = self.memory["user_profiles"].get(user_id) or {}
+        return list(profile.get("linked_accounts", []))
+
+    @traced("memory.get_user_summary", lambda summary: {"memory.found": summary is not None})
+    @_synchronized
+    def get_user_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Rolling summary of the user's past conversations (None for unknown users)"""
+        profile = self.memory["user_profiles"].get(user_id)
+        if profile is None:
+            return None
+        return profile.get("summary") or summarize_history(profile["conversation_history"])
+
+    @traced("memory.get_knowledge_base_entry",
+            lambda entry: {"memory.found": entry is not None})
+    @_synchronized
     def get_knowledge_base_entry(self, categories: List[str]) -> Optional[Dict[str, Any]]:
         """Get relevant knowledge base entry for categories"""
-        categories_key = "_".join(sorted(categories))
-
-        # Look for exact category match first
-        if categories_key in self.memory["knowledge_base"]:
-            return self.memory["knowledge_base"][categories_key]
-
-        # Look for partial matches
-        for kb_key, entry in self.memory["knowledge_base"].items():
-            if any(cat in kb_key for cat in categories):
-                return entry
-
-        return None
+        return match_knowledge_base(self.memory["knowledge_base"], categories)
 
+    @traced("memory.update_knowledge_base")
+    @_synchronized
     def update_knowledge_base(self, categories: List[str], query: str, resolution: str):
         """Update knowledge base with successful resolution"""
         categories_key = "_".join(sorted(categories))
+        knowledge_base = self.memory["knowledge_base"]
+        knowledge_base[categories_key] = apply_knowledge_base_update(
+            knowledge_base.get(categories_key), categories_key, query, resolution
+        )
+        self._persist()
 
-        if categories_key not in self.memory["knowledge_base"]:
-            self.memory["knowledge_base"][categories_key] = {
-                "categories": list(categories_key.split("_")),
-                "common_queries": [],
-                "resolutions": [],
-                "frequency": 0,
-                "last_updated": datetime.now().isoformat()
-            }
-
-        kb_entry = self.memory["knowledge_base"][categories_key]
-        kb_entry["common_queries"].append(query)
-        kb_entry["resolutions"].append(resolution)
-        kb_entry["frequency"] += 1
-        kb_entry["last_updated"] = datetime.now().isoformat()
-
-        # Keep only recent entries
-        kb_entry["common_queries"] = kb_entry["common_queries"][-10:]
-        kb_entry["resolutions"] = kb_entry["resolutions"][-10:]
-
-        self._save_memory()
+    @_synchronized
+    def knowledge_tables(self) -> Dict[str, Dict[str, Any]]:
+        """A copy of the knowledge base (input to the KB snapshot compiler)"""
+        return {"knowledge_base": copy.deepcopy(self.memory["knowledge_base"])}
 
     def get_memory_stats(self) -> Dict[str, Any]:
         """Get memory system statistics"""
         return self.memory["stats"]
 
-# Global memory instance
-agent_memory = AgentMemory()
\ No newline at end of file
+    @traced("memory.get_system_stats")
+    @_synchronized
+    def get_system_stats(self) -> Dict[str, Any]:
+        """Get system-wide counters for the stats endpoint"""
+        stats = self.memory["stats"]
+        return {
+            "total_conversations": stats.get("total_conversations", 0),
+            "resolved_issues": stats.get("resolved_issues", 0),
+            "active_users": len(self.memory.get("user_profiles", {})),
+            "memory_patterns": len(self.memory.get("successful_patterns", {})),
+            "knowledge_base_entries": len(self.memory.get("knowledge_base", {})),
+            "indexed_entities": len(self.memory.get("entity_index", {}))
+        }
+
+    def flush(self):
+        """Persist any in-memory state (called on graceful shutdown)"""
+        if self.is_loaded:
+            self._save_memory()
+
+    def close(self):
+        self.flush()
+
+# MEMORY_FSYNC policy -> SQLite synchronous level (the JSON store fsyncs unless the policy is off)
+FSYNC_POLICIES = {"batch": "NORMAL", "always": "FULL", "off": "OFF"}
+
+def build_agent_memory():
+    """Construct the configured memory store (contents load lazily)
+
+    MEMORY_BACKEND=json (default) keeps everything in one JSON file and is
+    only safe with a single worker process. MEMORY_BACKEND=sqlite shares one
+    database between all workers. Unless MEMORY_WRITE_BEHIND=off, writes go
+    through a write-behind queue (see write_behind.py) and MEMORY_FSYNC
+    (batch | always | off) sets how often they are synced to disk. With
+    KB_SNAPSHOT=on, KB reads come from a shared mmap snapshot that one
+    elected worker compiles (see kb_snapshot.py).
+    """
+    load_settings()
+    backend = os.getenv("MEMORY_BACKEND", "json").lower()
+    fsync = os.getenv("MEMORY_FSYNC", "batch").lower()
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown MEMORY_FSYNC: {fsync}")
+    if backend == "sqlite":
+        from .memory_sqlite import SQLiteAgentMemory
+        memory = SQLiteAgentMemory(os.getenv("MEMORY_PATH", "data/agent_memory.db"),
+                                   synchronous=FSYNC_POLICIES[fsync])
+    elif backend == "json":
+        memory = AgentMemory(os.getenv("MEMORY_PATH", "data/agent_memory.json"), fsync=fsync != "off")
+    else:
+        raise ValueError(f"Unknown MEMORY_BACKEND: {backend}")
+
+    if os.getenv("MEMORY_WRITE_BEHIND", "on").lower() not in ("0", "off", "false", "no"):
+        memory = WriteBehindMemory(memory, max_pending=int(os.getenv("MEMORY_WRITE_QUEUE_MAX", "10000")),
+                                   max_batch=1 if fsync == "always" else 256)
+
+    if os.getenv("KB_SNAPSHOT", "off").lower() in ("1", "on", "true", "yes"):
+        from .kb_snapshot import SnapshotCompiler, SnapshotMemory, SnapshotReader
+        path = os.getenv("KB_SNAPSHOT_PATH", "data/knowledge.snapshot")
+        compiler = SnapshotCompiler(memory, path, interval=float(os.getenv("KB_SNAPSHOT_INTERVAL_SECONDS", "30")))
+        compiler.start()
+        memory = SnapshotMemory(memory, SnapshotReader(path, float(os.getenv("KB_SNAPSHOT_CHECK_SECONDS", "1"))),
+                                compiler)
+    return memory
+
+
+container.register("memory", build_agent_memory)
+
+
+def get_agent_memory() -> AgentMemory:
+    """Return the memory store used by the graph nodes and API (built on first use)"""
+    return container.get("memory")
+
+
+def set_agent_memory(memory: AgentMemory) -> AgentMemory:
+    """Swap the memory store (e.g. for an isolated store in benchmarks); returns the previous one"""
+    return container.set("memory", memory)
+
+
+def __getattr__(name):
+    # Backwards compatibility for `from src.memory import agent_memory`
+    if name == "agent_memory":
+        return get_agent_memory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,335 @@
+"""
+SQLite-backed agent memory shared by every worker process.
+
+Drop-in replacement for AgentMemory (select it with MEMORY_BACKEND=sqlite).
+Each record type lives in its own table as a JSON document keyed like the
+JSON store, and every read-modify-write runs inside a ``BEGIN IMMEDIATE``
+transaction, so concurrent uvicorn/gunicorn workers never lose updates.
+WAL mode lets readers proceed while one worker writes.
+
+The entity index is one row per (entity, conversation) in entity_refs,
+written in the same transaction as the conversation and trimmed to the
+newest ENTITY_INDEX_MAX_REFS per entity; lookups are a single index range
+scan however many entities are indexed. Databases created before the index
+existed are backfilled once (tracked with PRAGMA user_version).
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .context import summarize_history
+from .memory import (
+    ENTITY_INDEX_MAX_REFS, apply_account_link, apply_conversation, build_entity_index, entity_key, entity_refs, apply_knowledge_base_update, apply_successful_pattern, match_knowledge_base,
+    new_user_profile, pattern_key, score_similar_issues,
+)
+from .tracing import traced
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_profiles (user_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS successful_patterns (pattern_key TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS knowledge_base (categories_key TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS entity_refs (id INTEGER PRIMARY KEY AUTOINCREMENT, entity_key TEXT NOT NULL,
+                                        data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS entity_refs_by_key ON entity_refs (entity_key, id);
+INSERT OR IGNORE INTO stats (name, value) VALUES ('total_conversations', 0), ('resolved_issues', 0);
+"""
+
+# PRAGMA user_version once entity_refs covers every stored conversation
+ENTITY_INDEX_VERSION = 1
+
+_TABLE_KEYS = {
+    "user_profiles": "user_id",
+    "successful_patterns": "pattern_key",
+    "knowledge_base": "categories_key",
+}
+
+
+class SQLiteAgentMemory:
+    def __init__(self, storage_path: str = "data/agent_memory.db", busy_timeout_ms: int = 30000,
+                 synchronous: str = "NORMAL"):
+        self.storage_path = Path(storage_path)
+        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    # Connection management
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.storage_path), isolation_level=None,
+                                   timeout=self.busy_timeout_ms / 1000.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        batch_conn = getattr(self._local, "batch_conn", None)
+        if batch_conn is not None:
+            # Already inside batch(): join its transaction
+            yield batch_conn
+            return
+        self.load()
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front so read-modify-write cycles can't interleave
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Run several writes from this thread in one transaction (one commit)"""
+        with self._transaction(write=True) as conn:
+            self._local.batch_conn = conn
+            try:
+                yield
+            finally:
+                self._local.batch_conn = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._schema_ready
+
+    def load(self):
+        """Create the schema if needed (there is nothing to parse up front)"""
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    conn = sqlite3.connect(str(self.storage_path), timeout=self.busy_timeout_ms / 1000.0)
+                    try:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(SCHEMA)
+                        conn.commit()
+                        if conn.execute("PRAGMA user_version").fetchone()[0] < ENTITY_INDEX_VERSION:
+                            self._backfill_entity_index(conn)
+                    finally:
+                        conn.close()
+                    self._schema_ready = True
+
+    def flush(self):
+        """Checkpoint the WAL into the main database file"""
+        if self._schema_ready:
+            self._connect().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        """Fold the WAL back into the database file and close every connection"""
+        if self._schema_ready:
+            self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
+
+    def _backfill_entity_index(self, conn: sqlite3.Connection):
+        """Index the conversations stored before entity_refs existed (once per database)"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < ENTITY_INDEX_VERSION:
+                profiles = ((user_id, json.loads(data))
+                            for user_id, data in conn.execute("SELECT user_id, data FROM user_profiles"))
+                self._replace_entity_index(conn, build_entity_index(profiles))
+                conn.execute(f"PRAGMA user_version = {ENTITY_INDEX_VERSION}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _replace_entity_index(conn: sqlite3.Connection, index: Dict[str, List[Dict[str, Any]]]):
+        conn.execute("DELETE FROM entity_refs")
+        conn.executemany("INSERT INTO entity_refs (entity_key, data) VALUES (?, ?)",
+                         ((key, json.dumps(ref, default=str)) for key, refs in index.items() for ref in refs))
+
+    @staticmethod
+    def _index_entities(conn: sqlite3.Connection, refs):
+        for key, ref in refs:
+            conn.execute("INSERT INTO entity_refs (entity_key, data) VALUES (?, ?)", (key, json.dumps(ref, default=str)))
+            # Drop everything older than the newest ENTITY_INDEX_MAX_REFS for this entity
+            conn.execute("DELETE FROM entity_refs WHERE entity_key = ? AND id <= (SELECT id FROM entity_refs "
+                         "WHERE entity_key = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                         (key, key, ENTITY_INDEX_MAX_REFS))
+
+    # Row helpers
+    @staticmethod
+    def _read(conn: sqlite3.Connection, table: str, key: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute(f"SELECT data FROM {table} WHERE {_TABLE_KEYS[table]} = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, table: str, key: str, value: Dict[str, Any]):
+        conn.execute(f"INSERT OR REPLACE INTO {table} ({_TABLE_KEYS[table]}, data) VALUES (?, ?)",
+                     (key, json.dumps(value, default=str)))
+
+    # AgentMemory interface
+    def get_user_profile(self, user_id: str) -> Dict[str, Any]:
+        """Get or create user profile"""
+        with self._transaction(write=True) as conn:
+            profile = self._read(conn, "user_profiles", user_id)
+            if profile is None:
+                profile = new_user_profile()
+                self._write(conn, "user_profiles", user_id, profile)
+        return profile
+
+    @traced("memory.find_user_profile", lambda profile: {"memory.found": profile is not None})
+    def find_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """User profile, or None for unknown users (never creates one)"""
+        with self._transaction() as conn:
+            return self._read(conn, "user_profiles", user_id)
+
+    @traced("memory.save_conversation")
+    def save_conversation(self, user_id: str, conversation_data: Dict[str, Any]):
+        """Save conversation data to user profile"""
+        with self._transaction(write=True) as conn:
+            profile = self._read(conn, "user_profiles", user_id) or new_user_profile()
+            conversation_summary = apply_conversation(profile, conversation_data)
+            self._write(conn, "user_profiles", user_id, profile)
+            self._index_entities(conn, entity_refs(user_id, conversation_summary))
+
+            resolved = 1 if conversation_summary["resolution"] else 0
+            if resolved:
+                key = pattern_key(conversation_data)
+                pattern = apply_successful_pattern(self._read(conn, "successful_patterns", key), conversation_data)
+                self._write(conn, "successful_patterns", key, pattern)
+
+            conn.execute("UPDATE stats SET value = value + 1 WHERE name = 'total_conversations'")
+            conn.execute("UPDATE stats SET value = value + ? WHERE name = 'resolved_issues'", (resolved,))
+
+    @traced("memory.find_similar_past_issues",
+            lambda issues: {"memory.similar_issues": len(issues)})
+    def find_similar_past_issues(self, user_id: str, current_query: str, categories: List[str]) -> List[Dict[str, Any]]:
+        """Find similar past issues for the user"""
+        with self._transaction() as conn:
+            profile = self._read(conn, "user_profiles", user_id)
+        if profile is None:
+            return []
+        return score_similar_issues(profile["conversation_history"], current_query, categories)
+
+    @traced("memory.find_conversations_by_entity",
+            lambda refs: {"memory.conversations": len(refs)})
+    def find_conversations_by_entity(self, entity_type: str, value: Any, limit: int = 10) -> List[Dict[str, Any]]:
+        """Newest conversations of any user that mention the entity (e.g. an order_id)"""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT data FROM entity_refs WHERE entity_key = ? ORDER BY id DESC LIMIT ?",
+                                (entity_key(entity_type, value), limit)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    @traced("memory.link_accounts")
+    def link_accounts(self, user_id: str, other_user_id: str, linked: bool = True):
+        """Link two accounts (e.g. one household) so each sees the other's conversations about shared orders"""
+        with self._transaction(write=True) as conn:
+            for owner, other in ((user_id, other_user_id), (other_user_id, user_id)):
+                profile = self._read(conn, "user_profiles", owner) or new_user_profile()
+                apply_account_link(profile, other, linked)
+                self._write(conn, "user_profiles", owner, profile)
+
+    def linked_accounts(self, user_id: str) -> List[str]:
+        """Accounts linked to the user with link_accounts"""
+        with self._transaction() as conn:
+            profile = self._read(conn, "user_profiles", user_id) or {}
+        return list(profile.get("linked_accounts", []))
+
+    @traced("memory.get_user_summary", lambda summary: {"memory.found": summary is not None})
+    def get_user_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Rolling summary of the user's past conversations (None for unknown users)"""
+        with self._transaction() as conn:
+            profile = self._read(conn, "user_profiles", user_id)
+        if profile is None:
+            return None
+        return profile.get("summary") or summarize_history(profile["conversation_history"])
+
+    @traced("memory.get_knowledge_base_entry",
+            lambda entry: {"memory.found": entry is not None})
+    def get_knowledge_base_entry(self, categories: List[str]) -> Optional[Dict[str, Any]]:
+        """Get relevant knowledge base entry for categories"""
+        with self._transaction() as conn:
+            entry = self._read(conn, "knowledge_base", "_".join(sorted(categories)))
+            if entry is not None:
+                return entry
+            # Partial matches: the KB is keyed by category combinations, so it stays small
+            rows = conn.execute("SELECT categories_key, data FROM knowledge_base ORDER BY rowid").fetchall()
+        return match_knowledge_base({key: json.loads(data) for key, data in rows}, categories)
+
+    @traced("memory.update_knowledge_base")
+    def update_knowledge_base(self, categories: List[str], query: str, resolution: str):
+        """Update knowledge base with successful resolution"""
+        categories_key = "_".join(sorted(categories))
+        with self._transaction(write=True) as conn:
+            entry = apply_knowledge_base_update(self._read(conn, "knowledge_base", categories_key),
+                                                categories_key, query, resolution)
+            self._write(conn, "knowledge_base", categories_key, entry)
+
+    def knowledge_tables(self) -> Dict[str, Dict[str, Any]]:
+        """The knowledge base (input to the KB snapshot compiler)"""
+        with self._transaction() as conn:
+            return {"knowledge_base": {key: json.loads(data) for key, data in
+                                       conn.execute("SELECT categories_key, data FROM knowledge_base ORDER BY rowid")}}
+
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """Get memory system statistics"""
+        with self._transaction() as conn:
+            return dict(conn.execute("SELECT name, value FROM stats").fetchall())
+
+    @traced("memory.get_system_stats")
+    def get_system_stats(self) -> Dict[str, Any]:
+        """Get system-wide counters for the stats endpoint"""
+        with self._transaction() as conn:
+            stats = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in _TABLE_KEYS}
+            indexed = conn.execute("SELECT COUNT(DISTINCT entity_key) FROM entity_refs").fetchone()[0]
+        return {
+            "total_conversations": stats.get("total_conversations", 0),
+            "resolved_issues": stats.get("resolved_issues", 0),
+            "active_users": counts["user_profiles"],
+            "memory_patterns": counts["successful_patterns"],
+            "knowledge_base_entries": counts["knowledge_base"],
+            "indexed_entities": indexed
+        }
+
+    def import_json(self, json_path: str):
+        """Bulk-load a JSON memory file (AgentMemory layout) into this database"""
+        with open(json_path) as f:
+            data = json.load(f)
+        with self._transaction(write=True) as conn:
+            for table in _TABLE_KEYS:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({_TABLE_KEYS[table]}, data) VALUES (?, ?)",
+                    ((key, json.dumps(value, default=str)) for key, value in data.get(table, {}).items())
+                )
+            for name, value in data.get("stats", {}).items():
+                conn.execute("INSERT OR REPLACE INTO stats (name, value) VALUES (?, ?)", (name, value))
+            index = data.get("entity_index")
+            if index is None:
+                index = build_entity_index(data.get("user_profiles", {}).items())
+            self._replace_entity_index(conn, index)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m src.memory_sqlite <agent_memory.json> <agent_memory.db>")
+        sys.exit(1)
+    SQLiteAgentMemory(sys.argv[2]).import_json(sys.argv[1])
+    print(f"✓ Imported {sys.argv[1]} into {sys.argv[2]}")
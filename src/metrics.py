@@ -0,0 +1,189 @@
+"""
+In-process metrics exposed at /metrics in the Prometheus text format.
+
+Counters and histograms are kept per worker process; scrape every worker
+(or sum across them) when running the multi-worker production server.
+"""
+
+import bisect
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_suppressed: contextvars.ContextVar[bool] = contextvars.ContextVar("metrics_suppressed", default=False)
+
+
+@contextmanager
+def suppressed():
+    """Drop every metric update made in the block (e.g. the warm-up dry run)"""
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        if _suppressed.get():
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str):
+        if _suppressed.get():
+            return
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        # label key -> (per-bucket counts incl. +Inf, sum, count)
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str):
+        if _suppressed.get():
+            return
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def summary(self, **labels: str) -> Dict[str, float]:
+        with self._lock:
+            _, total, count = self._values.get(_label_key(labels)) or ([], 0.0, 0)
+        return {"count": count, "sum": total, "mean": total / count if count else 0.0}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(name, lambda: Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(name, lambda: Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float]) -> Histogram:
+        return self._register(name, lambda: Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+requests_total = metrics.counter("support_requests_total", "Support queries processed")
+escalations_total = metrics.counter("support_escalations_total", "Queries escalated to a human, by exhausted budget")
+degradations_total = metrics.counter("support_degradations_total", "Deadline degradations applied, by kind")
+refinement_attempts = metrics.histogram("support_refinement_attempts", "Validation attempts per query",
+                                        [1, 2, 3, 4, 5])
+llm_calls_per_request = metrics.histogram("support_llm_calls_per_request", "LLM calls per query",
+                                          [1, 2, 3, 4, 6, 8, 10, 15])
+fast_path_total = metrics.counter("support_fast_path_total", "Queries answered from a template, by intent")
+llm_free_total = metrics.counter("support_llm_free_requests_total", "Queries answered without any LLM call")
+llm_free_share = metrics.gauge("support_llm_free_share", "Share of queries answered without any LLM call")
+request_seconds = metrics.histogram("support_request_seconds", "End-to-end query latency",
+                                    [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+
+
+def record_query(result: Dict, seconds: float):
+    """Record per-request refinement metrics from a finished graph state"""
+    if _suppressed.get():
+        return
+    requests_total.inc()
+    refinement_attempts.observe(result.get("attempts", 0))
+    llm_calls_per_request.observe(result.get("llm_calls", 0))
+    request_seconds.observe(seconds)
+    if result.get("fast_path"):
+        fast_path_total.inc(intent=result["fast_path"])
+    if not result.get("llm_calls"):
+        llm_free_total.inc()
+    llm_free_share.set(round(llm_free_total.value() / requests_total.value(), 4))
+    if result.get("escalation_needed"):
+        escalations_total.inc(reason=result.get("escalation_reason") or "unresolved")
+    for degradation in result.get("degradations") or []:
+        degradations_total.inc(kind=degradation)
@@ -0,0 +1,168 @@
+"""
+Dynamic micro-batching of validation judgments.
+
+Every request's validate_response used to send its own small yes/no
+prompt, so at high concurrency the provider saw hundreds of tiny calls,
+each paying per-call overhead and counting against its request-rate
+limit. With VALIDATION_BATCHING=on, concurrent judgments are collected
+into one numbered multi-item prompt (refinement.build_batch_validation_prompt)
+and each request gets its own verdict back.
+
+Batching is leader-based, with no scheduler thread: the first judgment of
+a batch waits up to VALIDATION_BATCH_WAIT_MS (default 5) for others to
+join. It sends the batch as soon as VALIDATION_BATCH_MAX_ITEMS (default
+16) have joined, and answers every future. The window is dynamic: the
+leader only waits when other validations are in flight or judgments have
+recently been arriving less than a window apart, so at low traffic a
+request pays no extra latency. A batch of one uses the ordinary
+single-item prompt.
+
+The batched call uses the tightest deadline among its items. Items whose
+verdict line is missing from the reply, or cannot be parsed, fall back to
+an individual call (``single``) made by their own request. Each request is charged an
+equal share of the batch's LLM tokens for its tenant budget.
+
+Metrics: validation_batch_size (items per provider call) and
+validation_batch_fallbacks_total (items re-judged individually).
+"""
+
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from .capture import record_llm_call
+from .config import get_llm, load_settings
+from .container import container
+from .metrics import metrics
+from .ratelimit import count_llm_tokens, record_llm_tokens
+from .refinement import build_batch_validation_prompt, parse_batch_validation
+from .tracing import start_span
+
+batch_size = metrics.histogram("validation_batch_size", "Validation judgments per provider call",
+                               [1, 2, 4, 8, 16, 32, 64])
+fallbacks_total = metrics.counter("validation_batch_fallbacks_total",
+                                  "Batched validation judgments re-sent individually after an unparseable reply")
+
+
+def validation_batching_enabled() -> bool:
+    load_settings()
+    return os.getenv("VALIDATION_BATCHING", "off").lower() in ("1", "on", "true", "yes")
+
+
+class _Judgment(NamedTuple):
+    query: str
+    response: str
+    timeout: Optional[float]
+    future: Future
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[_Judgment] = []
+        self.closed = False
+
+
+class ValidationBatcher:
+    def __init__(self, max_items: int = 16, max_wait_ms: float = 5.0):
+        self.max_items = max(1, max_items)
+        self.max_wait = max_wait_ms / 1000.0
+        self._cond = threading.Condition()
+        self._open: Dict[int, _Batch] = {}  # one open batch per LLM client
+        self._active = 0  # judgments waiting to be sent or answered
+        self._last_arrival: Optional[float] = None
+        self._arrival_gap: Optional[float] = None  # moving average of the time between judgments
+
+    def judge(self, query: str, response: str, single: Callable[[], str], timeout: Optional[float] = None) -> str:
+        """Verdict ("yes" / "no: ...") from a batched call, or from single() when judged on its own"""
+        llm = get_llm()
+        judgment = _Judgment(query, response, timeout, Future())
+        with self._cond:
+            self._active += 1
+            now = time.monotonic()
+            if self._last_arrival is not None:
+                gap = now - self._last_arrival
+                self._arrival_gap = gap if self._arrival_gap is None else 0.8 * self._arrival_gap + 0.2 * gap
+            self._last_arrival = now
+            batch = self._open.get(id(llm))
+            leader = batch is None
+            if leader:
+                batch = self._open[id(llm)] = _Batch()
+            batch.items.append(judgment)
+            if len(batch.items) >= self.max_items:
+                self._close(id(llm), batch)
+        try:
+            if leader:
+                self._lead(llm, batch)
+            verdict, tokens = judgment.future.result()
+            if tokens:
+                record_llm_tokens(tokens)
+            if verdict is None:
+                # Alone in its batch, or missing from the batched reply
+                verdict = single()
+        finally:
+            with self._cond:
+                self._active -= 1
+        return verdict
+
+    def _close(self, key: int, batch: _Batch):
+        if self._open.get(key) is batch:
+            del self._open[key]
+        batch.closed = True
+        self._cond.notify_all()
+
+    def _busy(self) -> bool:
+        return self._arrival_gap is not None and self._arrival_gap < self.max_wait
+
+    def _lead(self, llm, batch: _Batch):
+        with self._cond:
+            deadline = time.monotonic() + self.max_wait
+            # Only wait for company when other validations are in flight or arriving
+            while not batch.closed and (self._active > len(batch.items) or self._busy()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._close(id(llm), batch)
+            items = list(batch.items)
+        batch_size.observe(len(items))
+        if len(items) == 1:
+            items[0].future.set_result((None, 0))
+            return
+
+        prompt = build_batch_validation_prompt([(item.query, item.response) for item in items])
+        timeouts = [item.timeout for item in items if item.timeout is not None]
+        kwargs = {"timeout": min(timeouts)} if timeouts else {}
+        try:
+            with start_span("llm.invoke", {"llm.prompt_chars": len(prompt), "llm.batch_size": len(items)}):
+                started = time.perf_counter()
+                reply = llm.invoke(prompt, **kwargs)
+            # Recorded on the query whose thread made the call
+            record_llm_call(prompt, reply, time.perf_counter() - started)
+        except Exception as e:
+            for item in items:
+                item.future.set_exception(e)
+            return
+
+        verdicts = parse_batch_validation(reply.content, len(items))
+        share = math.ceil(count_llm_tokens(prompt, reply) / len(items))
+        missing = sum(verdict is None for verdict in verdicts)
+        if missing:
+            fallbacks_total.inc(missing)
+        for item, verdict in zip(items, verdicts):
+            item.future.set_result((verdict, share))
+
+
+def build_validation_batcher() -> ValidationBatcher:
+    load_settings()
+    return ValidationBatcher(max_items=int(os.getenv("VALIDATION_BATCH_MAX_ITEMS", "16")),
+                             max_wait_ms=float(os.getenv("VALIDATION_BATCH_WAIT_MS", "5")))
+
+
+container.register("validation_batcher", build_validation_batcher)
+
+
+def get_validation_batcher() -> ValidationBatcher:
+    return container.get("validation_batcher")
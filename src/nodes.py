@@ -1,13 +1,135 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 from .state import CustomerServiceState
-from .config import llm
-from .memory import agent_memory
+from .config import get_llm
+from .memory import get_agent_memory, resolution_hint
+from .tracing import start_span
+from .context import build_memory_context, context_budget, count_tokens, model_name
+from .fastpath import match_fast_path
+from .predictor import predict_categories
+from .ratelimit import record_llm_usage
+from .capture import record_llm_call
+from .sentiment import PRIORITIES, score_text
+from .speculation import get_speculator, speculation_enabled
+from .microbatch import get_validation_batcher, validation_batching_enabled
+from .refinement import budget_exhausted, build_refinement_prompt, build_validation_prompt, parse_validation
+from .deadline import (
+    DeadlineExceeded, deadline_at, degraded_answer, llm_timeout, remaining_ms, with_degradation,
+    CANNED_FALLBACK, SKIPPED_MEMORY_LOOKUP, SKIPPED_VALIDATION,
+)
+import functools
 import re
+import time
+
+RELATED_CONVERSATIONS = 5  # entity-index references loaded per query
+
+def _invoke_llm(prompt: str, state: CustomerServiceState = None):
+    """Invoke the LLM inside a child span of the current node, bounded by the request deadline"""
+    timeout = llm_timeout(state)  # raises DeadlineExceeded when too little time is left
+    attributes = {"llm.prompt_chars": len(prompt)}
+    if timeout is not None:
+        attributes["llm.timeout_s"] = round(timeout, 3)
+    with start_span("llm.invoke", attributes) as span:
+        started = time.perf_counter()
+        response = get_llm().invoke(prompt, **({"timeout": timeout} if timeout is not None else {}))
+        span.set_attribute("llm.response_chars", len(response.content or ""))
+        record_llm_usage(prompt, response)
+        record_llm_call(prompt, response, time.perf_counter() - started)
+        return response
+
+def _memory_context(state: CustomerServiceState) -> str:
+    """User summary, session turns, similar issues and KB resolutions packed into the context budget"""
+    with start_span("context.select") as span:
+        budget = context_budget(model_name(get_llm()))
+        context = build_memory_context(state, budget)
+        span.set_attributes({"context.budget": budget, "context.tokens": count_tokens(context)})
+        return context
+
+def _answer(state: CustomerServiceState, prompt: str, canned: str) -> Dict[str, Any]:
+    """Handler answer from the LLM, degrading to KB/cached/canned answers near the deadline or on failure"""
+    llm_calls = state.get('llm_calls', 0)
+    degradations = list(state.get('degradations') or [])
+    try:
+        response_content = _invoke_llm(prompt, state).content
+        llm_calls += 1
+    except DeadlineExceeded:
+        response_content, degradation = degraded_answer(state, canned)
+        degradations = with_degradation(state, degradation)
+    except Exception as e:
+        print(f"LLM call failed: {e}")
+        llm_calls += 1
+        response_content = canned
+        degradations = with_degradation(state, CANNED_FALLBACK)
+    return {"response": response_content, "llm_calls": llm_calls, "degradations": degradations,
+            "conversation_history": [{"role": "assistant", "content": response_content}]}
+
+def extract_entities(query: str) -> Dict[str, Any]:
+    """Basic, safe entity extraction: only include order_id if it's explicitly present in the query"""
+    entities = {}
+    # simple detection for order patterns like 'order 12345' or 'order id 12345'
+    match = re.search(r'order\s*(?:id)?\s*(\d{3,12})', query or '', re.IGNORECASE)
+    if match:
+        entities['order_id'] = match.group(1)
+    return entities
+
+def has_new_context(state: CustomerServiceState) -> bool:
+    """True when the query mentions entities the session hasn't seen (e.g. a different order)"""
+    known = state.get('entities') or {}
+    return any(known.get(key) != value for key, value in extract_entities(state['query']).items())
+
+# Session Nodes
+def start_turn(state: CustomerServiceState) -> Dict[str, Any]:
+    """Record the user's message and reset the per-turn budgets"""
+    started_at = time.time()
+    return {
+        "conversation_history": [{"role": "user", "content": state['query']}],
+        "started_at": started_at,
+        "deadline_at": deadline_at(started_at, state.get('deadline_ms')),
+        "llm_calls": 0,
+        "critique": None,
+        "escalation_reason": None,
+        "degradations": [],
+        "fast_path": None,
+        "speculation_id": None
+    }
+
+# Fast path: templated answers for greetings and FAQs, no LLM call
+def session_entities(state: CustomerServiceState) -> Dict[str, Any]:
+    """Entities known to the session, updated with any in the current query"""
+    return {**(state.get('entities') or {}), **extract_entities(state['query'])}
+
+def answer_fast_path(state: CustomerServiceState) -> Dict[str, Any]:
+    entities = session_entities(state)
+    match = match_fast_path(state['query'], entities)
+    score = score_text(state['query'])
+    update = {
+        "response": match.response,
+        "satisfactory": True,
+        "escalation_needed": False,
+        "fast_path": match.intent,
+        "sentiment": score.sentiment,
+        "priority": min(score.priority, state.get('priority') or "normal", key=PRIORITIES.index),
+        "conversation_history": [{"role": "assistant", "content": match.response}]
+    }
+    # Follow-up turns keep the session's classification for the next real question
+    if not state.get('memory_loaded'):
+        update["categories"] = match.categories
+        update["entities"] = entities
+    return update
 
 # Memory Management Nodes
 def load_memory(state: CustomerServiceState) -> Dict[str, Any]:
     """Load user memory and similar past issues"""
+    # Classification is final: drop a speculative handler run that guessed wrong
+    if state.get('speculation_id'):
+        get_speculator().settle(state['speculation_id'], state.get('categories') or [], state.get('entities') or {})
+
+    if remaining_ms(state) <= 0:
+        return {"similar_past_issues": [], "knowledge_base_entry": None, "related_conversations": [],
+                "memory_loaded": True,
+                "degradations": with_degradation(state, SKIPPED_MEMORY_LOOKUP)}
+
     user_id = state.get('user_id', 'anonymous')
+    agent_memory = get_agent_memory()
 
     # Get similar past issues
     similar_issues = agent_memory.find_similar_past_issues(
@@ -22,12 +144,37 @@ def load_memory(state: CustomerServiceState) -> Dict[str, Any]:
     return {
         "similar_past_issues": similar_issues,
         "knowledge_base_entry": kb_entry,
+        "related_conversations": related_conversations(agent_memory, user_id, state.get('entities') or {},
+                                                       similar_issues),
+        "user_summary": agent_memory.get_user_summary(user_id),
         "memory_loaded": True
     }
 
+def related_conversations(agent_memory, user_id: str, entities: Dict[str, Any],
+                          similar_issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Earlier conversations about the query's entities (e.g. the same order), from the entity index
+
+    Only the user's own and linked accounts' conversations come with their
+    query and response; other accounts' are reduced to resolution hints.
+    """
+    already_loaded = {issue.get('timestamp') for issue in similar_issues}
+    household = None
+    related = []
+    for entity_type, value in entities.items():
+        for ref in agent_memory.find_conversations_by_entity(entity_type, value, limit=RELATED_CONVERSATIONS):
+            if ref.get('user_id') == user_id:
+                if ref.get('timestamp') not in already_loaded:
+                    related.append(ref)
+                continue
+            if household is None:
+                household = set(agent_memory.linked_accounts(user_id))
+            related.append(ref if ref.get('user_id') in household else resolution_hint(ref))
+    return related[:RELATED_CONVERSATIONS]
+
 def save_memory(state: CustomerServiceState) -> Dict[str, Any]:
     """Save conversation to memory after completion"""
     user_id = state.get('user_id', 'anonymous')
+    agent_memory = get_agent_memory()
 
     # Prepare conversation data for storage
     conversation_data = {
@@ -43,8 +190,9 @@ def save_memory(state: CustomerServiceState) -> Dict[str, Any]:
     # Save to memory
     agent_memory.save_conversation(user_id, conversation_data)
 
-    # Update knowledge base if issue was resolved
-    if state.get('satisfactory') and state.get('response'):
+    # Update knowledge base if issue was resolved (degraded and templated answers are not validated resolutions)
+    if state.get('satisfactory') and state.get('response') and not state.get('degradations') \
+            and not state.get('fast_path'):
         agent_memory.update_knowledge_base(
             categories=state['categories'],
             query=state['query'],
@@ -55,10 +203,12 @@ def save_memory(state: CustomerServiceState) -> Dict[str, Any]:
 
 # Enhanced Classification with Memory
 def classify_query(state: CustomerServiceState) -> Dict[str, Any]:
-    state['conversation_history'].append({"role": "user", "content": state['query']})
+    # Start the likely handler now so its LLM call overlaps the memory reads below
+    speculation_id = _speculate(state) if speculation_enabled() else None
 
     # Use memory to enhance classification
     user_id = state.get('user_id', 'anonymous')
+    agent_memory = get_agent_memory()
     user_profile = agent_memory.get_user_profile(user_id)
 
     # If user has common issues, bias towards those categories
@@ -88,54 +238,63 @@ def classify_query(state: CustomerServiceState) -> Dict[str, Any]:
             category_counts = Counter(past_categories)
             inferred_categories = [cat for cat, _ in category_counts.most_common(2)]
         else:
-            inferred_categories = ["billing", "technical"]  # fallback
+            inferred_categories = predict_categories(state['query']) or ["general"]
     else:
-        inferred_categories = ["billing", "technical"]  # fallback for testing
+        # No history to go on: guess from the query's wording
+        inferred_categories = predict_categories(state['query']) or ["general"]
 
-        # Basic, safe entity extraction: only include order_id if it's explicitly present in the query
+    query_text = state.get('query', '') or ''
+    entities = extract_entities(query_text)
+
+    # If the user only said a greeting, treat as a general inquiry (no entities)
+    if re.match(r'^(hi|hello|hey|good\s+morning|good\s+afternoon|good\s+evening)[\W]*$', query_text.strip(), re.IGNORECASE):
+        inferred_categories = ['general']
         entities = {}
-        query_text = state.get('query', '') or ''
-        # simple detection for order patterns like 'order 12345' or 'order id 12345'
-        import re
-        match = re.search(r'order\s*(?:id)?\s*(\d{3,12})', query_text, re.IGNORECASE)
-        if match:
-            entities['order_id'] = match.group(1)
-
-        # If the user only said a greeting, treat as a general inquiry (no entities)
-        if re.match(r'^(hi|hello|hey|good\s+morning|good\s+afternoon|good\s+evening)[\W]*$', query_text.strip(), re.IGNORECASE):
-            inferred_categories = ['general']
-            entities = {}
-
-        return {
-            "categories": inferred_categories,
-            "entities": entities
-        }
+
+    return {
+        "categories": inferred_categories,
+        "entities": entities,
+        "speculation_id": speculation_id
+    }
 
 def analyze_sentiment(state: CustomerServiceState) -> Dict[str, Any]:
-    # Hardcoded for testing
-    sentiment = "neutral"
-    priority = "normal"
+    # Local lexicon scorer, no LLM call; keep admission's priority if it was higher (e.g. a VIP tier)
+    score = score_text(state['query'])
+    priority = min(score.priority, state.get('priority') or "normal", key=PRIORITIES.index)
     return {
-        "sentiment": sentiment,
+        "sentiment": score.sentiment,
         "priority": priority
     }
 
+# Speculative handler execution (see speculation.py)
+def speculative(category: str):
+    """Handler decorator: adopt the result of a matching speculative run instead of calling the LLM again"""
+    def decorate(handler):
+        @functools.wraps(handler)
+        def run(state: CustomerServiceState) -> Dict[str, Any]:
+            taken = get_speculator().take(state['speculation_id'], category) if state.get('speculation_id') else None
+            if taken is None:
+                return handler(state)
+            snapshot, result = taken
+            degradations = list(state.get('degradations') or [])
+            degradations += [d for d in result['degradations'] if d not in degradations]
+            return {**result, "degradations": degradations,
+                    "llm_calls": state.get('llm_calls', 0) + result['llm_calls'] - snapshot.get('llm_calls', 0)}
+        return run
+    return decorate
+
+def _speculate(state: CustomerServiceState) -> str:
+    """Start the predicted category's handler on the state as it is before memory loading"""
+    category = (predict_categories(state['query']) or ["general"])[0]
+    snapshot = {**state, "categories": [category], "entities": extract_entities(state['query']),
+                "similar_past_issues": [], "knowledge_base_entry": None, "user_summary": None,
+                "related_conversations": [], "speculation_id": None}
+    return get_speculator().start(category, HANDLERS[category], snapshot)
+
+@speculative("billing")
 def handle_billing(state: CustomerServiceState) -> Dict[str, Any]:
-    # Use memory to enhance response
-    similar_issues = state.get('similar_past_issues', [])
-    kb_entry = state.get('knowledge_base_entry')
-
-    # Build context from memory
-    context = ""
-    if similar_issues:
-        context += "\nPast similar issues:\n"
-        for issue in similar_issues[:2]:
-            context += f"- Previous query: '{issue.get('query', '')}'\n"
-            context += f"  Resolution: {issue.get('resolution', 'N/A')}\n"
-
-    if kb_entry:
-        context += f"\nKnowledge base for {kb_entry.get('categories', [])}:\n"
-        context += f"Frequent resolutions: {kb_entry.get('resolutions', [])[:2]}\n"
+    # Most relevant memory context that fits the model's prompt budget
+    context = _memory_context(state)
 
     # Enhanced prompt with memory context
     prompt = f"""Handle billing support query: {state['query']}
@@ -145,32 +304,14 @@ Context from user history:{context}
 
 Provide a personalized response considering the user's past interactions."""
 
-    try:
-        response = llm.invoke(prompt)
-        response_content = response.content
-    except:
-        # Fallback to hardcoded response
-        response_content = f"I've checked your order {state['entities'].get('order_id', 'N/A')}. Based on your history, it seems there might be a billing issue. Can you provide more details?"
-
-    state['conversation_history'].append({"role": "assistant", "content": response_content})
-    return {"response": response_content}
+    # Fallback to hardcoded response
+    canned = f"I've checked your order {state['entities'].get('order_id', 'N/A')}. Based on your history, it seems there might be a billing issue. Can you provide more details?"
+    return _answer(state, prompt, canned)
 
+@speculative("technical")
 def handle_technical(state: CustomerServiceState) -> Dict[str, Any]:
-    # Use memory to enhance response
-    similar_issues = state.get('similar_past_issues', [])
-    kb_entry = state.get('knowledge_base_entry')
-
-    # Build context from memory
-    context = ""
-    if similar_issues:
-        context += "\nPast similar issues:\n"
-        for issue in similar_issues[:2]:
-            context += f"- Previous query: '{issue.get('query', '')}'\n"
-            context += f"  Resolution: {issue.get('resolution', 'N/A')}\n"
-
-    if kb_entry:
-        context += f"\nKnowledge base for {kb_entry.get('categories', [])}:\n"
-        context += f"Frequent resolutions: {kb_entry.get('resolutions', [])[:2]}\n"
+    # Most relevant memory context that fits the model's prompt budget
+    context = _memory_context(state)
 
     # Enhanced prompt with memory context
     prompt = f"""Handle technical support query: {state['query']}
@@ -180,41 +321,22 @@ Context from user history:{context}
 
 Provide a personalized response considering the user's past interactions."""
 
-    try:
-        response = llm.invoke(prompt)
-        response_content = response.content
-    except Exception as e:
-        print(f"LLM call failed: {e}")
-        # Fallback response
-        response_content = f"I've analyzed your technical issue with order {state['entities'].get('order_id', 'N/A')}. Based on similar past cases, here are the troubleshooting steps:\n\n1. Check system requirements\n2. Update your software\n3. Clear cache and restart\n4. Contact support if issue persists"
-
-    state['conversation_history'].append({"role": "assistant", "content": response_content})
-    return {"response": response_content}
+    # Fallback response
+    canned = f"I've analyzed your technical issue with order {state['entities'].get('order_id', 'N/A')}. Based on similar past cases, here are the troubleshooting steps:\n\n1. Check system requirements\n2. Update your software\n3. Clear cache and restart\n4. Contact support if issue persists"
+    return _answer(state, prompt, canned)
 
+@speculative("returns")
 def handle_returns(state: CustomerServiceState) -> Dict[str, Any]:
     prompt = f"""Handle returns query: {state['query']}
 Entities: {state['entities']}
 Process return request."""
-    response = llm.invoke(prompt)
-    state['conversation_history'].append({"role": "assistant", "content": response.content})
-    return {"response": response.content}
+    canned = f"I can help with returning order {state['entities'].get('order_id', 'N/A')}. Please tell me which item you want to return and why."
+    return _answer(state, prompt, canned)
 
+@speculative("general")
 def handle_general(state: CustomerServiceState) -> Dict[str, Any]:
-    # Use memory to enhance response
-    similar_issues = state.get('similar_past_issues', [])
-    kb_entry = state.get('knowledge_base_entry')
-
-    # Build context from memory
-    context = ""
-    if similar_issues:
-        context += "\nPast similar issues:\n"
-        for issue in similar_issues[:2]:
-            context += f"- Previous query: '{issue.get('query', '')}'\n"
-            context += f"  Resolution: {issue.get('resolution', 'N/A')}\n"
-
-    if kb_entry:
-        context += f"\nKnowledge base for {kb_entry.get('categories', [])}:\n"
-        context += f"Frequent resolutions: {kb_entry.get('resolutions', [])[:2]}\n"
+    # Most relevant memory context that fits the model's prompt budget
+    context = _memory_context(state)
 
     # Enhanced prompt with memory context
     prompt = f"""Handle general inquiry: {state['query']}
@@ -224,20 +346,19 @@ Context from user history:{context}
 
 Provide a personalized response considering the user's past interactions."""
 
-    try:
-        response = llm.invoke(prompt)
-        response_content = response.content
-    except Exception as e:
-        print(f"LLM call failed: {e}")
-        # Fallback response
-        response_content = f"Thank you for your inquiry about '{state['query']}'. I'm here to help. Could you provide more details about what you're looking for?"
+    # Fallback response
+    canned = f"Thank you for your inquiry about '{state['query']}'. I'm here to help. Could you provide more details about what you're looking for?"
+    return _answer(state, prompt, canned)
 
-    state['conversation_history'].append({"role": "assistant", "content": response_content})
-    return {"response": response_content}
+HANDLERS = {"billing": handle_billing, "technical": handle_technical,
+            "returns": handle_returns, "general": handle_general}
 
 def collaborate(state: CustomerServiceState) -> Dict[str, Any]:
     categories = state['categories']
     responses = []
+    history = []
+    llm_calls = state.get('llm_calls', 0)
+    degradations = list(state.get('degradations') or [])
     for cat in categories:
         if cat == "technical":
             res = handle_technical(state)
@@ -250,43 +371,71 @@ def collaborate(state: CustomerServiceState) -> Dict[str, Any]:
         else:
             continue
         responses.append(res.get('response', ''))
+        history.extend(res.get('conversation_history', []))
+        # Every handler sees the same input state, so accumulate their increments here
+        llm_calls += res['llm_calls'] - state.get('llm_calls', 0)
+        degradations += [d for d in res['degradations'] if d not in degradations]
     # Combine responses using consensus (simple concatenation for now)
     combined_response = " ".join(responses)
-    state['conversation_history'].append({"role": "assistant", "content": combined_response})
-    return {"response": combined_response}
+    history.append({"role": "assistant", "content": combined_response})
+    return {"response": combined_response, "conversation_history": history,
+            "llm_calls": llm_calls, "degradations": degradations}
 
 def escalate(state: CustomerServiceState) -> Dict[str, Any]:
     escalation_msg = "Escalating to human agent."
-    state['conversation_history'].append({"role": "assistant", "content": escalation_msg})
-    return {"escalation_needed": True, "response": escalation_msg}
+    return {"escalation_needed": True, "response": escalation_msg,
+            "escalation_reason": budget_exhausted(state) or "unresolved",
+            "conversation_history": [{"role": "assistant", "content": escalation_msg}]}
 
 def generate_response(state: CustomerServiceState) -> Dict[str, Any]:
     # If not handled by specialized, generate general response
     if not state.get('response'):
         # Use LLM to generate a response
         prompt = f"Generate a helpful response for the customer query: {state['query']}"
-        try:
-            response = llm.invoke(prompt)
-            response_content = response.content
-        except Exception as e:
-            print(f"LLM call failed in generate_response: {e}")
-            response_content = "I'm sorry, I couldn't process your request at this time. Please try again."
-        state['conversation_history'].append({"role": "assistant", "content": response_content})
-        return {"response": response_content}
+        return _answer(state, prompt, "I'm sorry, I couldn't process your request at this time. Please try again.")
     return {}
 
+def refine_response(state: CustomerServiceState) -> Dict[str, Any]:
+    """Rewrite the rejected response to address the validator's critique"""
+    llm_calls = state.get('llm_calls', 0)
+    try:
+        response = _invoke_llm(build_refinement_prompt(state), state)
+        response_content = response.content
+        llm_calls += 1
+    except DeadlineExceeded:
+        # Out of time: keep the previous answer; validation is skipped for the same reason
+        response_content = state.get('response')
+    except Exception as e:
+        print(f"LLM call failed in refine_response: {e}")
+        llm_calls += 1
+        # Keep the previous answer; validation decides whether to try again
+        response_content = state.get('response')
+    return {"response": response_content, "llm_calls": llm_calls,
+            "conversation_history": [{"role": "assistant", "content": response_content}]}
+
 def validate_response(state: CustomerServiceState) -> Dict[str, Any]:
     # Use LLM to validate if the response is satisfactory
-    prompt = f"""Evaluate if the following response adequately addresses the customer's query.
+    query, response = state['query'], state.get('response', '') or ''
+    update = {"attempts": state.get('attempts', 0) + 1}
 
-Query: {state['query']}
-Response: {state.get('response', '')}
+    def judge_alone() -> str:
+        return _invoke_llm(build_validation_prompt(query, response), state).content
 
-Is this response satisfactory? Answer with only 'yes' or 'no'."""
     try:
-        validation = llm.invoke(prompt)
-        is_satisfactory = 'yes' in validation.content.lower()
+        if validation_batching_enabled():
+            # Shares one provider call with concurrent requests when there are any
+            verdict = get_validation_batcher().judge(query, response, judge_alone, llm_timeout(state))
+        else:
+            verdict = judge_alone()
+        is_satisfactory, critique = parse_validation(verdict)
+        update["llm_calls"] = state.get('llm_calls', 0) + 1
+    except DeadlineExceeded:
+        # Not enough time left to validate: return the answer as is
+        is_satisfactory, critique = True, None
+        update["degradations"] = with_degradation(state, SKIPPED_VALIDATION)
     except Exception as e:
         print(f"LLM call failed in validate_response: {e}")
-        is_satisfactory = True  # Default to satisfactory if LLM fails
-    return {"satisfactory": is_satisfactory}
\ No newline at end of file
+        is_satisfactory, critique = True, None  # Default to satisfactory if LLM fails
+        update["llm_calls"] = state.get('llm_calls', 0) + 1
+    update.update({"satisfactory": is_satisfactory, "critique": critique})
+    return update
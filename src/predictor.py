@@ -0,0 +1,72 @@
+"""
+Keyword category predictor.
+
+A local, microsecond-cost guess of a query's support categories from the
+words it uses. classify_query falls back to it when the user's history has
+nothing similar, and speculative handler execution (speculation.py) uses it
+to pick the handler to start before classification and memory loading
+have finished.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Word (or word prefix ending in "*") -> weight per category
+KEYWORDS: Dict[str, Dict[str, float]] = {
+    "billing": {
+        "bill*": 2, "charg*": 2, "refund*": 2, "invoice*": 2, "payment*": 2, "pay": 1, "paid": 1,
+        "price*": 1, "subscription*": 1, "card": 1, "fee*": 2, "receipt*": 1, "overcharged": 2,
+        "discount*": 1, "coupon*": 1, "money": 1, "$": 1,
+    },
+    "technical": {
+        "crash*": 2, "error*": 2, "bug*": 2, "app": 1, "login": 2, "log": 1, "password*": 2,
+        "website": 1, "site": 1, "load*": 1, "slow": 1, "update*": 1, "install*": 2, "notification*": 2,
+        "page": 1, "settings": 1, "freez*": 2, "broken": 1, "working": 1, "reset*": 1, "checkout": 1,
+    },
+    "returns": {
+        "return*": 2, "exchange*": 2, "replace*": 1, "replacement": 2, "damaged": 2, "wrong": 1,
+        "label": 1, "size": 1, "send": 1, "back": 1,
+    },
+}
+
+_WORDS = re.compile(r"[a-z]+|\$")
+# A second category must score at least this share of the best one to count
+SECONDARY_SHARE = 0.6
+
+
+def _lookup(word: str) -> List[Tuple[str, float]]:
+    hits = []
+    for category, keywords in KEYWORDS.items():
+        weight = keywords.get(word)
+        if weight is None:
+            for keyword, prefix_weight in keywords.items():
+                if keyword.endswith("*") and word.startswith(keyword[:-1]):
+                    weight = prefix_weight
+                    break
+        if weight:
+            hits.append((category, weight))
+    return hits
+
+
+@lru_cache(maxsize=4096)
+def _word_hits(word: str) -> Tuple[Tuple[str, float], ...]:
+    return tuple(_lookup(word))
+
+
+def category_scores(query: str) -> Dict[str, float]:
+    scores: Dict[str, float] = {}
+    for word in _WORDS.findall((query or "").lower()):
+        for category, weight in _word_hits(word):
+            scores[category] = scores.get(category, 0.0) + weight
+    return scores
+
+
+def predict_categories(query: str, min_score: float = 2.0) -> List[str]:
+    """Likely categories, best first (empty when nothing scores min_score)"""
+    scores = category_scores(query)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if not ranked or ranked[0][1] < min_score:
+        return []
+    best = ranked[0][1]
+    return [category for category, score in ranked[:2] if score >= best * SECONDARY_SHARE]
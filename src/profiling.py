@@ -0,0 +1,348 @@
+"""
+On-demand profiling of live queries and of the memory store, for admins.
+
+Off unless PROFILING=on and ADMIN_TOKEN is set. Then a query is
+profiled when it carries ``X-Profile: cprofile`` (or ``sampler``) together
+with a valid ``X-Admin-Token`` header, or when it is picked by
+PROFILING_SAMPLE_RATE (0-1, with PROFILING_MODE):
+
+    cprofile  deterministic cProfile of the graph run; saved as .pstats
+              (python -m pstats, snakeviz)
+    sampler   the graph thread's stack every PROFILING_SAMPLE_INTERVAL_MS;
+              saved as collapsed stacks (flamegraph.pl, speedscope, inferno)
+
+Profiles cover the thread running the graph, which is where LangGraph runs
+single nodes and where AgentMemory reads happen. Parallel collaboration
+branches and the write-behind thread are not included. The query's
+response carries ``profile_id``.
+
+tracemalloc snapshots show which lines of the memory store hold memory.
+Only allocations made after tracing started are seen, so set
+PROFILING_TRACEMALLOC_FRAMES to trace from start-up, or start tracing on
+demand. Tracing makes allocation-heavy code several times slower, so
+stop it once the snapshots are taken.
+
+Profiles and snapshots are written to PROFILING_DIR, which all workers
+share. The newest PROFILING_MAX_PROFILES are kept. They are listed and
+downloaded under /api/v1/admin/profiles. When profiling is off, a query
+pays for one attribute check.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from .config import admin_token_configured, is_admin, load_settings
+from .container import container
+from .metrics import metrics
+
+PROFILE_MODES = ("cprofile", "sampler")
+PROFILE_FORMATS = {"cprofile": "pstats", "sampler": "collapsed", "tracemalloc": "tracemalloc"}
+MEMORY_STORE_FILES = ("memory.py", "memory_sqlite.py", "write_behind.py", "kb_snapshot.py")
+
+_PROFILE_ID = re.compile(r"^[\w-]{1,64}$")
+
+profiles_total = metrics.counter("profiles_total", "Profiles and memory snapshots saved, by mode and trigger")
+
+
+def _frame_label(code) -> str:
+    path = Path(code.co_filename)
+    where = f"{path.parent.name}/{path.name}" if path.parent.name else path.name
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({where}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """One daemon thread that samples the stacks of the threads being profiled"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._targets: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, thread_id: int) -> Counter:
+        samples: Counter = Counter()
+        with self._lock:
+            self._targets[thread_id] = samples
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+                self._thread.start()
+        return samples
+
+    def remove(self, thread_id: int):
+        with self._lock:
+            self._targets.pop(thread_id, None)
+
+    def _run(self):
+        # Exits when nothing is being profiled; the next add starts a new thread
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = list(self._targets.items())
+            frames = sys._current_frames()
+            for thread_id, samples in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[_collapse(frame)] += 1
+
+
+def _collapse(frame) -> str:
+    """Root-first stack, cut at the profiled call so pool plumbing is left out"""
+    labels = []
+    while frame is not None and frame.f_code is not _profiled_call.__code__:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def new_profile_id() -> str:
+    # Sorts by creation time, which is what pruning and listing go by
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+
+
+def _profiled_call(fn: Callable, args, kwargs):
+    return fn(*args, **kwargs)
+
+
+class RequestProfile:
+    """One query being profiled"""
+
+    def __init__(self, mode: str, trigger: str):
+        self.profile_id = new_profile_id()
+        self.mode = mode
+        self.trigger = trigger
+        self.saved = False
+
+
+class Profiler:
+    """Decides which queries to profile, runs them under the profiler and stores the results"""
+
+    def __init__(self, directory: str = "data/profiles", enabled: bool = True,
+                 sample_rate: float = 0.0, mode: str = "sampler", sample_interval: float = 0.005,
+                 max_profiles: int = 200):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"PROFILING_MODE must be one of {', '.join(PROFILE_MODES)}")
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.max_profiles = max_profiles
+        self.sampler = StackSampler(sample_interval)
+        self._previous_snapshot_bytes: Optional[int] = None
+
+    def for_request(self, headers: Mapping[str, str]) -> Optional[RequestProfile]:
+        """The profile to take for this query, if any (ValueError for an unknown X-Profile mode)"""
+        if not self.enabled:
+            return None
+        mode = headers.get("x-profile")
+        if mode is not None and is_admin(headers.get("x-admin-token")):
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"X-Profile must be one of {', '.join(PROFILE_MODES)}")
+            return RequestProfile(mode, "header")
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return RequestProfile(self.mode, "sampled")
+        return None
+
+    def wrap(self, profile: Optional[RequestProfile], fn: Callable) -> Callable:
+        if profile is None:
+            return fn
+        return lambda *args, **kwargs: self.run(profile, fn, *args, **kwargs)
+
+    def run(self, profile: RequestProfile, fn: Callable, *args, **kwargs) -> Any:
+        """Call fn under the profile's profiler, then save the profile (after the timed call)"""
+        started = time.time()
+        samples = None
+        profiler = cProfile.Profile() if profile.mode == "cprofile" else None
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Python 3.12+ allows one cProfile at a time; run this query unprofiled
+                print(f"Profiling skipped for {profile.profile_id}: {e}")
+                return fn(*args, **kwargs)
+        else:
+            samples = self.sampler.add(threading.get_ident())
+        try:
+            result = _profiled_call(fn, args, kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            else:
+                self.sampler.remove(threading.get_ident())
+            duration_ms = (time.time() - started) * 1000.0
+
+        meta = {"started": started, "duration_ms": round(duration_ms, 1), "route": _route(result)}
+        try:
+            if profiler is not None:
+                self._save(profile.profile_id, profile.mode, profile.trigger, meta,
+                           lambda path: profiler.dump_stats(str(path)))
+            else:
+                meta.update(samples=sum(samples.values()), interval_ms=round(self.sampler.interval * 1000.0, 2))
+                self._save(profile.profile_id, profile.mode, profile.trigger, meta,
+                           lambda path: path.write_text("".join(f"{stack} {count}\n"
+                                                                for stack, count in samples.most_common()),
+                                                        encoding="utf-8"))
+            profile.saved = True
+        except OSError as e:
+            print(f"Profile {profile.profile_id} could not be saved: {e}")
+        return result
+
+    def _save(self, profile_id: str, mode: str, trigger: str, meta: Dict[str, Any], write: Callable[[Path], None]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data_file = self.directory / f"{profile_id}.{PROFILE_FORMATS[mode]}"
+        write(data_file)
+        meta = {"profile_id": profile_id, "mode": mode, "trigger": trigger, "pid": os.getpid(),
+                "file": data_file.name, "bytes": data_file.stat().st_size, **meta}
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(meta), encoding="utf-8")
+        profiles_total.inc(mode=mode, trigger=trigger)
+        self._prune()
+
+    def _prune(self):
+        metas = sorted(self.directory.glob("*.json"))
+        for stale in metas[:max(0, len(metas) - self.max_profiles)]:
+            for path in self.directory.glob(f"{stale.stem}.*"):
+                path.unlink(missing_ok=True)  # another worker may be pruning too
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Saved profiles and snapshots of every worker, newest first"""
+        profiles = []
+        for path in sorted(self.directory.glob("*.json"), reverse=True):
+            try:
+                profiles.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue  # pruned or still being written
+        return profiles
+
+    def get_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        try:
+            return json.loads((self.directory / f"{profile_id}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def profile_file(self, meta: Dict[str, Any]) -> Path:
+        return self.directory / meta["file"]
+
+    def summary(self, meta: Dict[str, Any], limit: int = 30) -> str:
+        """Human-readable top of a saved profile or snapshot"""
+        path = self.profile_file(meta)
+        if meta["mode"] == "cprofile":
+            out = io.StringIO()
+            pstats.Stats(str(path), stream=out).sort_stats("cumulative").print_stats(limit)
+            return out.getvalue()
+        if meta["mode"] == "tracemalloc":
+            lines = [f"{meta['traced_kb']} KB in {meta['blocks']} blocks ({meta['scope']} scope)"]
+            lines += [f"{entry['size_kb']:>10} KB {entry['count']:>8}  {entry['line']}" for entry in meta["top"]]
+            return "\n".join(lines) + "\n"
+        own: Counter = Counter()
+        total = 0
+        for line in path.read_text(encoding="utf-8").splitlines():
+            stack, _, count = line.rpartition(" ")
+            own[stack.rsplit(";", 1)[-1]] += int(count)
+            total += int(count)
+        lines = [f"{total} samples every {meta['interval_ms']} ms over {meta['duration_ms']} ms; "
+                 "functions by own samples"]
+        lines += [f"{count:>8} {100.0 * count / total:5.1f}%  {frame}" for frame, count in own.most_common(limit)]
+        return "\n".join(lines) + "\n"
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start_tracemalloc(self, frames: int = 25) -> bool:
+        """Start tracing allocations; False when already tracing"""
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(frames)
+        return True
+
+    def stop_tracemalloc(self):
+        tracemalloc.stop()
+        self._previous_snapshot_bytes = None
+
+    def snapshot_memory(self, scope: str = "memory", limit: int = 20) -> Dict[str, Any]:
+        """Save a tracemalloc snapshot; scope=memory keeps allocations made from the memory store"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing; start it first")
+        snapshot = tracemalloc.take_snapshot()
+        if scope == "memory":
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(True, f"*{os.sep}src{os.sep}{name}", all_frames=True)
+                                               for name in MEMORY_STORE_FILES])
+        by_line: Dict[str, List[int]] = {}
+        for trace in snapshot.traces:
+            frame = _innermost(trace.traceback, scope)
+            entry = by_line.setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+            entry[0] += trace.size
+            entry[1] += 1
+        traced = sum(size for size, _ in by_line.values())
+        top = sorted(by_line.items(), key=lambda item: -item[1][0])[:limit]
+        meta = {"started": time.time(), "scope": scope, "traced_kb": round(traced / 1024, 1),
+                "blocks": sum(count for _, count in by_line.values()),
+                "change_kb": (round((traced - self._previous_snapshot_bytes) / 1024, 1)
+                              if self._previous_snapshot_bytes is not None else None),
+                "top": [{"line": line, "size_kb": round(size / 1024, 1), "count": count}
+                        for line, (size, count) in top]}
+        self._previous_snapshot_bytes = traced
+        profile_id = new_profile_id()
+        self._save(profile_id, "tracemalloc", "admin", meta, lambda path: snapshot.dump(str(path)))
+        return self.get_profile(profile_id)
+
+
+def _innermost(traceback, scope: str):
+    """The newest frame of an allocation inside the memory store (or the newest frame at all)"""
+    if scope == "memory":
+        for frame in reversed(traceback):
+            if os.path.basename(frame.filename) in MEMORY_STORE_FILES:
+                return frame
+    return traceback[-1]
+
+
+def _route(result: Any) -> Optional[str]:
+    if not isinstance(result, dict):
+        return None
+    from .capture import route_of
+    return route_of(result)
+
+
+def build_profiler() -> Profiler:
+    load_settings()
+    enabled = os.getenv("PROFILING", "off").lower() in ("1", "on", "true", "yes")
+    if enabled and not admin_token_configured():
+        print("PROFILING=on ignored: ADMIN_TOKEN is not set")
+        enabled = False
+    profiler = Profiler(
+        directory=os.getenv("PROFILING_DIR", "data/profiles"),
+        enabled=enabled,
+        sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+        mode=os.getenv("PROFILING_MODE", "sampler"),
+        sample_interval=float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5")) / 1000.0,
+        max_profiles=int(os.getenv("PROFILING_MAX_PROFILES", "200")),
+    )
+    frames = int(os.getenv("PROFILING_TRACEMALLOC_FRAMES", "0"))
+    if profiler.enabled and frames > 0:
+        profiler.start_tracemalloc(frames)
+    return profiler
+
+
+container.register("profiler", build_profiler)
+
+
+def get_profiler() -> Profiler:
+    return container.get("profiler")
@@ -0,0 +1,336 @@
+"""
+Per-user, per-API-key and per-tenant rate limiting.
+
+Every query spends one token from a bucket for each identity it carries:
+``user:<user_id>`` (or ``ip:<client>`` for anonymous queries), ``key:<API key
+hash>`` from the X-API-Key header, and ``tenant:<metadata.tenant_id>``. Each
+bucket holds RATE_LIMIT_<SCOPE>_BURST tokens and refills at
+RATE_LIMIT_<SCOPE>_PER_MINUTE; a scope with a limit of 0 is not limited. A
+query is only charged when every bucket has a token, otherwise it is
+rejected with ``RateLimited`` (HTTP 429 + Retry-After).
+
+Tenants additionally get TENANT_LLM_TOKENS_PER_HOUR LLM tokens per clock
+hour (0 = unlimited). LLM usage is metered per request by ``_invoke_llm``
+and charged once the graph finishes; a tenant over budget is rejected until
+the next hour starts.
+
+Buckets and usage live in this process (RATE_LIMIT_BACKEND=memory) or in a
+SQLite file shared by every worker (RATE_LIMIT_BACKEND=sqlite,
+RATE_LIMIT_DB_PATH). A bucket left alone long enough to refill completely
+is the same as no bucket, so idle buckets are dropped: identities are chosen
+by clients, and keeping every one would grow without bound.
+"""
+
+import contextvars
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import load_settings
+from .container import container
+from .metrics import metrics
+
+SCOPES = ("user", "key", "tenant")
+DEFAULT_LIMITS = {
+    # scope: (sustained per minute, burst)
+    "user": (30, 10),
+    "key": (300, 50),
+    "tenant": (1200, 200),
+}
+HOUR_SECONDS = 3600
+
+# (key, capacity, refill tokens per second)
+Bucket = Tuple[str, float, float]
+
+rejections_total = metrics.counter("ratelimit_rejections_total", "Queries rejected by rate limits, by scope")
+llm_tokens_total = metrics.counter("support_llm_tokens_total", "LLM tokens used by queries (estimated when unreported)")
+
+
+class RateLimited(Exception):
+    def __init__(self, scope: str, identity: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {scope} '{identity}'; retry after {retry_after:.0f}s")
+        self.scope = scope
+        self.identity = identity
+        self.retry_after = retry_after
+
+
+# LLM usage metering
+class LLMUsage:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tokens = 0
+        self.calls = 0
+
+    def add(self, tokens: int):
+        with self._lock:
+            self.tokens += tokens
+            self.calls += 1
+
+
+_current_usage: contextvars.ContextVar[Optional[LLMUsage]] = contextvars.ContextVar("llm_usage", default=None)
+
+
+@contextmanager
+def meter_llm_usage() -> Iterator[LLMUsage]:
+    """Collect the LLM tokens used by everything run inside the block (threadpool and graph nodes included)"""
+    usage = LLMUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def count_llm_tokens(prompt: str, response: Any) -> int:
+    """Tokens reported by the provider, or ~4 characters per token when it reports none"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    return math.ceil((len(prompt) + len(getattr(response, "content", "") or "")) / 4)
+
+
+def record_llm_usage(prompt: str, response: Any):
+    record_llm_tokens(count_llm_tokens(prompt, response))
+
+
+def record_llm_tokens(tokens: int):
+    """Charge tokens to the current request (e.g. its share of a batched call)"""
+    llm_tokens_total.inc(tokens)
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add(tokens)
+
+
+# Storage backends
+def _refill_seconds(buckets: List[Bucket]) -> float:
+    """Longest time any of these buckets takes to refill from empty"""
+    return max((capacity / rate for _, capacity, rate in buckets), default=0.0)
+
+
+class InMemoryRateLimitStore:
+    """Buckets and hourly usage for a single worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (tokens, updated_at), least recently charged first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._usage: Dict[Tuple[str, int], int] = {}
+        self._refill_after = 0.0
+
+    def take(self, buckets: List[Bucket], now: float) -> Optional[Tuple[str, float]]:
+        """Spend one token from every bucket, or none; returns (blocking key, retry_after) when denied"""
+        with self._lock:
+            self._evict_full(buckets, now)
+            levels = {key: _refill(self._buckets.get(key), capacity, rate, now) for key, capacity, rate in buckets}
+            denied = _first_empty(buckets, levels)
+            if denied is None:
+                for key, _, _ in buckets:
+                    self._buckets[key] = (levels[key] - 1.0, now)
+                    self._buckets.move_to_end(key)
+            return denied
+
+    def _evict_full(self, buckets: List[Bucket], now: float):
+        # Buckets untouched for a full refill are back at capacity, which is what a missing bucket reads as
+        self._refill_after = max(self._refill_after, _refill_seconds(buckets))
+        while self._buckets:
+            key, (_, updated_at) = next(iter(self._buckets.items()))
+            if now - updated_at < self._refill_after:
+                break
+            del self._buckets[key]
+
+    def bucket_count(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+    def usage(self, tenant: str, window: int) -> int:
+        with self._lock:
+            return self._usage.get((tenant, window), 0)
+
+    def add_usage(self, tenant: str, window: int, tokens: int) -> int:
+        with self._lock:
+            # Only the current window is ever read; drop the old ones
+            for stale in [k for k in self._usage if k[1] < window]:
+                del self._usage[stale]
+            total = self._usage.get((tenant, window), 0) + tokens
+            self._usage[(tenant, window)] = total
+            return total
+
+
+class SQLiteRateLimitStore:
+    """Buckets and hourly usage shared by every worker through one SQLite file"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS rate_buckets_updated ON rate_buckets (updated_at);
+    CREATE TABLE IF NOT EXISTS llm_usage (tenant TEXT NOT NULL, hour INTEGER NOT NULL, tokens INTEGER NOT NULL,
+                                          PRIMARY KEY (tenant, hour));
+    """
+    PRUNE_EVERY = 100  # takes between sweeps of refilled buckets
+
+    def __init__(self, path: str = "data/ratelimit.db", busy_timeout_ms: int = 5000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._takes = 0
+        self._refill_after = 0.0
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), isolation_level=None,
+                                   timeout=self.busy_timeout_ms / 1000.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        # IMMEDIATE so two workers can't both spend the last token
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def take(self, buckets: List[Bucket], now: float) -> Optional[Tuple[str, float]]:
+        with self._transaction() as conn:
+            levels = {}
+            for key, capacity, rate in buckets:
+                row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                levels[key] = _refill(row, capacity, rate, now)
+            denied = _first_empty(buckets, levels)
+            if denied is None:
+                conn.executemany("INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                                 [(key, levels[key] - 1.0, now) for key, _, _ in buckets])
+            self._refill_after = max(self._refill_after, _refill_seconds(buckets))
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                # Refilled buckets read the same as missing ones
+                conn.execute("DELETE FROM rate_buckets WHERE updated_at <= ?", (now - self._refill_after,))
+            return denied
+
+    def bucket_count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+    def usage(self, tenant: str, window: int) -> int:
+        row = self._connect().execute("SELECT tokens FROM llm_usage WHERE tenant = ? AND hour = ?",
+                                      (tenant, window)).fetchone()
+        return row[0] if row else 0
+
+    def add_usage(self, tenant: str, window: int, tokens: int) -> int:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM llm_usage WHERE hour < ?", (window,))
+            conn.execute("INSERT INTO llm_usage (tenant, hour, tokens) VALUES (?, ?, ?) "
+                         "ON CONFLICT (tenant, hour) DO UPDATE SET tokens = tokens + excluded.tokens",
+                         (tenant, window, tokens))
+            return conn.execute("SELECT tokens FROM llm_usage WHERE tenant = ? AND hour = ?",
+                                (tenant, window)).fetchone()[0]
+
+
+def _refill(stored: Optional[Tuple[float, float]], capacity: float, rate: float, now: float) -> float:
+    if stored is None:
+        return capacity
+    tokens, updated_at = stored
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+def _first_empty(buckets: List[Bucket], levels: Dict[str, float]) -> Optional[Tuple[str, float]]:
+    for key, _, rate in buckets:
+        if levels[key] < 1.0:
+            return key, (1.0 - levels[key]) / rate
+    return None
+
+
+# Limiter
+class RateLimiter:
+    def __init__(self, store=None, limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 llm_tokens_per_hour: int = 0):
+        self.store = store or InMemoryRateLimitStore()
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.llm_tokens_per_hour = llm_tokens_per_hour
+        self.rejected = 0
+
+    def _buckets(self, identities: Dict[str, Optional[str]]) -> List[Bucket]:
+        buckets = []
+        for scope in SCOPES:
+            identity = identities.get(scope)
+            per_minute, burst = self.limits.get(scope, (0, 0))
+            if identity and per_minute > 0:
+                buckets.append((f"{scope}:{identity}", max(float(burst), 1.0), per_minute / 60.0))
+        return buckets
+
+    def _reject(self, scope: str, identity: str, retry_after: float):
+        self.rejected += 1
+        rejections_total.inc(scope=scope)
+        raise RateLimited(scope, identity, max(1, math.ceil(retry_after)))
+
+    def check(self, user: Optional[str] = None, api_key: Optional[str] = None, tenant: Optional[str] = None,
+              now: Optional[float] = None):
+        """Charge one query to every identity; raises RateLimited when any bucket or the tenant budget is empty"""
+        now = time.time() if now is None else now
+        if tenant and self.llm_tokens_per_hour > 0:
+            window = int(now // HOUR_SECONDS)
+            if self.store.usage(tenant, window) >= self.llm_tokens_per_hour:
+                self._reject("llm_tokens", tenant, (window + 1) * HOUR_SECONDS - now)
+
+        identities = {"user": user, "key": _hash_key(api_key) if api_key else None, "tenant": tenant}
+        denied = self.store.take(self._buckets(identities), now)
+        if denied is not None:
+            key, retry_after = denied
+            scope, _, identity = key.partition(":")
+            # Never echo an API key (even hashed) back to the client
+            self._reject(scope, "api key" if scope == "key" else identity, retry_after)
+
+    def charge_llm_tokens(self, tenant: Optional[str], tokens: int, now: Optional[float] = None) -> int:
+        """Add a finished query's LLM tokens to its tenant's hourly usage"""
+        if not tenant or tokens <= 0:
+            return 0
+        now = time.time() if now is None else now
+        return self.store.add_usage(tenant, int(now // HOUR_SECONDS), tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": type(self.store).__name__, "rejected": self.rejected,
+                "limits": {scope: {"per_minute": pm, "burst": burst} for scope, (pm, burst) in self.limits.items()},
+                "llm_tokens_per_hour": self.llm_tokens_per_hour}
+
+
+def _hash_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def build_rate_limiter() -> RateLimiter:
+    load_settings()
+    limits = {}
+    for scope, (per_minute, burst) in DEFAULT_LIMITS.items():
+        prefix = f"RATE_LIMIT_{scope.upper()}"
+        limits[scope] = (float(os.getenv(f"{prefix}_PER_MINUTE", str(per_minute))),
+                         float(os.getenv(f"{prefix}_BURST", str(burst))))
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        store = SQLiteRateLimitStore(os.getenv("RATE_LIMIT_DB_PATH", "data/ratelimit.db"))
+    elif backend == "memory":
+        store = InMemoryRateLimitStore()
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    return RateLimiter(store, limits, int(os.getenv("TENANT_LLM_TOKENS_PER_HOUR", "0")))
+
+
+container.register("rate_limiter", build_rate_limiter)
+
+
+def get_rate_limiter() -> RateLimiter:
+    return container.get("rate_limiter")
@@ -0,0 +1,107 @@
+"""
+Bounded refinement of unsatisfactory responses.
+
+validate_response asks the validator for a verdict plus a one-sentence
+critique. When the answer is rejected, refine_response rewrites the
+previous answer to address that critique (instead of regenerating from
+scratch) and the result is validated again. Every request is bounded by:
+
+    MAX_REFINEMENT_ATTEMPTS    validations per request (default 3)
+    REQUEST_LLM_CALL_BUDGET    LLM calls per request (default 10)
+    the request deadline       time for another round must be left (see deadline.py)
+
+Once any budget is exhausted the graph escalates to a human agent and
+records which budget ran out in ``escalation_reason``.
+
+The validation prompts live here too, including the numbered multi-item
+form used when validations are micro-batched (see microbatch.py).
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import load_settings
+from .deadline import min_llm_call_ms, remaining_ms
+
+# A refinement round costs one regeneration call plus one validation call
+LLM_CALLS_PER_ROUND = 2
+
+
+def refinement_limits() -> Dict[str, float]:
+    load_settings()
+    return {
+        "max_attempts": int(os.getenv("MAX_REFINEMENT_ATTEMPTS", "3")),
+        "llm_call_budget": int(os.getenv("REQUEST_LLM_CALL_BUDGET", "10")),
+    }
+
+
+def budget_exhausted(state: Dict[str, Any], limits: Optional[Dict[str, float]] = None) -> Optional[str]:
+    """Name of the first exhausted budget ('attempts', 'llm_calls', 'latency'), or None"""
+    limits = limits or refinement_limits()
+    if state.get('attempts', 0) >= limits["max_attempts"]:
+        return "attempts"
+    if state.get('llm_calls', 0) + LLM_CALLS_PER_ROUND > limits["llm_call_budget"]:
+        return "llm_calls"
+    if remaining_ms(state) < LLM_CALLS_PER_ROUND * min_llm_call_ms():
+        return "latency"
+    return None
+
+
+def build_validation_prompt(query: str, response: str) -> str:
+    return f"""Evaluate if the following response adequately addresses the customer's query.
+
+Query: {query}
+Response: {response}
+
+Is this response satisfactory? Reply 'yes', or 'no: <one sentence on what is missing or wrong>'."""
+
+
+BATCH_VALIDATION_INSTRUCTIONS = "Reply with exactly one line per item, in order, formatted"
+_BATCH_VERDICT = re.compile(r"^\s*\[?(\d+)\]?\s*[:.)]?\s*(.+?)\s*$")
+
+
+def build_batch_validation_prompt(items: List[Tuple[str, str]]) -> str:
+    """One prompt judging several (query, response) pairs (see microbatch.py)"""
+    blocks = "\n\n".join(f"[{i}]\nQuery: {query}\nResponse: {response}"
+                          for i, (query, response) in enumerate(items, 1))
+    return f"""Evaluate, for each numbered item, if the response adequately addresses the customer's query.
+
+{blocks}
+
+{BATCH_VALIDATION_INSTRUCTIONS} '<n>: yes' or '<n>: no: <one sentence on what is missing or wrong>'."""
+
+
+def parse_batch_validation(content: str, count: int) -> List[Optional[str]]:
+    """Per-item verdicts ("yes" / "no: ...") from a batched reply; None where an item's line is missing"""
+    verdicts: List[Optional[str]] = [None] * count
+    for line in (content or "").splitlines():
+        match = _BATCH_VERDICT.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        verdict = match.group(2)
+        if 0 <= index < count and verdicts[index] is None and verdict.lower().startswith(("yes", "no")):
+            verdicts[index] = verdict
+    return verdicts
+
+
+def parse_validation(content: str) -> Tuple[bool, Optional[str]]:
+    """Split a "yes" / "no: <critique>" verdict into (satisfactory, critique)"""
+    verdict, _, critique = (content or "").partition(":")
+    satisfactory = 'yes' in verdict.lower()
+    critique = critique.strip() or None
+    if not satisfactory and critique is None:
+        critique = "The response does not fully address the customer's query."
+    return satisfactory, None if satisfactory else critique
+
+
+def build_refinement_prompt(state: Dict[str, Any]) -> str:
+    return f"""Improve this customer support response.
+
+Query: {state['query']}
+Entities: {state.get('entities', {})}
+Previous response: {state.get('response', '')}
+Reviewer feedback: {state.get('critique')}
+
+Keep what was correct, fix only what the feedback points out, and reply with the improved response only."""
@@ -0,0 +1,151 @@
+"""
+Local sentiment and priority scoring without an LLM call.
+
+A small support-domain lexicon assigns each word a valence (-3..+3) and an
+urgency weight. Scoring a query is one regex tokenisation plus dictionary
+lookups: negators ("not", "never", "n't") flip the next two words,
+intensifiers ("very", "so") scale them, and a few phrases ("no rush",
+"cancel my account") are matched as bigrams/trigrams before single words.
+Repeated "!" and SHOUTING add urgency.
+
+The valence sum is squashed into a compound score in (-1, 1) (as VADER
+does) and mapped to a sentiment; priority is high for urgent or strongly
+negative text, low for explicitly relaxed text, and normal otherwise.
+``score_batch`` scores many texts at once, scoring each distinct text once.
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+# Word -> valence
+VALENCE: Dict[str, float] = {
+    # negative
+    "angry": -3, "furious": -3, "outraged": -3, "disgusted": -3, "worst": -3, "horrible": -3,
+    "terrible": -3, "awful": -3, "unacceptable": -3, "ridiculous": -2.5, "scam": -3, "useless": -2.5,
+    "hate": -3, "pathetic": -3, "incompetent": -3, "disappointed": -2, "disappointing": -2,
+    "frustrated": -2, "frustrating": -2, "annoyed": -2, "annoying": -2, "upset": -2, "bad": -1.5,
+    "poor": -1.5, "wrong": -1.5, "broken": -1.5, "fail": -1.5, "failed": -1.5, "failing": -1.5,
+    "error": -1, "errors": -1, "crash": -1.5, "crashes": -1.5, "crashing": -1.5, "bug": -1, "slow": -1,
+    "missing": -1, "lost": -1.5, "damaged": -2, "late": -1, "delayed": -1, "overcharged": -2,
+    "unhappy": -2, "confused": -1, "stuck": -1.5, "problem": -1, "issue": -0.5, "never": -0.5,
+    "waste": -2, "refund": -0.5, "complaint": -1.5, "sucks": -2.5, "ignored": -2,
+    # positive
+    "thanks": 1.5, "thank": 1.5, "great": 2, "good": 1.5, "excellent": 3, "amazing": 3, "awesome": 2.5,
+    "love": 2.5, "happy": 2, "pleased": 2, "perfect": 2.5, "helpful": 2, "appreciate": 2,
+    "wonderful": 2.5, "fantastic": 3, "glad": 1.5, "nice": 1.5, "resolved": 1.5, "fixed": 1, "works": 1,
+    "quick": 1, "fast": 1, "easy": 1,
+}
+
+# Word -> urgency weight (priority signal independent of tone)
+URGENCY: Dict[str, float] = {
+    "urgent": 2, "urgently": 2, "asap": 2, "immediately": 2, "emergency": 2, "now": 0.5, "today": 0.5,
+    "lawyer": 2, "chargeback": 2, "fraud": 2, "stolen": 2, "hacked": 2, "again": 1, "still": 1,
+    "deadline": 1, "critical": 2, "down": 0.5, "outage": 2,
+}
+
+# Phrases matched before single words -> (valence, urgency)
+PHRASES: Dict[Tuple[str, ...], Tuple[float, float]] = {
+    ("no", "rush"): (0.5, -2), ("just", "wondering"): (0.5, -2), ("out", "of", "curiosity"): (0.5, -2),
+    ("whenever", "you"): (0.5, -1), ("legal", "action"): (-2, 2), ("cancel", "my", "account"): (-2, 2),
+    ("third", "time"): (-1.5, 2), ("still", "not"): (-1.5, 1.5), ("not", "working"): (-1.5, 0.5),
+    ("doesn't", "work"): (-1.5, 0.5), ("thank", "you"): (2, 0),
+}
+_PHRASE_LENGTHS = sorted({len(phrase) for phrase in PHRASES}, reverse=True)
+
+NEGATORS = frozenset({"not", "no", "never", "don't", "doesn't", "didn't", "isn't", "wasn't", "can't",
+                      "cannot", "won't", "haven't", "hasn't", "nothing", "nobody"})
+INTENSIFIERS: Dict[str, float] = {"very": 1.5, "really": 1.4, "so": 1.3, "extremely": 1.8, "totally": 1.4,
+                                  "completely": 1.5, "absolutely": 1.6, "super": 1.4}
+NEGATION_SPAN = 2
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_COMPOUND_ALPHA = 15.0  # VADER's normaliser
+
+PRIORITIES = ("high", "normal", "low")  # most to least urgent
+NEGATIVE_THRESHOLD = -0.35
+POSITIVE_THRESHOLD = 0.35
+HIGH_URGENCY = 2.0
+HIGH_NEGATIVITY = -0.6
+LOW_URGENCY = -1.0
+
+
+class SentimentScore(NamedTuple):
+    sentiment: str
+    priority: str
+    compound: float
+    urgency: float
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"sentiment": self.sentiment, "priority": self.priority,
+                "compound": round(self.compound, 3), "urgency": round(self.urgency, 2)}
+
+
+def _lexical_scores(tokens: List[str]) -> Tuple[float, float]:
+    valence = urgency = 0.0
+    negate_left = 0
+    scale = 1.0
+    i = 0
+    while i < len(tokens):
+        for length in _PHRASE_LENGTHS:
+            phrase = PHRASES.get(tuple(tokens[i:i + length]))
+            if phrase is not None:
+                valence += phrase[0]
+                urgency += phrase[1]
+                i += length
+                negate_left, scale = 0, 1.0
+                break
+        else:
+            token = tokens[i]
+            i += 1
+            if token in NEGATORS:
+                negate_left = NEGATION_SPAN
+                continue
+            if token in INTENSIFIERS:
+                scale *= INTENSIFIERS[token]
+                continue
+            word_valence = VALENCE.get(token)
+            if word_valence is not None:
+                # Negation flips and dampens ("not bad" is mildly positive)
+                valence += word_valence * scale * (-0.5 if negate_left else 1.0)
+                scale = 1.0
+            urgency += URGENCY.get(token, 0.0)
+            if negate_left:
+                negate_left -= 1
+    return valence, urgency
+
+
+@lru_cache(maxsize=4096)
+def score_text(text: str) -> SentimentScore:
+    """Sentiment and priority for one query"""
+    valence, urgency = _lexical_scores(_TOKEN.findall(text.lower()))
+    if text.count("!") >= 2:
+        # Repeated "!" is urgent unless the text is otherwise positive ("Great, thanks!!")
+        urgency += 1.5 if valence <= 0 else 0.5
+    letters = [c for c in text if c.isalpha()]
+    if len(letters) >= 12 and sum(c.isupper() for c in letters) / len(letters) > 0.7:
+        urgency += 2.0  # SHOUTING
+
+    compound = valence / math.sqrt(valence * valence + _COMPOUND_ALPHA)
+    if compound <= NEGATIVE_THRESHOLD:
+        sentiment = "negative"
+    elif compound >= POSITIVE_THRESHOLD:
+        sentiment = "positive"
+    else:
+        sentiment = "neutral"
+
+    if urgency >= HIGH_URGENCY or compound <= HIGH_NEGATIVITY:
+        priority = "high"
+    elif urgency <= LOW_URGENCY:
+        priority = "low"
+    else:
+        priority = "normal"
+    return SentimentScore(sentiment, priority, compound, urgency)
+
+
+def score_batch(texts: Iterable[str]) -> List[SentimentScore]:
+    """Score many texts, scoring each distinct text once"""
+    texts = list(texts)
+    unique = {text: score_text(text) for text in dict.fromkeys(texts)}
+    return [unique[text] for text in texts]
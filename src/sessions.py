@@ -0,0 +1,163 @@
+"""
+Multi-turn support sessions keyed by conversation id.
+
+The API runs each query on a graph compiled with a LangGraph checkpointer,
+using the conversation id as the thread id. A follow-up turn only sends the
+per-turn fields (query, response, attempts, ...); categories, entities and
+the memory context loaded on the first turn stay in the checkpoint, so the
+graph can skip classification and memory loading when nothing new was
+mentioned. Nodes return conversation_history deltas which the state
+reducer appends, and graphs run with durability="exit" so one checkpoint
+is written per turn instead of one per node.
+
+Idle sessions are evicted after SESSION_TTL_SECONDS (default 1800).
+SESSION_CHECKPOINTER=memory (default) keeps sessions in this process;
+SESSION_CHECKPOINTER=sqlite stores them in SESSION_DB_PATH so all workers
+share them (requires langgraph-checkpoint-sqlite).
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .config import load_settings
+from .container import container
+
+
+class SessionStore:
+    def __init__(self, checkpointer, ttl_seconds: float = 1800.0, sweep_interval: float = 60.0):
+        self.checkpointer = checkpointer
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._last_seen: Dict[str, float] = {}
+        self._last_sweep = time.time()
+        self.evicted = 0
+
+    @staticmethod
+    def config(conversation_id: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": conversation_id}}
+
+    def _checkpoint(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        checkpoint_tuple = self.checkpointer.get_tuple(self.config(conversation_id))
+        return checkpoint_tuple.checkpoint if checkpoint_tuple else None
+
+    def owner(self, conversation_id: str) -> Optional[str]:
+        """user_id of an existing session, or None if there is no such session"""
+        checkpoint = self._checkpoint(conversation_id)
+        if checkpoint is None:
+            return None
+        return checkpoint["channel_values"].get("user_id")
+
+    def touch(self, conversation_id: str):
+        """Mark a session as active and evict idle ones every sweep_interval seconds"""
+        now = time.time()
+        with self._lock:
+            self._last_seen[conversation_id] = now
+            sweep_due = now - self._last_sweep >= self.sweep_interval
+            if sweep_due:
+                self._last_sweep = now
+        if sweep_due:
+            self.evict_idle(now)
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Delete sessions idle for longer than the TTL; returns the evicted conversation ids"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            candidates = [cid for cid, seen in self._last_seen.items() if now - seen > self.ttl_seconds]
+        evicted = []
+        for conversation_id in candidates:
+            # Another worker may have continued the session; trust the checkpoint's own timestamp
+            checkpoint = self._checkpoint(conversation_id)
+            if checkpoint is not None:
+                last_write = datetime.fromisoformat(checkpoint["ts"]).timestamp()
+                if now - last_write <= self.ttl_seconds:
+                    with self._lock:
+                        self._last_seen[conversation_id] = last_write
+                    continue
+                self.checkpointer.delete_thread(conversation_id)
+            with self._lock:
+                self._last_seen.pop(conversation_id, None)
+                self.evicted += 1
+            evicted.append(conversation_id)
+        return evicted
+
+    def end(self, conversation_id: str):
+        """Drop a session immediately"""
+        self.checkpointer.delete_thread(conversation_id)
+        with self._lock:
+            self._last_seen.pop(conversation_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active_sessions": len(self._last_seen), "evicted_sessions": self.evicted,
+                    "ttl_seconds": self.ttl_seconds}
+
+
+def first_turn_state(query: str, user_id: str, deadline_ms: Optional[float] = None,
+                     priority: Optional[str] = None) -> Dict[str, Any]:
+    """Full state for the first turn of a conversation"""
+    return {
+        **follow_up_state(query, user_id, deadline_ms, priority),
+        "categories": [],
+        "entities": {},
+        "sentiment": None,
+        "conversation_history": [],
+        "similar_past_issues": [],
+        "knowledge_base_entry": None,
+        "related_conversations": [],
+        "user_summary": None,
+        "memory_loaded": False
+    }
+
+
+def follow_up_state(query: str, user_id: str, deadline_ms: Optional[float] = None,
+                    priority: Optional[str] = None) -> Dict[str, Any]:
+    """Only the per-turn fields; everything else is restored from the checkpoint"""
+    return {
+        "query": query,
+        "user_id": user_id,
+        "deadline_ms": deadline_ms,
+        "priority": priority,
+        "response": None,
+        "escalation_needed": False,
+        "attempts": 0,
+        "satisfactory": None
+    }
+
+
+def build_checkpointer():
+    load_settings()
+    backend = os.getenv("SESSION_CHECKPOINTER", "memory").lower()
+    if backend == "sqlite":
+        try:
+            import sqlite3
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            raise RuntimeError("SESSION_CHECKPOINTER=sqlite requires langgraph-checkpoint-sqlite") from e
+        path = os.getenv("SESSION_DB_PATH", "data/sessions.db")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One connection for every threadpool thread: SqliteSaver serializes its calls on it with its own lock.
+        # WAL lets the other workers read while one writes; the timeout covers their write locks.
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return SqliteSaver(conn)
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_CHECKPOINTER: {backend}")
+    from langgraph.checkpoint.memory import InMemorySaver
+    return InMemorySaver()
+
+
+def build_session_store() -> SessionStore:
+    load_settings()
+    return SessionStore(build_checkpointer(), ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1800")))
+
+
+container.register("sessions", build_session_store)
+
+
+def get_session_store() -> SessionStore:
+    """Return the session store shared by the API (built on first use)"""
+    return container.get("sessions")
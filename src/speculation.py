@@ -0,0 +1,176 @@
+"""
+Speculative handler execution.
+
+The graph runs classify -> load_memory -> sentiment -> handler, so the
+handler's LLM call cannot start until both memory reads are done. With
+SPECULATIVE_HANDLERS=on, classify_query asks the keyword predictor
+(predictor.py) for the likely category and starts that handler on a
+worker thread straight away, before its own memory reads, so the LLM call
+overlaps classification and memory loading.
+
+Once classification is final (at the start of load_memory) the speculation
+is settled: if the speculated category is not among the final categories,
+or the entities differ, it is cancelled (or, if the LLM call already
+started, its result is discarded) and counted as a miss. Otherwise the
+matching handler node adopts the speculative result instead of calling
+the LLM again, waiting for it if it is still running; inside collaboration
+only the matching category is adopted.
+
+Trade-off: the speculative prompt is built before memory is loaded, so it
+has the session's turns but not the similar past issues, KB resolution or
+user summary that load_memory adds. Leave speculation off where that
+context matters more than the latency.
+
+The speculative run's spans are held back until it is settled: an adopted
+run's spans join the request's trace, a discarded run's are dropped, so a
+run that outlives its request never leaves spans behind in the tracer.
+
+Metrics: speculation_total{outcome=hit|miss|late|expired}, the
+speculation_hit_rate gauge, speculation_saved_seconds (handler time that
+overlapped the earlier nodes) and speculation_wasted_llm_calls_total.
+"""
+
+import contextvars
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .config import load_settings
+from .container import container
+from .metrics import metrics
+from .tracing import attach_spans, detached_spans, start_span
+
+speculation_total = metrics.counter("speculation_total", "Speculative handler runs, by outcome")
+speculation_hit_rate = metrics.gauge("speculation_hit_rate", "Share of settled speculations whose result was used")
+speculation_saved_seconds = metrics.histogram("speculation_saved_seconds",
+                                              "Handler time overlapped with classification and memory loading",
+                                              [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5])
+wasted_llm_calls_total = metrics.counter("speculation_wasted_llm_calls_total",
+                                         "LLM calls made by speculative runs whose result was discarded")
+
+
+def speculation_enabled() -> bool:
+    load_settings()
+    return os.getenv("SPECULATIVE_HANDLERS", "off").lower() in ("1", "on", "true", "yes")
+
+
+class Speculation(NamedTuple):
+    category: str
+    snapshot: Dict[str, Any]
+    future: Future
+    started_at: float
+
+
+class Speculator:
+    def __init__(self, max_workers: int = 8, ttl: float = 60.0):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._running: Dict[str, Speculation] = {}
+        self.outcomes: Dict[str, int] = {"hit": 0, "miss": 0, "late": 0, "expired": 0}
+
+    def start(self, category: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+              snapshot: Dict[str, Any]) -> str:
+        """Run handler(snapshot) in the background (with the caller's context); returns the speculation id"""
+        self._expire()
+        speculation_id = f"spec-{next(self._ids)}"
+        context = contextvars.copy_context()
+
+        def run():
+            with detached_spans() as spans:
+                with start_span("speculation.run", {"speculation.handler": category}):
+                    result = handler(snapshot)
+            return result, time.time(), spans
+
+        future = self._executor.submit(context.run, run)
+        with self._lock:
+            self._running[speculation_id] = Speculation(category, snapshot, future, time.time())
+        return speculation_id
+
+    def settle(self, speculation_id: Optional[str], categories: List[str], entities: Dict[str, Any]):
+        """Cancel the speculation once classification is final and doesn't match it"""
+        if not speculation_id:
+            return
+        with self._lock:
+            speculation = self._running.get(speculation_id)
+            if speculation is None or (speculation.category in categories
+                                       and speculation.snapshot.get('entities') == entities):
+                return
+            del self._running[speculation_id]
+        self._discard(speculation, "miss")
+
+    def take(self, speculation_id: Optional[str], category: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(snapshot, result) of a matching speculation, waiting for it if needed; None to run the handler"""
+        if not speculation_id:
+            return None
+        with self._lock:
+            speculation = self._running.get(speculation_id)
+            if speculation is None or speculation.category != category:
+                return None
+            del self._running[speculation_id]
+        taken_at = time.time()
+        if speculation.future.cancel():
+            # Never got a worker: running it inline is no slower
+            self._record("late")
+            return None
+        try:
+            result, finished_at, spans = speculation.future.result()
+        except Exception as e:
+            print(f"Speculative {category} handler failed: {e}")
+            self._record("miss")
+            return None
+        attach_spans(spans)
+        speculation_saved_seconds.observe(max(min(finished_at, taken_at) - speculation.started_at, 0.0))
+        self._record("hit")
+        return speculation.snapshot, result
+
+    def _discard(self, speculation: Speculation, outcome: str):
+        if not speculation.future.cancel():
+            def count_waste(future: Future):
+                if not future.cancelled() and future.exception() is None:
+                    wasted = future.result()[0].get('llm_calls', 0) - speculation.snapshot.get('llm_calls', 0)
+                    wasted_llm_calls_total.inc(max(wasted, 0))
+            speculation.future.add_done_callback(count_waste)
+        self._record(outcome)
+
+    def _expire(self):
+        """Drop speculations nobody settled or took (e.g. the run failed before its handler)"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            stale = [(sid, s) for sid, s in self._running.items() if s.started_at < cutoff]
+            for sid, _ in stale:
+                del self._running[sid]
+        for sid, speculation in stale:
+            self._discard(speculation, "expired")
+
+    def _record(self, outcome: str):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            hit_rate = self.outcomes["hit"] / sum(self.outcomes.values())
+        speculation_total.inc(outcome=outcome)
+        speculation_hit_rate.set(round(hit_rate, 4))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            settled = sum(self.outcomes.values())
+            return {**self.outcomes, "running": len(self._running),
+                    "hit_rate": round(self.outcomes["hit"] / settled, 4) if settled else None}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_speculator() -> Speculator:
+    load_settings()
+    return Speculator(max_workers=int(os.getenv("SPECULATION_MAX_WORKERS", "8")))
+
+
+container.register("speculator", build_speculator)
+
+
+def get_speculator() -> Speculator:
+    return container.get("speculator")
@@ -1,4 +1,11 @@
-from typing import TypedDict, Optional, Dict, Any, List
+from typing import TypedDict, Optional, Dict, Any, List, Annotated
+
+MAX_HISTORY_TURNS = 50
+
+def append_history(history: List[Dict[str, Any]], new_turns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reducer for conversation_history: nodes return only their new turns"""
+    combined = (history or []) + (new_turns or [])
+    return combined[-MAX_HISTORY_TURNS:]
 
 class CustomerServiceState(TypedDict):
     query: str
@@ -10,9 +17,21 @@ class CustomerServiceState(TypedDict):
     response: Optional[str]
     escalation_needed: bool
     attempts: int
-    conversation_history: List[str]
+    conversation_history: Annotated[List[Dict[str, Any]], append_history]
     satisfactory: Optional[bool]
     # Memory-related fields
     similar_past_issues: List[Dict[str, Any]]
     knowledge_base_entry: Optional[Dict[str, Any]]
-    memory_loaded: bool
\ No newline at end of file
+    related_conversations: List[Dict[str, Any]]  # conversations about the same order; unlinked accounts as hints (memory.py)
+    user_summary: Optional[Dict[str, Any]]  # rolling summary of past conversations (see context.py)
+    memory_loaded: bool
+    # Refinement budget and deadline (reset by start_turn every turn)
+    started_at: Optional[float]
+    deadline_ms: Optional[float]
+    deadline_at: Optional[float]
+    llm_calls: int
+    critique: Optional[str]
+    escalation_reason: Optional[str]
+    degradations: List[str]
+    fast_path: Optional[str]  # intent answered from a template without an LLM (see fastpath.py)
+    speculation_id: Optional[str]  # handler run started before memory loading (see speculation.py)
@@ -0,0 +1,216 @@
+"""
+Static frontend assets: content-hashed, precompressed and cached.
+
+``frontend/`` used to be served by a single-threaded SimpleHTTPRequestHandler
+with no cache headers and no compression, so every page view refetched
+every file in full and one slow client blocked everyone. Now the assets are
+built once:
+
+- every file except the entry point (index.html) gets a content-hashed
+  name (``styles.3f2a9c01d4.css``), and index.html is rewritten to point at
+  ``/static/<hashed name>``;
+- text assets get ``.gz`` (and ``.br`` when the optional ``brotli`` package
+  is installed) siblings compressed at the highest level, kept only when
+  smaller;
+- hashed assets are served with ``Cache-Control: public, max-age=31536000,
+  immutable``; index.html with ``no-cache`` and an ETag, so a reload costs
+  one 304 until a deploy changes it.
+
+``python -m src.static_assets`` writes the build to ``frontend/dist`` (with
+a ``manifest.json``); without a build, the same output is produced in
+memory at startup. The API app serves it at ``/`` and ``/static/...``
+(FRONTEND_SERVE, FRONTEND_DIR), and ``servers/frontend_server.py`` serves
+it from a threaded keep-alive server.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .compression import negotiate_encoding
+from .config import load_settings
+from .container import container
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENTRY_POINTS = ("index.html",)  # keep their names; revalidated on every load
+ASSET_PREFIX = "/static/"
+HASHED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".svg", ".txt", ".map")
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}  # most preferred first
+MANIFEST = "manifest.json"
+
+_REFERENCE = re.compile(r'(\b(?:href|src)=")([^"]+)(")')
+
+
+class Asset(NamedTuple):
+    content_type: str
+    cache_control: str
+    digest: str
+    variants: Dict[Optional[str], bytes]  # encoding (None = identity) -> body
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:10]
+
+
+def hashed_name(name: str, content: bytes) -> str:
+    stem, dot, suffix = name.rpartition(".")
+    return f"{stem}.{_digest(content)}.{suffix}" if dot else f"{name}.{_digest(content)}"
+
+
+def precompress(name: str, content: bytes) -> Dict[str, bytes]:
+    """Compressed variants of a text asset that are smaller than the original"""
+    if not name.endswith(COMPRESSIBLE):
+        return {}
+    variants = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(content, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(content)}
+
+
+def build_assets(source: Path) -> Tuple[Dict[str, Dict[Optional[str], bytes]], Dict[str, str]]:
+    """({served name: {encoding: body}}, {source name: hashed name}) for the files in source"""
+    files = {path.name: path.read_bytes() for path in sorted(Path(source).iterdir()) if path.is_file()}
+    manifest = {name: hashed_name(name, content) for name, content in files.items() if name not in ENTRY_POINTS}
+
+    def rewrite(match):
+        target = manifest.get(match.group(2))
+        return f"{match.group(1)}{ASSET_PREFIX}{target}{match.group(3)}" if target else match.group(0)
+
+    built = {}
+    for name, content in files.items():
+        if name in ENTRY_POINTS:
+            content = _REFERENCE.sub(rewrite, content.decode("utf-8")).encode("utf-8")
+        served = manifest.get(name, name)
+        built[served] = {None: content, **precompress(name, content)}
+    return built, manifest
+
+
+def write_assets(source: Path, destination: Path) -> Dict[str, str]:
+    """Build source into destination (hashed files, .gz/.br siblings, manifest.json); returns the manifest"""
+    built, manifest = build_assets(source)
+    destination.mkdir(parents=True, exist_ok=True)
+    for name, variants in built.items():
+        for encoding, body in variants.items():
+            (destination / (name + PRECOMPRESSED_SUFFIXES.get(encoding, ""))).write_bytes(body)
+    (destination / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def load_built_assets(directory: Path) -> Dict[str, Dict[Optional[str], bytes]]:
+    """A build written by write_assets"""
+    built = {}
+    for path in sorted(directory.iterdir()):
+        if not path.is_file() or path.name == MANIFEST or path.suffix in PRECOMPRESSED_SUFFIXES.values():
+            continue
+        variants = {None: path.read_bytes()}
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            compressed = path.with_name(path.name + suffix)
+            if compressed.exists():
+                variants[encoding] = compressed.read_bytes()
+        built[path.name] = variants
+    return built
+
+
+class StaticAssets:
+    """Every asset held in memory with its headers precomputed"""
+
+    def __init__(self, directory: str = "frontend"):
+        directory = Path(directory)
+        if (directory / MANIFEST).exists():
+            built, self.manifest = load_built_assets(directory), json.loads((directory / MANIFEST).read_text())
+        else:
+            built, self.manifest = build_assets(directory)
+        hashed = set(self.manifest.values())
+        self.assets: Dict[str, Asset] = {}
+        for name, variants in built.items():
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+                content_type += "; charset=utf-8"
+            cache_control = HASHED_CACHE_CONTROL if name in hashed else REVALIDATE_CACHE_CONTROL
+            self.assets[name] = Asset(content_type, cache_control, _digest(variants[None]), variants)
+        # Unhashed names still resolve (for old pages and hand-written links), revalidated like index.html
+        self._aliases = dict(self.manifest)
+
+    def resolve(self, path: str) -> Optional[Asset]:
+        if path in ("", "/"):
+            path = "/" + ENTRY_POINTS[0]
+        if path.startswith(ASSET_PREFIX):
+            name = path[len(ASSET_PREFIX):]
+        elif path.lstrip("/") in ENTRY_POINTS:
+            name = path.lstrip("/")
+        else:
+            return None
+        if name in self.assets:
+            return self.assets[name]
+        if name in self._aliases:
+            return self.assets[self._aliases[name]]._replace(cache_control=REVALIDATE_CACHE_CONTROL)
+        return None
+
+    def respond(self, path: str, accept_encoding: Optional[str] = None,
+                if_none_match: Optional[str] = None) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """(status, headers, body) for a GET of path, or None when there is no such asset"""
+        asset = self.resolve(path)
+        if asset is None:
+            return None
+        offered = [encoding for encoding in PRECOMPRESSED_SUFFIXES if encoding in asset.variants]
+        encoding = negotiate_encoding(accept_encoding, offered)
+        etag = f'"{asset.digest}{"-" + encoding if encoding else ""}"'
+        headers = {"Cache-Control": asset.cache_control, "ETag": etag, "Vary": "Accept-Encoding",
+                   "Content-Type": asset.content_type}
+        if if_none_match and _matches(if_none_match, asset.digest):
+            return 304, headers, b""
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return 200, headers, asset.variants[encoding]
+
+
+def _matches(if_none_match: str, digest: str) -> bool:
+    """Any representation of the asset matches: they only differ in Content-Encoding"""
+    tags = [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+    return any(tag == "*" or tag == digest or tag.startswith(digest + "-") for tag in tags)
+
+
+def frontend_serving_enabled() -> bool:
+    load_settings()
+    return os.getenv("FRONTEND_SERVE", "on").lower() in ("1", "on", "true", "yes")
+
+
+def default_frontend_dir() -> str:
+    """frontend/dist when a build exists, else the frontend sources (built in memory)"""
+    root = Path(__file__).resolve().parents[1] / "frontend"
+    return str(root / "dist") if (root / "dist" / MANIFEST).exists() else str(root)
+
+
+def build_static_assets() -> StaticAssets:
+    load_settings()
+    return StaticAssets(os.getenv("FRONTEND_DIR") or default_frontend_dir())
+
+
+container.register("static_assets", build_static_assets)
+
+
+def get_static_assets() -> StaticAssets:
+    return container.get("static_assets")
+
+
+if __name__ == "__main__":
+    import sys
+
+    root = Path(__file__).resolve().parents[1]
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else root / "frontend"
+    destination = Path(sys.argv[2]) if len(sys.argv) > 2 else source / "dist"
+    manifest = write_assets(source, destination)
+    print(f"✓ Built {len(manifest) + len(ENTRY_POINTS)} assets into {destination}")
+    for name in sorted(os.listdir(destination)):
+        print(f"  {name} ({(destination / name).stat().st_size} bytes)")
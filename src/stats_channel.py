@@ -0,0 +1,170 @@
+"""
+Server-sent stats channel for the frontend dashboard.
+
+Every open tab used to poll /health every 30 seconds for stats that /health
+never returned. Now each worker runs one aggregator: while at least one
+client is subscribed it reads get_system_stats() every
+STATS_STREAM_INTERVAL_SECONDS and publishes only the counters that changed.
+``GET /api/v1/support/stats/stream`` is an SSE (text/event-stream) stream:
+
+    event: snapshot   every counter, sent on connect and to clients that fell behind
+    event: delta      only the counters that changed since the previous event
+    : keep-alive      comment every STATS_STREAM_HEARTBEAT_SECONDS so proxies keep it open
+
+So the store is read once per interval per worker however many tabs are
+open, and idle dashboards receive nothing but heartbeats. Beyond
+STATS_STREAM_MAX_CLIENTS streams per worker new clients get 503 and fall
+back to polling /api/v1/support/stats. STATS_STREAM=off disables the stream.
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set, Tuple
+
+from .config import load_settings
+from .container import container
+from .metrics import metrics
+
+RECONNECT_MS = 2000  # EventSource "retry:" hint; the frontend adds its own backoff
+
+stream_clients = metrics.gauge("stats_stream_clients", "Open stats streams on this worker")
+stream_events_total = metrics.counter("stats_stream_events_total", "Stats events sent to clients, by type")
+stats_reads_total = metrics.counter("stats_aggregator_reads_total", "Stats reads by the aggregator, by result")
+
+Event = Tuple[str, int, Dict[str, Any]]  # (type, sequence number, counters)
+
+
+class StreamsFull(Exception):
+    pass
+
+
+def with_resolution_rate(stats: Dict[str, Any]) -> Dict[str, Any]:
+    total = stats.get("total_conversations") or 0
+    rate = round(100.0 * stats.get("resolved_issues", 0) / total, 1) if total else 0.0
+    return {**stats, "resolution_rate": rate}
+
+
+class StatsAggregator:
+    """Reads the stats once per interval for all subscribers and fans out the changes"""
+
+    def __init__(self, read_stats: Callable[[], Dict[str, Any]], interval: float = 2.0,
+                 max_subscribers: int = 1000, queue_size: int = 16):
+        self.read_stats = read_stats
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.current: Dict[str, Any] = {}
+        self.sequence = 0
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._first_read: Optional[asyncio.Event] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    async def refresh(self):
+        """Read the stats and publish a delta to every subscriber if anything changed"""
+        try:
+            stats = with_resolution_rate(await asyncio.to_thread(self.read_stats))
+        except Exception as e:
+            print(f"Stats aggregator read failed: {e}")
+            stats_reads_total.inc(result="failed")
+            return
+        changed = {name: value for name, value in stats.items() if self.current.get(name) != value}
+        stats_reads_total.inc(result="changed" if changed else "unchanged")
+        if not changed:
+            return
+        self.current.update(changed)
+        self.sequence += 1
+        for queue in list(self._subscribers):
+            self._deliver(queue, ("delta", self.sequence, changed))
+
+    def _deliver(self, queue: asyncio.Queue, event: Event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client that can't keep up gets one snapshot in place of its backlog
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(self.snapshot())
+
+    def snapshot(self) -> Event:
+        return "snapshot", self.sequence, dict(self.current)
+
+    async def subscribe(self) -> asyncio.Queue:
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._first_read = asyncio.Event()
+            self._task = asyncio.create_task(self._run(self._first_read))
+        # Clients arriving after an idle period (or together) wait for one fresh read
+        await self._first_read.wait()
+        if len(self._subscribers) >= self.max_subscribers:
+            raise StreamsFull(f"{self.max_subscribers} stats streams already open")
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        queue.put_nowait(self.snapshot())
+        self._subscribers.add(queue)
+        stream_clients.set(len(self._subscribers))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        stream_clients.set(len(self._subscribers))
+
+    async def _run(self, first_read: asyncio.Event):
+        # Stops once the last subscriber leaves; the next subscribe starts it again
+        await self.refresh()
+        first_read.set()
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._subscribers:
+                return
+            await self.refresh()
+
+
+def format_event(event: Event) -> str:
+    kind, sequence, data = event
+    return f"event: {kind}\nid: {sequence}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stats_events(aggregator: StatsAggregator, queue: asyncio.Queue, heartbeat: float = 15.0) -> AsyncIterator[str]:
+    """SSE frames for one subscribed client; unsubscribes when the client goes away"""
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            stream_events_total.inc(type=event[0])
+            yield format_event(event)
+    finally:
+        aggregator.unsubscribe(queue)
+
+
+def stats_stream_enabled() -> bool:
+    load_settings()
+    return os.getenv("STATS_STREAM", "on").lower() in ("1", "on", "true", "yes")
+
+
+def stream_heartbeat_seconds() -> float:
+    load_settings()
+    return float(os.getenv("STATS_STREAM_HEARTBEAT_SECONDS", "15"))
+
+
+def build_stats_aggregator() -> StatsAggregator:
+    load_settings()
+    from .memory import get_agent_memory
+    return StatsAggregator(
+        lambda: get_agent_memory().get_system_stats(),
+        interval=float(os.getenv("STATS_STREAM_INTERVAL_SECONDS", "2")),
+        max_subscribers=int(os.getenv("STATS_STREAM_MAX_CLIENTS", "1000")),
+    )
+
+
+container.register("stats_aggregator", build_stats_aggregator)
+
+
+def get_stats_aggregator() -> StatsAggregator:
+    return container.get("stats_aggregator")
@@ -0,0 +1,329 @@
+"""
+Lightweight OpenTelemetry-style tracing for the support graph.
+
+Spans are grouped by trace and handed to an exporter when the root span of a
+trace ends. Exporters run on a background thread so the request path never
+waits on disk or network I/O.
+
+Configuration (environment variables):
+    TRACE_EXPORTER   none | file | otlp | memory   (default: none)
+    TRACE_FILE       NDJSON output path for the file exporter
+    OTLP_ENDPOINT    OTLP/HTTP JSON endpoint for the otlp exporter
+"""
+
+import contextvars
+import functools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import load_settings
+
+SERVICE_NAME = "customer-support-multiagent"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_detached_spans: contextvars.ContextVar[Optional[List["Span"]]] = contextvars.ContextVar("detached_spans",
+                                                                                         default=None)
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.status = "OK"
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def record_exception(self, exc: BaseException):
+        self.status = "ERROR"
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time or time.time_ns()
+        return (end - self.start_time) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize using the OTLP/JSON span field names"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_time,
+            "endTimeUnixNano": self.end_time,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": value}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    elif isinstance(value, (list, tuple)):
+        typed = {"arrayValue": {"values": [{"stringValue": str(v)} for v in value]}}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+# Exporters
+class InMemorySpanExporter:
+    """Keeps finished traces in memory (useful for tests)"""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+
+    def export(self, spans: List[Span]):
+        self.spans.extend(span.to_dict() for span in spans)
+
+
+class FileSpanExporter:
+    """Appends one JSON line per span to a local file"""
+
+    def __init__(self, path: str = "data/traces.ndjson"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """Posts traces to an OTLP/HTTP JSON endpoint (e.g. servers/trace_collector.py)"""
+
+    def __init__(self, endpoint: str = "http://localhost:4318/v1/traces", timeout: float = 2.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]):
+        import requests
+
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "src.tracing"},
+                    "spans": [span.to_dict() for span in spans],
+                }],
+            }]
+        }
+        requests.post(self.endpoint, json=payload, timeout=self.timeout)
+
+
+class Tracer:
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self._pending: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    @contextmanager
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        parent = _current_span.get()
+        if parent is None:
+            span = Span(name, uuid.uuid4().hex, attributes=attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+
+        if self.exporter is not None:
+            detached = _detached_spans.get()
+            if detached is not None:
+                detached.append(span)
+            else:
+                with self._lock:
+                    if parent is None:
+                        self._pending[span.trace_id] = [span]
+                    elif span.trace_id in self._pending:
+                        # A child started after its trace was exported is dropped rather than kept forever
+                        self._pending[span.trace_id].append(span)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_exception(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time_ns()
+            if parent is None:
+                self._finish_trace(span.trace_id)
+
+    @contextmanager
+    def detached(self):
+        """Collect the spans started in the block instead of adding them to their trace (see attach)"""
+        spans: List[Span] = []
+        token = _detached_spans.set(spans)
+        try:
+            yield spans
+        finally:
+            _detached_spans.reset(token)
+
+    @contextmanager
+    def suppressed(self):
+        """Drop every span started in the block, root spans included (e.g. the warm-up dry run)"""
+        with self.detached():
+            yield
+
+    def attach(self, spans: List[Span]):
+        """Add detached spans to their trace, unless it has already been exported"""
+        if self.exporter is None or not spans:
+            return
+        with self._lock:
+            pending = self._pending.get(spans[0].trace_id)
+            if pending is not None:
+                pending.extend(spans)
+
+    def _finish_trace(self, trace_id: str):
+        if self.exporter is None:
+            return
+        with self._lock:
+            spans = self._pending.pop(trace_id, [])
+        if spans:
+            self._ensure_worker()
+            self._queue.put(spans)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self._worker.start()
+
+    def _export_loop(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                if spans is not None:
+                    self.exporter.export(spans)
+            except Exception as e:
+                print(f"Trace export failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until all finished traces have been exported"""
+        if self._worker is not None:
+            self._queue.join()
+
+
+def _exporter_from_env():
+    load_settings()
+    kind = os.getenv("TRACE_EXPORTER", "none").lower()
+    if kind == "file":
+        return FileSpanExporter(os.getenv("TRACE_FILE", "data/traces.ndjson"))
+    if kind == "otlp":
+        return OTLPHttpSpanExporter(os.getenv("OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+    if kind == "memory":
+        return InMemorySpanExporter()
+    return None
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(_exporter_from_env())
+    return _tracer
+
+
+def set_exporter(exporter) -> Tracer:
+    """Replace the global tracer's exporter (None disables export)"""
+    tracer = get_tracer()
+    tracer.flush()
+    tracer.exporter = exporter
+    return tracer
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    return get_tracer().start_span(name, attributes)
+
+
+def detached_spans():
+    return get_tracer().detached()
+
+
+def suppressed_spans():
+    return get_tracer().suppressed()
+
+
+def attach_spans(spans: List[Span]):
+    get_tracer().attach(spans)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def traced(name: str, result_attributes: Optional[Callable[[Any], Dict[str, Any]]] = None):
+    """Decorator that wraps a function call in a child span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(name) as span:
+                result = func(*args, **kwargs)
+                if result_attributes is not None:
+                    span.set_attributes(result_attributes(result))
+                return result
+        return wrapper
+    return decorator
+
+
+def traced_node(name: str, node: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """Wrap a LangGraph node so each execution gets its own span"""
+    @functools.wraps(node)
+    def wrapper(state):
+        attributes = {
+            "graph.node": name,
+            "state.attempts": state.get("attempts", 0),
+            "state.categories": list(state.get("categories") or []),
+        }
+        if state.get("deadline_at"):
+            attributes["deadline.remaining_ms"] = round((state["deadline_at"] - time.time()) * 1000.0, 1)
+        with start_span(f"node.{name}", attributes) as span:
+            update = node(state)
+            if update:
+                if "categories" in update:
+                    span.set_attribute("state.categories", list(update["categories"] or []))
+                if "satisfactory" in update:
+                    span.set_attribute("state.satisfactory", bool(update["satisfactory"]))
+                if "similar_past_issues" in update:
+                    span.set_attribute("memory.similar_issues", len(update["similar_past_issues"] or []))
+                if "related_conversations" in update:
+                    span.set_attribute("memory.related_conversations", len(update["related_conversations"] or []))
+                if "knowledge_base_entry" in update:
+                    span.set_attribute("memory.kb_hit", update["knowledge_base_entry"] is not None)
+                if update.get("critique"):
+                    span.set_attribute("refinement.critique", update["critique"])
+                if update.get("degradations"):
+                    span.set_attribute("deadline.degradations", list(update["degradations"]))
+                if update.get("escalation_reason"):
+                    span.set_attribute("refinement.escalation_reason", update["escalation_reason"])
+            return update
+    return wrapper
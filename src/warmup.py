@@ -0,0 +1,139 @@
+"""
+Per-worker warm-up run from the application lifespan.
+
+Each worker compiles its graph once, loads the memory store and the prompt
+tokenizer, opens the LLM connection pool and pushes one synthetic query
+through the graph with the fake model, so the first real request sees
+steady-state latency. /ready only reports ready once every step has
+finished.
+
+Set WARMUP=off to skip warm-up and WARMUP_LLM_PING=off to avoid the
+network round-trip that pre-opens the LLM connection pool.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .config import get_llm, load_settings
+from .container import container
+from .context import count_tokens
+from .memory import AgentMemory, get_agent_memory
+from .metrics import suppressed as metrics_suppressed
+from .tracing import suppressed_spans
+
+
+class WarmupState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = "cold"  # cold | warming | ready | failed | skipped
+        self.steps: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            if status == "warming":
+                self.started_at = datetime.now()
+            elif status in ("ready", "failed"):
+                self.finished_at = datetime.now()
+
+    def record_step(self, name: str, seconds: float):
+        with self._lock:
+            self.steps[name] = round(seconds * 1000.0, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": self.status,
+                "steps_ms": dict(self.steps),
+                "error": self.error,
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None
+            }
+
+
+warmup_state = WarmupState()
+
+
+def warmup_enabled() -> bool:
+    load_settings()
+    return os.getenv("WARMUP", "on").lower() not in ("0", "off", "false", "no")
+
+
+def _prewarm_llm_connection():
+    """Open the HTTP connection pool of the real client (no-op for fake models)"""
+    llm = get_llm()
+    if os.getenv("WARMUP_LLM_PING", "on").lower() in ("0", "off", "false", "no"):
+        return
+    root_client = getattr(llm, "root_client", None)
+    if root_client is None:
+        return
+    try:
+        # Listing models is free and leaves a warm TLS connection in the shared pool
+        root_client.with_options(timeout=5.0, max_retries=0).models.list()
+    except Exception as e:
+        print(f"LLM connection pre-warm failed (continuing): {e}")
+
+
+def _dry_run():
+    """Run one synthetic query through the compiled graph with a fake model and throwaway memory
+
+    Its metrics and spans are dropped so worker starts never show up as traffic.
+    """
+    from .api import get_graph
+    from .fake_llm import FakeChatModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch_memory = AgentMemory(os.path.join(tmp, "warmup_memory.json"))
+        with container.override(llm=FakeChatModel(), memory=scratch_memory), \
+                metrics_suppressed(), suppressed_spans():
+            get_graph().invoke({
+                "query": "Warm-up: I have a billing issue with order 12345",
+                "user_id": "warmup",
+                "categories": [],
+                "entities": {},
+                "sentiment": None,
+                "priority": None,
+                "response": None,
+                "escalation_needed": False,
+                "attempts": 0,
+                "conversation_history": [],
+                "satisfactory": None,
+                "similar_past_issues": [],
+                "knowledge_base_entry": None,
+                "memory_loaded": False
+            })
+
+
+def run_warmup(state: WarmupState = warmup_state) -> WarmupState:
+    """Warm every per-worker service; safe to call from a background thread"""
+    from .api import get_graph, get_session_graph
+
+    steps = [
+        ("graph", lambda: (get_graph(), get_session_graph())),
+        ("memory", lambda: get_agent_memory().load()),
+        ("tokenizer", lambda: count_tokens("warm-up")),
+        ("llm", _prewarm_llm_connection),
+        ("dry_run", _dry_run),
+    ]
+
+    state.set_status("warming")
+    try:
+        for name, step in steps:
+            start = time.perf_counter()
+            step()
+            state.record_step(name, time.perf_counter() - start)
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+        state.set_status("failed", str(e))
+        return state
+
+    state.set_status("ready")
+    return state
@@ -0,0 +1,215 @@
+"""
+Write-behind queue in front of the memory store.
+
+``save_memory`` is the last graph node, so with a synchronous store every
+client waited for ``save_conversation`` and ``update_knowledge_base`` (a
+full JSON file rewrite each) before getting its answer. WriteBehindMemory
+wraps either backend: writes are queued and applied by one background
+thread, and the node returns as soon as they are queued.
+
+Ordering: writes are queued per user (knowledge-base updates share one
+queue) and a single consumer applies them in order. Each round takes every
+queued write, up to ``max_batch``, and applies it inside ``backend.batch()``,
+so a burst of writes costs one JSON rewrite or one SQLite commit.
+
+Consistency: reads of a user's profile, similar issues or summary first
+wait for that user's queued writes (their queue jumps ahead), so a user
+always sees their own writes; KB reads wait for queued KB updates and the
+stats wait for everything. Entity-index lookups span users and do not
+wait: other users' conversations show up once applied (the write lag). When ``max_pending`` writes are queued, writers
+block until the consumer catches up rather than dropping anything.
+
+Durability (MEMORY_FSYNC): ``batch`` fsyncs once per applied batch,
+``always`` applies and fsyncs every write on its own, ``off`` leaves
+flushing to the OS. ``close()`` (application shutdown) and an atexit hook
+drain the queue before the process exits.
+"""
+
+import atexit
+import contextlib
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from .metrics import metrics
+
+queue_depth = metrics.gauge("memory_write_queue_depth", "Memory writes waiting for the write-behind thread")
+write_lag_seconds = metrics.histogram("memory_write_lag_seconds", "Time from queueing a memory write to applying it",
+                                      [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5])
+write_failures_total = metrics.counter("memory_write_failures_total", "Queued memory writes that raised, by method")
+
+# Queue key for knowledge-base updates (user queues are keyed by user id)
+KB_QUEUE = None
+
+# (method name, args, queued at)
+Write = Tuple[str, tuple, float]
+
+
+class WriteBehindMemory:
+    def __init__(self, backend: Any, max_pending: int = 10000, max_batch: int = 256):
+        self.backend = backend
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending: Dict[Optional[str], Deque[Write]] = {}
+        self._ready: Deque[Optional[str]] = deque()
+        self._in_flight: Set[Optional[str]] = set()
+        self._size = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.applied = 0
+        self.failed = 0
+        self.batches = 0
+        atexit.register(self.drain)
+
+    def __getattr__(self, name):
+        # load, is_loaded, memory, import_json, ... go straight to the backend
+        return getattr(self.__dict__["backend"], name)
+
+    # Queueing
+    def _enqueue(self, key: Optional[str], method: str, *args: Any):
+        with self._cond:
+            if not self._closed:
+                while self._size >= self.max_pending:
+                    self._cond.wait()
+                if key not in self._pending:
+                    self._pending[key] = deque()
+                    self._ready.append(key)
+                self._pending[key].append((method, args, time.perf_counter()))
+                self._size += 1
+                queue_depth.set(self._size)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+                    self._thread.start()
+                self._cond.notify_all()
+                return
+        # After shutdown, write through
+        getattr(self.backend, method)(*args)
+
+    def _wait_for(self, key: Optional[str]):
+        """Block until every queued write for key has been applied"""
+        with self._cond:
+            if key in self._pending and key not in self._in_flight:
+                # Let the reader's queue go next
+                self._ready.remove(key)
+                self._ready.appendleft(key)
+            while key in self._pending or key in self._in_flight:
+                self._cond.wait()
+
+    def drain(self):
+        """Block until every queued write has been applied"""
+        with self._cond:
+            while self._size:
+                self._cond.wait()
+
+    # Consumer
+    def _take_batch(self) -> List[Write]:
+        batch: List[Write] = []
+        while self._ready and len(batch) < self.max_batch:
+            key = self._ready.popleft()
+            queue = self._pending[key]
+            while queue and len(batch) < self.max_batch:
+                batch.append(queue.popleft())
+            if queue:
+                self._ready.appendleft(key)  # the rest goes in the next batch, still in order
+            else:
+                del self._pending[key]
+            self._in_flight.add(key)
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._closed:
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                batch = self._take_batch()
+            try:
+                self._apply(batch)
+            except Exception as e:
+                # Persisting the batch failed; keep consuming so readers and shutdown never hang
+                write_failures_total.inc(method="batch")
+                print(f"Write-behind batch of {len(batch)} failed: {e}")
+            with self._cond:
+                self._size -= len(batch)
+                self._in_flight.clear()
+                queue_depth.set(self._size)
+                self._cond.notify_all()
+
+    def _apply(self, batch: List[Write]):
+        batch_writes = getattr(self.backend, "batch", None)
+        with batch_writes() if batch_writes else contextlib.nullcontext():
+            for method, args, _ in batch:
+                try:
+                    getattr(self.backend, method)(*args)
+                    self.applied += 1
+                except Exception as e:
+                    self.failed += 1
+                    write_failures_total.inc(method=method)
+                    print(f"Write-behind {method} failed: {e}")
+        now = time.perf_counter()
+        for _, _, queued_at in batch:
+            write_lag_seconds.observe(now - queued_at)
+        self.batches += 1
+
+    # Writes
+    def save_conversation(self, user_id: str, conversation_data: Dict[str, Any]):
+        self._enqueue(user_id, "save_conversation", user_id, conversation_data)
+
+    def update_knowledge_base(self, categories: List[str], query: str, resolution: str):
+        self._enqueue(KB_QUEUE, "update_knowledge_base", categories, query, resolution)
+
+    # Reads (see the user's own queued writes)
+    def get_user_profile(self, user_id: str) -> Dict[str, Any]:
+        self._wait_for(user_id)
+        return self.backend.get_user_profile(user_id)
+
+    def find_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        self._wait_for(user_id)
+        return self.backend.find_user_profile(user_id)
+
+    def find_similar_past_issues(self, user_id: str, current_query: str, categories: List[str]) -> List[Dict[str, Any]]:
+        self._wait_for(user_id)
+        return self.backend.find_similar_past_issues(user_id, current_query, categories)
+
+    def get_user_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        self._wait_for(user_id)
+        return self.backend.get_user_summary(user_id)
+
+    def get_knowledge_base_entry(self, categories: List[str]) -> Optional[Dict[str, Any]]:
+        self._wait_for(KB_QUEUE)
+        return self.backend.get_knowledge_base_entry(categories)
+
+    def knowledge_tables(self) -> Dict[str, Dict[str, Any]]:
+        self._wait_for(KB_QUEUE)
+        return self.backend.knowledge_tables()
+
+    def get_memory_stats(self) -> Dict[str, Any]:
+        self.drain()
+        return self.backend.get_memory_stats()
+
+    def get_system_stats(self) -> Dict[str, Any]:
+        self.drain()
+        return self.backend.get_system_stats()
+
+    def get_queue_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"pending": self._size, "applied": self.applied, "failed": self.failed, "batches": self.batches}
+
+    # Lifecycle
+    def flush(self):
+        """Apply every queued write, then flush the backend"""
+        self.drain()
+        self.backend.flush()
+
+    def close(self):
+        """Apply every queued write, stop the consumer and close the backend (graceful shutdown)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.backend.close()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for priority-aware admission control
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.admission import AdmissionController, Overloaded, classify_priority, shed_total
+from src.container import container
+
+
+def test_classify_priority():
+    assert classify_priority("Where is my order?") == "normal"
+    assert classify_priority("This is UNACCEPTABLE, fix it now") == "high"
+    assert classify_priority("Refund me!! Now!!") == "high"
+    assert classify_priority("WHY HAS NOBODY ANSWERED MY EMAIL") == "high"
+    assert classify_priority("Just wondering about your newsletter") == "low"
+    assert classify_priority("Where is my order?", {"tier": "enterprise"}) == "high"
+    assert classify_priority("This is urgent", {"priority": "low"}) == "low"
+    assert classify_priority("Where is my order?", {"priority": "bogus"}) == "normal"
+    print("✓ Priority pre-classifier")
+
+
+def _admission_order(controller, arrivals):
+    """Hold every slot, queue `arrivals` behind it, then let them run one after another"""
+    async def run():
+        blockers = [await controller.acquire("normal", "blocker") for _ in range(controller.max_concurrency)]
+        order = []
+
+        async def waiter(name, priority, tenant):
+            ticket = await controller.acquire(priority, tenant)
+            order.append(name)
+            await asyncio.sleep(0)
+            controller.release(ticket)
+
+        tasks = [asyncio.create_task(waiter(*arrival)) for arrival in arrivals]
+        await asyncio.sleep(0)
+        for blocker in blockers:
+            controller.release(blocker)
+        await asyncio.gather(*tasks)
+        return order
+    return asyncio.run(run())
+
+
+def test_weighted_fair_order():
+    """High priority jumps bulk traffic; tenants at the same priority are interleaved"""
+    controller = AdmissionController(max_concurrency=1, max_wait_ms=60000)
+    arrivals = [(f"bulk{i}", "low", "bulk") for i in range(4)] + [("vip", "high", "acme")]
+    order = _admission_order(controller, arrivals)
+    assert order.index("vip") == 0, order
+
+    controller = AdmissionController(max_concurrency=1, max_wait_ms=60000)
+    arrivals = [(f"a{i}", "normal", "a") for i in range(3)] + [(f"b{i}", "normal", "b") for i in range(3)]
+    order = _admission_order(controller, arrivals)
+    assert order == ["a0", "b0", "a1", "b1", "a2", "b2"], order
+    assert controller.running == 0 and controller.get_stats()["queued"] == 0
+    print(f"✓ Weighted-fair admission order {order}")
+
+
+def test_load_shedding():
+    """A full queue or a long wait estimate sheds with a Retry-After hint; low priority first"""
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, max_wait_ms=2000, initial_service_ms=1000)
+        ticket = await controller.acquire()
+        waiters = [asyncio.create_task(controller.acquire("high")) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        # A new low flow starts level with the first waiter: (1 + 1) x 1000 ms is over low's 0.3 x 2 s
+        controller.max_queue = 10
+        try:
+            await controller.acquire("low")
+            raise AssertionError("low priority should be shed")
+        except Overloaded as e:
+            assert e.reason == "wait_estimate" and e.retry_after == 2
+
+        controller.max_queue = 2
+        try:
+            await controller.acquire("high")
+            raise AssertionError("full queue should shed")
+        except Overloaded as e:
+            assert e.reason == "queue_full" and e.retry_after >= 1
+
+        controller.release(ticket)
+        for waiter in waiters:
+            controller.release(await waiter)
+        return controller
+    controller = asyncio.run(run())
+    assert controller.shed == 2 and controller.running == 0
+    assert shed_total.value(priority="low", reason="wait_estimate") >= 1
+    print("✓ Overload sheds with Retry-After")
+
+
+def test_api_returns_429():
+    """The query endpoint maps shedding to 429 + Retry-After and exports queue metrics"""
+    from src.api import app
+
+    async def saturate():
+        controller = AdmissionController(max_concurrency=1, max_queue=0)
+        await controller.acquire()
+        return controller
+    controller = asyncio.run(saturate())
+
+    with container.override(admission=controller):
+        client = TestClient(app)
+        response = client.post("/api/v1/support/query", json={"query": "Where is my order?"})
+        assert response.status_code == 429, response.text
+        assert int(response.headers["Retry-After"]) >= 1
+
+        text = client.get("/metrics").text
+        assert "# TYPE admission_queue_depth gauge" in text
+        assert 'admission_shed_total{priority="normal",reason="queue_full"}' in text
+    print("✓ API sheds with 429 and exposes admission metrics")
+
+
+if __name__ == "__main__":
+    test_classify_priority()
+    test_weighted_fair_order()
+    test_load_shedding()
+    test_api_returns_429()
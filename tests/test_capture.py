@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for traffic capture and replay
+"""
+
+import sys
+import os
+import argparse
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.capture import RecordedResponder, TrafficRecorder, load_capture, prompt_digest, replaying, sanitize_text
+from src.container import container
+from src.fake_llm import FakeChatModel, default_responder
+from src.memory import AgentMemory
+from src.ratelimit import RateLimiter
+
+QUERY_URL = "/api/v1/support/query"
+
+
+def _responder(prompt: str) -> str:
+    if prompt.startswith("Evaluate"):
+        return default_responder(prompt)
+    return "We refunded order 12345; questions to billing@example.com or +1 (555) 010-9999."
+
+
+def test_sanitize():
+    text = ("I'm jane.doe+shop@mail.example.com, card 4111 1111 1111 1111, SSN 123-45-6789, "
+            "call +44 20 7946 0958 about order 12345 placed 2025-03-01")
+    assert sanitize_text(text) == ("I'm <email>, card <card>, SSN <ssn>, call <phone> "
+                                   "about order 12345 placed 2025-03-01")
+    print("✓ Emails, card numbers, SSNs and phone numbers are masked; order numbers are kept")
+
+
+def _capture_traffic(tmp: str) -> str:
+    from src.api import app
+
+    path = os.path.join(tmp, "capture.ndjson")
+    services = {"llm": FakeChatModel(responder=_responder), "memory": AgentMemory(os.path.join(tmp, "memory.json")),
+                "rate_limiter": RateLimiter(limits={}), "traffic_recorder": TrafficRecorder(path, salt="s3cret")}
+    os.environ["TRAFFIC_CAPTURE"] = "on"
+    try:
+        with container.override(**services):
+            client = TestClient(app)
+            first = client.post(QUERY_URL, json={"query": "I was charged twice for order 12345, email me at a@b.co",
+                                                 "user_id": "alice", "metadata": {"tier": "premium", "note": "x"}})
+            client.post(QUERY_URL, json={"query": "Any update on that refund?", "user_id": "alice",
+                                         "conversation_id": first.json()["conversation_id"]})
+            client.post(QUERY_URL, json={"query": "hi", "user_id": "bob"})
+            assert client.post(QUERY_URL, json={"query": "x", "metadata": {"deadline_ms": -1}}).status_code == 422
+    finally:
+        os.environ.pop("TRAFFIC_CAPTURE")
+    return path
+
+
+def test_capture_records_sanitized_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        records = load_capture(_capture_traffic(tmp))
+        assert [record["status"] for record in records] == [200, 200, 200, 422]
+        first, follow_up, greeting, rejected = records
+
+        assert first["request"]["query"] == "I was charged twice for order 12345, email me at <email>"
+        assert first["request"]["user_id"].startswith("u_") and "alice" not in str(first)
+        assert first["request"]["user_id"] == follow_up["request"]["user_id"] != greeting["request"]["user_id"]
+        assert first["request"]["metadata"] == {"tier": "premium"}, "unknown metadata is dropped"
+        assert follow_up["request"]["follow_up"] and follow_up["request"]["conversation"] == \
+            first["request"]["conversation"]
+        assert first["result"]["route"] == "billing_handler" and first["result"]["categories"] == ["billing"]
+        assert greeting["result"]["route"] == "fast_path:greeting" and greeting["llm"] == []
+        assert rejected["result"] is None and rejected["request"]["user_id"] is None
+
+        kinds = [call["kind"] for call in first["llm"]]
+        assert kinds == ["answer", "validation"], kinds
+        assert first["llm"][0]["response"] == "We refunded order 12345; questions to <email> or <phone>."
+        assert all(len(call["prompt_sha"]) == 32 and "prompt" not in call for call in first["llm"])
+    print("✓ Queries, results and LLM calls are captured with ids pseudonymized and PII masked")
+
+
+def test_recorded_responder():
+    record = {"llm": [
+        {"kind": "answer", "prompt_sha": prompt_digest("Handle billing support query: refund"), "latency_ms": 0,
+         "response": "recorded answer"},
+        {"kind": "validation", "prompt_sha": "0" * 32, "latency_ms": 0, "response": "no"},
+        {"kind": "answer", "prompt_sha": "1" * 32, "latency_ms": 0, "response": "second answer"},
+    ]}
+    responder = RecordedResponder(latency=False)
+    with replaying(record) as cursor:
+        # The prompt changed between builds: fall back to the next recorded call of that kind
+        assert responder("Handle billing support query: refund (new wording)") == "recorded answer"
+        assert responder("Handle billing support query: refund") == "second answer"
+        assert responder("Evaluate if the following response adequately addresses it") == "no"
+        assert responder("Improve this customer support response.") == default_responder(
+            "Improve this customer support response.")
+        assert cursor.stats == {"exact": 0, "in_order": 3, "unrecorded": 1}
+    with replaying(record) as cursor:
+        assert responder("Handle billing support query: refund") == "recorded answer"
+        assert cursor.stats["exact"] == 1
+    print("✓ Replayed LLM calls get the recorded response by prompt, then by call order")
+
+
+def test_replay_reports_no_differences_on_the_same_build():
+    from benchmarks.replay_traffic import replay, report
+
+    with tempfile.TemporaryDirectory() as tmp:
+        records = load_capture(_capture_traffic(tmp))
+        for target in ("api", "graph"):
+            args = argparse.Namespace(url=None, target=target, speed=0, concurrency=4, llm_latency="none")
+            results = replay(args, records)
+            assert len(results) == len(records)
+            ok = [result for result in results if result["status"] == 200]
+            assert len(ok) == (3 if target == "api" else 4), target
+            changed = report(records, results, examples=0)
+            # The graph has no request validation, so only the query the API rejected comes out differently
+            expected = 0 if target == "api" else 1
+            assert all(changed[field] == expected for field in ("status", "route", "categories",
+                                                                "escalation_needed")), (target, changed)
+            assert changed["fast_path"] == changed["missing"] == 0
+    print("✓ Replaying a capture on the same build reproduces its routes and categories")
+
+
+if __name__ == "__main__":
+    test_sanitize()
+    test_capture_records_sanitized_queries()
+    test_recorded_responder()
+    test_replay_reports_no_differences_on_the_same_build()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script for token-budgeted prompt context and rolling user summaries
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.context import build_memory_context, count_tokens, render_user_summary, truncate_tokens
+from src.fake_llm import FakeChatModel, default_responder
+from src.memory import AgentMemory
+from src.memory_sqlite import SQLiteAgentMemory
+from src.sessions import first_turn_state
+
+
+def _conversation(i, resolved=True):
+    return {"query": f"My refund for order {10000 + i} is late", "categories": ["billing"],
+            "entities": {"order_id": str(10000 + i)}, "sentiment": "negative" if i % 4 == 0 else "neutral",
+            "response": "We have issued your refund. " * 20, "satisfactory": resolved}
+
+
+def test_truncation():
+    text = "word " * 500
+    cut = truncate_tokens(text, 50)
+    assert count_tokens(cut) <= 50 and cut.endswith("…")
+    assert truncate_tokens("short text", 50) == "short text"
+    print("✓ Truncation respects the token limit")
+
+
+def test_context_stays_in_budget():
+    """Long answers and many turns are packed into the budget, most relevant first"""
+    state = {
+        "query": "Where is the refund for my damaged blender?",
+        "conversation_history": [{"role": "assistant" if i % 2 else "user", "content": "blah " * 300}
+                                 for i in range(40)],
+        "similar_past_issues": [
+            {"query": "Refund for damaged blender", "resolution": True, "response": "Refund issued in 5 days. " * 50},
+            {"query": "Password reset", "resolution": True, "response": "Use the reset link. " * 50},
+        ],
+        "knowledge_base_entry": {"resolutions": ["Long resolution text. " * 200] * 10},
+        "user_summary": {"conversations": 80, "resolved": 70, "categories": {"billing": 60}, "negative": 3,
+                         "order_ids": ["12345"], "recent_unresolved": [], "recent_resolved": []},
+    }
+    for budget in (100, 300, 800):
+        context = build_memory_context(state, budget, max_item_tokens=80)
+        assert count_tokens(context) <= budget, (budget, count_tokens(context))
+    context = build_memory_context(state, 300, max_item_tokens=80)
+    assert "80 past conversations" in context
+    assert "damaged blender" in context and "Password reset" not in context.split("Known resolutions")[0] \
+        or context.index("damaged blender") < context.index("Password reset")
+    print("✓ Context packed into the token budget")
+
+
+def test_rolling_summary():
+    """Summaries cover every conversation even after history is capped at 50"""
+    with tempfile.TemporaryDirectory() as tmp:
+        json_memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        sqlite_memory = SQLiteAgentMemory(os.path.join(tmp, "memory.db"))
+        for memory in (json_memory, sqlite_memory):
+            for i in range(60):
+                memory.save_conversation("alice", _conversation(i, resolved=i != 59))
+            summary = memory.get_user_summary("alice")
+            assert summary["conversations"] == 60 and summary["resolved"] == 59
+            assert summary["negative"] == 15 and summary["order_ids"][-1] == "10059"
+            assert summary["recent_unresolved"] == ["My refund for order 10059 is late"]
+            assert len(memory.get_user_profile("alice")["conversation_history"]) == 50
+            assert memory.get_user_summary("nobody") is None
+        sqlite_memory.close()
+        assert "nobody" not in json_memory.memory["user_profiles"]
+        assert json_memory.get_user_summary("alice") == sqlite_memory.get_user_summary("alice")
+    assert "60 past conversations (59 resolved)" in render_user_summary(summary)
+    print("✓ Rolling summaries maintained incrementally")
+
+
+def test_handler_prompt_uses_summary():
+    from src.graph import create_graph
+
+    prompts = []
+
+    def respond(prompt):
+        prompts.append(prompt)
+        return default_responder(prompt)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        for i in range(5):
+            memory.save_conversation("bob", _conversation(i))
+        with container.override(llm=FakeChatModel(responder=respond), memory=memory):
+            create_graph().invoke(first_turn_state("I was charged twice for order 10003", "bob"))
+    handler_prompt = next(p for p in prompts if p.startswith("Handle "))
+    assert "Customer summary" in handler_prompt and "5 past conversations" in handler_prompt
+    print("✓ Handler prompts include the user summary")
+
+
+if __name__ == "__main__":
+    test_truncation()
+    test_context_stays_in_budget()
+    test_rolling_summary()
+    test_handler_prompt_uses_summary()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for request deadlines and graceful degradation
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.deadline import DeadlineExceeded, degraded_answer, llm_timeout
+from src.fake_llm import FakeChatModel
+from src.memory import AgentMemory
+
+
+def test_llm_timeout_from_budget():
+    """LLM calls get the remaining budget as timeout and are refused when it is too small"""
+    import time
+    assert llm_timeout({}) is None
+    timeout = llm_timeout({"deadline_at": time.time() + 5})
+    assert 4.5 < timeout <= 5
+    try:
+        llm_timeout({"deadline_at": time.time() + 0.1})
+        assert False, "should refuse the call"
+    except DeadlineExceeded:
+        pass
+    print("✓ LLM timeouts derived from the deadline")
+
+
+def test_degraded_answer_preference():
+    """KB resolutions beat similar past answers, which beat the canned reply"""
+    kb = {"knowledge_base_entry": {"resolutions": ["old", "Refund issued within 5 days"]}}
+    similar = {"similar_past_issues": [{"resolution": False, "response": "unresolved"},
+                                       {"resolution": True, "response": "Reset your password"}]}
+    assert degraded_answer(kb, "canned") == ("Refund issued within 5 days", "kb_answer")
+    assert degraded_answer(similar, "canned") == ("Reset your password", "cached_answer")
+    assert degraded_answer({}, "canned") == ("canned", "canned_fallback")
+    print("✓ Degraded answers prefer KB and past resolutions")
+
+
+def test_api_reports_degradations():
+    """A tight deadline skips slow LLM work and the response lists what was skipped"""
+    from fastapi.testclient import TestClient
+    from src.api import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        memory.update_knowledge_base(["billing", "technical"], "billing issue", "We refunded the duplicate charge.")
+        model = FakeChatModel(latency_ms=200)
+        previous = os.environ.get("DEADLINE_MIN_LLM_MS")
+        os.environ["DEADLINE_MIN_LLM_MS"] = "100"
+        try:
+            with container.override(llm=model, memory=memory):
+                client = TestClient(app)
+                tight = client.post("/api/v1/support/query", json={
+                    "query": "I have a billing issue with order 12345", "metadata": {"deadline_ms": 150}}).json()
+                invalid = client.post("/api/v1/support/query", json={
+                    "query": "Hello", "metadata": {"deadline_ms": -1}})
+        finally:
+            if previous is None:
+                os.environ.pop("DEADLINE_MIN_LLM_MS", None)
+            else:
+                os.environ["DEADLINE_MIN_LLM_MS"] = previous
+
+    assert set(tight["degradations"]) >= {"skipped_validation"}, tight
+    assert {"kb_answer", "canned_fallback"} & set(tight["degradations"]), tight
+    assert tight["processing_time"] < 1.0
+    assert model.stats["timeouts"] + model.stats["calls"] <= 2
+    assert invalid.status_code == 422 and invalid.json()["error"] is True
+    print(f"✓ Tight deadline degraded with {tight['degradations']}")
+
+
+if __name__ == "__main__":
+    test_llm_timeout_from_budget()
+    test_degraded_answer_preference()
+    test_api_reports_degradations()
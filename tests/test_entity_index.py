@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test script for the cross-conversation entity index (lookup by order_id)
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.container import container
+from src.fake_llm import FakeChatModel, default_responder
+from src.memory import ENTITY_INDEX_MAX_REFS, AgentMemory
+from src.memory_sqlite import SQLiteAgentMemory
+from src.ratelimit import RateLimiter
+from src.sessions import first_turn_state
+
+ADMIN = {"X-Admin-Token": "s3cret"}
+
+
+def _conversation(query, order_id=None, resolved=True):
+    return {"query": query, "categories": ["billing"], "entities": {"order_id": order_id} if order_id else {},
+            "response": f"Answer to: {query}", "satisfactory": resolved}
+
+
+def _stores(tmp):
+    return [AgentMemory(os.path.join(tmp, "memory.json")), SQLiteAgentMemory(os.path.join(tmp, "memory.db"))]
+
+
+def test_lookup_across_users():
+    with tempfile.TemporaryDirectory() as tmp:
+        for memory in _stores(tmp):
+            memory.save_conversation("alice", _conversation("Refund for order 12345?", "12345"))
+            memory.save_conversation("bob", _conversation("Order 12345 arrived damaged", "12345", resolved=False))
+            memory.save_conversation("bob", _conversation("What are your opening hours?"))
+
+            refs = memory.find_conversations_by_entity("order_id", "12345")
+            assert [(ref["user_id"], ref["query"]) for ref in refs] == \
+                [("bob", "Order 12345 arrived damaged"), ("alice", "Refund for order 12345?")]
+            assert refs[1]["resolution"] is True and refs[1]["response"] == "Answer to: Refund for order 12345?"
+            assert memory.find_conversations_by_entity("order_id", "99999") == []
+            assert memory.get_system_stats()["indexed_entities"] == 1
+            memory.close()
+    print("✓ Conversations about an order are found across users, newest first")
+
+
+def test_index_is_bounded_per_entity():
+    with tempfile.TemporaryDirectory() as tmp:
+        for memory in _stores(tmp):
+            for i in range(ENTITY_INDEX_MAX_REFS + 5):
+                memory.save_conversation(f"user_{i}", _conversation(f"question {i} about order 555", "555"))
+            refs = memory.find_conversations_by_entity("order_id", "555", limit=ENTITY_INDEX_MAX_REFS + 5)
+            assert len(refs) == ENTITY_INDEX_MAX_REFS
+            assert refs[0]["query"] == f"question {ENTITY_INDEX_MAX_REFS + 4} about order 555"
+            memory.close()
+    print(f"✓ The index keeps the newest {ENTITY_INDEX_MAX_REFS} references per entity")
+
+
+def test_existing_stores_are_backfilled():
+    """Memory written before the index existed is indexed on load"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = AgentMemory(os.path.join(tmp, "memory.json"))
+        legacy.save_conversation("alice", _conversation("Refund for order 12345?", "12345"))
+        legacy.close()
+        with open(legacy.storage_path) as f:
+            data = json.load(f)
+        del data["entity_index"]
+        with open(legacy.storage_path, "w") as f:
+            json.dump(data, f)
+        assert AgentMemory(str(legacy.storage_path)).find_conversations_by_entity("order_id", "12345")
+
+        imported = SQLiteAgentMemory(os.path.join(tmp, "imported.db"))
+        imported.import_json(str(legacy.storage_path))
+        assert imported.find_conversations_by_entity("order_id", "12345")[0]["user_id"] == "alice"
+        imported.close()
+
+        # A database from before the entity_refs table: index rows dropped, version reset
+        path = os.path.join(tmp, "imported.db")
+        conn = sqlite3.connect(path)
+        conn.execute("DELETE FROM entity_refs")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+        reopened = SQLiteAgentMemory(path)
+        assert reopened.find_conversations_by_entity("order_id", "12345")[0]["user_id"] == "alice"
+        reopened.close()
+    print("✓ Stores written before the index existed are backfilled")
+
+
+def test_handlers_see_linked_accounts_conversations_about_the_order():
+    """Only linked accounts share answers; other accounts' conversations are resolution hints"""
+    from src.deadline import CACHED_ANSWER
+    from src.graph import create_graph
+
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return default_responder(prompt)
+
+    answer = "We refunded the duplicate charge on order 12345 on Monday."
+    with tempfile.TemporaryDirectory() as tmp:
+        for memory in _stores(tmp):
+            memory.save_conversation("household_a", {
+                **_conversation("I was charged twice for order 12345", "12345"), "response": answer})
+            with container.override(llm=FakeChatModel(responder=responder), memory=memory):
+                graph = create_graph()
+                prompts.clear()
+                unlinked = graph.invoke(first_turn_state("Where is the refund for order 12345?", "stranger"))
+                assert [set(ref) for ref in unlinked["related_conversations"]] == \
+                    [{"timestamp", "categories", "resolution"}]
+                assert "charged twice" not in prompts[0] and answer not in prompts[0]
+                assert "Another account raised this order about billing (resolved)" in prompts[0]
+                # A deadline too short for the LLM must not hand out the other account's answer
+                rushed = graph.invoke(first_turn_state("Where is the refund for order 12345?", "stranger",
+                                                       deadline_ms=500))
+                assert rushed["response"] != answer and CACHED_ANSWER not in rushed["degradations"]
+
+                memory.link_accounts("household_a", "household_b")
+                assert memory.linked_accounts("household_b") == ["household_a"]
+                prompts.clear()
+                linked = graph.invoke(first_turn_state("Where is the refund for order 12345?", "household_b"))
+                # The stranger's two conversations above stay hints
+                assert [ref.get("user_id") for ref in linked["related_conversations"]] == [None, None, "household_a"]
+                assert answer in prompts[0]
+                memory.link_accounts("household_a", "household_b", linked=False)
+                assert memory.linked_accounts("household_a") == []
+            memory.close()
+    print("✓ Handlers get linked accounts' resolutions for the same order, and only hints from others")
+
+
+def test_entity_endpoint():
+    from src.api import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        memory.save_conversation("alice", _conversation("Refund for order 12345?", "12345"))
+        with container.override(memory=memory, llm=FakeChatModel(), rate_limiter=RateLimiter(limits={})):
+            client = TestClient(app)
+            assert client.get("/api/v1/support/entities/order_id/12345", headers=ADMIN).status_code == 403, \
+                "no ADMIN_TOKEN configured"
+            os.environ["ADMIN_TOKEN"] = "s3cret"
+            try:
+                assert client.get("/api/v1/support/entities/order_id/12345").status_code == 403
+                assert client.get("/api/v1/support/entities/order_id/12345",
+                                  headers={"X-Admin-Token": "guess"}).status_code == 403
+                body = client.get("/api/v1/support/entities/order_id/12345", headers=ADMIN).json()
+                assert body["entity_type"] == "order_id" and body["value"] == "12345"
+                assert [c["user_id"] for c in body["conversations"]] == ["alice"]
+                assert client.get("/api/v1/support/entities/order_id/404", headers=ADMIN).json()["conversations"] == []
+                assert client.get("/api/v1/support/entities/order_id/12345?limit=0", headers=ADMIN).status_code == 422
+                assert client.get("/api/v1/support/stats").json()["indexed_entities"] == 1
+
+                links = "/api/v1/admin/accounts/alice/links/bob"
+                assert client.put(links).status_code == 403
+                assert client.put(links, headers=ADMIN).json() == {"user_id": "alice", "linked_accounts": ["bob"]}
+                assert memory.linked_accounts("bob") == ["alice"]
+                assert client.delete(links, headers=ADMIN).json()["linked_accounts"] == []
+                assert client.put("/api/v1/admin/accounts/alice/links/alice", headers=ADMIN).status_code == 422
+            finally:
+                os.environ.pop("ADMIN_TOKEN")
+    print("✓ /entities/{type}/{value} returns the indexed conversations to admins only")
+
+
+if __name__ == "__main__":
+    test_lookup_across_users()
+    test_index_is_bounded_per_entity()
+    test_existing_stores_are_backfilled()
+    test_handlers_see_linked_accounts_conversations_about_the_order()
+    test_entity_endpoint()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the zero-LLM greeting/FAQ fast path
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.fastpath import compile_intents, load_intents, match_fast_path
+from src.memory import AgentMemory
+from src.predictor import predict_categories
+from src.sessions import first_turn_state
+
+
+def test_matching():
+    cases = {
+        "hi": "greeting",
+        "Good morning!!": "greeting",
+        "Thank you so much for your help.": "thanks",
+        "bye": "goodbye",
+        "What's your return policy?": "return_policy",
+        "hi, my app keeps crashing": None,
+        "thanks but it is still broken": None,
+        "Where is my order": None,  # no order id to fill the template
+    }
+    for query, intent in cases.items():
+        match = match_fast_path(query)
+        assert (match and match.intent) == intent, (query, match)
+
+    match = match_fast_path("Where is my order 12345?", {"order_id": "12345"})
+    assert match.intent == "order_status" and "order 12345" in match.response
+    # Filed under the category the classifier gives order-tracking queries, so history and stats agree
+    assert match.categories == (predict_categories("Where is my order 12345?") or ["general"])
+    print("✓ Whole-query intents matched, partial matches rejected")
+
+
+def test_custom_faq_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "faq.json")
+        with open(path, "w") as f:
+            json.dump([{"name": "shipping_cost", "patterns": [r"how much is shipping"],
+                        "template": "Shipping is free over $50.", "categories": ["billing"]}], f)
+        os.environ["FASTPATH_FAQ_PATH"] = path
+        try:
+            intents = load_intents()
+        finally:
+            del os.environ["FASTPATH_FAQ_PATH"]
+    assert match_fast_path("How much is shipping?", intents=intents).response == "Shipping is free over $50."
+    assert match_fast_path("hello", intents=intents).intent == "greeting"
+    assert match_fast_path("hello", intents=compile_intents([])) is None
+    print("✓ FAQ intents load from FASTPATH_FAQ_PATH")
+
+
+def test_graph_skips_llm_but_saves_memory():
+    from src.graph import create_graph
+
+    llm = FakeChatModel()
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        with container.override(llm=llm, memory=memory):
+            result = create_graph().invoke(first_turn_state("Hello!", "greeter"))
+        assert result["fast_path"] == "greeting" and result["satisfactory"] and result["llm_calls"] == 0
+        assert result["categories"] == ["general"]
+        assert llm.stats["calls"] == 0
+        assert memory.get_user_profile("greeter")["total_interactions"] == 1
+        assert memory.memory["knowledge_base"] == {}, "templated answers are not KB resolutions"
+    print("✓ Fast-path turns skip every LLM node and still save memory")
+
+
+def test_fast_path_can_be_disabled():
+    from src.graph import create_graph
+
+    llm = FakeChatModel()
+    os.environ["FASTPATH"] = "off"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            with container.override(llm=llm, memory=AgentMemory(os.path.join(tmp, "memory.json"))):
+                result = create_graph().invoke(first_turn_state("hi", "greeter"))
+    finally:
+        del os.environ["FASTPATH"]
+    assert not result.get("fast_path") and llm.stats["calls"] > 0
+    print("✓ FASTPATH=off sends greetings through the LLM path")
+
+
+if __name__ == "__main__":
+    test_matching()
+    test_custom_faq_file()
+    test_graph_skips_llm_but_saves_memory()
+    test_fast_path_can_be_disabled()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script for the paginated conversation history endpoint
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.compression import negotiate_encoding
+from src.container import container
+from src.memory import AgentMemory
+
+HISTORY_URL = "/api/v1/support/history/{}"
+
+
+def _memory_with_history(tmp, conversations=25):
+    memory = AgentMemory(os.path.join(tmp, "memory.json"))
+    for i in range(conversations):
+        memory.save_conversation("alice", {"query": f"question {i}", "categories": ["billing"], "entities": {},
+                                           "response": f"A long answer about billing number {i}. " * 10,
+                                           "satisfactory": True})
+    return memory
+
+
+def _client():
+    from src.api import app
+    return TestClient(app)
+
+
+def test_cursor_pagination_and_projection():
+    with tempfile.TemporaryDirectory() as tmp:
+        with container.override(memory=_memory_with_history(tmp)):
+            client = _client()
+            queries, cursor = [], None
+            while True:
+                params = {"limit": 10, "fields": "query,timestamp"}
+                if cursor:
+                    params["cursor"] = cursor
+                data = client.get(HISTORY_URL.format("alice"), params=params).json()
+                assert all(set(c) == {"query", "timestamp"} for c in data["recent_conversations"])
+                queries = [c["query"] for c in data["recent_conversations"]] + queries
+                cursor = data["next_cursor"]
+                if cursor is None:
+                    break
+            assert queries == [f"question {i}" for i in range(25)]
+
+            assert client.get(HISTORY_URL.format("alice"), params={"fields": "password"}).status_code == 400
+            assert client.get(HISTORY_URL.format("alice"), params={"cursor": "yesterday"}).status_code == 400
+    print("✓ Cursor pagination walks the whole history with projected fields")
+
+
+def test_etag_and_compression():
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = _memory_with_history(tmp)
+        with container.override(memory=memory):
+            client = _client()
+            response = client.get(HISTORY_URL.format("alice"), headers={"Accept-Encoding": "gzip"})
+            assert response.status_code == 200 and response.headers["content-encoding"] == "gzip"
+            assert "Accept-Encoding" in response.headers["vary"] and response.json()["user_id"] == "alice"
+            etag = response.headers["etag"]
+
+            unchanged = client.get(HISTORY_URL.format("alice"), headers={"If-None-Match": etag})
+            assert unchanged.status_code == 304 and not unchanged.content
+
+            memory.save_conversation("alice", {"query": "one more", "categories": [], "satisfactory": False})
+            changed = client.get(HISTORY_URL.format("alice"), headers={"If-None-Match": etag})
+            assert changed.status_code == 200 and changed.json()["recent_conversations"][-1]["query"] == "one more"
+
+    assert negotiate_encoding("br;q=1.0, gzip;q=0.5") in ("br", "gzip")
+    assert negotiate_encoding("identity") is None and negotiate_encoding("gzip;q=0") is None
+    print("✓ ETag revalidation and gzip compression")
+
+
+def test_unknown_user_is_not_created():
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = _memory_with_history(tmp, conversations=1)
+        with container.override(memory=memory):
+            assert _client().get(HISTORY_URL.format("nobody")).status_code == 404
+        assert "nobody" not in memory.memory["user_profiles"]
+    print("✓ Unknown users get 404 without creating a profile")
+
+
+if __name__ == "__main__":
+    test_cursor_pagination_and_projection()
+    test_etag_and_compression()
+    test_unknown_user_is_not_created()
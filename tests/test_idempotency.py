@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test script for Idempotency-Key handling on the support query endpoint
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from fastapi.testclient import TestClient
+
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.idempotency import (
+    DONE, PENDING, IdempotencyConflict, IdempotencyManager, InMemoryIdempotencyStore, SQLiteIdempotencyStore,
+)
+from src.memory import AgentMemory
+from src.ratelimit import RateLimiter
+
+QUERY_URL = "/api/v1/support/query"
+BODY = {"query": "I was charged twice for order 12345", "user_id": "retrier"}
+
+
+def _services(tmp, llm, manager=None):
+    return {"llm": llm, "memory": AgentMemory(os.path.join(tmp, "memory.json")),
+            "rate_limiter": RateLimiter(limits={}), "idempotency": manager or IdempotencyManager()}
+
+
+def test_stores():
+    with tempfile.TemporaryDirectory() as tmp:
+        for store in (InMemoryIdempotencyStore(max_keys=3), SQLiteIdempotencyStore(os.path.join(tmp, "keys.db"), 3)):
+            assert store.claim("a", "fp", now=100.0, pending_ttl=10) is None
+            assert store.claim("a", "fp", now=101.0, pending_ttl=10).status == PENDING
+            store.complete("a", "fp", '{"ok": true}', expires_at=200.0)
+            assert store.get("a", now=150.0) == ("fp", DONE, '{"ok": true}', 200.0)
+            assert store.get("a", now=250.0) is None  # expired
+
+            assert store.claim("b", "fp", now=100.0, pending_ttl=10) is None
+            store.release("b")
+            assert store.claim("b", "fp", now=100.0, pending_ttl=10) is None, "released keys can be claimed again"
+        # Bounded: the oldest key goes first
+        memory_store = InMemoryIdempotencyStore(max_keys=3)
+        for key in "abcd":
+            memory_store.claim(key, "fp", now=100.0, pending_ttl=10)
+        assert len(memory_store) == 3 and memory_store.get("a", now=100.0) is None
+    print("✓ In-memory and SQLite stores claim, complete, expire and evict keys")
+
+
+def test_retry_replays_stored_response():
+    from src.api import app
+
+    llm = FakeChatModel()
+    with tempfile.TemporaryDirectory() as tmp:
+        services = _services(tmp, llm)
+        with container.override(**services):
+            client = TestClient(app)
+            headers = {"Idempotency-Key": "retry-1"}
+            first = client.post(QUERY_URL, json=BODY, headers=headers)
+            calls = llm.stats["calls"]
+            second = client.post(QUERY_URL, json=BODY, headers=headers)
+            assert first.status_code == second.status_code == 200
+            assert second.json() == first.json() and second.headers["idempotent-replayed"] == "true"
+            assert "idempotent-replayed" not in first.headers
+            assert llm.stats["calls"] == calls, "the replay made no LLM calls"
+            assert services["memory"].get_user_profile("retrier")["total_interactions"] == 1
+
+            changed = client.post(QUERY_URL, json={**BODY, "query": "something else"}, headers=headers)
+            assert changed.status_code == 422
+            assert client.post(QUERY_URL, json=BODY, headers={"Idempotency-Key": ""}).status_code == 400
+            # Without a key every request runs
+            client.post(QUERY_URL, json=BODY)
+            assert services["memory"].get_user_profile("retrier")["total_interactions"] == 2
+    print("✓ Retries with the same key replay the stored response")
+
+
+def test_concurrent_duplicates_attach():
+    from src.api import app
+
+    llm = FakeChatModel(latency_ms=50)
+    with tempfile.TemporaryDirectory() as tmp:
+        services = _services(tmp, llm)
+
+        async def burst():
+            with container.override(**services):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await asyncio.gather(*(client.post(QUERY_URL, json=BODY, headers={"Idempotency-Key": "dup"})
+                                                  for _ in range(3)))
+
+        responses = asyncio.run(burst())
+        assert all(r.status_code == 200 for r in responses)
+        assert len({r.json()["conversation_id"] for r in responses}) == 1
+        assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 2
+        assert llm.stats["calls"] == 2, "one handler call and one validation for three requests"
+        assert services["memory"].get_user_profile("retrier")["total_interactions"] == 1
+    print("✓ Concurrent duplicates attach to the running execution")
+
+
+def test_other_worker_pending_key():
+    """A key claimed by another worker that never finishes ends in 409; a finished one replays"""
+    async def run(store, complete_after=None):
+        manager = IdempotencyManager(store, wait_timeout=0.3)
+        store.claim("k", "fp", now=time.time(), pending_ttl=60)
+        if complete_after is not None:
+            async def finish():
+                await asyncio.sleep(complete_after)
+                store.complete("k", "fp", '{"answer": 42}', expires_at=float("inf"))
+            asyncio.get_running_loop().create_task(finish())
+
+        async def never_runs():
+            raise AssertionError("the key is owned by another worker")
+        return await manager.run("k", "fp", never_runs)
+
+    try:
+        asyncio.run(run(InMemoryIdempotencyStore()))
+        raise AssertionError("expected a conflict")
+    except IdempotencyConflict as e:
+        assert e.retry_after >= 1
+    assert asyncio.run(run(InMemoryIdempotencyStore(), complete_after=0.1)) == ({"answer": 42}, "replayed")
+    print("✓ Keys pending on another worker are awaited, then 409")
+
+
+def test_locked_store_does_not_block_the_event_loop():
+    """Claims waiting on another worker's SQLite write lock run off the event loop"""
+    import sqlite3
+
+    async def run(store, ticks):
+        async def tick():
+            while True:
+                await asyncio.sleep(0.01)
+                ticks.append(time.perf_counter())
+
+        async def execute():
+            return {"answer": 42}
+
+        ticker = asyncio.get_running_loop().create_task(tick())
+        result = await IdempotencyManager(store).run("k", "fp", execute)
+        ticker.cancel()
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteIdempotencyStore(os.path.join(tmp, "idempotency.db"))
+        other_worker = sqlite3.connect(os.path.join(tmp, "idempotency.db"), isolation_level=None,
+                                       check_same_thread=False)
+        other_worker.execute("BEGIN IMMEDIATE")
+        releaser = threading.Timer(0.3, other_worker.execute, ("COMMIT",))
+        releaser.start()
+        ticks = []
+        assert asyncio.run(run(store, ticks)) == ({"answer": 42}, "executed")
+        releaser.join()
+        other_worker.close()
+        assert len(ticks) >= 10 and max(b - a for a, b in zip(ticks, ticks[1:])) < 0.15, ticks
+    print("✓ A store waiting on another worker's lock leaves the event loop free")
+
+
+if __name__ == "__main__":
+    test_stores()
+    test_retry_replays_stored_response()
+    test_concurrent_duplicates_attach()
+    test_other_worker_pending_key()
+    test_locked_store_does_not_block_the_event_loop()
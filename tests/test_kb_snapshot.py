@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for the memory-mapped knowledge snapshot shared by workers
+"""
+
+import sys
+import os
+import fcntl
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.kb_snapshot import KnowledgeSnapshot, SnapshotCompiler, SnapshotMemory, SnapshotReader, write_snapshot
+from src.memory import AgentMemory, build_agent_memory, match_knowledge_base
+from src.memory_sqlite import SQLiteAgentMemory
+
+KNOWLEDGE_BASE = {
+    "billing": {"categories": ["billing"], "resolutions": ["Refund issued"]},
+    "returns_technical": {"categories": ["returns", "technical"], "resolutions": ["Replacement sent"]},
+    "general_technical": {"categories": ["general", "technical"], "resolutions": ["Cleared cache"]},
+    "ümlaut": {"categories": ["ümlaut"], "resolutions": ["Unicode keys work"]},
+}
+
+
+def test_lookups_match_the_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "kb.snapshot")
+        write_snapshot(path, {"knowledge_base": KNOWLEDGE_BASE}, generation=7)
+        snapshot = KnowledgeSnapshot(path)
+        assert snapshot.generation == 7 and len(snapshot) == 4
+        # Exact, partial (first in insertion order, like the store) and missing
+        for categories in (["billing"], ["technical", "returns"], ["technical"], ["ümlaut"], ["shipping"], []):
+            assert snapshot.knowledge_base_entry(categories) == match_knowledge_base(KNOWLEDGE_BASE, categories), \
+                categories
+        assert snapshot.get("knowledge_base", "missing") is None
+    print("✓ Snapshot lookups match the store's knowledge-base matching")
+
+
+def test_compiler_swaps_versions_atomically():
+    with tempfile.TemporaryDirectory() as tmp:
+        for memory in (AgentMemory(os.path.join(tmp, "memory.json")), SQLiteAgentMemory(os.path.join(tmp, "memory.db"))):
+            path = os.path.join(tmp, f"{type(memory).__name__}.snapshot")
+            compiler = SnapshotCompiler(memory, path)
+            reader = SnapshotReader(path, check_interval=0)
+            snapshot_memory = SnapshotMemory(memory, reader)
+            memory.update_knowledge_base(["billing"], "charged twice", "Refund issued")
+
+            assert snapshot_memory.get_knowledge_base_entry(["billing"])["resolutions"] == ["Refund issued"], \
+                "reads fall through to the store until a snapshot exists"
+            assert compiler.compile() == "written"
+            first = reader.current()
+            assert first.generation == 1
+            assert compiler.compile() == "unchanged"
+
+            memory.update_knowledge_base(["billing"], "late refund", "Refund expedited")
+            assert snapshot_memory.get_knowledge_base_entry(["billing"])["resolutions"] == ["Refund issued"], \
+                "the snapshot lags the store until the next compile"
+            assert compiler.compile() == "written"
+            assert snapshot_memory.get_knowledge_base_entry(["billing"])["resolutions"] == \
+                ["Refund issued", "Refund expedited"]
+            assert reader.current().generation == 2
+            # A reader still holding the previous version keeps a consistent view
+            assert first.knowledge_base_entry(["billing"])["resolutions"] == ["Refund issued"]
+            memory.close()
+    print("✓ New snapshot versions replace the old one without disturbing its readers")
+
+
+class CountingMemory(AgentMemory):
+    reads = 0
+
+    def knowledge_tables(self):
+        self.reads += 1
+        return super().knowledge_tables()
+
+
+def test_one_compiler_per_host():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "kb.snapshot")
+        compiler = SnapshotCompiler(AgentMemory(os.path.join(tmp, "memory.json")), path)
+        with open(f"{path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            assert compiler.compile() == "busy" and not os.path.exists(path)
+        assert compiler.compile() == "written"
+        compiler.stop()
+
+        # Workers' compilers: the first to start keeps the lock, the others never read the store
+        workers = [SnapshotCompiler(CountingMemory(os.path.join(tmp, f"worker{i}.json")), path, interval=0.01)
+                   for i in range(3)]
+        for worker in workers:
+            worker.start()
+        time.sleep(0.2)
+        leader, *standby = sorted(workers, key=lambda worker: not worker.elected)
+        assert leader.elected and leader.memory.reads > 1
+        assert not any(worker.elected or worker.memory.reads for worker in standby)
+        leader.stop()
+        time.sleep(0.2)
+        assert sum(worker.elected for worker in standby) == 1, "a standby takes over when the leader stops"
+        for worker in standby:
+            worker.stop()
+    print("✓ One elected compiler per host reads the store; standbys take over when it exits")
+
+
+def test_enabled_from_settings():
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = {"KB_SNAPSHOT": "on", "KB_SNAPSHOT_PATH": os.path.join(tmp, "kb.snapshot"),
+                    "MEMORY_PATH": os.path.join(tmp, "memory.json"), "MEMORY_BACKEND": "json"}
+        previous = {name: os.environ.get(name) for name in settings}
+        os.environ.update(settings)
+        try:
+            memory = build_agent_memory()
+            assert isinstance(memory, SnapshotMemory)
+            memory.compiler.stop()
+            with container.override(memory=memory):
+                memory.update_knowledge_base(["returns"], "return shoes", "Label emailed")
+                memory.compiler.compile()
+                memory.reader.check_interval = 0
+                assert memory.get_knowledge_base_entry(["returns"])["resolutions"] == ["Label emailed"]
+                assert memory.reader.current() is not None
+            memory.close()
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    print("✓ KB_SNAPSHOT=on serves KB reads from the snapshot")
+
+
+if __name__ == "__main__":
+    test_lookups_match_the_store()
+    test_compiler_swaps_versions_atomically()
+    test_one_compiler_per_host()
+    test_enabled_from_settings()
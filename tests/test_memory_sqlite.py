@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for the SQLite memory backend shared by production workers
+"""
+
+import sys
+import os
+import json
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.memory import AgentMemory
+from src.memory_sqlite import SQLiteAgentMemory
+
+CONVERSATION = {
+    "query": "I have a billing issue with order 12345",
+    "categories": ["billing"],
+    "entities": {"order_id": "12345"},
+    "response": "I've checked your order. Here's how to resolve it...",
+    "satisfactory": True
+}
+
+
+def _save_from_process(path: str, worker: int, count: int):
+    memory = SQLiteAgentMemory(path)
+    for i in range(count):
+        memory.save_conversation(f"user_{i % 3}", dict(CONVERSATION, query=f"worker {worker} query {i}"))
+    memory.close()
+
+
+def _strip_timestamps(value):
+    if isinstance(value, list):
+        return [_strip_timestamps(item) for item in value]
+    if isinstance(value, dict):
+        return {k: _strip_timestamps(v) for k, v in value.items() if k not in ("timestamp", "created_at", "last_updated")}
+    return value
+
+
+def test_sqlite_matches_json_interface():
+    """Both backends give the same answers for the same conversation"""
+    with tempfile.TemporaryDirectory() as tmp:
+        json_memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        sqlite_memory = SQLiteAgentMemory(os.path.join(tmp, "memory.db"))
+        for memory in (json_memory, sqlite_memory):
+            memory.save_conversation("alice", CONVERSATION)
+            memory.update_knowledge_base(["billing"], CONVERSATION["query"], CONVERSATION["response"])
+
+        for method, args in [
+            ("find_similar_past_issues", ("alice", "billing problem with order 12345", ["billing"])),
+            ("get_knowledge_base_entry", (["billing"],)),
+            ("get_system_stats", ()),
+        ]:
+            assert _strip_timestamps(getattr(json_memory, method)(*args)) == \
+                _strip_timestamps(getattr(sqlite_memory, method)(*args)), method
+        sqlite_memory.close()
+    print("✓ SQLite backend matches the JSON backend")
+
+
+def test_sqlite_concurrent_writers():
+    """Threads and processes writing at once never lose an update"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memory.db")
+        memory = SQLiteAgentMemory(path)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: memory.save_conversation(f"user_{i % 3}", CONVERSATION), range(40)))
+
+        ctx = multiprocessing.get_context("spawn")
+        processes = [ctx.Process(target=_save_from_process, args=(path, worker, 10)) for worker in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+
+        stats = memory.get_system_stats()
+        assert stats["total_conversations"] == 70, stats
+        assert stats["resolved_issues"] == 70, stats
+        assert sum(memory.get_user_profile(f"user_{i}")["total_interactions"] for i in range(3)) == 70
+        memory.close()
+    print("✓ Concurrent thread and process writers are all recorded")
+
+
+def test_import_json():
+    """A JSON memory file migrates into SQLite unchanged"""
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "memory.json")
+        json_memory = AgentMemory(json_path)
+        json_memory.save_conversation("bob", CONVERSATION)
+
+        sqlite_memory = SQLiteAgentMemory(os.path.join(tmp, "memory.db"))
+        sqlite_memory.import_json(json_path)
+        assert sqlite_memory.get_system_stats() == json_memory.get_system_stats()
+        with open(json_path) as f:
+            assert sqlite_memory.get_user_profile("bob") == json.load(f)["user_profiles"]["bob"]
+        sqlite_memory.close()
+    print("✓ JSON memory imported into SQLite")
+
+
+if __name__ == "__main__":
+    test_sqlite_matches_json_interface()
+    test_sqlite_concurrent_writers()
+    test_import_json()
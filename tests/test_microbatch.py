@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for micro-batched validation judgments
+"""
+
+import sys
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.fake_llm import FakeChatModel, default_responder
+from src.memory import AgentMemory
+from src.microbatch import ValidationBatcher
+from src.ratelimit import meter_llm_usage
+from src.refinement import build_batch_validation_prompt, parse_batch_validation
+from src.sessions import first_turn_state
+
+
+def _judge_concurrently(batcher, llm, count):
+    def one(i):
+        with container.override(llm=llm), meter_llm_usage() as usage:
+            return batcher.judge(f"question {i}", f"answer {i}", lambda: "alone"), usage.tokens
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        results = [pool.submit(one, 0).result()]  # the first of a burst has nobody to wait for
+        return results + list(pool.map(one, range(1, count)))
+
+
+def test_prompt_round_trip():
+    prompt = build_batch_validation_prompt([("Where is my refund?", "Tomorrow."), ("hi", "Hello!")])
+    assert "[1]\nQuery: Where is my refund?" in prompt and "[2]\nQuery: hi" in prompt
+    assert parse_batch_validation("1: yes\n2: no: says nothing about the refund", 2) == \
+        ["yes", "no: says nothing about the refund"]
+    assert parse_batch_validation("[2] yes\n1) no: wrong order", 2) == ["no: wrong order", "yes"]
+    assert parse_batch_validation("I think they are all fine", 2) == [None, None]
+    print("✓ Batched prompts and per-item verdicts round-trip")
+
+
+def test_concurrent_judgments_share_calls():
+    llm = FakeChatModel(latency_ms=30)
+    batcher = ValidationBatcher(max_items=4, max_wait_ms=50)
+    results = _judge_concurrently(batcher, llm, 9)[1:]
+    assert [verdict for verdict, _ in results] == ["yes"] * 8
+    assert llm.stats["calls"] <= 3, llm.stats
+    assert all(tokens > 0 for _, tokens in results), "every request is charged its share"
+    print(f"✓ 8 judgments took {llm.stats['calls']} provider calls")
+
+
+def test_lone_judgment_does_not_wait():
+    llm = FakeChatModel()
+    batcher = ValidationBatcher(max_wait_ms=500)
+    start = time.perf_counter()
+    with container.override(llm=llm):
+        assert batcher.judge("q", "r", lambda: "alone") == "alone"  # judged individually by the caller
+    assert time.perf_counter() - start < 0.2 and llm.stats["calls"] == 0
+    print("✓ A lone judgment skips the batching window")
+
+
+def test_unparseable_items_fall_back():
+    def responder(prompt):
+        if "one line per item" in prompt:
+            return "1: no: too vague"  # every other line missing
+        return default_responder(prompt)
+
+    llm = FakeChatModel(latency_ms=30, responder=responder)
+    results = _judge_concurrently(ValidationBatcher(max_items=3, max_wait_ms=50), llm, 4)[1:]
+    verdicts = sorted(verdict for verdict, _ in results)
+    assert verdicts == ["alone", "alone", "no: too vague"], verdicts
+    print("✓ Items missing from the batched reply are left to individual calls")
+
+
+def test_graph_with_batching():
+    from src.graph import create_graph
+
+    llm = FakeChatModel(latency_ms=20)
+    queries = ["I was charged twice for order 12345", "My app keeps crashing",
+               "I want to return the shoes from order 98765"] * 4
+    os.environ["VALIDATION_BATCHING"] = "on"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            services = {"llm": llm, "memory": AgentMemory(os.path.join(tmp, "memory.json")),
+                        "validation_batcher": ValidationBatcher(max_wait_ms=30)}
+            app = create_graph()
+
+            def one(i):
+                with container.override(**services):
+                    return app.invoke(first_turn_state(queries[i], f"user_{i}"))
+
+            with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+                results = list(pool.map(one, range(len(queries))))
+    finally:
+        del os.environ["VALIDATION_BATCHING"]
+    assert all(r["satisfactory"] and r["llm_calls"] == 2 for r in results)
+    # One handler call each, and fewer validation calls than requests
+    assert llm.stats["calls"] < 2 * len(queries), llm.stats
+    print(f"✓ {len(queries)} concurrent queries used {llm.stats['calls']} provider calls")
+
+
+if __name__ == "__main__":
+    test_prompt_round_trip()
+    test_concurrent_judgments_share_calls()
+    test_lone_judgment_does_not_wait()
+    test_unparseable_items_fall_back()
+    test_graph_with_batching()
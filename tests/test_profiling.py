@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test script for on-demand request profiling and memory snapshots
+"""
+
+import sys
+import os
+import io
+import pstats
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.memory import AgentMemory
+from src.profiling import Profiler, build_profiler
+from src.ratelimit import RateLimiter
+
+QUERY_URL = "/api/v1/support/query"
+PROFILES_URL = "/api/v1/admin/profiles"
+ADMIN = {"X-Admin-Token": "s3cret"}
+BODY = {"query": "I was charged twice for order 12345", "user_id": "profiled"}
+
+
+@contextmanager
+def _admin_token(token="s3cret"):
+    os.environ["ADMIN_TOKEN"] = token
+    try:
+        yield
+    finally:
+        os.environ.pop("ADMIN_TOKEN")
+
+
+def _services(tmp, profiler, llm=None):
+    return {"llm": llm or FakeChatModel(), "memory": AgentMemory(os.path.join(tmp, "memory.json")),
+            "rate_limiter": RateLimiter(limits={}), "profiler": profiler}
+
+
+def test_disabled_by_default():
+    from src.api import app
+
+    os.environ["PROFILING"] = "on"
+    try:
+        assert not build_profiler().enabled, "no admin token, no profiling"
+    finally:
+        os.environ.pop("PROFILING")
+    profiler = Profiler(enabled=False)
+    assert profiler.for_request({"x-profile": "cprofile", "x-admin-token": "s3cret"}) is None
+    with tempfile.TemporaryDirectory() as tmp, _admin_token():
+        with container.override(**_services(tmp, profiler)):
+            client = TestClient(app)
+            response = client.post(QUERY_URL, json=BODY, headers={"X-Profile": "cprofile", **ADMIN})
+            assert response.status_code == 200 and response.json()["profile_id"] is None
+            assert client.get(PROFILES_URL, headers=ADMIN).status_code == 404
+    print("✓ Profiling is off (and admin endpoints 404) unless enabled with an admin token")
+
+
+def test_profile_one_request_by_header():
+    from src.api import app
+
+    with tempfile.TemporaryDirectory() as tmp, _admin_token():
+        profiler = Profiler(os.path.join(tmp, "profiles"))
+        with container.override(**_services(tmp, profiler)):
+            client = TestClient(app)
+            unprofiled = client.post(QUERY_URL, json=BODY, headers={"X-Profile": "cprofile", "X-Admin-Token": "nope"})
+            assert unprofiled.status_code == 200 and unprofiled.json()["profile_id"] is None
+            assert client.post(QUERY_URL, json=BODY, headers={"X-Profile": "perf", **ADMIN}).status_code == 422
+
+            profile_id = client.post(QUERY_URL, json=BODY, headers={"X-Profile": "cprofile", **ADMIN}).json()["profile_id"]
+            assert profile_id
+
+            assert client.get(PROFILES_URL).status_code == 403
+            assert client.get(PROFILES_URL, headers={"X-Admin-Token": "nope"}).status_code == 403
+            listed = client.get(PROFILES_URL, headers=ADMIN).json()["profiles"]
+            assert [(p["profile_id"], p["mode"], p["trigger"], p["route"]) for p in listed] == \
+                [(profile_id, "cprofile", "header", "billing_handler")]
+
+            download = client.get(f"{PROFILES_URL}/{profile_id}", headers=ADMIN)
+            assert download.status_code == 200 and ".pstats" in download.headers["content-disposition"]
+            path = os.path.join(tmp, "downloaded.pstats")
+            with open(path, "wb") as f:
+                f.write(download.content)
+            functions = {(os.path.basename(filename), name) for filename, _, name in pstats.Stats(path, stream=io.StringIO()).stats}
+            assert ("nodes.py", "classify_query") in functions and ("memory.py", "get_user_profile") in functions
+
+            text = client.get(f"{PROFILES_URL}/{profile_id}?format=text", headers=ADMIN).text
+            assert "Ordered by: cumulative time" in text
+            assert client.get(f"{PROFILES_URL}/..%2Fmemory", headers=ADMIN).status_code == 404
+    print("✓ X-Profile with the admin token profiles one query; the .pstats file downloads")
+
+
+def test_sampled_requests_give_collapsed_stacks():
+    from src.api import app
+
+    with tempfile.TemporaryDirectory() as tmp, _admin_token():
+        profiler = Profiler(os.path.join(tmp, "profiles"), sample_rate=1.0,
+                            sample_interval=0.002, max_profiles=2)
+        with container.override(**_services(tmp, profiler, FakeChatModel(latency_ms=20))):
+            client = TestClient(app)
+            ids = [client.post(QUERY_URL, json=BODY).json()["profile_id"] for _ in range(3)]
+            listed = client.get(PROFILES_URL, headers=ADMIN).json()["profiles"]
+            assert [p["profile_id"] for p in listed] == ids[:0:-1], "the oldest profile is pruned"
+            assert listed[0]["trigger"] == "sampled" and listed[0]["samples"] > 0
+
+            collapsed = client.get(f"{PROFILES_URL}/{ids[-1]}", headers=ADMIN).text
+            stacks = [line.rpartition(" ") for line in collapsed.splitlines()]
+            assert all(count.isdigit() for _, _, count in stacks)
+            assert any("(src/nodes.py:" in stack and "(src/fake_llm.py:" in stack for stack, _, _ in stacks)
+            assert all(stack.startswith("Pregel.invoke (") for stack, _, _ in stacks), "pool plumbing is cut off"
+            text = client.get(f"{PROFILES_URL}/{ids[-1]}?format=text", headers=ADMIN).text
+            assert "functions by own samples" in text
+    print("✓ Sampled queries are profiled by stack sampling into collapsed flamegraph stacks")
+
+
+def test_tracemalloc_snapshot_of_memory_store():
+    from src.api import app
+
+    assert not tracemalloc.is_tracing()
+    with tempfile.TemporaryDirectory() as tmp, _admin_token():
+        profiler = Profiler(os.path.join(tmp, "profiles"))
+        with container.override(**_services(tmp, profiler)):
+            client = TestClient(app)
+            url = "/api/v1/admin/tracemalloc"
+            assert client.post(f"{url}/snapshot", headers=ADMIN).status_code == 409
+            try:
+                assert client.post(f"{url}/start?frames=10", headers=ADMIN).json()["started"]
+                memory = AgentMemory(os.path.join(tmp, "traced.json"))
+                for i in range(20):
+                    memory.save_conversation(f"user{i}", {"query": f"Where is order {10000 + i}?" * 5,
+                                                          "categories": ["billing"], "resolution": "resolved"})
+                snapshot = client.post(f"{url}/snapshot", headers=ADMIN).json()
+                assert snapshot["mode"] == "tracemalloc" and snapshot["scope"] == "memory"
+                assert snapshot["traced_kb"] > 0 and snapshot["change_kb"] is None
+                assert all(os.path.basename(entry["line"].rsplit(":", 1)[0]) in
+                           ("memory.py", "memory_sqlite.py", "write_behind.py", "kb_snapshot.py")
+                           for entry in snapshot["top"])
+                again = client.post(f"{url}/snapshot", headers=ADMIN).json()
+                assert again["change_kb"] is not None
+
+                download = client.get(f"{PROFILES_URL}/{snapshot['profile_id']}", headers=ADMIN)
+                path = os.path.join(tmp, "downloaded.tracemalloc")
+                with open(path, "wb") as f:
+                    f.write(download.content)
+                assert tracemalloc.Snapshot.load(path).traces
+                assert "KB in" in client.get(f"{PROFILES_URL}/{snapshot['profile_id']}?format=text",
+                                            headers=ADMIN).text
+            finally:
+                client.post(f"{url}/stop", headers=ADMIN)
+            assert not tracemalloc.is_tracing()
+    print("✓ tracemalloc snapshots attribute memory to memory-store lines and download")
+
+
+if __name__ == "__main__":
+    test_disabled_by_default()
+    test_profile_one_request_by_header()
+    test_sampled_requests_give_collapsed_stacks()
+    test_tracemalloc_snapshot_of_memory_store()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test script for per-user / per-tenant rate limiting
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.memory import AgentMemory
+from src.ratelimit import InMemoryRateLimitStore, RateLimited, RateLimiter, SQLiteRateLimitStore, count_llm_tokens
+
+
+def _rejected(limiter, **kwargs):
+    try:
+        limiter.check(**kwargs)
+    except RateLimited as e:
+        return e
+    return None
+
+
+def test_token_bucket():
+    """Burst up front, then the sustained rate; a denied query spends no tokens"""
+    limiter = RateLimiter(limits={"user": (60, 3), "tenant": (600, 100)})
+    for _ in range(3):
+        assert _rejected(limiter, user="alice", tenant="acme", now=1000.0) is None
+    e = _rejected(limiter, user="alice", tenant="acme", now=1000.0)
+    assert e.scope == "user" and e.identity == "alice" and e.retry_after == 1
+    # The rejected query didn't spend a tenant token
+    assert limiter.store._buckets["tenant:acme"][0] == 97.0
+
+    # 60/min refills one token per second
+    assert _rejected(limiter, user="alice", now=1001.0) is None
+    assert _rejected(limiter, user="alice", now=1001.0) is not None
+
+    # Other users are unaffected
+    assert _rejected(limiter, user="bob", tenant="acme", now=1001.0) is None
+    print("✓ Token buckets enforce burst and sustained rates")
+
+
+def test_api_key_scope_hides_key():
+    limiter = RateLimiter(limits={"key": (60, 1)})
+    assert _rejected(limiter, api_key="sk-secret", now=0.0) is None
+    e = _rejected(limiter, api_key="sk-secret", now=0.0)
+    assert e.scope == "key" and "sk-secret" not in str(e)
+    print("✓ API keys are limited without being echoed")
+
+
+def test_llm_token_budget():
+    """A tenant past its hourly LLM-token budget is rejected until the next hour"""
+    limiter = RateLimiter(limits={}, llm_tokens_per_hour=1000)
+    limiter.charge_llm_tokens("acme", 600, now=3600 * 5 + 10)
+    assert _rejected(limiter, tenant="acme", now=3600 * 5 + 20) is None
+    limiter.charge_llm_tokens("acme", 500, now=3600 * 5 + 30)
+    e = _rejected(limiter, tenant="acme", now=3600 * 5 + 40)
+    assert e.scope == "llm_tokens" and e.retry_after == 3600 - 40
+    assert _rejected(limiter, tenant="other", now=3600 * 5 + 40) is None
+    assert _rejected(limiter, tenant="acme", now=3600 * 6) is None
+
+    class Reply:
+        content = "x" * 40
+        usage_metadata = None
+    assert count_llm_tokens("y" * 40, Reply()) == 20
+    Reply.usage_metadata = {"total_tokens": 7}
+    assert count_llm_tokens("y" * 40, Reply()) == 7
+    print("✓ Hourly per-tenant LLM-token budget")
+
+
+def test_sqlite_store_shared():
+    """Two limiters on one SQLite file (as two workers) share the same buckets"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ratelimit.db")
+        workers = [RateLimiter(SQLiteRateLimitStore(path), limits={"user": (60, 4)}, llm_tokens_per_hour=100)
+                   for _ in range(2)]
+        allowed = sum(_rejected(workers[i % 2], user="alice", now=50.0) is None for i in range(8))
+        assert allowed == 4
+
+        workers[0].charge_llm_tokens("acme", 60, now=50.0)
+        workers[1].charge_llm_tokens("acme", 60, now=50.0)
+        assert _rejected(workers[0], tenant="acme", now=60.0).scope == "llm_tokens"
+    print("✓ SQLite backend shares limits across workers")
+
+
+def test_refilled_buckets_are_dropped():
+    """Buckets for client-chosen identities don't pile up once they have refilled"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for store in (InMemoryRateLimitStore(), SQLiteRateLimitStore(os.path.join(tmp, "ratelimit.db"))):
+            limiter = RateLimiter(store=store, limits={"user": (60, 3)})  # refills from empty in 3 s
+            for i in range(SQLiteRateLimitStore.PRUNE_EVERY):
+                limiter.check(user=f"spoofed{i}", now=0.0)
+            assert store.bucket_count() == SQLiteRateLimitStore.PRUNE_EVERY
+            for _ in range(3):
+                limiter.check(user="busy", now=2.0)
+            assert _rejected(limiter, user="busy", now=2.0).scope == "user"
+            for i in range(SQLiteRateLimitStore.PRUNE_EVERY):
+                limiter.check(user="other", now=3.0 + i)
+            assert store.bucket_count() <= 2, "refilled buckets are dropped"
+            # A dropped bucket reads as full: the whole burst is available again
+            for _ in range(3):
+                assert _rejected(limiter, user="spoofed0", now=200.0) is None
+            assert _rejected(limiter, user="spoofed0", now=200.0) is not None
+    print("✓ Buckets that have refilled to capacity are evicted in memory and in SQLite")
+
+
+def test_api_returns_429():
+    from src.api import app
+
+    limiter = RateLimiter(limits={"user": (1, 1)}, llm_tokens_per_hour=10 ** 6)
+    with tempfile.TemporaryDirectory() as tmp:
+        with container.override(rate_limiter=limiter, llm=FakeChatModel(),
+                                memory=AgentMemory(os.path.join(tmp, "memory.json"))):
+            client = TestClient(app)
+            body = {"query": "My order 12345 arrived damaged, what can I do?", "user_id": "flooder",
+                    "metadata": {"tenant_id": "acme"}}
+            assert client.post("/api/v1/support/query", json=body).status_code == 200
+            response = client.post("/api/v1/support/query", json=body)
+            assert response.status_code == 429
+            assert "flooder" in response.json()["message"]
+            assert int(response.headers["Retry-After"]) >= 1
+            assert limiter.store.usage("acme", int(time.time() // 3600)) > 0
+            assert 'ratelimit_rejections_total{scope="user"}' in client.get("/metrics").text
+    print("✓ API rejects floods with 429 and charges tenant LLM tokens")
+
+
+def test_locked_store_does_not_block_the_event_loop():
+    """A check waiting on another worker's SQLite write lock leaves the worker answering other requests"""
+    import asyncio
+    import sqlite3
+    import threading
+    import httpx
+    from src.api import app
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            query = asyncio.ensure_future(client.post("/api/v1/support/query",
+                                                      json={"query": "Where is order 12345?", "user_id": "waiter"}))
+            await asyncio.sleep(0.05)
+            assert (await client.get("/health")).status_code == 200
+            assert time.perf_counter() - start < 0.3, "the event loop was blocked"
+            assert not query.done()
+            assert (await query).status_code == 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ratelimit.db")
+        limiter = RateLimiter(SQLiteRateLimitStore(path), limits={"user": (60, 5)})
+        other_worker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        other_worker.execute("BEGIN IMMEDIATE")
+        releaser = threading.Timer(0.5, other_worker.execute, ("COMMIT",))
+        releaser.start()
+        with container.override(rate_limiter=limiter, llm=FakeChatModel(),
+                                memory=AgentMemory(os.path.join(tmp, "memory.json"))):
+            asyncio.run(scenario())
+        releaser.join()
+        other_worker.close()
+    print("✓ Rate-limit checks waiting on the SQLite lock run off the event loop")
+
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_api_key_scope_hides_key()
+    test_llm_token_budget()
+    test_sqlite_store_shared()
+    test_refilled_buckets_are_dropped()
+    test_api_returns_429()
+    test_locked_store_does_not_block_the_event_loop()
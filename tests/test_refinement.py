@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for the bounded validate/refine loop
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.fake_llm import FakeChatModel, default_responder
+from src.memory import AgentMemory
+from src.metrics import MetricsRegistry, record_query
+from src.refinement import parse_validation
+from src.sessions import first_turn_state
+
+
+def _rejecting_responder(rejections):
+    """Reject the first `rejections` validations with a critique, then accept"""
+    seen = {"validations": 0, "prompts": []}
+
+    def respond(prompt):
+        seen["prompts"].append(prompt)
+        if "Is this response satisfactory?" in prompt:
+            seen["validations"] += 1
+            return "yes" if seen["validations"] > rejections else "no: it never mentions the refund timeline"
+        return default_responder(prompt)
+    return respond, seen
+
+
+def _run(responder, latency_ms=0.0, **env):
+    from src.graph import create_graph
+
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update({key: str(value) for key, value in env.items()})
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            model = FakeChatModel(responder=responder, latency_ms=latency_ms)
+            with container.override(llm=model, memory=AgentMemory(os.path.join(tmp, "memory.json"))):
+                result = create_graph().invoke(first_turn_state("I want a refund for order 12345", "refund_user"))
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return result, model.stats["calls"]
+
+
+def test_parse_validation():
+    assert parse_validation("yes") == (True, None)
+    assert parse_validation("No: missing the order status") == (False, "missing the order status")
+    assert parse_validation("no")[0] is False and parse_validation("no")[1]
+    print("✓ Validator verdicts parsed")
+
+
+def test_critique_drives_refinement():
+    """A rejected answer is rewritten with the critique and then accepted"""
+    responder, seen = _rejecting_responder(rejections=1)
+    result, calls = _run(responder)
+
+    assert result["satisfactory"] is True and not result["escalation_needed"]
+    assert result["attempts"] == 2
+    assert result["llm_calls"] == calls
+    refine_prompts = [p for p in seen["prompts"] if p.startswith("Improve this customer support response")]
+    assert len(refine_prompts) == 1 and "refund timeline" in refine_prompts[0]
+    print(f"✓ Refined once after critique ({calls} LLM calls)")
+
+
+def test_budgets_escalate():
+    """Persistent rejection escalates once the attempt or LLM-call budget runs out"""
+    responder, _ = _rejecting_responder(rejections=100)
+    result, calls = _run(responder)
+    assert result["escalation_needed"] and result["escalation_reason"] == "attempts"
+    assert result["attempts"] == 3
+
+    result, calls = _run(responder, REQUEST_LLM_CALL_BUDGET=4)
+    assert result["escalation_needed"] and result["escalation_reason"] == "llm_calls"
+    assert calls <= 4
+
+    # 2 calls x 40 ms (billing handler, validation) leave less than two 30 ms calls of a 110 ms budget
+    result, _ = _run(responder, latency_ms=40, REQUEST_LATENCY_BUDGET_MS=110, DEADLINE_MIN_LLM_MS=30)
+    assert result["escalation_reason"] == "latency" and result["attempts"] == 1
+    print("✓ Exhausted budgets escalate")
+
+
+def test_metrics_render():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("attempts", "Attempts", [1, 2, 3])
+    histogram.observe(2)
+    histogram.observe(5)
+    text = registry.render()
+    assert 'attempts_bucket{le="1"} 0' in text
+    assert 'attempts_bucket{le="2"} 1' in text
+    assert 'attempts_bucket{le="+Inf"} 2' in text
+    assert "attempts_count 2" in text
+
+    from src.metrics import escalations_total
+    before = escalations_total.value(reason="latency")
+    record_query({"attempts": 1, "llm_calls": 3, "escalation_needed": True, "escalation_reason": "latency"}, 0.1)
+    assert escalations_total.value(reason="latency") == before + 1
+    print("✓ Metrics rendered in Prometheus format")
+
+
+if __name__ == "__main__":
+    test_parse_validation()
+    test_critique_drives_refinement()
+    test_budgets_escalate()
+    test_metrics_render()
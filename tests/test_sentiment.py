@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for the local sentiment and priority scorer
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.memory import AgentMemory
+from src.sentiment import score_batch, score_text
+from src.sessions import first_turn_state
+
+
+def test_scores():
+    cases = {
+        "Where is my order?": ("neutral", "normal"),
+        "I am very disappointed and frustrated": ("negative", "high"),
+        "Third time asking, still not fixed. I will take legal action": ("negative", "high"),
+        "Great service, thank you!": ("positive", "normal"),
+        "Just wondering, no rush": ("neutral", "low"),
+        "MY ACCOUNT IS LOCKED AND I NEED IT": ("neutral", "high"),
+        "Refund me!! Now!!": ("neutral", "high"),
+    }
+    for text, expected in cases.items():
+        score = score_text(text)
+        assert (score.sentiment, score.priority) == expected, (text, score)
+    print("✓ Sentiment and priority scored locally")
+
+
+def test_negation_and_intensifiers():
+    assert score_text("The app is bad").compound < 0 < score_text("The app is not bad").compound
+    assert score_text("I am very upset").compound < score_text("I am upset").compound
+    print("✓ Negation flips and intensifiers scale valence")
+
+
+def test_batch_matches_single():
+    texts = ["This is terrible", "thanks!", "This is terrible", "hi"]
+    assert score_batch(texts) == [score_text(text) for text in texts]
+    assert score_batch([]) == []
+    print("✓ Batch scoring matches single scoring")
+
+
+def test_graph_sets_sentiment_and_priority():
+    """analyze_sentiment scores the query but keeps a higher priority set by admission control"""
+    from src.graph import create_graph
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with container.override(llm=FakeChatModel(), memory=AgentMemory(os.path.join(tmp, "memory.json"))):
+            graph = create_graph()
+            result = graph.invoke(first_turn_state("This is unacceptable, my order 12345 is broken", "angry_user"))
+            assert result["sentiment"] == "negative" and result["priority"] == "high"
+
+            result = graph.invoke(first_turn_state("Where is my order 12345?", "vip_user", priority="high"))
+            assert result["sentiment"] == "neutral" and result["priority"] == "high"
+    print("✓ Graph state carries sentiment and priority")
+
+
+def test_batch_endpoint():
+    from src.api import app
+
+    client = TestClient(app)
+    response = client.post("/api/v1/support/sentiment/batch",
+                           json={"texts": ["I hate this", "thank you so much", "where is my parcel"]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["sentiment"] for r in results] == ["negative", "positive", "neutral"]
+    assert client.post("/api/v1/support/sentiment/batch", json={"texts": ["x"] * 1001}).status_code == 422
+    print("✓ Batch sentiment endpoint")
+
+
+if __name__ == "__main__":
+    test_scores()
+    test_negation_and_intensifiers()
+    test_batch_matches_single()
+    test_graph_sets_sentiment_and_priority()
+    test_batch_endpoint()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Test script for checkpointer-backed multi-turn sessions
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.memory import AgentMemory
+from src.sessions import SessionStore
+from src.tracing import InMemorySpanExporter, set_exporter
+
+
+def _node_names(exporter, trace_id):
+    return [span["name"] for span in exporter.spans if span["traceId"] == trace_id and span["name"].startswith("node.")]
+
+
+def test_follow_up_skips_classification():
+    """Follow-ups reuse the session's classification unless a new entity appears"""
+    from fastapi.testclient import TestClient
+    from langgraph.checkpoint.memory import InMemorySaver
+    from src.api import app
+    from src.graph import create_graph
+
+    store = SessionStore(InMemorySaver())
+    exporter = InMemorySpanExporter()
+    tracer = set_exporter(exporter)
+    with tempfile.TemporaryDirectory() as tmp:
+        with container.override(llm=FakeChatModel(), memory=AgentMemory(os.path.join(tmp, "memory.json")),
+                                sessions=store, session_graph=create_graph(checkpointer=store.checkpointer)):
+            client = TestClient(app)
+            first = client.post("/api/v1/support/query",
+                                json={"query": "I have a billing issue with order 12345", "user_id": "alice"}).json()
+            same = client.post("/api/v1/support/query",
+                               json={"query": "Any update?", "conversation_id": first["conversation_id"]}).json()
+            changed = client.post("/api/v1/support/query",
+                                  json={"query": "What about order 67890?", "user_id": "alice",
+                                        "conversation_id": first["conversation_id"]}).json()
+            other_user = client.post("/api/v1/support/query",
+                                     json={"query": "Hi", "user_id": "mallory",
+                                           "conversation_id": first["conversation_id"]}).json()
+            tracer.flush()
+    set_exporter(None)
+
+    assert first["follow_up"] is False
+    assert same["follow_up"] is True and same["user_id"] == "alice"
+    assert same["conversation_id"] == first["conversation_id"]
+    assert "node.classify" in _node_names(exporter, first["trace_id"])
+    assert "node.classify" not in _node_names(exporter, same["trace_id"])
+    assert "node.load_memory" not in _node_names(exporter, same["trace_id"])
+    assert "node.classify" in _node_names(exporter, changed["trace_id"])
+    assert other_user["follow_up"] is False and other_user["conversation_id"] != first["conversation_id"]
+    print("✓ Follow-up turns skip classification and memory loading")
+
+
+def test_history_deltas_and_ttl_eviction():
+    """History accumulates across turns and idle sessions are evicted"""
+    from langgraph.checkpoint.memory import InMemorySaver
+    from src.graph import create_graph
+    from src.sessions import first_turn_state, follow_up_state
+
+    store = SessionStore(InMemorySaver(), ttl_seconds=60)
+    with tempfile.TemporaryDirectory() as tmp:
+        with container.override(llm=FakeChatModel(), memory=AgentMemory(os.path.join(tmp, "memory.json"))):
+            graph = create_graph(checkpointer=store.checkpointer)
+            config = store.config("conv_test")
+            store.touch("conv_test")
+            graph.invoke(first_turn_state("My order 12345 is late", "bob"), config, durability="exit")
+            result = graph.invoke(follow_up_state("Thanks, any news?", "bob"), config, durability="exit")
+
+    user_turns = [turn["content"] for turn in result["conversation_history"] if turn["role"] == "user"]
+    assert user_turns == ["My order 12345 is late", "Thanks, any news?"]
+    assert store.owner("conv_test") == "bob"
+
+    import time
+    assert store.evict_idle(time.time() + 30) == []
+    assert store.evict_idle(time.time() + 120) == ["conv_test"]
+    assert store.owner("conv_test") is None
+    print("✓ Session history accumulates and idle sessions are evicted")
+
+
+def test_workers_share_sessions_through_sqlite():
+    """With several prod_server workers, a follow-up on another worker continues the session"""
+    import argparse
+    from servers.prod_server import configure_environment
+    from src.graph import create_graph
+    from src.sessions import build_session_store, first_turn_state, follow_up_state
+
+    saved = {name: os.environ.pop(name, None) for name in ("MEMORY_BACKEND", "MEMORY_PATH",
+                                                             "SESSION_CHECKPOINTER", "SESSION_DB_PATH")}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            configure_environment(argparse.Namespace(workers=2, memory_backend="sqlite",
+                                                     memory_path=os.path.join(tmp, "agent_memory.db")))
+            assert os.environ["SESSION_CHECKPOINTER"] == "sqlite"
+            assert os.environ["SESSION_DB_PATH"] == os.path.join(tmp, "sessions.db")
+
+            # Each worker builds its own store and graph on its own connection to the same file
+            worker_a, worker_b = build_session_store(), build_session_store()
+            with container.override(llm=FakeChatModel(), memory=AgentMemory(os.path.join(tmp, "memory.json"))):
+                config = worker_a.config("conv_shared")
+                first = create_graph(checkpointer=worker_a.checkpointer).invoke(
+                    first_turn_state("I was charged twice for order 12345", "carol"), config, durability="exit")
+                assert worker_b.owner("conv_shared") == "carol"
+                result = create_graph(checkpointer=worker_b.checkpointer).invoke(
+                    follow_up_state("Any update?", "carol"), config, durability="exit")
+            for store in (worker_a, worker_b):
+                store.checkpointer.conn.close()
+    finally:
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+
+    assert result["categories"] == first["categories"] == ["billing"]
+    assert result["entities"] == first["entities"]
+    user_turns = [turn["content"] for turn in result["conversation_history"] if turn["role"] == "user"]
+    assert user_turns == ["I was charged twice for order 12345", "Any update?"]
+    print("✓ Workers sharing a SQLite checkpointer continue each other's sessions")
+
+
+def test_concurrent_turns_on_sqlite_sessions():
+    """Session lookups, evictions and graph runs share the SQLite checkpointer across threadpool threads"""
+    import asyncio
+    import httpx
+    from src.api import app
+    from src.graph import create_graph
+    from src.ratelimit import RateLimiter
+    from src.sessions import build_session_store
+
+    async def turns(client, first_queries):
+        async def ask(body):
+            response = await client.post("/api/v1/support/query", json=body)
+            assert response.status_code == 200, response.text
+            return response.json()
+        firsts = await asyncio.gather(*(ask({"query": query, "user_id": f"user{i}"})
+                                        for i, query in enumerate(first_queries)))
+        return firsts, await asyncio.gather(*(ask({"query": "Any update?", "conversation_id": first["conversation_id"]})
+                                              for first in firsts))
+
+    saved = {name: os.environ.pop(name, None) for name in ("SESSION_CHECKPOINTER", "SESSION_DB_PATH")}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ.update(SESSION_CHECKPOINTER="sqlite", SESSION_DB_PATH=os.path.join(tmp, "sessions.db"))
+            store = build_session_store()
+            store.sweep_interval = 0  # every touch also sweeps for idle sessions
+            with container.override(llm=FakeChatModel(latency_ms=5), rate_limiter=RateLimiter(limits={}),
+                                    memory=AgentMemory(os.path.join(tmp, "memory.json")), sessions=store,
+                                    session_graph=create_graph(checkpointer=store.checkpointer)):
+                async def drive():
+                    transport = httpx.ASGITransport(app=app)
+                    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                        return await turns(client, [f"My order {10000 + i} is late" for i in range(12)])
+                firsts, follow_ups = asyncio.run(drive())
+            store.checkpointer.conn.close()
+    finally:
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+
+    assert all(turn["follow_up"] for turn in follow_ups)
+    assert [turn["user_id"] for turn in follow_ups] == [f"user{i}" for i in range(12)]
+    print("✓ Concurrent turns share the SQLite session checkpointer safely")
+
+
+if __name__ == "__main__":
+    test_follow_up_skips_classification()
+    test_history_deltas_and_ttl_eviction()
+    test_workers_share_sessions_through_sqlite()
+    test_concurrent_turns_on_sqlite_sessions()
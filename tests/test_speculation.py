@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test script for speculative handler execution
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.memory import AgentMemory
+from src.predictor import predict_categories
+from src.sessions import first_turn_state
+from src.speculation import Speculator
+
+
+def _run(query, user_id="spec_user", history=None, llm=None):
+    from src.graph import create_graph
+
+    llm = llm or FakeChatModel(latency_ms=20)
+    speculator = Speculator(max_workers=2)
+    os.environ["SPECULATIVE_HANDLERS"] = "on"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = AgentMemory(os.path.join(tmp, "memory.json"))
+            for conversation in history or []:
+                memory.save_conversation(user_id, conversation)
+            with container.override(llm=llm, memory=memory, speculator=speculator):
+                result = create_graph().invoke(first_turn_state(query, user_id))
+    finally:
+        del os.environ["SPECULATIVE_HANDLERS"]
+    return result, speculator, llm
+
+
+def test_predictor():
+    assert predict_categories("I was charged twice for order 12345") == ["billing"]
+    assert predict_categories("The app crashes when I open the settings page") == ["technical"]
+    assert predict_categories("I want to return the shoes from order 98765") == ["returns"]
+    assert predict_categories("Do you ship internationally?") == []
+    print("✓ Keyword predictor guesses categories from the query")
+
+
+def test_hit_reuses_handler_call():
+    result, speculator, llm = _run("I was charged twice for order 12345")
+    assert result["categories"] == ["billing"] and result["entities"] == {"order_id": "12345"}
+    assert speculator.get_stats()["hit"] == 1
+    # Speculative handler call + validation, no second handler call
+    assert result["llm_calls"] == 2 and llm.stats["calls"] == 2
+    assert result["response"]
+    print("✓ Matching speculation is adopted by the handler node")
+
+
+def test_miss_is_discarded():
+    # The user's history makes classification pick technical although the wording looks like billing
+    history = [{"query": "charged twice for order 12345 app error", "categories": ["technical"],
+                "entities": {}, "response": "Clear the cache.", "satisfactory": True}] * 2
+    result, speculator, llm = _run("I was charged twice for order 12345", history=history)
+    assert result["categories"] == ["technical"]
+    stats = speculator.get_stats()
+    assert stats["miss"] == 1 and stats["hit"] == 0 and stats["running"] == 0
+    assert result["llm_calls"] == 2, "discarded speculative calls are not billed to the request"
+    print("✓ Mismatched speculation is cancelled and the real handler runs")
+
+
+def test_collaboration_adopts_matching_category():
+    result, speculator, llm = _run("I was charged twice and the app shows an error")
+    assert set(result["categories"]) == {"billing", "technical"}
+    assert speculator.get_stats()["hit"] == 1
+    assert result["llm_calls"] == 3 and llm.stats["calls"] == 3
+    print("✓ Collaboration adopts the speculated category and runs the others")
+
+
+def test_settle_and_take():
+    speculator = Speculator(max_workers=1)
+    snapshot = {"entities": {}, "llm_calls": 0}
+
+    def slow(state):
+        time.sleep(0.05)
+        return {"response": "done", "llm_calls": 1, "degradations": []}
+
+    sid = speculator.start("billing", slow, snapshot)
+    assert speculator.take(sid, "technical") is None  # another handler: left for its owner
+    _, result = speculator.take(sid, "billing")
+    assert result["response"] == "done"
+
+    blocker = speculator.start("general", slow, snapshot)
+    queued = speculator.start("returns", slow, snapshot)
+    speculator.settle(queued, ["billing"], {})  # still queued behind blocker: cancelled outright
+    assert speculator.take(queued, "returns") is None
+    speculator.settle(blocker, ["general"], {"order_id": "1"})  # entities differ
+    assert speculator.get_stats()["miss"] == 2 and speculator.get_stats()["hit"] == 1
+    speculator.close()
+    print("✓ Speculator settles, takes and cancels runs")
+
+
+def test_late_speculation_leaves_no_spans():
+    """Only adopted speculations join the trace; a discarded run finishing late leaves nothing behind"""
+    from src.graph import create_graph
+    from src.tracing import InMemorySpanExporter, set_exporter, start_span
+
+    def traced_run(query, history, first_call_delay):
+        calls = []
+
+        def responder(prompt):
+            calls.append(prompt)
+            if len(calls) == 1:
+                time.sleep(first_call_delay)  # the speculative call
+            return "Handled."
+
+        speculator = Speculator(max_workers=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = AgentMemory(os.path.join(tmp, "memory.json"))
+            for conversation in history:
+                memory.save_conversation("spec_user", conversation)
+            with container.override(llm=FakeChatModel(responder=responder), memory=memory, speculator=speculator):
+                with start_span("request") as root:
+                    create_graph().invoke(first_turn_state(query, "spec_user"))
+            speculator._executor.shutdown(wait=True)
+        tracer.flush()
+        return speculator.get_stats(), [span["name"] for span in exporter.spans if span["traceId"] == root.trace_id]
+
+    history = [{"query": "charged twice for order 12345 app error", "categories": ["technical"],
+                "entities": {}, "response": "Clear the cache.", "satisfactory": True}] * 2
+    exporter = InMemorySpanExporter()
+    tracer = set_exporter(exporter)
+    os.environ["SPECULATIVE_HANDLERS"] = "on"
+    try:
+        stats, names = traced_run("I was charged twice for order 12345", history, first_call_delay=0.3)
+        assert stats["miss"] == 1 and "speculation.run" not in names, names
+        assert tracer._pending == {}, "the late run's spans are not left pending"
+
+        stats, names = traced_run("I was charged twice for order 12345", [], first_call_delay=0.0)
+        assert stats["hit"] == 1 and "speculation.run" in names, names
+        assert tracer._pending == {}
+    finally:
+        del os.environ["SPECULATIVE_HANDLERS"]
+        set_exporter(None)
+    print("✓ A discarded speculation's spans are dropped; an adopted one's join the trace")
+
+if __name__ == "__main__":
+    test_predictor()
+    test_hit_reuses_handler_call()
+    test_miss_is_discarded()
+    test_collaboration_adopts_matching_category()
+    test_settle_and_take()
+    test_late_speculation_leaves_no_spans()
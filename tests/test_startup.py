@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for lazy service construction and readiness reporting
+"""
+
+import sys
+import os
+import subprocess
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_import_is_lazy():
+    """Importing the API builds no LLM client, memory store or graph"""
+    code = (
+        "import sys; import src.api; from src.container import container; "
+        "print(','.join(str(container.is_initialized(n)) for n in ('llm', 'memory', 'graph'))); "
+        "print('langchain_openai' in sys.modules, 'langgraph' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout.splitlines()
+    assert output[0] == "False,False,False", output
+    assert output[1] == "False False", output
+    print("✓ Services are built lazily")
+
+
+def test_readiness_reflects_warm_up():
+    """/health answers immediately while /ready reports 503 until services exist"""
+    from fastapi.testclient import TestClient
+    from src.api import app, get_graph
+    from src.container import container
+    from src.fake_llm import FakeChatModel
+    from src.config import set_llm
+    from src.memory import AgentMemory, set_agent_memory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = {name: container.set(name, None) for name in ("llm", "memory", "graph")}
+        try:
+            client = TestClient(app)
+            assert client.get("/health").status_code == 200
+            cold = client.get("/ready")
+            assert cold.status_code == 503
+            assert cold.json()["status"] == "warming"
+
+            set_llm(FakeChatModel())
+            set_agent_memory(AgentMemory(os.path.join(tmp, "memory.json")))
+            container.get("memory").load()
+            get_graph()
+            warm = client.get("/ready")
+            assert warm.status_code == 200, warm.json()
+        finally:
+            for name, instance in previous.items():
+                container.set(name, instance)
+    print("✓ Readiness reports warm-up state")
+
+
+def test_lifespan_warm_up():
+    """Start-up warm-up compiles the graph and dry-runs without touching the real store"""
+    import time
+    from fastapi.testclient import TestClient
+    from src.api import app
+    from src.container import container
+    from src.fake_llm import FakeChatModel
+    from src.memory import AgentMemory
+    from src.warmup import warmup_state
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        previous = {"llm": container.set("llm", FakeChatModel()), "memory": container.set("memory", memory),
+                    "graph": container.set("graph", None)}
+        try:
+            with TestClient(app) as client:
+                for _ in range(200):
+                    response = client.get("/ready")
+                    if response.status_code == 200:
+                        break
+                    time.sleep(0.05)
+                assert response.status_code == 200, response.json()
+                assert set(response.json()["warmup"]["steps_ms"]) == {"graph", "memory", "tokenizer", "llm", "dry_run"}
+            assert "warmup" not in memory.memory["user_profiles"]
+        finally:
+            for name, instance in previous.items():
+                container.set(name, instance)
+            warmup_state.set_status("cold")
+    print("✓ Lifespan warm-up completed")
+
+
+def test_dry_run_records_no_metrics_or_spans():
+    """The warm-up query leaves the metrics registry and the trace exporter untouched"""
+    from src.container import container
+    from src.metrics import metrics
+    from src.tracing import InMemorySpanExporter, get_tracer, set_exporter
+    from src.warmup import _dry_run
+
+    exporter = InMemorySpanExporter()
+    previous_exporter = get_tracer().exporter
+    previous_graph = container.set("graph", None)
+    set_exporter(exporter)
+    try:
+        before = metrics.render()
+        _dry_run()
+        get_tracer().flush()
+        assert metrics.render() == before
+        assert exporter.spans == []
+    finally:
+        set_exporter(previous_exporter)
+        container.set("graph", previous_graph)
+    print("✓ Dry run stays out of metrics and traces")
+
+
+if __name__ == "__main__":
+    test_import_is_lazy()
+    test_readiness_reflects_warm_up()
+    test_lifespan_warm_up()
+    test_dry_run_records_no_metrics_or_spans()
+    print("All startup tests passed!")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for serving the frontend with hashed, precompressed, cacheable assets
+"""
+
+import sys
+import os
+import gzip
+import socket
+import tempfile
+import threading
+import http.client
+from pathlib import Path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.container import container
+from src.static_assets import HASHED_CACHE_CONTROL, StaticAssets, write_assets
+
+FRONTEND = Path(__file__).resolve().parents[1] / "frontend"
+
+
+def _hashed(assets: StaticAssets, name: str) -> str:
+    return "/static/" + assets.manifest[name]
+
+
+def test_index_points_at_hashed_assets():
+    assets = StaticAssets(FRONTEND)
+    status, headers, body = assets.respond("/")
+    assert status == 200 and headers["Cache-Control"] == "no-cache"
+    assert headers["Content-Type"] == "text/html; charset=utf-8"
+    for name in ("styles.css", "script.js"):
+        assert _hashed(assets, name).encode() in body, name
+        status, headers, _ = assets.respond(_hashed(assets, name))
+        assert status == 200 and headers["Cache-Control"] == HASHED_CACHE_CONTROL
+        # Unhashed names still work but are revalidated
+        assert assets.respond(f"/static/{name}")[1]["Cache-Control"] == "no-cache"
+    assert assets.respond("/static/missing.js") is None and assets.respond("/../README.md") is None
+    print("✓ index.html references content-hashed, immutable assets")
+
+
+def test_negotiation_and_revalidation():
+    assets = StaticAssets(FRONTEND)
+    path = _hashed(assets, "script.js")
+    _, identity_headers, identity = assets.respond(path)
+    status, headers, body = assets.respond(path, accept_encoding="gzip, deflate")
+    assert status == 200 and headers["Content-Encoding"] == "gzip" and headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(body) == identity and len(body) < len(identity)
+    assert headers["ETag"] != identity_headers["ETag"]
+
+    for etag in (headers["ETag"], identity_headers["ETag"], f'W/{headers["ETag"]}', '"other", ' + headers["ETag"]):
+        status, _, body = assets.respond(path, "gzip", if_none_match=etag)
+        assert status == 304 and body == b"", etag
+    assert assets.respond(path, "gzip", if_none_match='"stale"')[0] == 200
+    print("✓ Precompressed variants are negotiated and revalidate with 304")
+
+
+def test_built_directory_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = write_assets(FRONTEND, Path(tmp))
+        files = set(os.listdir(tmp))
+        assert manifest["script.js"] in files and manifest["script.js"] + ".gz" in files
+        assert "manifest.json" in files and "index.html" in files
+        built, in_memory = StaticAssets(tmp), StaticAssets(FRONTEND)
+        for path in ("/", _hashed(in_memory, "styles.css"), _hashed(in_memory, "script.js")):
+            assert built.respond(path, "gzip") == in_memory.respond(path, "gzip"), path
+    print("✓ A build written to disk serves the same bytes as the in-memory build")
+
+
+def test_api_serves_frontend():
+    from src.api import app
+
+    assets = StaticAssets(FRONTEND)
+    with container.override(static_assets=assets):
+        client = TestClient(app)
+        page = client.get("/")
+        assert page.status_code == 200 and page.headers["cache-control"] == "no-cache"
+        script = client.get(_hashed(assets, "script.js"), headers={"Accept-Encoding": "gzip"})
+        assert script.status_code == 200 and script.headers["content-encoding"] == "gzip"
+        assert script.headers["cache-control"] == HASHED_CACHE_CONTROL
+        assert "API_BASE_URL" in script.text
+        again = client.get("/", headers={"If-None-Match": page.headers["etag"]})
+        assert again.status_code == 304 and again.content == b""
+        assert client.get("/static/missing.js").status_code == 404
+        assert client.get("/health").status_code == 200
+
+        os.environ["FRONTEND_SERVE"] = "off"
+        try:
+            assert client.get("/").status_code == 404
+        finally:
+            os.environ.pop("FRONTEND_SERVE")
+    print("✓ The API serves the frontend at / and /static/")
+
+
+def test_frontend_server_is_not_blocked_by_a_slow_client():
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "servers"))
+    from frontend_server import make_server
+
+    server = make_server("127.0.0.1", 0, str(FRONTEND))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        slow = socket.create_connection(("127.0.0.1", port))
+        slow.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n")  # never finishes its headers
+
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        for path in ("/", "/index.html"):  # two requests on one kept-alive connection
+            connection.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            response = connection.getresponse()
+            body = response.read()
+            assert response.status == 200 and response.getheader("Content-Encoding") == "gzip"
+            assert b"/static/" in gzip.decompress(body)
+        connection.request("HEAD", "/missing")
+        response = connection.getresponse()
+        assert response.status == 404 and response.read() == b""
+        connection.close()
+        slow.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("✓ The frontend server keeps connections alive and serves around a stalled client")
+
+
+if __name__ == "__main__":
+    test_index_points_at_hashed_assets()
+    test_negotiation_and_revalidation()
+    test_built_directory_round_trip()
+    test_api_serves_frontend()
+    test_frontend_server_is_not_blocked_by_a_slow_client()
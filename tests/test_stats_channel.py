@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test script for the server-sent stats channel
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from src.container import container
+from src.memory import AgentMemory
+from src.stats_channel import StatsAggregator, StreamsFull, stats_events
+
+
+class CountingStats:
+    def __init__(self):
+        self.stats = {"total_conversations": 4, "resolved_issues": 1, "active_users": 2}
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return dict(self.stats)
+
+
+def test_publishes_only_changes():
+    async def scenario():
+        source = CountingStats()
+        aggregator = StatsAggregator(source, interval=3600)
+        first, second = await aggregator.subscribe(), await aggregator.subscribe()
+        assert source.reads == 1, "one read serves every subscriber"
+        kind, sequence, data = first.get_nowait()
+        assert kind == "snapshot" and data["resolution_rate"] == 25.0 and data["active_users"] == 2
+        assert second.get_nowait() == (kind, sequence, data)
+
+        await aggregator.refresh()
+        assert first.empty(), "unchanged counters publish nothing"
+
+        source.stats["active_users"] = 3
+        await aggregator.refresh()
+        for queue in (first, second):
+            assert queue.get_nowait() == ("delta", sequence + 1, {"active_users": 3})
+
+        source.stats.update(total_conversations=5, resolved_issues=2)
+        await aggregator.refresh()
+        assert first.get_nowait()[2] == {"total_conversations": 5, "resolved_issues": 2, "resolution_rate": 40.0}
+        aggregator.unsubscribe(first)
+        aggregator.unsubscribe(second)
+    asyncio.run(scenario())
+    print("✓ The aggregator reads once for all clients and sends only changed counters")
+
+
+def test_slow_client_gets_a_snapshot():
+    async def scenario():
+        source = CountingStats()
+        aggregator = StatsAggregator(source, interval=3600, queue_size=2)
+        queue = await aggregator.subscribe()
+        for users in range(3, 8):
+            source.stats["active_users"] = users
+            await aggregator.refresh()
+        events = [queue.get_nowait() for _ in range(queue.qsize())]
+        # The backlog was replaced with a snapshot; applying what is left gives the current counters
+        assert events[0][0] == "snapshot"
+        state = {}
+        for _, _, data in events:
+            state.update(data)
+        assert state == aggregator.current and state["active_users"] == 7
+        aggregator.unsubscribe(queue)
+    asyncio.run(scenario())
+    print("✓ A client that falls behind gets a snapshot instead of its backlog")
+
+
+def test_capacity_and_idle_stop():
+    async def scenario():
+        source = CountingStats()
+        aggregator = StatsAggregator(source, interval=0.01, max_subscribers=2)
+        queues = [await aggregator.subscribe(), await aggregator.subscribe()]
+        try:
+            await aggregator.subscribe()
+            assert False, "third subscriber should be refused"
+        except StreamsFull:
+            pass
+        await asyncio.sleep(0.05)
+        assert source.reads > 1, "the aggregator polls while clients are subscribed"
+        for queue in queues:
+            aggregator.unsubscribe(queue)
+        await asyncio.sleep(0.05)
+        assert aggregator._task.done()
+        reads = source.reads
+        await asyncio.sleep(0.05)
+        assert source.reads == reads, "no reads without subscribers"
+    asyncio.run(scenario())
+    print("✓ Streams are capped per worker and the aggregator idles without clients")
+
+
+def test_event_stream_frames():
+    async def scenario():
+        source = CountingStats()
+        aggregator = StatsAggregator(source, interval=3600)
+        queue = await aggregator.subscribe()
+        frames = stats_events(aggregator, queue, heartbeat=0.01)
+        assert (await frames.__anext__()).startswith("retry: ")
+        snapshot = await frames.__anext__()
+        assert snapshot.startswith("event: snapshot\nid: 1\ndata: ") and snapshot.endswith("\n\n")
+        assert json.loads(snapshot.split("data: ", 1)[1])["total_conversations"] == 4
+        assert await frames.__anext__() == ": keep-alive\n\n"
+        source.stats["resolved_issues"] = 2
+        await aggregator.refresh()
+        assert await frames.__anext__() == 'event: delta\nid: 2\ndata: {"resolved_issues":2,"resolution_rate":50.0}\n\n'
+        await frames.aclose()
+        assert aggregator.subscribers == 0, "closing the stream unsubscribes"
+    asyncio.run(scenario())
+    print("✓ The stream sends retry, snapshot, delta and keep-alive frames")
+
+
+def test_api_fallbacks():
+    from src.api import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = AgentMemory(os.path.join(tmp, "memory.json"))
+        memory.save_conversation("u1", {"query": "where is my order", "satisfactory": True, "categories": ["general"]})
+        full = StatsAggregator(lambda: {}, max_subscribers=0)
+        with container.override(memory=memory, stats_aggregator=full):
+            client = TestClient(app)
+            stats = client.get("/api/v1/support/stats").json()
+            assert stats["total_conversations"] == 1 and stats["resolution_rate"] == 100.0
+
+            response = client.get("/api/v1/support/stats/stream")
+            assert response.status_code == 503 and response.headers["retry-after"] == "60"
+            os.environ["STATS_STREAM"] = "off"
+            try:
+                assert client.get("/api/v1/support/stats/stream").status_code == 503
+            finally:
+                os.environ.pop("STATS_STREAM")
+    print("✓ Clients are sent to the polling endpoint when the stream is unavailable")
+
+
+if __name__ == "__main__":
+    test_publishes_only_changes()
+    test_slow_client_gets_a_snapshot()
+    test_capacity_and_idle_stop()
+    test_event_stream_frames()
+    test_api_fallbacks()
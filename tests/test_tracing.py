@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for request tracing
+"""
+
+import sys
+import os
+import contextvars
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tracing import Tracer, InMemorySpanExporter, set_exporter, start_span, traced_node
+from src.memory import AgentMemory
+
+
+def test_span_hierarchy():
+    """Child spans share the root trace id and point at their parent"""
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter)
+
+    with tracer.start_span("root") as root:
+        with tracer.start_span("child", {"attempt": 1}) as child:
+            pass
+    tracer.flush()
+
+    spans = {span["name"]: span for span in exporter.spans}
+    assert set(spans) == {"root", "child"}
+    assert spans["child"]["traceId"] == root.trace_id
+    assert spans["child"]["parentSpanId"] == root.span_id
+    assert spans["root"]["parentSpanId"] == ""
+    assert child.attributes["attempt"] == 1
+    print("✓ Span hierarchy exported")
+
+
+def test_error_status():
+    """Exceptions mark the span as failed and still propagate"""
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter)
+
+    try:
+        with tracer.start_span("failing"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    tracer.flush()
+
+    assert exporter.spans[0]["status"]["code"] == "ERROR"
+    print("✓ Failing span recorded")
+
+
+def test_detached_and_late_spans():
+    """Detached spans join their trace only when attached; children of an exported trace are dropped"""
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter)
+
+    with tracer.start_span("root"):
+        with tracer.detached() as kept:
+            with tracer.start_span("kept"):
+                pass
+        with tracer.detached() as discarded:
+            with tracer.start_span("discarded"):
+                pass
+        tracer.attach(kept)
+        context = contextvars.copy_context()
+
+    def late_child():
+        with tracer.start_span("late_child"):
+            pass
+
+    context.run(late_child)  # e.g. background work still running after the request ended
+    tracer.flush()
+
+    assert discarded and sorted(span["name"] for span in exporter.spans) == ["kept", "root"]
+    assert tracer._pending == {}
+    print("✓ Detached spans are attached on demand and late spans are not kept")
+
+
+def test_node_and_memory_spans():
+    """Node wrappers and memory operations emit child spans with attributes"""
+    exporter = InMemorySpanExporter()
+    tracer = set_exporter(exporter)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = AgentMemory(os.path.join(tmp, "memory.json"))
+
+        def lookup_node(state):
+            return {"knowledge_base_entry": memory.get_knowledge_base_entry(state["categories"])}
+
+        node = traced_node("load_memory", lookup_node)
+        with start_span("support.query") as root:
+            node({"categories": ["billing"], "attempts": 2})
+        tracer.flush()
+
+    set_exporter(None)
+    spans = {span["name"]: span for span in exporter.spans if span["traceId"] == root.trace_id}
+    assert "node.load_memory" in spans
+    assert "memory.get_knowledge_base_entry" in spans
+    assert spans["memory.get_knowledge_base_entry"]["parentSpanId"] == spans["node.load_memory"]["spanId"]
+
+    attributes = {a["key"]: a["value"] for a in spans["node.load_memory"]["attributes"]}
+    assert attributes["state.attempts"] == {"intValue": 2}
+    assert attributes["memory.kb_hit"] == {"boolValue": False}
+    lookup = {a["key"]: a["value"] for a in spans["memory.get_knowledge_base_entry"]["attributes"]}
+    assert lookup["memory.found"] == {"boolValue": False}
+    assert "memory.cache_hit" not in lookup
+    print("✓ Node and memory spans exported")
+
+
+if __name__ == "__main__":
+    test_span_hierarchy()
+    test_error_status()
+    test_detached_and_late_spans()
+    test_node_and_memory_spans()
+    print("All tracing tests passed!")
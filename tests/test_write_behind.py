@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test script for the write-behind memory queue
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.container import container
+from src.fake_llm import FakeChatModel
+from src.memory import AgentMemory
+from src.memory_sqlite import SQLiteAgentMemory
+from src.sessions import first_turn_state
+from src.write_behind import WriteBehindMemory
+
+
+class GatedMemory(AgentMemory):
+    """AgentMemory whose writes wait for a gate and that counts file rewrites"""
+
+    def __init__(self, storage_path, delay=0.0):
+        super().__init__(storage_path)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.delay = delay
+        self.rewrites = 0
+
+    def save_conversation(self, user_id, conversation_data):
+        self.gate.wait()
+        time.sleep(self.delay)
+        super().save_conversation(user_id, conversation_data)
+
+    def _save_memory(self):
+        self.rewrites += 1
+        super()._save_memory()
+
+
+def _conversation(i):
+    return {"query": f"question {i}", "categories": ["billing"], "entities": {}, "response": f"answer {i}",
+            "satisfactory": True}
+
+
+def test_read_your_writes_in_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = GatedMemory(os.path.join(tmp, "memory.json"), delay=0.01)
+        memory = WriteBehindMemory(backend)
+        start = time.perf_counter()
+        for i in range(10):
+            memory.save_conversation("alice", _conversation(i))
+        assert time.perf_counter() - start < 0.05, "writes should only be queued"
+        history = memory.get_user_profile("alice")["conversation_history"]
+        assert [c["query"] for c in history] == [f"question {i}" for i in range(10)]
+        memory.close()
+    print("✓ Reads see the user's queued writes, in order")
+
+
+def test_batches_coalesce_rewrites():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = GatedMemory(os.path.join(tmp, "memory.json"))
+        backend.gate.clear()
+        memory = WriteBehindMemory(backend)
+        for i in range(50):
+            memory.save_conversation(f"user{i % 5}", _conversation(i))
+            memory.update_knowledge_base(["billing"], f"question {i}", f"answer {i}")
+        backend.gate.set()
+        memory.drain()
+        # The first write can be taken alone before the rest queue up behind the gate
+        assert backend.rewrites <= 2, backend.rewrites
+        assert memory.get_system_stats()["total_conversations"] == 50
+        assert memory.get_queue_stats() == {"pending": 0, "applied": 100, "failed": 0, "batches": backend.rewrites}
+        memory.close()
+    print("✓ Queued writes are applied with one rewrite per batch")
+
+
+def test_max_batch_splits_one_users_queue():
+    """max_batch=1 (MEMORY_FSYNC=always) persists every write on its own, even for a single user"""
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = GatedMemory(os.path.join(tmp, "memory.json"))
+        backend.gate.clear()
+        memory = WriteBehindMemory(backend, max_batch=1)
+        for i in range(5):
+            memory.save_conversation("frank", _conversation(i))
+        backend.gate.set()
+        history = memory.get_user_profile("frank")["conversation_history"]
+        assert [c["query"] for c in history] == [f"question {i}" for i in range(5)]
+        assert backend.rewrites == memory.get_queue_stats()["batches"] == 5
+        memory.close()
+    print("✓ max_batch caps the writes sharing one rewrite, within a user's queue too")
+
+
+def test_backpressure():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = GatedMemory(os.path.join(tmp, "memory.json"))
+        backend.gate.clear()
+        memory = WriteBehindMemory(backend, max_pending=2)
+        memory.save_conversation("bob", _conversation(0))
+        memory.save_conversation("bob", _conversation(1))
+        writer = threading.Thread(target=memory.save_conversation, args=("bob", _conversation(2)))
+        writer.start()
+        writer.join(0.1)
+        assert writer.is_alive(), "a full queue should block the writer"
+        backend.gate.set()
+        writer.join(5)
+        assert not writer.is_alive()
+        assert len(memory.get_user_profile("bob")["conversation_history"]) == 3
+        memory.close()
+    print("✓ A full queue blocks writers instead of dropping writes")
+
+
+def test_close_persists_pending_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, db_path = os.path.join(tmp, "memory.json"), os.path.join(tmp, "memory.db")
+        json_backend = GatedMemory(json_path, delay=0.005)
+        for backend, reopen in ((json_backend, lambda: AgentMemory(json_path)),
+                                (SQLiteAgentMemory(db_path, synchronous="FULL"), lambda: SQLiteAgentMemory(db_path))):
+            memory = WriteBehindMemory(backend)
+            for i in range(20):
+                memory.save_conversation("carol", _conversation(i))
+            memory.close()
+            reopened = reopen()
+            assert reopened.get_user_profile("carol")["total_interactions"] == 20
+            if hasattr(reopened, "close"):
+                reopened.close()
+    print("✓ Shutdown applies and persists every queued write")
+
+
+def test_graph_does_not_wait_for_persistence():
+    from src.graph import create_graph
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = GatedMemory(os.path.join(tmp, "memory.json"))
+        backend.gate.clear()
+        memory = WriteBehindMemory(backend)
+        with container.override(llm=FakeChatModel(), memory=memory):
+            result = create_graph().invoke(first_turn_state("I have a billing issue with order 12345", "dave"))
+        assert result["response"] and memory.get_queue_stats()["pending"] >= 1
+        backend.gate.set()
+        assert memory.get_user_profile("dave")["total_interactions"] == 1
+        memory.close()
+    print("✓ The graph returns before its memory writes are persisted")
+
+
+def test_api_reads_do_not_block_the_event_loop():
+    """Endpoints waiting on queued writes leave the worker free to answer other requests"""
+    import asyncio
+    import httpx
+    from src.api import app
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            stats = asyncio.ensure_future(client.get("/api/v1/support/stats"))
+            history = asyncio.ensure_future(client.get("/api/v1/support/history/erin"))
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            assert (await client.get("/health")).status_code == 200
+            assert time.perf_counter() - start < 0.3, "the event loop was blocked"
+            assert not stats.done() and not history.done()
+            assert (await stats).json()["total_conversations"] == 1
+            assert (await history).status_code == 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = GatedMemory(os.path.join(tmp, "memory.json"))
+        backend.gate.clear()
+        memory = WriteBehindMemory(backend)
+        memory.save_conversation("erin", _conversation(0))
+        opener = threading.Timer(0.6, backend.gate.set)
+        opener.start()
+        with container.override(memory=memory):
+            asyncio.run(scenario())
+        opener.join()
+        memory.close()
+    print("✓ Stats and history reads wait for queued writes off the event loop")
+
+
+if __name__ == "__main__":
+    test_read_your_writes_in_order()
+    test_batches_coalesce_rewrites()
+    test_max_batch_splits_one_users_queue()
+    test_backpressure()
+    test_close_persists_pending_writes()
+    test_graph_does_not_wait_for_persistence()
+    test_api_reads_do_not_block_the_event_loop()